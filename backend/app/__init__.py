@@ -4,7 +4,7 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from dotenv import load_dotenv
 import os
-import boto3
+from .utils.db_engine import engine_options
 
 # Load environment variables
 load_dotenv()
@@ -18,6 +18,7 @@ def create_app():
     
     # Load configuration from environment variables
     app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///ev_charging.db')
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
     app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your_secret_key')
     app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'your_jwt_secret_key')
     
@@ -25,32 +26,125 @@ def create_app():
     app.config['AWS_COGNITO_USER_POOL_ID'] = os.getenv('AWS_COGNITO_USER_POOL_ID')
     app.config['AWS_COGNITO_CLIENT_ID'] = os.getenv('AWS_COGNITO_CLIENT_ID')
     app.config['AWS_REGION'] = os.getenv('AWS_REGION')
+    
+    # Payment worker (outbox drained in the background)
+    app.config['PAYMENT_WORKERS'] = int(os.getenv('PAYMENT_WORKERS', 8))
+    gateway_latency = os.getenv('PAYMENT_GATEWAY_LATENCY')
+    app.config['PAYMENT_GATEWAY_LATENCY'] = float(gateway_latency) if gateway_latency else None
+    app.config['PAYMENT_GATEWAY_TIMEOUT'] = float(os.getenv('PAYMENT_GATEWAY_TIMEOUT', 30))
+    # A payment stays leased to one worker this long; must outlast a gateway call
+    app.config['PAYMENT_LEASE_SECONDS'] = int(os.getenv('PAYMENT_LEASE_SECONDS', 300))
+    
+    # Listing cache ('memory' per process, or 'redis' shared across workers)
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', 'memory')
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    app.config['CACHE_TTL'] = int(os.getenv('CACHE_TTL', 60))
+    
+    # Telemetry ingestion buffer
+    app.config['TELEMETRY_MAX_BUFFERED'] = int(os.getenv('TELEMETRY_MAX_BUFFERED', 500000))
+    app.config['TELEMETRY_FLUSH_SIZE'] = int(os.getenv('TELEMETRY_FLUSH_SIZE', 10000))
+    
+    # In-memory free-slot index; rebuilt this often to pick up other workers' changes
+    app.config['AVAILABILITY_RELOAD_SECONDS'] = int(os.getenv('AVAILABILITY_RELOAD_SECONDS', 60))
+    
+    # Metrics (/metrics behind a bearer token unless METRICS_PUBLIC=1) and sampled request profiling
+    app.config['METRICS_ENABLED'] = os.getenv('METRICS_ENABLED', '1') == '1'
+    app.config['METRICS_TOKEN'] = os.getenv('METRICS_TOKEN')
+    app.config['METRICS_PUBLIC'] = os.getenv('METRICS_PUBLIC', '0') == '1'
+    # Shared directory where each worker process publishes its metrics for /metrics to merge
+    app.config['METRICS_DIR'] = os.getenv('METRICS_DIR')
+    app.config['METRICS_WRITE_SECONDS'] = float(os.getenv('METRICS_WRITE_SECONDS', 5))
+    app.config['PROFILE_SAMPLE_RATE'] = int(os.getenv('PROFILE_SAMPLE_RATE', 0))
+    app.config['PROFILE_SLOW_MS'] = float(os.getenv('PROFILE_SLOW_MS', 500))
+    app.config['PROFILE_DIR'] = os.getenv('PROFILE_DIR', 'profiles')
+    
+    # Auth endpoint protection: token-bucket limits ("<requests>/<seconds>") and bounded password hashing
+    app.config['RATE_LIMIT_ENABLED'] = os.getenv('RATE_LIMIT_ENABLED', '1') == '1'
+    app.config['RATE_LIMIT_BACKEND'] = os.getenv('RATE_LIMIT_BACKEND', 'memory')
+    app.config['RATE_LIMIT_REDIS_URL'] = os.getenv('RATE_LIMIT_REDIS_URL', app.config['CACHE_REDIS_URL'])
+    app.config['AUTH_RATE_LIMIT_IP'] = os.getenv('AUTH_RATE_LIMIT_IP', '30/60')
+    app.config['AUTH_RATE_LIMIT_USER'] = os.getenv('AUTH_RATE_LIMIT_USER', '10/300')
+    app.config['PASSWORD_HASH_WORKERS'] = int(os.getenv('PASSWORD_HASH_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    app.config['PASSWORD_HASH_QUEUE'] = int(os.getenv('PASSWORD_HASH_QUEUE', 32))
+    # Number of reverse proxies in front of the app, so client IPs come from X-Forwarded-For
+    app.config['PROXY_FIX_HOPS'] = int(os.getenv('PROXY_FIX_HOPS', 0))
+    
+    # Maintenance jobs run by the in-process scheduler (started by each worker's first request)
+    app.config['JOBS_ENABLED'] = os.getenv('JOBS_ENABLED', '1') == '1'
+    app.config['JOB_BATCH_SIZE'] = int(os.getenv('JOB_BATCH_SIZE', 500))
+    app.config['SESSION_IDLE_MINUTES'] = int(os.getenv('SESSION_IDLE_MINUTES', 30))
+    app.config['SESSION_MAX_HOURS'] = int(os.getenv('SESSION_MAX_HOURS', 12))
+    app.config['ARCHIVE_AFTER_DAYS'] = int(os.getenv('ARCHIVE_AFTER_DAYS', 90))
+    app.config['PRICE_REFRESH_SECONDS'] = int(os.getenv('PRICE_REFRESH_SECONDS', 900))
+    
+    # Optional per-request SQL statement budget (used by tests/CI to catch N+1 queries)
+    app.config['MAX_QUERIES_PER_REQUEST'] = int(os.getenv('MAX_QUERIES_PER_REQUEST', 0)) or None
 
     # Initialize database and JWT manager
     db.init_app(app)
     JWTManager(app)
     migrate.init_app(app, db) 
     
-    # Initialize AWS Cognito Client
-    try:
-        app.cognito_client = boto3.client(
-            'cognito-idp',
-            region_name=app.config['AWS_REGION']
-        )
-    except Exception as e:
-        raise RuntimeError(f"Failed to initialize AWS Cognito: {e}")
+    from .services.payment_worker import payment_worker
+    payment_worker.init_app(app)
+    # Drain payments left in the outbox by a restart on the first request, not the next booking
+    app.before_request(payment_worker.ensure_started)
+    
+    from .utils.cache import response_cache
+    response_cache.init_app(app)
+    
+    from .services.telemetry import telemetry_ingestor
+    telemetry_ingestor.init_app(app)
+    
+    from .services.availability import availability_index
+    availability_index.init_app(app)
+    
+    from .utils.rate_limit import rate_limiter
+    rate_limiter.init_app(app)
+    
+    from .utils.scheduler import job_scheduler
+    from .services.maintenance import register_jobs
+    job_scheduler.init_app(app)
+    register_jobs(job_scheduler, app.config)
+    if app.config['JOBS_ENABLED']:
+        app.before_request(job_scheduler.ensure_started)
+    
+    if app.config['PROXY_FIX_HOPS']:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_HOPS'])
+    
+    if app.config['METRICS_ENABLED']:
+        from .utils.metrics import init_metrics
+        init_metrics(app)
+    
+    if app.config['PROFILE_SAMPLE_RATE']:
+        from .utils.profiler import init_profiler
+        init_profiler(app)
+    
+    if app.config['MAX_QUERIES_PER_REQUEST']:
+        from .utils.query_counter import init_query_guard
+        init_query_guard(app)
     
     # Import and register blueprints
-    from .auth import auth_bp
+    from .auth import auth_bp, password_hasher
+    password_hasher.configure(app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_QUEUE'])
     from .routes.ev_owner import ev_owner_bp
     from .routes.energy_provider import energy_provider_bp
+    from .routes.sessions import sessions_bp
     
     app.register_blueprint(auth_bp)
     app.register_blueprint(ev_owner_bp)
     app.register_blueprint(energy_provider_bp)
+    app.register_blueprint(sessions_bp)
+    
+    if app.config['METRICS_ENABLED']:
+        from .routes.metrics import metrics_bp
+        app.register_blueprint(metrics_bp)
 
-    # Database initialization
-    with app.app_context():
-        db.create_all()
+    # Schema changes go through migrations (`flask db upgrade`); `flask init-db` sets up an empty database
+    from .cli import init_db_command, data_cli, jobs_cli
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(data_cli)
+    app.cli.add_command(jobs_cli)
     
     return app
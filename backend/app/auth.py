@@ -1,26 +1,24 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 from .models import User, db
-import boto3
+from .utils.cognito_auth import cognito_required
+from .utils.aws import get_cognito_client
+from .utils.rate_limit import rate_limited
+from .utils.concurrency import BoundedExecutor, ExecutorBusy, SingleFlight
 import os
 import hmac
 import hashlib
 import base64
-import jwt
-from jwt import PyJWKClient, ExpiredSignatureError, InvalidAudienceError, InvalidTokenError
 import datetime
 
 auth_bp = Blueprint('auth', __name__)
 
-# AWS Cognito Client
-cognito_client = boto3.client('cognito-idp', region_name=os.getenv('AWS_REGION'))
+# Password hashing is deliberately CPU-heavy; a small pool keeps login bursts from starving other requests
+password_hasher = BoundedExecutor('password-hash')
 
-# ✅ Validate Environment Variables
-required_env_vars = ['AWS_COGNITO_CLIENT_ID', 'AWS_COGNITO_CLIENT_SECRET', 'AWS_REGION', 'JWT_DECODE_ISSUER']
-for var in required_env_vars:
-    if not os.getenv(var):
-        raise EnvironmentError(f"Missing required environment variable: {var}")
+# Identical refresh requests in flight share one Cognito call
+refresh_flights = SingleFlight()
 
 
 # ✅ Calculate SECRET_HASH for AWS Cognito Authentication
@@ -36,6 +34,7 @@ def calculate_secret_hash(username, client_id, client_secret):
 
 # ✅ User Registration (Local Authentication)
 @auth_bp.route('/api/register', methods=['POST'])
+@rate_limited('register')
 def register():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
@@ -45,7 +44,10 @@ def register():
     if existing_user:
         return jsonify({"message": "User already exists"}), 400
 
-    hashed_password = generate_password_hash(data['password'])
+    try:
+        hashed_password = password_hasher.run(generate_password_hash, data['password'])
+    except ExecutorBusy:
+        return jsonify({"message": "Server busy, please try again"}), 503
     new_user = User(username=data['username'], password=hashed_password, role='user')
     db.session.add(new_user)
     db.session.commit()
@@ -54,13 +56,18 @@ def register():
 
 # ✅ User Login (Local Authentication)
 @auth_bp.route('/api/login', methods=['POST'])
+@rate_limited('login', username_field='username')
 def login():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({"message": "Username and password are required"}), 400
 
     user = User.query.filter_by(username=data['username']).first()
-    if user and check_password_hash(user.password, data['password']):
+    try:
+        valid = user is not None and password_hasher.run(check_password_hash, user.password, data['password'])
+    except ExecutorBusy:
+        return jsonify({"message": "Server busy, please try again"}), 503
+    if valid:
         access_token = create_access_token(
             identity=str(user.id),
             expires_delta=datetime.timedelta(hours=1)
@@ -71,11 +78,18 @@ def login():
 
 # ✅ AWS Cognito Login
 @auth_bp.route('/api/aws-login', methods=['POST'])
+@rate_limited('aws_login', username_field='username')
 def aws_login():
     data = request.get_json()
     if not data or 'username' not in data or 'password' not in data:
         return jsonify({"message": "Username and password are required"}), 400
 
+    # Created on first use; missing Cognito settings only affect these routes
+    try:
+        cognito_client = get_cognito_client()
+    except EnvironmentError as e:
+        return jsonify({"message": str(e)}), 500
+
     try:
         secret_hash = calculate_secret_hash(
             data['username'],
@@ -113,45 +127,27 @@ def aws_login():
 
 # ✅ AWS Protected Route Example (AWS Cognito)
 @auth_bp.route('/api/aws-protected', methods=['GET'])
+@cognito_required
 def aws_protected():
-    token = request.headers.get('Authorization')
-    if not token or "Bearer " not in token:
-        return jsonify({"message": "Missing or malformed Authorization Header"}), 401
-    
-    token = token.split("Bearer ")[1]
-    try:
-        jwk_client = PyJWKClient("https://cognito-idp.us-east-1.amazonaws.com/us-east-1_hSlxLW1DX/.well-known/jwks.json")
-        signing_key = jwk_client.get_signing_key_from_jwt(token).key
-
-        decoded_token = jwt.decode(
-            token,
-            signing_key,
-            algorithms=["RS256"],
-            issuer=os.getenv('JWT_DECODE_ISSUER'),
-            audience=os.getenv('AWS_COGNITO_CLIENT_ID')
-        )
-
-        if decoded_token.get("token_use") != "id":
-            raise jwt.InvalidTokenError("Token is not an ID Token")
-
-        username = decoded_token.get("cognito:username") or decoded_token.get("username") or "Unknown User"
-        return jsonify({"message": f"Hello, AWS Cognito user {username}!"}), 200
-
-    except jwt.ExpiredSignatureError:
-        return jsonify({"message": "Token has expired"}), 401
-    except jwt.InvalidAudienceError:
-        return jsonify({"message": "Invalid token audience"}), 401
-    except jwt.InvalidTokenError as e:
-        return jsonify({"message": f"Invalid token: {str(e)}"}), 401
+    claims = g.cognito_claims
+    username = claims.get("cognito:username") or claims.get("username") or "Unknown User"
+    return jsonify({"message": f"Hello, AWS Cognito user {username}!"}), 200
 
 
 # ✅ Refresh Token Route (AWS Cognito)
 @auth_bp.route('/api/aws-refresh', methods=['POST'])
+@rate_limited('aws_refresh')
 def aws_refresh():
     data = request.get_json()
     if not data or 'refresh_token' not in data:
         return jsonify({"message": "Refresh token is required"}), 400
 
+    # Created on first use; missing Cognito settings only affect these routes
+    try:
+        cognito_client = get_cognito_client()
+    except EnvironmentError as e:
+        return jsonify({"message": str(e)}), 500
+
     try:
         secret_hash = calculate_secret_hash(
             os.getenv('AWS_COGNITO_CLIENT_ID'),
@@ -159,14 +155,15 @@ def aws_refresh():
             os.getenv('AWS_COGNITO_CLIENT_SECRET')
         )
 
-        response = cognito_client.initiate_auth(
+        refresh_key = hashlib.sha256(data['refresh_token'].encode('utf-8')).hexdigest()
+        response = refresh_flights.do(refresh_key, lambda: cognito_client.initiate_auth(
             AuthFlow='REFRESH_TOKEN_AUTH',
             AuthParameters={
                 'REFRESH_TOKEN': data['refresh_token'],
                 'SECRET_HASH': secret_hash
             },
             ClientId=os.getenv('AWS_COGNITO_CLIENT_ID')
-        )
+        ))
 
         new_access_token = response['AuthenticationResult']['AccessToken']
         new_id_token = response['AuthenticationResult']['IdToken']
@@ -0,0 +1,126 @@
+import time
+import click
+from flask.cli import with_appcontext
+from flask_migrate import stamp
+from sqlalchemy import inspect
+from sqlalchemy.exc import IntegrityError
+from . import db
+from .services.bulk_io import ENTITIES, FORMATS, DEFAULT_CHUNK_SIZE, BulkIOError, export_rows, import_rows
+from .utils.scheduler import job_scheduler
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create the schema in an empty database and mark it as migrated to head."""
+    tables = set(inspect(db.engine).get_table_names())
+    if 'alembic_version' in tables:
+        raise click.ClickException("Database is already managed by migrations; run `flask db upgrade` instead.")
+    if tables:
+        raise click.ClickException(
+            "Database already has tables; stamp its current revision with `flask db stamp <revision>` "
+            "and run `flask db upgrade`."
+        )
+    db.create_all()
+    stamp(revision='head')
+    click.echo("Database initialized.")
+
+
+def _progress(label):
+    reported = [0.0]
+
+    def report(rows, elapsed):
+        if elapsed - reported[0] >= 1:
+            reported[0] = elapsed
+            click.echo(f"{label}: {rows} rows, {rows / elapsed:.0f} rows/s", err=True)
+    return report
+
+
+@click.group('data')
+def data_cli():
+    """Bulk import and export of stations, slots and bookings."""
+
+
+@data_cli.command('export')
+@click.argument('entity', type=click.Choice(list(ENTITIES)))
+@click.argument('path', type=click.Path(dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, type=click.IntRange(min=1))
+@click.option('--since', type=click.DateTime(), help="Slots starting / bookings made at or after this time.")
+@click.option('--until', type=click.DateTime(), help="Slots starting / bookings made before this time.")
+@click.option('--resume', is_flag=True, help="Continue an interrupted export from its checkpoint.")
+@with_appcontext
+def export_command(entity, path, fmt, chunk_size, since, until, resume):
+    """Export ENTITY to PATH (CSV, NDJSON or Parquet) in id order."""
+    try:
+        stats = export_rows(entity, path, fmt, chunk_size, since, until, resume, _progress(f"Exporting {entity}"))
+    except BulkIOError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Exported {stats['rows']} {entity} in {stats['seconds']}s ({stats['rows_per_second']} rows/s).")
+
+
+@data_cli.command('import')
+@click.argument('entity', type=click.Choice(list(ENTITIES)))
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(FORMATS), help="Defaults to the file extension.")
+@click.option('--chunk-size', default=DEFAULT_CHUNK_SIZE, show_default=True, type=click.IntRange(min=1))
+@click.option('--defer-indexes', is_flag=True, help="Drop secondary indexes during the load and rebuild them after.")
+@click.option('--resume', is_flag=True, help="Continue an interrupted import from its checkpoint.")
+@with_appcontext
+def import_command(entity, path, fmt, chunk_size, defer_indexes, resume):
+    """Import ENTITY rows from PATH (CSV, NDJSON or Parquet), one transaction per chunk."""
+    try:
+        stats = import_rows(entity, path, fmt, chunk_size, defer_indexes, resume, _progress(f"Importing {entity}"))
+    except BulkIOError as e:
+        raise click.ClickException(str(e))
+    except IntegrityError as e:
+        raise click.ClickException(f"Rows rejected by the database: {str(e.orig)}; "
+                                   f"fix the file and re-run with --resume")
+    click.echo(f"Imported {stats['rows']} {entity} in {stats['seconds']}s ({stats['rows_per_second']} rows/s).")
+
+
+@click.group('jobs')
+def jobs_cli():
+    """Inspect and run the scheduled maintenance jobs."""
+
+
+@jobs_cli.command('list')
+@with_appcontext
+def list_jobs_command():
+    """List registered jobs and their schedules."""
+    for job in job_scheduler.jobs():
+        batch = f", {job.batch_size} rows per run" if job.batch_size else ""
+        click.echo(f"{job.name}: every {job.interval:g}s{batch}")
+
+
+@jobs_cli.command('run')
+@click.argument('name')
+@click.option('--drain', is_flag=True, help="Repeat until a run processes less than a full batch.")
+@with_appcontext
+def run_job_command(name, drain):
+    """Run the job NAME once in this process."""
+    jobs = {job.name: job for job in job_scheduler.jobs()}
+    if name not in jobs:
+        raise click.ClickException("Unknown job; see `flask jobs list`")
+    total = 0
+    while True:
+        rows = job_scheduler.run_job(name)
+        total += rows
+        if jobs[name].last_error:
+            raise click.ClickException(jobs[name].last_error)
+        if not drain or not jobs[name].batch_size or rows < jobs[name].batch_size:
+            break
+    click.echo(f"{name}: {total} rows")
+
+
+@jobs_cli.command('serve')
+@with_appcontext
+def serve_jobs_command():
+    """Run the scheduler in the foreground, e.g. as the only job runner with JOBS_ENABLED=0 on web workers."""
+    job_scheduler.ensure_started()
+    click.echo(f"Running {len(job_scheduler.jobs())} jobs; press Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        job_scheduler.stop(timeout=30)
@@ -1,5 +1,7 @@
 from . import db
 from datetime import datetime
+from sqlalchemy import event
+from .utils.geo import geohash_encode
 
 # ✅ User Model
 class User(db.Model):
@@ -8,6 +10,12 @@ class User(db.Model):
     password = db.Column(db.String(255), nullable=False)
     role = db.Column(db.String(50), nullable=False)  # EV Owner or Energy Provider
 
+# ✅ Site Model (stations sharing one grid connection)
+class Site(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    grid_limit_kw = db.Column(db.Float, nullable=False)
+
 # ✅ Charging Station Model
 class ChargingStation(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -17,6 +25,46 @@ class ChargingStation(db.Model):
     status = db.Column(db.String(50), default="available")
     pricing = db.Column(db.String(50), nullable=True)  # Ensure this field exists
     speed = db.Column(db.String(50), nullable=True)    # Ensure this field exists
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True, index=True)  # Derived from latitude/longitude
+    site_id = db.Column(db.Integer, db.ForeignKey('site.id'), nullable=True, index=True)
+    max_power_kw = db.Column(db.Float, nullable=True)  # Total for all connectors; see load_scheduler defaults
+
+    site = db.relationship('Site', backref='stations')
+
+    # filter_stations may filter on any subset of pricing/speed/status
+    __table_args__ = (
+        db.Index('ix_charging_station_pricing_speed_status', 'pricing', 'speed', 'status'),
+        db.Index('ix_charging_station_speed_status', 'speed', 'status'),
+        db.Index('ix_charging_station_status', 'status'),
+    )
+
+
+# Keep the geohash index in step with the coordinates on every write path
+@event.listens_for(ChargingStation, 'before_insert')
+@event.listens_for(ChargingStation, 'before_update')
+def _update_station_geohash(mapper, connection, station):
+    if station.latitude is None or station.longitude is None:
+        station.geohash = None
+    else:
+        station.geohash = geohash_encode(station.latitude, station.longitude)
+
+
+# ✅ Connector Model (one per charging point; a station has `capacity` of them)
+class Connector(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # 1..capacity within the station
+    state = db.Column(db.SmallInteger, nullable=False, default=0)  # 0 available, 1 reserved, 2 charging, 3 faulted
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Drives incremental registry sync
+
+    station = db.relationship('ChargingStation', backref=db.backref('connectors', order_by='Connector.position'))
+
+    __table_args__ = (
+        db.UniqueConstraint('station_id', 'position', name='uq_connector_station_id_position'),
+        db.Index('ix_connector_updated_at', 'updated_at'),
+    )
 
 
 # ✅ Slot Model (NEW)
@@ -25,10 +73,43 @@ class Slot(db.Model):
     station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=False)
-    status = db.Column(db.String(50), default="available")
+    status = db.Column(db.String(50), default="available")  # available, reserved, held (waitlist offer), occupied, expired (ended unbooked)
+    reserved_until = db.Column(db.DateTime, nullable=True)  # Hold expiry while payment runs or a waitlist offer is open
+    reserved_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    connector_id = db.Column(db.Integer, db.ForeignKey('connector.id'), nullable=True)  # None = station-wide slot
     
     station = db.relationship('ChargingStation', backref='slots')
 
+    __table_args__ = (
+        db.Index('ix_slot_station_id_status', 'station_id', 'status'),
+        db.Index('ix_slot_connector_id_start_time', 'connector_id', 'start_time'),
+        db.Index('ix_slot_status_end_time', 'status', 'end_time'),  # Expiry and lapsed-hold scans
+    )
+
+# ✅ Pricing Rule Model (time-of-use and demand-based pricing)
+class PricingRule(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), nullable=True, index=True)  # None = all stations
+    weekdays = db.Column(db.Integer, nullable=False, default=127)  # Bitmask, bit 0 = Monday
+    start_minute = db.Column(db.Integer, nullable=False, default=0)  # Minute of day, inclusive
+    end_minute = db.Column(db.Integer, nullable=False, default=1440)  # Exclusive; may wrap past midnight
+    rate_per_hour = db.Column(db.Float, nullable=True)  # Base rate set by this rule
+    multiplier = db.Column(db.Float, nullable=False, default=1.0)
+    min_utilization = db.Column(db.Float, nullable=True)  # Demand rule: day's booked share of slots
+    priority = db.Column(db.Integer, nullable=False, default=0)
+
+# ✅ Slot Price Model (precomputed from pricing rules)
+class SlotPrice(db.Model):
+    slot_id = db.Column(db.Integer, db.ForeignKey('slot.id', ondelete='CASCADE'), primary_key=True)
+    station_id = db.Column(db.Integer, nullable=False)
+    start_time = db.Column(db.DateTime, nullable=False)
+    price = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_slot_price_station_id_price', 'station_id', 'price'),
+        db.Index('ix_slot_price_price', 'price'),
+    )
+
 # ✅ Charging Session Model
 class ChargingSession(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -36,11 +117,32 @@ class ChargingSession(db.Model):
     station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), nullable=False)
     start_time = db.Column(db.DateTime, nullable=False)
     end_time = db.Column(db.DateTime, nullable=True)
-    status = db.Column(db.String(50), default="in_progress")
+    status = db.Column(db.String(50), default="in_progress")  # in_progress, completed, abandoned (closed by the session reaper)
+    energy_kwh = db.Column(db.Float, nullable=True)  # Set from telemetry when the session closes
+    max_power_kw = db.Column(db.Float, nullable=True)  # Vehicle limit requested at start
+    connector_id = db.Column(db.Integer, db.ForeignKey('connector.id'), nullable=True)
 
     user = db.relationship('User', backref='sessions')
     station = db.relationship('ChargingStation', backref='sessions')
 
+    __table_args__ = (
+        db.Index('ix_charging_session_user_id_start_time', 'user_id', 'start_time'),
+        db.Index('ix_charging_session_station_id_status', 'station_id', 'status'),
+        db.Index('ix_charging_session_status_start_time', 'status', 'start_time'),  # Stale session scans
+    )
+
+# ✅ Meter Sample Model (charger telemetry, append-only)
+class MeterSample(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, db.ForeignKey('charging_session.id'), nullable=False)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    energy_kwh = db.Column(db.Float, nullable=True)  # Cumulative meter reading
+    power_kw = db.Column(db.Float, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_meter_sample_session_id_recorded_at', 'session_id', 'recorded_at'),
+    )
+
 # ✅ Booking Model
 class Booking(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -48,6 +150,113 @@ class Booking(db.Model):
     slot_id = db.Column(db.Integer, db.ForeignKey('slot.id'), nullable=False)
     booking_time = db.Column(db.DateTime, nullable=False)
     amount = db.Column(db.Float, nullable=False)
+    idempotency_key = db.Column(db.String(64), nullable=True)  # Client retry key
+    status = db.Column(db.String(50), default="confirmed")  # pending_payment, confirmed, payment_failed, expired
 
     user = db.relationship('User', backref='bookings')
     slot = db.relationship('Slot', backref='bookings')
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_booking_user_idempotency_key'),
+        db.Index('ix_booking_user_id_booking_time', 'user_id', 'booking_time'),
+        db.Index('ix_booking_user_id_id', 'user_id', 'id'),  # Keyset pagination of history
+        db.Index('ix_booking_slot_id', 'slot_id'),
+    )
+
+# ✅ Station Usage Rollups (materialized aggregates for provider analytics)
+class StationHourlyUsage(db.Model):
+    station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    hour = db.Column(db.Integer, primary_key=True)
+    weekday = db.Column(db.Integer, nullable=False)  # 0 = Monday, for hour-of-week heatmaps
+    slot_minutes = db.Column(db.Float, nullable=False, default=0)  # Offered slot time starting in this hour
+    booked_minutes = db.Column(db.Float, nullable=False, default=0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)  # Confirmed bookings made in this hour
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    energy_kwh = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_station_hourly_usage_day', 'day'),
+    )
+
+class StationDailyUsage(db.Model):
+    station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    slot_minutes = db.Column(db.Float, nullable=False, default=0)
+    booked_minutes = db.Column(db.Float, nullable=False, default=0)
+    bookings = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    sessions = db.Column(db.Integer, nullable=False, default=0)
+    energy_kwh = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_station_daily_usage_day', 'day'),
+    )
+
+# ✅ Payment Model (outbox drained by the payment worker)
+class Payment(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    booking_id = db.Column(db.Integer, db.ForeignKey('booking.id'), nullable=False, unique=True)
+    amount = db.Column(db.Float, nullable=False)
+    details = db.Column(db.Text, nullable=True)  # JSON gateway payment method reference, never card data
+    status = db.Column(db.String(50), default="pending")  # pending, processing, succeeded, failed, refund_required
+    attempts = db.Column(db.Integer, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False)  # Retry time, or lease expiry while processing
+    transaction_id = db.Column(db.String(64), nullable=True)
+    last_error = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    booking = db.relationship('Booking', backref=db.backref('payment', uselist=False))
+
+    __table_args__ = (
+        db.Index('ix_payment_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
+# ✅ Waitlist Entry (user queued for a slot at a station within a time window)
+class WaitlistEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    station_id = db.Column(db.Integer, db.ForeignKey('charging_station.id'), nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)  # Offered slots start at or after this
+    window_end = db.Column(db.DateTime, nullable=False)  # and end by this
+    status = db.Column(db.String(50), nullable=False, default="waiting")  # waiting, offered, booked, cancelled, expired
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Queue order
+    slot_id = db.Column(db.Integer, db.ForeignKey('slot.id', ondelete='SET NULL'), nullable=True)  # Held slot once offered
+    offered_until = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_waitlist_entry_station_id_status', 'station_id', 'status'),
+        db.Index('ix_waitlist_entry_user_id_status', 'user_id', 'status'),
+        db.Index('ix_waitlist_entry_status_offered_until', 'status', 'offered_until'),
+    )
+
+
+# ✅ Archive Tables (old rows moved out of the hot tables by the maintenance jobs; ids are kept)
+class MeterSampleArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.Integer, nullable=False, index=True)
+    recorded_at = db.Column(db.DateTime, nullable=False)
+    energy_kwh = db.Column(db.Float, nullable=True)
+    power_kw = db.Column(db.Float, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+class WaitlistEntryArchive(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False, index=True)
+    station_id = db.Column(db.Integer, nullable=False)
+    window_start = db.Column(db.DateTime, nullable=False)
+    window_end = db.Column(db.DateTime, nullable=False)
+    status = db.Column(db.String(50), nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    slot_id = db.Column(db.Integer, nullable=True)
+    offered_until = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, nullable=False)
+
+
+# ✅ Job Lease (jobs that must run in one process at a time; held by the owner until expires_at)
+class JobLease(db.Model):
+    name = db.Column(db.String(64), primary_key=True)
+    owner = db.Column(db.String(128), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
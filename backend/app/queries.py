@@ -0,0 +1,47 @@
+from datetime import datetime
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload
+from .models import db, ChargingStation, ChargingSession, Slot, SlotPrice, Booking
+
+# Shared query builders for the API endpoints. Every relationship a serializer
+# reads is loaded up front here, so listing N rows never costs N extra queries.
+
+
+def station_query(pricing=None, speed=None, min_price=None, max_price=None):
+    """
+    Stations matching the optional filters; listings only read columns.
+    A price range keeps stations with at least one upcoming free slot priced
+    inside it, answered from the precomputed slot_price table.
+    """
+    query = ChargingStation.query
+    if pricing:
+        query = query.filter_by(pricing=pricing)
+    if speed:
+        query = query.filter_by(speed=speed)
+    if min_price is not None or max_price is not None:
+        priced = (
+            select(SlotPrice.station_id)
+            .join(Slot, Slot.id == SlotPrice.slot_id)
+            .where(SlotPrice.start_time >= datetime.utcnow(), Slot.status == 'available')
+        )
+        if min_price is not None:
+            priced = priced.where(SlotPrice.price >= min_price)
+        if max_price is not None:
+            priced = priced.where(SlotPrice.price <= max_price)
+        query = query.filter(ChargingStation.id.in_(priced))
+    return query
+
+
+def slot_query(station_id):
+    """Slots of one station; listings only read columns."""
+    return Slot.query.filter_by(station_id=station_id)
+
+
+def history_query(user_id):
+    """Bookings of one user with their slot joined in the same query."""
+    return Booking.query.filter_by(user_id=user_id).options(joinedload(Booking.slot))
+
+
+def get_session_with_station(session_id):
+    """Load a charging session and its station in a single query."""
+    return db.session.get(ChargingSession, session_id, options=[joinedload(ChargingSession.station)])
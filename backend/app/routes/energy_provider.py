@@ -1,8 +1,26 @@
 from flask import Blueprint, request, jsonify
-from app.models import db, ChargingStation, Slot
+from flask_jwt_extended import jwt_required
+from datetime import date, datetime, timedelta
+from app.models import db, Site, ChargingStation, ChargingSession, Slot, Booking, MeterSample, PricingRule, Connector
+from app.queries import slot_query
+from app.services.slot_service import apply_slot_operations, expand_recurrence, SlotValidationError
+from app.utils.cache import invalidate_station_listings
+from app.utils.pagination import parse_page_args, paginate, stream_response, next_page_link
+from app.services import analytics
+from app.services.load_scheduler import load_scheduler
+from app.services.connectors import (
+    connector_registry, create_connectors, set_fault, refresh_station_status, STATE_NAMES, MAX_CONNECTORS_PER_STATION
+)
+from app.services.change_events import publish_station_status
+from app.services.pricing_service import parse_rule, serialize_rule, refresh_prices, PricingValidationError
+from app.services.maintenance import reprice_all_stations
+from app.utils.query_counter import query_budget
+from app.services.telemetry import telemetry_ingestor, parse_samples, open_session_ids, TelemetryValidationError
 
 energy_provider_bp = Blueprint('energy_provider', __name__)
 
+REPRICE_QUERY_BUDGET = float('inf')  # Network-wide rules reprice every station, a batch at a time
+
 # ✅ Add Charging Station
 @energy_provider_bp.route('/api/provider/add-station', methods=['POST'])
 def add_station():
@@ -10,20 +28,52 @@ def add_station():
     station_name = data.get('station_name')
     location = data.get('location')
     station_type = data.get('station_type')
+    latitude = data.get('latitude')
+    longitude = data.get('longitude')
+    site_id = data.get('site_id')
+    max_power_kw = data.get('max_power_kw')
     
     if not station_name or not location or not station_type:
         return jsonify({"message": "Station Name, Location, and Type are required"}), 400
     
+    try:
+        latitude = float(latitude) if latitude is not None else None
+        longitude = float(longitude) if longitude is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Latitude and Longitude must be numeric"}), 400
+    
+    if (latitude is None) != (longitude is None):
+        return jsonify({"message": "Latitude and Longitude must be provided together"}), 400
+    
+    try:
+        max_power_kw = float(max_power_kw) if max_power_kw is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Max power must be numeric"}), 400
+    
+    capacity = data.get('capacity', 1)
+    if not isinstance(capacity, int) or not 1 <= capacity <= MAX_CONNECTORS_PER_STATION:
+        return jsonify({"message": f"Capacity must be a whole number between 1 and {MAX_CONNECTORS_PER_STATION}"}), 400
+    
+    if site_id is not None and not db.session.get(Site, site_id):
+        return jsonify({"message": "Site not found"}), 404
+    
     new_station = ChargingStation(
         name=station_name,
         location=location,
-        station_type=station_type,
+        capacity=capacity,
+        speed=station_type,
+        latitude=latitude,
+        longitude=longitude,
+        site_id=site_id,
+        max_power_kw=max_power_kw,
         status="available"
     )
+    create_connectors(new_station, capacity)
     db.session.add(new_station)
     db.session.commit()
+    invalidate_station_listings()
     
-    return jsonify({"message": "Charging Station Added Successfully"}), 201
+    return jsonify({"message": "Charging Station Added Successfully", "station_id": new_station.id}), 201
 
 
 # ✅ Manage Charging Slots
@@ -36,35 +86,47 @@ def manage_slots():
     if action not in ['Add', 'Edit', 'Delete'] or not slot_details:
         return jsonify({"message": "Invalid action or missing slot details"}), 400
     
-    if action == 'Add':
-        new_slot = Slot(
-            station_id=slot_details['station_id'],
-            start_time=slot_details['start_time'],
-            end_time=slot_details['end_time'],
-            status="available"
-        )
-        db.session.add(new_slot)
-        message = "Slot added successfully"
-    
-    elif action == 'Edit':
-        slot = Slot.query.get(slot_details['slot_id'])
-        if not slot:
-            return jsonify({"message": "Slot not found"}), 404
-        slot.start_time = slot_details['start_time']
-        slot.end_time = slot_details['end_time']
-        message = "Slot updated successfully"
-    
-    elif action == 'Delete':
-        slot = Slot.query.get(slot_details['slot_id'])
-        if not slot:
-            return jsonify({"message": "Slot not found"}), 404
-        db.session.delete(slot)
-        message = "Slot deleted successfully"
+    result = apply_slot_operations([{"action": action, "slot_details": slot_details}])
+    if result['status'] != 'success':
+        return jsonify({k: v for k, v in result.items() if k not in ('status', 'code')}), result['code']
+    invalidate_station_listings()
     
-    db.session.commit()
+    message = {
+        'Add': "Slot added successfully",
+        'Edit': "Slot updated successfully",
+        'Delete': "Slot deleted successfully"
+    }[action]
     return jsonify({"message": message}), 200
 
 
+# ✅ Bulk Slot Management
+@energy_provider_bp.route('/api/provider/manage-slots/bulk', methods=['POST'])
+def manage_slots_bulk():
+    data = request.get_json()
+    operations = data.get('operations') or []
+    recurrence = data.get('recurrence')
+    
+    if not operations and not recurrence:
+        return jsonify({"message": "Operations or a recurrence rule are required"}), 400
+    
+    if recurrence:
+        try:
+            operations = operations + expand_recurrence(recurrence)
+        except SlotValidationError as e:
+            return jsonify({"message": str(e)}), 400
+    
+    result = apply_slot_operations(operations)
+    if result['status'] != 'success':
+        return jsonify({k: v for k, v in result.items() if k not in ('status', 'code')}), result['code']
+    invalidate_station_listings()
+    return jsonify({
+        "message": "Slots updated successfully",
+        "added": result['added'],
+        "updated": result['updated'],
+        "deleted": result['deleted']
+    }), 200
+
+
 # ✅ Slot Availability
 @energy_provider_bp.route('/api/provider/slot-availability', methods=['GET'])
 def slot_availability():
@@ -72,16 +134,69 @@ def slot_availability():
     if not station_id:
         return jsonify({"message": "Station ID is required"}), 400
     
-    slots = Slot.query.filter_by(station_id=station_id).all()
-    slot_data = [
-        {"slot_id": slot.id, "status": slot.status}
-        for slot in slots
-    ]
-    return jsonify({"slots": slot_data}), 200
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid pagination parameters", "error": str(e)}), 400
+    
+    query = slot_query(station_id)
+    if page['stream']:
+        return stream_response(query, Slot.id, page['after_id'], serialize_slot, "slots", page['stream'])
+    
+    slots, next_cursor = paginate(query, Slot.id, page['after_id'], page['limit'])
+    slot_data = [serialize_slot(slot) for slot in slots]
+    return jsonify({"slots": slot_data, "next_cursor": next_cursor}), 200, next_page_link(next_cursor)
+
+
+def serialize_slot(slot):
+    return {"slot_id": slot.id, "status": slot.status, "connector_id": slot.connector_id}
+
+
+# ✅ Station Connectors
+@energy_provider_bp.route('/api/provider/stations/<int:station_id>/connectors', methods=['GET'])
+def station_connectors(station_id):
+    station = db.session.get(ChargingStation, station_id)
+    if not station:
+        return jsonify({"message": "Station not found"}), 404
+    
+    return jsonify({
+        "station_id": station.id,
+        "status": station.status,
+        "connectors": [
+            {"connector_id": connector.id, "position": connector.position, "state": STATE_NAMES[connector.state]}
+            for connector in station.connectors
+        ]
+    }), 200
+
+
+# ✅ Report Connector Fault / Return to Service
+@energy_provider_bp.route('/api/provider/connectors/<int:connector_id>/state', methods=['POST'])
+def set_connector_state(connector_id):
+    data = request.get_json()
+    state = data.get('state')
+    if state not in ('faulted', 'available'):
+        return jsonify({"message": "State must be 'faulted' or 'available'"}), 400
+    
+    connector = db.session.get(Connector, connector_id)
+    if not connector:
+        return jsonify({"message": "Connector not found"}), 404
+    
+    if not set_fault(connector.id, state == 'faulted'):
+        db.session.rollback()
+        return jsonify({"message": f"Connector is currently {STATE_NAMES[connector.state]}"}), 409
+    db.session.refresh(connector)
+    station = connector.station
+    refresh_station_status(station)
+    db.session.commit()
+    connector_registry.mark(station.id, connector.id, connector.state)
+    invalidate_station_listings()
+    publish_station_status(station.id, station.status)
+    load_scheduler.replan_for_station(station)
+    return jsonify({"message": "Connector updated", "state": STATE_NAMES[connector.state]}), 200
 
 
 # ✅ Send Notification
-from app.utils.notifications import send_notification
+from app.utils.notifications import notification_dispatcher
 
 @energy_provider_bp.route('/api/provider/send-notification', methods=['POST'])
 def send_notification_route():
@@ -92,5 +207,268 @@ def send_notification_route():
     if not booking_id or not user_info:
         return jsonify({"message": "Booking ID and User Info are required"}), 400
     
-    send_notification(user_info, f"Your slot booking with ID {booking_id} is confirmed!")
-    return jsonify({"message": f"Notification sent for booking {booking_id}"}), 200
+    if not notification_dispatcher.notify(user_info, f"Your slot booking with ID {booking_id} is confirmed!"):
+        return jsonify({"message": "Notification queue is full, try again later"}), 503
+    return jsonify({"message": f"Notification queued for booking {booking_id}"}), 202
+
+
+# ✅ Broadcast to Booking Holders of a Station
+@energy_provider_bp.route('/api/provider/broadcast', methods=['POST'])
+def broadcast_notification():
+    data = request.get_json()
+    station_id = data.get('station_id')
+    message = data.get('message')
+    
+    if not station_id or not message:
+        return jsonify({"message": "Station ID and Message are required"}), 400
+    
+    holders = (
+        db.session.query(Booking.user_id)
+        .join(Slot, Booking.slot_id == Slot.id)
+        .filter(Slot.station_id == station_id, Booking.status.in_(['pending_payment', 'confirmed']))
+        .distinct()
+        .yield_per(1000)
+    )
+    queued = dropped = 0
+    for (user_id,) in holders:
+        if notification_dispatcher.notify(user_id, message):
+            queued += 1
+        else:
+            dropped += 1
+    return jsonify({"message": "Broadcast queued", "queued": queued, "dropped": dropped}), 202
+
+
+# ✅ Ingest Charger Telemetry (batched meter samples)
+@energy_provider_bp.route('/api/provider/telemetry', methods=['POST'])
+def ingest_telemetry():
+    data = request.get_json(silent=True) or {}
+    
+    try:
+        rows = parse_samples(data.get('samples'))
+    except TelemetryValidationError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    session_ids = {row["session_id"] for row in rows}
+    unknown = session_ids - open_session_ids(session_ids)
+    if unknown:
+        return jsonify({"message": "Session not found or already closed", "session_ids": sorted(unknown)}), 404
+    
+    if not telemetry_ingestor.ingest(rows):
+        return jsonify({"message": "Telemetry buffer is full, try again later"}), 503
+    return jsonify({"message": "Samples accepted", "accepted": len(rows)}), 202
+
+
+# ✅ Session Power Curve
+@energy_provider_bp.route('/api/provider/sessions/<int:session_id>/telemetry', methods=['GET'])
+def session_telemetry(session_id):
+    session = db.session.get(ChargingSession, session_id)
+    if not session:
+        return jsonify({"message": "Session not found"}), 404
+    
+    samples = (
+        db.session.query(MeterSample.recorded_at, MeterSample.energy_kwh, MeterSample.power_kw)
+        .filter(MeterSample.session_id == session_id)
+        .order_by(MeterSample.recorded_at)
+    )
+    return jsonify({
+        "session_id": session_id,
+        "status": session.status,
+        "energy_kwh": session.energy_kwh,
+        "samples": [
+            {"recorded_at": recorded_at.isoformat(), "energy_kwh": energy, "power_kw": power}
+            for recorded_at, energy, power in samples
+        ]
+    }), 200
+
+
+def parse_analytics_args(args):
+    """
+    Read the `from`/`to` dates (inclusive, default the last 30 days) and optional `station_id`.
+    Raises:
+        ValueError: If a parameter is invalid.
+    """
+    end_day = date.fromisoformat(args['to']) if args.get('to') else datetime.utcnow().date()
+    start_day = date.fromisoformat(args['from']) if args.get('from') else end_day - timedelta(days=analytics.DEFAULT_RANGE_DAYS)
+    if start_day > end_day:
+        raise ValueError("'from' must not be after 'to'")
+    station_id = int(args['station_id']) if args.get('station_id') else None
+    return start_day, end_day, station_id
+
+
+# ✅ Station Utilization Report
+@energy_provider_bp.route('/api/provider/analytics/utilization', methods=['GET'])
+def analytics_utilization():
+    try:
+        start_day, end_day, station_id = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid analytics parameters", "error": str(e)}), 400
+    
+    return jsonify({
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "stations": analytics.station_utilization(start_day, end_day, station_id)
+    }), 200
+
+
+# ✅ Revenue per Day
+@energy_provider_bp.route('/api/provider/analytics/revenue', methods=['GET'])
+def analytics_revenue():
+    try:
+        start_day, end_day, station_id = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid analytics parameters", "error": str(e)}), 400
+    
+    return jsonify({
+        "from": start_day.isoformat(),
+        "to": end_day.isoformat(),
+        "days": analytics.revenue_by_day(start_day, end_day, station_id)
+    }), 200
+
+
+# ✅ Peak Hours (hour-of-week heatmap)
+@energy_provider_bp.route('/api/provider/analytics/heatmap', methods=['GET'])
+def analytics_heatmap():
+    metric = request.args.get('metric', 'bookings')
+    if metric not in analytics.HEATMAP_METRICS:
+        return jsonify({"message": "Metric must be one of: " + ", ".join(analytics.HEATMAP_METRICS)}), 400
+    try:
+        start_day, end_day, station_id = parse_analytics_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid analytics parameters", "error": str(e)}), 400
+    
+    heatmap = analytics.hour_of_week_heatmap(start_day, end_day, station_id, metric)
+    return jsonify({"from": start_day.isoformat(), "to": end_day.isoformat(), **heatmap}), 200
+
+
+# ✅ Refresh Analytics Rollup
+@energy_provider_bp.route('/api/provider/analytics/refresh', methods=['POST'])
+@jwt_required()
+def analytics_refresh():
+    full = request.args.get('full') in ('1', 'true')
+    # Requests never queue up behind a running refresh, so repeated calls cannot stack rebuilds
+    rows = analytics.refresh_rollup(full=full, wait=False)
+    if rows is None:
+        return jsonify({"message": "An analytics refresh is already running"}), 409
+    return jsonify({"message": "Analytics refreshed", "rows": rows}), 200
+
+
+# ✅ Add Site (stations sharing a grid connection)
+@energy_provider_bp.route('/api/provider/sites', methods=['POST'])
+def add_site():
+    data = request.get_json()
+    name = data.get('name')
+    grid_limit_kw = data.get('grid_limit_kw')
+    
+    if not name or grid_limit_kw is None:
+        return jsonify({"message": "Name and Grid Limit are required"}), 400
+    
+    try:
+        grid_limit_kw = float(grid_limit_kw)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Grid Limit must be numeric"}), 400
+    if grid_limit_kw <= 0:
+        return jsonify({"message": "Grid Limit must be positive"}), 400
+    
+    site = Site(name=name, grid_limit_kw=grid_limit_kw)
+    db.session.add(site)
+    db.session.commit()
+    return jsonify({"message": "Site Added Successfully", "site_id": site.id}), 201
+
+
+# ✅ Current Power Allocation
+@energy_provider_bp.route('/api/provider/load-allocation', methods=['GET'])
+def load_allocation():
+    site_id = request.args.get('site_id', type=int)
+    station_id = request.args.get('station_id', type=int)
+    
+    if site_id is not None:
+        if not db.session.get(Site, site_id):
+            return jsonify({"message": "Site not found"}), 404
+        key = ('site', site_id)
+    elif station_id is not None:
+        station = db.session.get(ChargingStation, station_id)
+        if not station:
+            return jsonify({"message": "Station not found"}), 404
+        key = load_scheduler.plan_key(station)
+    else:
+        return jsonify({"message": "Site ID or Station ID is required"}), 400
+    
+    if request.args.get('refresh') in ('1', 'true'):
+        plan = load_scheduler.replan(key)
+    else:
+        plan = load_scheduler.plan(key)
+    sessions = [
+        {"session_id": session_id, **entry}
+        for session_id, entry in sorted(plan["sessions"].items())
+        if station_id is None or entry["station_id"] == station_id
+    ]
+    return jsonify({
+        "site_id": key[1] if key[0] == 'site' else None,
+        "grid_limit_kw": plan["grid_limit_kw"],
+        "allocated_kw": plan["allocated_kw"],
+        "sessions": sessions
+    }), 200
+
+
+def reprice_for_rule(station_id):
+    """Refresh precomputed prices after a rule for `station_id` (None = every station) changed."""
+    if station_id is None:
+        priced = reprice_all_stations()
+    else:
+        priced = refresh_prices(station_ids=[station_id])
+        db.session.commit()
+    invalidate_station_listings()
+    return priced
+
+
+# ✅ Add Pricing Rule
+@energy_provider_bp.route('/api/provider/pricing-rules', methods=['POST'])
+@query_budget(REPRICE_QUERY_BUDGET)
+def add_pricing_rule():
+    try:
+        values = parse_rule(request.get_json() or {})
+    except PricingValidationError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    if values['station_id'] is not None and not db.session.get(ChargingStation, values['station_id']):
+        return jsonify({"message": "Station not found"}), 404
+    
+    rule = PricingRule(**values)
+    db.session.add(rule)
+    db.session.commit()
+    priced = reprice_for_rule(rule.station_id)
+    return jsonify({"message": "Pricing rule added", "rule": serialize_rule(rule), "slots_priced": priced}), 201
+
+
+# ✅ List Pricing Rules
+@energy_provider_bp.route('/api/provider/pricing-rules', methods=['GET'])
+def list_pricing_rules():
+    query = PricingRule.query
+    station_id = request.args.get('station_id', type=int)
+    if station_id is not None:
+        query = query.filter((PricingRule.station_id == station_id) | PricingRule.station_id.is_(None))
+    return jsonify({"rules": [serialize_rule(rule) for rule in query.order_by(PricingRule.id)]}), 200
+
+
+# ✅ Delete Pricing Rule
+@energy_provider_bp.route('/api/provider/pricing-rules/<int:rule_id>', methods=['DELETE'])
+@query_budget(REPRICE_QUERY_BUDGET)
+def delete_pricing_rule(rule_id):
+    rule = db.session.get(PricingRule, rule_id)
+    if not rule:
+        return jsonify({"message": "Pricing rule not found"}), 404
+    
+    station_id = rule.station_id
+    db.session.delete(rule)
+    db.session.commit()
+    priced = reprice_for_rule(station_id)
+    return jsonify({"message": "Pricing rule deleted", "slots_priced": priced}), 200
+
+
+# ✅ Refresh Slot Prices (demand rules follow bookings)
+@energy_provider_bp.route('/api/provider/pricing/refresh', methods=['POST'])
+@query_budget(REPRICE_QUERY_BUDGET)
+def refresh_slot_prices():
+    station_id = request.args.get('station_id', type=int)
+    priced = reprice_for_rule(station_id)
+    return jsonify({"message": "Prices refreshed", "slots_priced": priced}), 200
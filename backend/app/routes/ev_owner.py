@@ -1,11 +1,27 @@
-from flask import Blueprint, request, jsonify
-from app.models import db, ChargingStation, Booking, Slot
+import math
+from flask import Blueprint, Response, request, jsonify
+from app.models import db, ChargingStation, Booking, Slot, SlotPrice, WaitlistEntry
 from datetime import datetime
-from app.services.payment_service import process_payment
+from app.services import booking_service, waitlist
+from app.queries import station_query, history_query
+from app.services.geo_service import find_nearby_stations
+from app.services.availability import availability_index
+from app.services.connectors import connector_registry, STATION_AVAILABILITY
+from app.utils.pagination import parse_page_args, paginate, stream_response, next_page_link
+from app.utils.cache import response_cache, STATION_LISTINGS
+from app.utils.change_bus import change_bus
+from app.utils.timestamps import parse_timestamp
+from app.services.change_events import parse_event_topics, format_sse
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 ev_owner_bp = Blueprint('ev_owner', __name__)
 
+DEFAULT_SEARCH_RADIUS_KM = 25
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+SSE_KEEPALIVE_SECONDS = 15
+MAX_SLOT_SEARCH_CANDIDATES = 1000
+
 # ✅ Find Nearby Energy Providers (Protected Endpoint)
 @ev_owner_bp.route('/api/ev/find-providers', methods=['GET'])
 @jwt_required()
@@ -17,10 +33,28 @@ def find_providers():
         return jsonify({"message": "Latitude and Longitude are required"}), 400
     
     try:
-        providers = ChargingStation.query.all()
+        latitude = float(latitude)
+        longitude = float(longitude)
+        radius = float(request.args.get('radius', DEFAULT_SEARCH_RADIUS_KM))
+        limit = int(request.args.get('limit', DEFAULT_SEARCH_LIMIT))
+    except ValueError:
+        return jsonify({"message": "Latitude, Longitude, Radius and Limit must be numeric"}), 400
+    
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius <= 0 or limit <= 0:
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    try:
+        nearby = find_nearby_stations(latitude, longitude, radius, min(limit, MAX_SEARCH_LIMIT))
         response = [
-            {"id": provider.id, "name": provider.name, "location": provider.location}
-            for provider in providers
+            {
+                "id": provider.id,
+                "name": provider.name,
+                "location": provider.location,
+                "latitude": provider.latitude,
+                "longitude": provider.longitude,
+                "distance_km": round(distance, 3)
+            }
+            for distance, provider in nearby
         ]
         return jsonify({"providers": response}), 200
     except Exception as e:
@@ -36,32 +70,174 @@ def filter_stations():
     availability = request.args.get('availability')
     
     try:
-        query = ChargingStation.query
-        if pricing:
-            query = query.filter_by(pricing=pricing)  # Correct attribute
-        if speed:
-            query = query.filter_by(speed=speed)      # Correct attribute
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid pagination parameters", "error": str(e)}), 400
+    
+    try:
+        min_price = float(request.args['min_price']) if request.args.get('min_price') else None
+        max_price = float(request.args['max_price']) if request.args.get('max_price') else None
+    except ValueError:
+        return jsonify({"message": "Min Price and Max Price must be numeric"}), 400
+    
+    if availability and availability not in STATION_AVAILABILITY:
+        return jsonify({"message": "Availability must be one of: " + ", ".join(STATION_AVAILABILITY)}), 400
+    
+    try:
+        query = station_query(pricing=pricing, speed=speed, min_price=min_price, max_price=max_price)
+        # Availability comes from the connector bitmaps rather than the stored status string
+        station_ids = None
         if availability:
-            query = query.filter_by(status=availability)
+            connector_registry.sync()
+            station_ids = connector_registry.stations_with(availability)
         
-        stations = query.all()
-        response = [
-            {
-                "id": station.id,
-                "name": station.name,
-                "pricing": station.pricing,
-                "speed": station.speed,
-                "status": station.status
-            }
-            for station in stations
-        ]
-        return jsonify({"stations": response}), 200
+        if page['stream']:
+            return stream_response(query, ChargingStation.id, page['after_id'],
+                                   serialize_station, "stations", page['stream'], ids=station_ids)
+        
+        def build():
+            stations, next_cursor = paginate(query, ChargingStation.id, page['after_id'], page['limit'],
+                                             ids=station_ids)
+            return {"stations": [serialize_station(station) for station in stations], "next_cursor": next_cursor}
+        
+        params = {name: request.args.get(name)
+                  for name in ('pricing', 'speed', 'availability', 'min_price', 'max_price', 'after', 'limit')}
+        return response_cache.response(STATION_LISTINGS, params, build,
+                                       headers=lambda body: next_page_link(body['next_cursor']))
     except AttributeError as e:
         return jsonify({"message": "Invalid filter parameters", "error": str(e)}), 400
     except Exception as e:
         return jsonify({"message": "Error filtering stations", "error": str(e)}), 500
 
 
+def serialize_station(station):
+    return {
+        "id": station.id,
+        "name": station.name,
+        "pricing": station.pricing,
+        "speed": station.speed,
+        "status": station.status
+    }
+
+
+
+# ✅ Search Free Slots in a Time Window
+# Stations with a free slot inside [from, to], earliest first; without `to`,
+# the earliest free slot after `from`. Optional pricing, speed and geo filters.
+@ev_owner_bp.route('/api/ev/search-slots', methods=['GET'])
+@jwt_required()
+def search_slots():
+    pricing = request.args.get('pricing')
+    speed = request.args.get('speed')
+    # Empty parameters count as absent
+    latitude = request.args.get('latitude') or None
+    longitude = request.args.get('longitude') or None
+    
+    if (latitude is None) != (longitude is None):
+        return jsonify({"message": "Latitude and Longitude must be provided together"}), 400
+    
+    try:
+        window_start = parse_timestamp(request.args['from']) if request.args.get('from') else datetime.utcnow()
+        window_end = parse_timestamp(request.args['to']) if request.args.get('to') else None
+        limit = min(int(request.args.get('limit') or DEFAULT_SEARCH_LIMIT), MAX_SEARCH_LIMIT)
+        if latitude is not None:
+            latitude = float(latitude)
+            longitude = float(longitude)
+            radius = float(request.args.get('radius') or DEFAULT_SEARCH_RADIUS_KM)
+    except (TypeError, ValueError):
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    if limit <= 0 or (window_end is not None and window_end <= window_start):
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    if latitude is not None and (not -90 <= latitude <= 90 or not -180 <= longitude <= 180 or radius <= 0):
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    try:
+        distances = {}
+        if latitude is not None:
+            for distance, station in find_nearby_stations(latitude, longitude, radius, MAX_SLOT_SEARCH_CANDIDATES):
+                if (not pricing or station.pricing == pricing) and (not speed or station.speed == speed):
+                    distances[station.id] = distance
+            station_ids = distances.keys()
+        else:
+            query = station_query(pricing=pricing, speed=speed).with_entities(ChargingStation.id)
+            station_ids = [station_id for (station_id,) in query]
+        
+        matches = availability_index.first_free(station_ids, window_start, window_end)
+        ranked = sorted(matches.items(), key=lambda item: (item[1][0], distances.get(item[0], 0), item[0]))[:limit]
+        
+        # The index only sees this process's changes; confirm against the database
+        slot_ids = [slot_id for _, (_, _, slot_id) in ranked]
+        free = {slot_id for (slot_id,) in db.session.query(Slot.id).filter(Slot.id.in_(slot_ids), Slot.status == 'available')}
+        availability_index.discard(set(slot_ids) - free)
+        ranked = [item for item in ranked if item[1][2] in free]
+        
+        stations = {station.id: station for station in
+                    ChargingStation.query.filter(ChargingStation.id.in_([station_id for station_id, _ in ranked]))}
+        results = []
+        for station_id, (start, end, slot_id) in ranked:
+            result = serialize_station(stations[station_id])
+            result["slot"] = {"id": slot_id, "start_time": start.isoformat(), "end_time": end.isoformat()}
+            if station_id in distances:
+                result["distance_km"] = round(distances[station_id], 3)
+            results.append(result)
+        return jsonify({"stations": results}), 200
+    except Exception as e:
+        return jsonify({"message": "Error searching slots", "error": str(e)}), 500
+
+
+# ✅ Cheapest Nearby Slots (precomputed prices)
+@ev_owner_bp.route('/api/ev/cheapest-slots', methods=['GET'])
+@jwt_required()
+def cheapest_slots():
+    try:
+        latitude = float(request.args['latitude'])
+        longitude = float(request.args['longitude'])
+        radius = float(request.args.get('radius') or DEFAULT_SEARCH_RADIUS_KM)
+        window_start = parse_timestamp(request.args['from']) if request.args.get('from') else datetime.utcnow()
+        window_end = parse_timestamp(request.args['to']) if request.args.get('to') else None
+        limit = min(int(request.args.get('limit') or DEFAULT_SEARCH_LIMIT), MAX_SEARCH_LIMIT)
+    except KeyError:
+        return jsonify({"message": "Latitude and Longitude are required"}), 400
+    except ValueError:
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    if limit <= 0 or radius <= 0:
+        return jsonify({"message": "Invalid search parameters"}), 400
+    
+    try:
+        nearby = {station.id: (distance, station)
+                  for distance, station in find_nearby_stations(latitude, longitude, radius, MAX_SLOT_SEARCH_CANDIDATES)}
+        if not nearby:
+            return jsonify({"slots": []}), 200
+        
+        query = (
+            db.session.query(SlotPrice.slot_id, SlotPrice.station_id, SlotPrice.price, Slot.start_time, Slot.end_time)
+            .join(Slot, Slot.id == SlotPrice.slot_id)
+            .filter(
+                SlotPrice.station_id.in_(nearby.keys()),
+                SlotPrice.start_time >= max(window_start, datetime.utcnow()),
+                Slot.status == 'available'
+            )
+        )
+        if window_end is not None:
+            query = query.filter(Slot.end_time <= window_end)
+        rows = query.order_by(SlotPrice.price, SlotPrice.start_time).limit(limit)
+        
+        return jsonify({"slots": [
+            {
+                "slot_id": slot_id,
+                "price": price,
+                "start_time": start_time.isoformat(),
+                "end_time": end_time.isoformat(),
+                "station": serialize_station(nearby[station_id][1]),
+                "distance_km": round(nearby[station_id][0], 3)
+            }
+            for slot_id, station_id, price, start_time, end_time in rows
+        ]}), 200
+    except Exception as e:
+        return jsonify({"message": "Error searching slots", "error": str(e)}), 500
 
 # ✅ Book Slot
 @ev_owner_bp.route('/api/ev/book-slot', methods=['POST'])
@@ -74,48 +250,169 @@ def book_slot():
     if not slot_id or not payment_details:
         return jsonify({"message": "Slot ID and Payment Details are required"}), 400
     
-    if 'amount' not in payment_details:
+    if not isinstance(payment_details, dict) or 'amount' not in payment_details:
         return jsonify({"message": "Payment amount is required"}), 400
     
+    # Unpriced slots are charged the client's amount, so it must be a real non-negative number
+    amount = payment_details['amount']
     try:
-        payment_result = process_payment(payment_details)
-        if payment_result['status'] != 'success':
-            return jsonify({"message": "Payment failed"}), 400
-        
-        slot = Slot.query.get(slot_id)
-        if not slot or slot.status != 'available':
-            return jsonify({"message": "Slot not available"}), 400
-        
-        slot.status = 'occupied'
-        booking = Booking(
-            slot_id=slot.id,
-            booking_time=datetime.utcnow(),
-            amount=payment_details['amount']
+        amount = float(amount) if not isinstance(amount, bool) else None
+    except (TypeError, ValueError):
+        amount = None
+    if amount is None or not math.isfinite(amount) or amount < 0:
+        return jsonify({"message": "Payment amount must be a non-negative number"}), 400
+    payment_details = {**payment_details, "amount": amount}
+    
+    idempotency_key = request.headers.get('Idempotency-Key')
+    if idempotency_key is not None and not 0 < len(idempotency_key) <= booking_service.MAX_IDEMPOTENCY_KEY_LENGTH:
+        return jsonify({"message": f"Idempotency-Key must be 1 to {booking_service.MAX_IDEMPOTENCY_KEY_LENGTH} characters"}), 400
+    
+    try:
+        result = booking_service.book_slot(
+            int(get_jwt_identity()),
+            slot_id,
+            payment_details,
+            idempotency_key=idempotency_key
         )
-        db.session.add(booking)
-        db.session.commit()
+        if result['status'] != 'success':
+            if 'price' in result:
+                return jsonify({"message": result['message'], "price": result['price']}), 409
+            return jsonify({"message": result['message']}), result.get('code', 400)
         
-        return jsonify({"message": "Booking Confirmed", "booking_id": booking.id}), 201
+        booking = result['booking']
+        status_code = 200 if result['replayed'] else 202
+        return jsonify({
+            "message": "Booking Confirmed" if booking.status == 'confirmed' else "Booking pending payment",
+            "booking_id": booking.id,
+            "status": booking.status
+        }), status_code
     except Exception as e:
         db.session.rollback()
         return jsonify({"message": "Error booking slot", "error": str(e)}), 500
 
 
+# ✅ Join Waitlist (instead of retrying book-slot for a taken slot)
+@ev_owner_bp.route('/api/ev/waitlist', methods=['POST'])
+@jwt_required()
+def join_waitlist():
+    data = request.get_json()
+    try:
+        station_id, window_start, window_end = waitlist.parse_entry(data or {})
+    except waitlist.WaitlistValidationError as e:
+        return jsonify({"message": str(e)}), 400
+    
+    if not db.session.get(ChargingStation, station_id):
+        return jsonify({"message": "Station not found"}), 404
+    
+    try:
+        result = waitlist.join(int(get_jwt_identity()), station_id, window_start, window_end)
+        if result['status'] != 'success':
+            return jsonify({"message": result['message']}), result['code']
+        return jsonify({"entry": waitlist.serialize_entry(result['entry'])}), 201 if result['created'] else 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"message": "Error joining waitlist", "error": str(e)}), 500
+
+
+# ✅ My Waitlist Entries
+@ev_owner_bp.route('/api/ev/waitlist', methods=['GET'])
+@jwt_required()
+def my_waitlist():
+    entries = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == int(get_jwt_identity()),
+        WaitlistEntry.status.in_(waitlist.OPEN_STATUSES)
+    ).order_by(WaitlistEntry.created_at).all()
+    return jsonify({"entries": [waitlist.serialize_entry(entry) for entry in entries]}), 200
+
+
+# ✅ Leave Waitlist (declines a held slot)
+@ev_owner_bp.route('/api/ev/waitlist/<int:entry_id>', methods=['DELETE'])
+@jwt_required()
+def leave_waitlist(entry_id):
+    entry = db.session.get(WaitlistEntry, entry_id)
+    if not entry or entry.user_id != int(get_jwt_identity()):
+        return jsonify({"message": "Waitlist entry not found"}), 404
+    
+    if not waitlist.cancel(entry):
+        return jsonify({"message": "Waitlist entry is already closed"}), 400
+    return jsonify({"message": "Left the waitlist"}), 200
+
+
+# ✅ Booking Status (poll after book-slot)
+@ev_owner_bp.route('/api/ev/bookings/<int:booking_id>', methods=['GET'])
+@jwt_required()
+def booking_status(booking_id):
+    booking = db.session.get(Booking, booking_id)
+    if not booking or booking.user_id != int(get_jwt_identity()):
+        return jsonify({"message": "Booking not found"}), 404
+    
+    payment = booking.payment
+    return jsonify({
+        "booking_id": booking.id,
+        "status": booking.status,
+        "payment_status": payment.status if payment else None,
+        "transaction_id": payment.transaction_id if payment else None
+    }), 200
+
+
+# ✅ Live Slot Updates (Server-Sent Events)
+@ev_owner_bp.route('/api/ev/slot-events', methods=['GET'])
+@jwt_required()
+def slot_events():
+    try:
+        topics = parse_event_topics(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid subscription parameters", "error": str(e)}), 400
+    if not topics:
+        return jsonify({"message": "Station ID or Area is required"}), 400
+    
+    subscription = change_bus.subscribe(topics)
+    
+    def generate():
+        try:
+            yield ": subscribed\n\n"
+            while True:
+                event = subscription.get(timeout=SSE_KEEPALIVE_SECONDS)
+                if subscription.overflowed:
+                    subscription.overflowed = False
+                    yield "event: resync\ndata: {}\n\n"
+                yield format_sse(event) if event else ": keepalive\n\n"
+        finally:
+            subscription.close()
+    
+    return Response(generate(), mimetype='text/event-stream', headers={"Cache-Control": "no-cache"})
+
+
 # ✅ Charging History
 @ev_owner_bp.route('/api/ev/history', methods=['GET'])
 @jwt_required()
 def history():
     user_id = get_jwt_identity()
     try:
-        history = Booking.query.filter_by(user_id=user_id).all()
-        response = [
-            {
-                "booking_id": booking.id,
-                "date": booking.booking_time.strftime('%Y-%m-%d'),
-                "amount": booking.amount
-            }
-            for booking in history
-        ]
-        return jsonify({"history": response}), 200
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid pagination parameters", "error": str(e)}), 400
+    
+    try:
+        query = history_query(user_id)
+        if page['stream']:
+            return stream_response(query, Booking.id, page['after_id'],
+                                   serialize_booking, "history", page['stream'])
+        
+        history, next_cursor = paginate(query, Booking.id, page['after_id'], page['limit'])
+        response = [serialize_booking(booking) for booking in history]
+        return jsonify({"history": response, "next_cursor": next_cursor}), 200, next_page_link(next_cursor)
     except Exception as e:
         return jsonify({"message": "Error fetching history", "error": str(e)}), 500
+
+
+def serialize_booking(booking):
+    return {
+        "booking_id": booking.id,
+        "slot_id": booking.slot_id,
+        # Bookings can outlive their slot row in databases predating the delete guard
+        "station_id": booking.slot.station_id if booking.slot else None,
+        "date": booking.booking_time.strftime('%Y-%m-%d'),
+        "amount": booking.amount,
+        "status": booking.status
+    }
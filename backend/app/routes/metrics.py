@@ -0,0 +1,17 @@
+import hmac
+from flask import Blueprint, Response, request, jsonify, current_app
+from app.utils.metrics import metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+# ✅ Prometheus Metrics
+@metrics_bp.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    token = current_app.config.get('METRICS_TOKEN')
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return jsonify({"message": "Unauthorized"}), 401
+    elif not current_app.config.get('METRICS_PUBLIC'):
+        # No token configured: closed unless explicitly opened with METRICS_PUBLIC=1
+        return jsonify({"message": "Unauthorized"}), 401
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
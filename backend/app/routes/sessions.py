@@ -0,0 +1,141 @@
+from flask import Blueprint, jsonify, request
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from app.models import db, ChargingStation, ChargingSession, Booking
+from app.services.change_events import publish_station_status
+from app.services.maintenance import close_session
+from app.services.waitlist import promote_station
+from app.services.load_scheduler import load_scheduler
+from app.services.connectors import (
+    connector_registry, create_connectors, claim_connector, sync_reservations,
+    refresh_station_status, CHARGING, RESERVE_LEAD, MAX_CONNECTORS_PER_STATION
+)
+from app.queries import station_query, get_session_with_station
+from app.utils.pagination import parse_page_args, paginate, stream_response, next_page_link
+from app.utils.cache import response_cache, invalidate_station_listings, STATION_LISTINGS
+
+sessions_bp = Blueprint('sessions', __name__)
+
+# ✅ Get all Charging Stations
+@sessions_bp.route('/api/stations', methods=['GET'])
+def get_stations():
+    try:
+        page = parse_page_args(request.args)
+    except ValueError as e:
+        return jsonify({"message": "Invalid pagination parameters", "error": str(e)}), 400
+
+    serialize = lambda s: {"id": s.id, "name": s.name, "location": s.location, "status": s.status}
+    if page['stream']:
+        return stream_response(station_query(), ChargingStation.id, page['after_id'],
+                               serialize, "stations", page['stream'])
+
+    def build():
+        stations, next_cursor = paginate(station_query(), ChargingStation.id, page['after_id'], page['limit'])
+        return {"stations": [serialize(s) for s in stations], "next_cursor": next_cursor}
+
+    params = {name: request.args.get(name) for name in ('after', 'limit')}
+    return response_cache.response(STATION_LISTINGS, params, build,
+                                   headers=lambda body: next_page_link(body['next_cursor']))
+
+
+# ✅ Create a Charging Station
+@sessions_bp.route('/api/stations', methods=['POST'])
+@jwt_required()
+def create_station():
+    data = request.get_json() or {}
+    if not data.get('name') or not data.get('location'):
+        return jsonify({"message": "Name and Location are required!"}), 400
+    capacity = data.get('capacity')
+    if not isinstance(capacity, int) or not 1 <= capacity <= MAX_CONNECTORS_PER_STATION:
+        return jsonify({"message": f"Capacity must be between 1 and {MAX_CONNECTORS_PER_STATION}!"}), 400
+    station = ChargingStation(
+        name=data['name'],
+        location=data['location'],
+        capacity=capacity,
+        latitude=data.get('latitude'),
+        longitude=data.get('longitude')
+    )
+    create_connectors(station, capacity)
+    db.session.add(station)
+    db.session.commit()
+    invalidate_station_listings()
+    return jsonify({"message": "Charging station created!", "station_id": station.id}), 201
+
+
+# ✅ Start a Charging Session
+# Walk-ins get the first free connector; with `booking_id`, the connector of the booked slot
+@sessions_bp.route('/api/sessions/start', methods=['POST'])
+@jwt_required()
+def start_session():
+    data = request.get_json() or {}
+    user_id = get_jwt_identity()
+    station = db.session.get(ChargingStation, data['station_id']) if data.get('station_id') else None
+
+    if not station:
+        return jsonify({"message": "Station not available!"}), 400
+
+    max_power_kw = data.get('max_power_kw')
+    try:
+        max_power_kw = float(max_power_kw) if max_power_kw is not None else None
+    except (TypeError, ValueError):
+        return jsonify({"message": "Max power must be numeric!"}), 400
+    if max_power_kw is not None and max_power_kw <= 0:
+        return jsonify({"message": "Max power must be positive!"}), 400
+
+    booked_connector = None
+    if data.get('booking_id') is not None:
+        booking = db.session.get(Booking, data['booking_id'])
+        now = datetime.utcnow()
+        if not booking or booking.user_id != int(user_id) or booking.status != 'confirmed' or not booking.slot:
+            return jsonify({"message": "Booking not found!"}), 404
+        slot = booking.slot
+        if slot.station_id != station.id or not slot.start_time - RESERVE_LEAD <= now < slot.end_time:
+            return jsonify({"message": "Booking is not for this station and time!"}), 400
+        booked_connector = slot.connector_id
+
+    if booked_connector is None:
+        # Connectors booked for now are held back from walk-ins
+        sync_reservations(station.id)
+    connector_id = claim_connector(station.id, booked_connector)
+    if connector_id is None:
+        db.session.rollback()
+        return jsonify({"message": "Station not available!"}), 400
+
+    session = ChargingSession(
+        user_id=user_id,
+        station_id=station.id,
+        connector_id=connector_id,
+        start_time=datetime.utcnow(),
+        max_power_kw=max_power_kw
+    )
+    db.session.add(session)
+    refresh_station_status(station)
+    db.session.commit()
+    connector_registry.mark(station.id, connector_id, CHARGING)
+    invalidate_station_listings()
+    publish_station_status(station.id, station.status)
+    plan = load_scheduler.replan_for_station(station)
+    return jsonify({
+        "message": "Session started!",
+        "session_id": session.id,
+        "connector_id": connector_id,
+        "power_kw": plan["sessions"].get(session.id, {}).get("power_kw")
+    }), 201
+
+
+# ✅ End a Charging Session
+@sessions_bp.route('/api/sessions/end/<int:session_id>', methods=['POST'])
+@jwt_required()
+def end_session(session_id):
+    session = get_session_with_station(session_id)
+    if not session:
+        return jsonify({"message": "Session not found!"}), 404
+
+    if session.status != "in_progress":
+        return jsonify({"message": "Session already ended!"}), 400
+
+    close_session(session, datetime.utcnow())
+    invalidate_station_listings()
+    # A session ending early can free upcoming slots for waitlisted users
+    promote_station(session.station_id)
+    return jsonify({"message": "Session ended!"}), 200
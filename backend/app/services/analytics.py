@@ -0,0 +1,193 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import func, extract, case, delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Slot, Booking, ChargingSession, StationHourlyUsage, StationDailyUsage
+
+ROLLUP_LOOKBACK_DAYS = 2
+ROLLUP_MAX_AGE_SECONDS = 300
+ROLLUP_INSERT_CHUNK = 5000
+BOOKED_SLOT_STATUSES = ('reserved', 'occupied')
+DAYS_OF_WEEK = ('Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun')
+USAGE_METRICS = ('slot_minutes', 'booked_minutes', 'bookings', 'revenue', 'sessions', 'energy_kwh')
+HEATMAP_METRICS = USAGE_METRICS
+DEFAULT_RANGE_DAYS = 30
+
+_refresh_lock = threading.Lock()
+_last_refresh = None
+
+
+def _day(column):
+    return func.date(column, type_=db.Date)
+
+
+def _hour(column):
+    return extract('hour', column)
+
+
+def _minutes(start, end):
+    if db.engine.dialect.name == 'sqlite':
+        return (func.julianday(end) - func.julianday(start)) * 1440
+    return extract('epoch', end - start) / 60
+
+
+def _collect(since):
+    """Aggregate slots, bookings and sessions per (station, day, hour) in SQL."""
+    rows = {}
+
+    def row(station_id, day, hour):
+        key = (station_id, day, int(hour))
+        if key not in rows:
+            rows[key] = {"station_id": station_id, "day": day, "hour": int(hour), "weekday": day.weekday(),
+                         "slot_minutes": 0.0, "booked_minutes": 0.0, "bookings": 0,
+                         "revenue": 0.0, "sessions": 0, "energy_kwh": 0.0}
+        return rows[key]
+
+    minutes = _minutes(Slot.start_time, Slot.end_time)
+    slots = db.session.query(
+        Slot.station_id, _day(Slot.start_time), _hour(Slot.start_time),
+        func.sum(minutes),
+        func.sum(case((Slot.status.in_(BOOKED_SLOT_STATUSES), minutes), else_=0))
+    )
+    bookings = db.session.query(
+        Slot.station_id, _day(Booking.booking_time), _hour(Booking.booking_time),
+        func.count(Booking.id), func.sum(Booking.amount)
+    ).join(Slot, Booking.slot_id == Slot.id).filter(Booking.status == 'confirmed')
+    sessions = db.session.query(
+        ChargingSession.station_id, _day(ChargingSession.start_time), _hour(ChargingSession.start_time),
+        func.count(ChargingSession.id), func.sum(func.coalesce(ChargingSession.energy_kwh, 0))
+    )
+    if since is not None:
+        slots = slots.filter(Slot.start_time >= since)
+        bookings = bookings.filter(Booking.booking_time >= since)
+        sessions = sessions.filter(ChargingSession.start_time >= since)
+
+    for station_id, day, hour, offered, booked in slots.group_by(Slot.station_id, _day(Slot.start_time), _hour(Slot.start_time)):
+        entry = row(station_id, day, hour)
+        entry["slot_minutes"] = offered or 0.0
+        entry["booked_minutes"] = booked or 0.0
+    for station_id, day, hour, count, amount in bookings.group_by(Slot.station_id, _day(Booking.booking_time), _hour(Booking.booking_time)):
+        entry = row(station_id, day, hour)
+        entry["bookings"] = count
+        entry["revenue"] = amount or 0.0
+    for station_id, day, hour, count, energy in sessions.group_by(
+            ChargingSession.station_id, _day(ChargingSession.start_time), _hour(ChargingSession.start_time)):
+        entry = row(station_id, day, hour)
+        entry["sessions"] = count
+        entry["energy_kwh"] = energy or 0.0
+    return list(rows.values())
+
+
+def refresh_rollup(full=False, wait=True):
+    """
+    Recompute the hourly and daily usage rollups.
+    Only the last ROLLUP_LOOKBACK_DAYS days and everything after them (future
+    slots keep changing) are recomputed; older days are history and stay as
+    they are. A full rebuild happens on the first run or when `full` is set.
+    The daily table is derived from the hourly one inside the database.
+    Args:
+        full (bool): Rebuild every day.
+        wait (bool): Wait for a refresh already running in this process instead of returning None.
+    Returns:
+        int: Number of hourly rows written, or None if not waiting and a refresh is running.
+    """
+    global _last_refresh
+    if not _refresh_lock.acquire(blocking=wait):
+        return None
+    try:
+        since = None
+        if not full and db.session.query(StationHourlyUsage.day).first() is not None:
+            since = datetime.combine(datetime.utcnow().date() - timedelta(days=ROLLUP_LOOKBACK_DAYS), datetime.min.time())
+
+        rows = _collect(since)
+        try:
+            clear_hourly = delete(StationHourlyUsage)
+            clear_daily = delete(StationDailyUsage)
+            hourly = select(
+                StationHourlyUsage.station_id, StationHourlyUsage.day,
+                *[func.sum(getattr(StationHourlyUsage, metric)) for metric in USAGE_METRICS]
+            ).group_by(StationHourlyUsage.station_id, StationHourlyUsage.day)
+            if since is not None:
+                clear_hourly = clear_hourly.where(StationHourlyUsage.day >= since.date())
+                clear_daily = clear_daily.where(StationDailyUsage.day >= since.date())
+                hourly = hourly.where(StationHourlyUsage.day >= since.date())
+            db.session.execute(clear_hourly)
+            db.session.execute(clear_daily)
+            for start in range(0, len(rows), ROLLUP_INSERT_CHUNK):
+                db.session.execute(insert(StationHourlyUsage), rows[start:start + ROLLUP_INSERT_CHUNK])
+            db.session.execute(
+                insert(StationDailyUsage).from_select(['station_id', 'day', *USAGE_METRICS], hourly)
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Another process refreshed the same days concurrently; its result stands
+            db.session.rollback()
+        _last_refresh = time.monotonic()
+        return len(rows)
+    finally:
+        _refresh_lock.release()
+
+
+def ensure_fresh(max_age=ROLLUP_MAX_AGE_SECONDS):
+    """Refresh the rollup if this process has not done so within `max_age` seconds."""
+    if _last_refresh is None or time.monotonic() - _last_refresh > max_age:
+        refresh_rollup()
+
+
+def _usage_query(model, columns, start_day, end_day, station_id=None):
+    query = db.session.query(*columns).filter(model.day >= start_day, model.day <= end_day)
+    if station_id is not None:
+        query = query.filter(model.station_id == station_id)
+    return query
+
+
+def station_utilization(start_day, end_day, station_id=None):
+    """
+    Per-station totals over a date range, from the daily rollup.
+    Returns:
+        list: Dicts with offered/booked minutes, utilization, bookings, revenue, sessions and energy.
+    """
+    query = _usage_query(
+        StationDailyUsage,
+        [StationDailyUsage.station_id, *[func.sum(getattr(StationDailyUsage, metric)) for metric in USAGE_METRICS]],
+        start_day, end_day, station_id
+    ).group_by(StationDailyUsage.station_id).order_by(StationDailyUsage.station_id)
+    return [
+        {
+            "station_id": sid,
+            "slot_minutes": round(offered, 2),
+            "booked_minutes": round(booked, 2),
+            "utilization": round(booked / offered, 4) if offered else None,
+            "bookings": bookings,
+            "revenue": round(revenue, 2),
+            "sessions": sessions,
+            "energy_kwh": round(energy, 3)
+        }
+        for sid, offered, booked, bookings, revenue, sessions, energy in query
+    ]
+
+
+def revenue_by_day(start_day, end_day, station_id=None):
+    query = _usage_query(
+        StationDailyUsage,
+        [StationDailyUsage.day, func.sum(StationDailyUsage.bookings), func.sum(StationDailyUsage.revenue)],
+        start_day, end_day, station_id
+    ).group_by(StationDailyUsage.day).order_by(StationDailyUsage.day)
+    return [
+        {"day": day.isoformat(), "bookings": bookings, "revenue": round(revenue, 2)}
+        for day, bookings, revenue in query
+    ]
+
+
+def hour_of_week_heatmap(start_day, end_day, station_id=None, metric='bookings'):
+    """7x24 matrix (Monday first) of an hourly rollup metric, grouped in SQL."""
+    query = _usage_query(
+        StationHourlyUsage,
+        [StationHourlyUsage.weekday, StationHourlyUsage.hour, func.sum(getattr(StationHourlyUsage, metric))],
+        start_day, end_day, station_id
+    ).group_by(StationHourlyUsage.weekday, StationHourlyUsage.hour)
+    matrix = [[0] * 24 for _ in DAYS_OF_WEEK]
+    for weekday, hour, value in query:
+        matrix[weekday][hour] = value or 0
+    return {"days": list(DAYS_OF_WEEK), "metric": metric, "values": matrix}
@@ -0,0 +1,213 @@
+import threading
+import time
+from bisect import bisect_left
+from datetime import datetime
+from app.models import db, Slot
+from app.utils.change_bus import change_bus
+
+RELOAD_SECONDS = 60
+
+
+class StationWindows:
+    """Free slots of one station as parallel lists sorted by start time."""
+    __slots__ = ('starts', 'slots')
+
+    def __init__(self):
+        self.starts = []
+        self.slots = []
+
+    def add(self, start, end, slot_id):
+        i = bisect_left(self.slots, (start, end, slot_id))
+        self.starts.insert(i, start)
+        self.slots.insert(i, (start, end, slot_id))
+
+    def remove(self, start, end, slot_id):
+        i = bisect_left(self.slots, (start, end, slot_id))
+        if i < len(self.slots) and self.slots[i] == (start, end, slot_id):
+            del self.starts[i]
+            del self.slots[i]
+
+    def prune(self, now):
+        """Drop slots that have already started and return them."""
+        i = bisect_left(self.starts, now)
+        pruned = self.slots[:i]
+        if i:
+            del self.starts[:i]
+            del self.slots[:i]
+        return pruned
+
+    def first_in_window(self, window_start, window_end=None):
+        """
+        Earliest free slot starting at or after `window_start` (and, when given,
+        lying entirely before `window_end`).
+        """
+        i = bisect_left(self.starts, window_start)
+        while i < len(self.slots):
+            start, end, slot_id = self.slots[i]
+            if window_end is None:
+                return self.slots[i]
+            if start >= window_end:
+                return None
+            if end <= window_end:
+                return self.slots[i]
+            i += 1
+        return None
+
+
+class AvailabilityIndex:
+    """
+    In-memory index of free slot windows per station.
+    Built from the database on first use, then kept current from the
+    change bus, so range and earliest-free-slot queries are a binary search
+    per station instead of a scan over every slot. The change bus only
+    carries this process's changes, so the index is rebuilt every
+    `reload_seconds` to pick up other workers, the reaper and imports. The
+    rebuild runs outside the lock while the old index keeps serving, and
+    events published meanwhile are replayed onto the new one. Callers
+    should still confirm results against the database before presenting
+    them as bookable.
+    """
+
+    def __init__(self, bus=change_bus, reload_seconds=RELOAD_SECONDS):
+        self.bus = bus
+        self.reload_seconds = reload_seconds
+        self._stations = {}
+        self._free = {}  # slot_id -> (station_id, start, end)
+        self._loaded_at = None
+        self._replay = None  # Events received while a rebuild runs
+        self._lock = threading.RLock()
+        self._reload_lock = threading.Lock()
+        self._listening = False
+
+    def init_app(self, app):
+        self.reload_seconds = app.config.get('AVAILABILITY_RELOAD_SECONDS', self.reload_seconds)
+        if not self._listening:
+            self.bus.add_listener(self.on_event)
+            self._listening = True
+
+    def _fresh(self):
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.reload_seconds
+
+    def _build(self):
+        stations, free = {}, {}
+        rows = (
+            db.session.query(Slot.id, Slot.station_id, Slot.start_time, Slot.end_time)
+            .filter(Slot.status == 'available', Slot.start_time >= datetime.utcnow())
+            .order_by(Slot.station_id, Slot.start_time, Slot.end_time, Slot.id)
+            .yield_per(10000)
+        )
+        for slot_id, station_id, start, end in rows:
+            windows = stations.get(station_id)
+            if windows is None:
+                windows = stations[station_id] = StationWindows()
+            windows.starts.append(start)
+            windows.slots.append((start, end, slot_id))
+            free[slot_id] = (station_id, start, end)
+        return stations, free
+
+    def ensure_loaded(self):
+        """Load the index on first use and rebuild it once it is `reload_seconds` old."""
+        if self._fresh():
+            return
+        # Only the first load waits; a stale index keeps serving while one thread rebuilds it
+        if not self._reload_lock.acquire(blocking=self._loaded_at is None):
+            return
+        try:
+            if self._fresh():
+                return
+            started = time.monotonic()
+            with self._lock:
+                self._replay = []
+            try:
+                stations, free = self._build()
+            finally:
+                with self._lock:
+                    replay, self._replay = self._replay, None
+            with self._lock:
+                current = self._stations, self._free
+                self._stations, self._free = stations, free
+                try:
+                    for event in replay:
+                        self._apply(event)
+                except Exception:
+                    self._stations, self._free = current
+                    raise
+                self._loaded_at = started
+        finally:
+            self._reload_lock.release()
+
+    def _add(self, slot_id, station_id, start, end):
+        self._remove(slot_id)
+        self._stations.setdefault(station_id, StationWindows()).add(start, end, slot_id)
+        self._free[slot_id] = (station_id, start, end)
+
+    def _remove(self, slot_id):
+        known = self._free.pop(slot_id, None)
+        if known is not None:
+            station_id, start, end = known
+            self._stations[station_id].remove(start, end, slot_id)
+
+    def on_event(self, topics, event):
+        """Apply a slot diff from the change bus."""
+        if event.get('type') != 'slot':
+            return
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append(event)
+            if self._loaded_at is not None:
+                self._apply(event)
+
+    def _apply(self, event):
+        """Apply one slot event; callers hold the lock."""
+        slot_id = event['slot_id']
+        status = event.get('status')
+        if status is None:
+            # Times changed; only matters if the slot is currently free
+            if slot_id in self._free:
+                self._add(slot_id, event['station_id'],
+                          datetime.fromisoformat(event['start_time']),
+                          datetime.fromisoformat(event['end_time']))
+        elif status != 'available':
+            self._remove(slot_id)
+        elif 'start_time' in event:
+            self._add(slot_id, event['station_id'],
+                      datetime.fromisoformat(event['start_time']),
+                      datetime.fromisoformat(event['end_time']))
+        else:
+            row = db.session.query(Slot.start_time, Slot.end_time).filter_by(id=slot_id).first()
+            if row is not None:
+                self._add(slot_id, event['station_id'], row.start_time, row.end_time)
+
+    def discard(self, slot_ids):
+        """Forget slots found to be taken, e.g. by a change made in another process."""
+        with self._lock:
+            for slot_id in slot_ids:
+                self._remove(slot_id)
+
+    def first_free(self, station_ids, window_start, window_end=None):
+        """
+        Earliest free slot per station within a window.
+        Args:
+            station_ids (iterable): Stations to search.
+            window_start (datetime): Slots must start at or after this time.
+            window_end (datetime): Optional; slots must end by this time.
+        Returns:
+            dict: station_id -> (start, end, slot_id) for stations with a match.
+        """
+        self.ensure_loaded()
+        now = datetime.utcnow()
+        matches = {}
+        with self._lock:
+            for station_id in station_ids:
+                windows = self._stations.get(station_id)
+                if windows is None:
+                    continue
+                for _, _, slot_id in windows.prune(now):
+                    self._free.pop(slot_id, None)
+                match = windows.first_in_window(max(window_start, now), window_end)
+                if match is not None:
+                    matches[station_id] = match
+        return matches
+
+
+availability_index = AvailabilityIndex()
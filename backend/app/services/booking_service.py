@@ -0,0 +1,131 @@
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_, and_
+from sqlalchemy.exc import IntegrityError
+from app.models import db, Slot, Booking
+from app.services.payment_worker import payment_worker
+from app.services.change_events import publish_slot_status
+from app.services.pricing_service import check_amount
+from app.services.waitlist import promote_slots, mark_offer_booked
+from app.services.connectors import assign_connector
+
+RESERVATION_HOLD = timedelta(minutes=5)
+PAYMENT_RESERVATION_HOLD = timedelta(minutes=15)  # Outlasts the payment worker's retry window
+MAX_IDEMPOTENCY_KEY_LENGTH = Booking.idempotency_key.type.length
+
+
+def claim_slot(slot_id, user_id, hold=RESERVATION_HOLD):
+    """
+    Atomically reserve a slot for a user.
+    A single conditional UPDATE decides the winner, so concurrent requests for
+    the same slot can never both succeed. Lapsed reservations can be reclaimed,
+    and a slot held for a waitlisted user can only be claimed by that user
+    until the offer lapses.
+    Args:
+        slot_id (int): Slot to reserve.
+        user_id (int): User holding the reservation.
+        hold (timedelta): How long the reservation is held.
+    Returns:
+        bool: True if this caller now holds the slot.
+    """
+    now = datetime.utcnow()
+    result = db.session.execute(
+        update(Slot)
+        .where(Slot.id == slot_id)
+        .where(or_(
+            Slot.status == 'available',
+            and_(Slot.status.in_(('reserved', 'held')), Slot.reserved_until < now),
+            and_(Slot.status == 'held', Slot.reserved_by == user_id)
+        ))
+        .values(status='reserved', reserved_until=now + hold, reserved_by=user_id)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount != 1:
+        return False
+    publish_slot_status([slot_id], 'reserved')
+    return True
+
+
+def release_slot(slot_id, user_id):
+    """Give a reservation held by `user_id` back to the pool."""
+    result = db.session.execute(
+        update(Slot)
+        .where(Slot.id == slot_id, Slot.status == 'reserved', Slot.reserved_by == user_id)
+        .values(status='available', reserved_until=None, reserved_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    if result.rowcount == 1:
+        publish_slot_status([slot_id], 'available')
+        promote_slots([slot_id])
+
+
+def find_idempotent_booking(user_id, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Booking.query.filter_by(user_id=user_id, idempotency_key=idempotency_key).first()
+
+
+def book_slot(user_id, slot_id, payment_details, idempotency_key=None):
+    """
+    Reserve a slot and queue its payment.
+    The slot is claimed first, so losing a race costs nothing; a station-wide
+    slot is then pinned to a free connector, and the booking, the pin and its
+    outbox payment are written in one transaction and the payment
+    worker settles them asynchronously. A retried request with the same
+    idempotency key returns the original booking.
+    Args:
+        user_id (int): Booking user.
+        slot_id (int): Slot to book.
+        payment_details (dict): Payment information, including `amount`.
+        idempotency_key (str): Optional client-supplied retry key.
+    Returns:
+        dict: Booking status with the booking or a failure message.
+    """
+    existing = find_idempotent_booking(user_id, idempotency_key)
+    if existing:
+        return {"status": "success", "booking": existing, "replayed": True}
+
+    # Priced slots are charged the precomputed price, never a client-chosen amount
+    amount_ok, price = check_amount(slot_id, payment_details['amount'])
+    if not amount_ok:
+        return {"status": "failure", "message": "Amount does not match the slot price", "price": price}
+
+    if not claim_slot(slot_id, user_id, hold=PAYMENT_RESERVATION_HOLD):
+        existing = find_idempotent_booking(user_id, idempotency_key)
+        if existing:
+            return {"status": "success", "booking": existing, "replayed": True}
+        if idempotency_key and db.session.query(Slot.id).filter(
+                Slot.id == slot_id, Slot.status == 'reserved', Slot.reserved_by == user_id).scalar():
+            # A retry racing the original request, which has claimed the slot but not committed yet
+            return {"status": "failure", "code": 409, "message": "A request with this Idempotency-Key is in progress"}
+        return {"status": "failure", "message": "Slot not available"}
+
+    if assign_connector(slot_id) is None:
+        db.session.rollback()
+        release_slot(slot_id, user_id)
+        return {"status": "failure", "message": "No connector is free for this slot"}
+
+    booking = Booking(
+        user_id=user_id,
+        slot_id=slot_id,
+        booking_time=datetime.utcnow(),
+        amount=price if price is not None else payment_details['amount'],
+        idempotency_key=idempotency_key,
+        status='pending_payment'
+    )
+    db.session.add(booking)
+    payment_worker.enqueue(booking, payment_details)
+    mark_offer_booked(user_id, slot_id)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        release_slot(slot_id, user_id)
+        existing = find_idempotent_booking(user_id, idempotency_key)
+        if existing:
+            return {"status": "success", "booking": existing, "replayed": True}
+        raise
+
+    payment_worker.notify()
+    return {"status": "success", "booking": booking, "replayed": False}
@@ -0,0 +1,554 @@
+import csv
+import json
+import os
+import time
+from datetime import datetime, date
+from sqlalchemy import select, insert, update, exists, func, bindparam
+from app.models import db, ChargingStation, Connector, Slot, Booking, WaitlistEntry
+from app.services.change_events import slot_event, publish_slot_events, publish_slot_status
+from app.services.connectors import AVAILABLE, MAX_CONNECTORS_PER_STATION, assign_connector
+from app.services.pricing_service import refresh_prices
+from app.services.slot_service import _find_conflicts, MAX_REPORTED_CONFLICTS
+from app.services.waitlist import promote_slots
+from app.utils.cache import invalidate_station_listings
+from app.utils.geo import geohash_encode
+
+FORMATS = ('csv', 'ndjson', 'parquet')
+DEFAULT_CHUNK_SIZE = 10000
+CHECKPOINT_SUFFIX = '.checkpoint'
+IN_CLAUSE_CHUNK = 500
+BOOKED_BY_OTHERS = ('reserved', 'held', 'occupied')
+
+# Exported and imported tables, with the column used by --since/--until
+ENTITIES = {
+    "stations": {"model": ChargingStation, "time_column": None},
+    "slots": {"model": Slot, "time_column": "start_time"},
+    "bookings": {"model": Booking, "time_column": "booking_time"},
+}
+
+
+class BulkIOError(ValueError):
+    """Raised for unusable input files, options or checkpoints."""
+
+
+def detect_format(path, fmt=None):
+    """Explicit format, else the file extension (.csv, .ndjson/.jsonl, .parquet)."""
+    if fmt:
+        return fmt
+    extension = os.path.splitext(path)[1].lower()
+    if extension == '.csv':
+        return 'csv'
+    if extension in ('.ndjson', '.jsonl'):
+        return 'ndjson'
+    if extension == '.parquet':
+        return 'parquet'
+    raise BulkIOError(f"Cannot tell the format of {path}; pass --format")
+
+
+def _pyarrow():
+    try:
+        import pyarrow  # Optional dependency, only needed for Parquet files
+        import pyarrow.parquet
+    except ImportError:
+        raise BulkIOError("Parquet support needs pyarrow; install it with `pip install pyarrow`")
+    return pyarrow
+
+
+class Checkpoint:
+    """
+    Progress of one import or export, kept next to the data file.
+    Written atomically after every committed chunk, so a crashed run can
+    continue from the last chunk that made it to disk or to the database.
+    """
+
+    def __init__(self, path):
+        self.path = path + CHECKPOINT_SUFFIX
+
+    def load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self, state):
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+def _encode(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _decoder(column):
+    """Parse one file value into the Python type of `column`; empty values become None."""
+    python_type = column.type.python_type
+    if python_type is datetime:
+        parse = datetime.fromisoformat
+    elif python_type is date:
+        parse = date.fromisoformat
+    elif python_type is bool:
+        parse = lambda value: value if isinstance(value, bool) else str(value).lower() in ('1', 'true', 'yes')
+    else:
+        parse = python_type
+
+    def decode(value):
+        if value is None or value == '':
+            return None
+        if isinstance(value, python_type):
+            return value
+        return parse(value)
+    return decode
+
+
+class CsvWriter:
+    def __init__(self, path, names, append):
+        self._file = open(path, 'a' if append else 'w', newline='', encoding='utf-8')
+        self._writer = csv.writer(self._file)
+        if not append:
+            self._writer.writerow(names)
+
+    def write(self, rows):
+        self._writer.writerows([[_encode(value) for value in row] for row in rows])
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class NdjsonWriter:
+    def __init__(self, path, names, append):
+        self._file = open(path, 'a' if append else 'w', encoding='utf-8')
+        self._names = names
+
+    def write(self, rows):
+        self._file.write(''.join(
+            json.dumps(dict(zip(self._names, [_encode(value) for value in row]))) + '\n' for row in rows
+        ))
+
+    def sync(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        return self._file.tell()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter:
+    """One row group per chunk. Parquet files cannot be appended to, so these exports do not resume."""
+
+    def __init__(self, path, columns):
+        pa = _pyarrow()
+        self._pa = pa
+        types = {int: pa.int64(), float: pa.float64(), str: pa.string(), bool: pa.bool_(),
+                 datetime: pa.timestamp('us'), date: pa.date32()}
+        self._schema = pa.schema([(column.name, types.get(column.type.python_type, pa.string()))
+                                  for column in columns])
+        self._writer = pa.parquet.ParquetWriter(path, self._schema)
+
+    def write(self, rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in self._schema]
+        self._writer.write_table(self._pa.Table.from_arrays(
+            [self._pa.array(values, type=field.type) for values, field in zip(columns, self._schema)],
+            schema=self._schema
+        ))
+
+    def sync(self):
+        return None
+
+    def close(self):
+        self._writer.close()
+
+
+def _read_csv(path, chunk_size, skip):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        yield reader.fieldnames or []
+        chunk = []
+        for position, row in enumerate(reader):
+            if position < skip:
+                continue
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+
+def _read_ndjson(path, chunk_size, skip):
+    with open(path, encoding='utf-8') as f:
+        first = None
+        for line in f:
+            if line.strip():
+                first = json.loads(line)
+                break
+        yield list(first) if first else []
+        if first is None:
+            return
+        f.seek(0)
+        chunk = []
+        position = 0
+        for line in f:
+            if not line.strip():
+                continue
+            if position >= skip:
+                chunk.append(json.loads(line))
+                if len(chunk) == chunk_size:
+                    yield chunk
+                    chunk = []
+            position += 1
+        if chunk:
+            yield chunk
+
+
+def _read_parquet(path, chunk_size, skip):
+    pa = _pyarrow()
+    source = pa.parquet.ParquetFile(path)
+    yield source.schema_arrow.names
+    position = 0
+    for batch in source.iter_batches(batch_size=chunk_size):
+        rows = batch.to_pylist()
+        if position + len(rows) > skip:
+            yield rows[max(0, skip - position):]
+        position += len(rows)
+
+
+READERS = {"csv": _read_csv, "ndjson": _read_ndjson, "parquet": _read_parquet}
+
+
+def export_rows(entity, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, since=None, until=None,
+                resume=False, progress=None):
+    """
+    Write every row of `entity` to `path` in id order.
+    Rows are read in keyset pages of `chunk_size` and written before the next
+    page is fetched, so memory does not grow with the table. After each page
+    the file is synced and a checkpoint records the last id and file size;
+    `resume` truncates the file back to that size and carries on.
+    Args:
+        entity (str): Key of ENTITIES.
+        path (str): Output file.
+        fmt (str): One of FORMATS; taken from the extension when None.
+        chunk_size (int): Rows per page.
+        since (datetime): Only rows whose time column is at or after this.
+        until (datetime): Only rows whose time column is before this.
+        resume (bool): Continue from the checkpoint of an interrupted run.
+        progress (callable): Called with (rows written, elapsed seconds) after each page.
+    Returns:
+        dict: rows, seconds and rows_per_second of this run.
+    Raises:
+        BulkIOError: For bad options or a checkpoint from a different export.
+    """
+    fmt = detect_format(path, fmt)
+    spec = ENTITIES[entity]
+    table = spec["model"].__table__
+    columns = list(table.columns)
+    names = [column.name for column in columns]
+
+    conditions = []
+    if since is not None or until is not None:
+        if spec["time_column"] is None:
+            raise BulkIOError(f"{entity} cannot be filtered by time")
+        time_column = table.c[spec["time_column"]]
+        if since is not None:
+            conditions.append(time_column >= since)
+        if until is not None:
+            conditions.append(time_column < until)
+
+    checkpoint = Checkpoint(path)
+    job = {"entity": entity, "format": fmt,
+           "since": _encode(since), "until": _encode(until)}
+    last_id, exported = 0, 0
+    state = checkpoint.load() if resume else None
+    if resume and fmt == 'parquet':
+        raise BulkIOError("Parquet exports cannot be resumed; run the export again without --resume")
+    if state is not None:
+        if state.get("job") != job:
+            raise BulkIOError(f"{checkpoint.path} belongs to a different export")
+        with open(path, 'r+b') as f:
+            f.truncate(state["offset"])
+        last_id, exported = state["last_id"], state["rows"]
+
+    if fmt == 'csv':
+        writer = CsvWriter(path, names, append=state is not None)
+    elif fmt == 'ndjson':
+        writer = NdjsonWriter(path, names, append=state is not None)
+    else:
+        writer = ParquetWriter(path, columns)
+
+    started = time.perf_counter()
+    written = 0
+    try:
+        while True:
+            rows = db.session.execute(
+                select(*columns).where(table.c.id > last_id, *conditions).order_by(table.c.id).limit(chunk_size)
+            ).all()
+            db.session.rollback()  # End the read transaction between pages
+            if not rows:
+                break
+            writer.write(rows)
+            last_id = rows[-1].id
+            written += len(rows)
+            offset = writer.sync()
+            if offset is not None:
+                checkpoint.save({"job": job, "last_id": last_id, "rows": exported + written, "offset": offset})
+            if progress:
+                progress(written, time.perf_counter() - started)
+            if len(rows) < chunk_size:
+                break
+    finally:
+        writer.close()
+    checkpoint.clear()
+    return _stats(written, exported + written, time.perf_counter() - started)
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _secondary_indexes(table):
+    return [index for index in table.indexes if not index.unique]
+
+
+def _prepare_stations(rows):
+    for row in rows:
+        if row.get('status') is None:
+            row['status'] = 'available'
+        latitude, longitude = row.get('latitude'), row.get('longitude')
+        # Bulk inserts bypass the ORM hook that maintains the geohash
+        row['geohash'] = geohash_encode(latitude, longitude) if latitude is not None and longitude is not None else None
+        capacity = row.get('capacity')
+        if capacity is None or not 1 <= capacity <= MAX_CONNECTORS_PER_STATION:
+            raise BulkIOError(f"Capacity must be between 1 and {MAX_CONNECTORS_PER_STATION}: {row}")
+
+
+def _prepare_slots(rows, numbers):
+    """
+    Default the status of imported slots and check them as the slot
+    operations API would: against each other and against stored slots for
+    connector overlaps and station capacity.
+    Raises:
+        BulkIOError: For a slot without a valid time range, or overlapping slots.
+    """
+    intervals = []
+    for row, number in zip(rows, numbers):
+        if row.get('status') is None:
+            row['status'] = 'available'
+        start, end = row.get('start_time'), row.get('end_time')
+        if row.get('station_id') is None or start is None or end is None or start >= end:
+            raise BulkIOError(f"Row {number}: a slot needs a station_id and a start_time before its end_time")
+        intervals.append((row['station_id'], row.get('connector_id'), start, end, f"row{number}"))
+    conflicts = _find_conflicts(intervals, set())
+    if conflicts:
+        raise BulkIOError("Slots overlap existing slots: " + "; ".join(
+            f"{conflict['operation']} with {conflict['conflicts_with']}" for conflict in conflicts))
+
+
+def _occupy_booked_slots(rows, numbers):
+    """
+    Take the slots of imported confirmed bookings as a paid booking would:
+    mark them occupied by the booking's user and pin station-wide slots to
+    a free connector. The caller commits.
+    Returns:
+        list: Ids of the slots taken.
+    Raises:
+        BulkIOError: If a slot is missing, held or booked by another user, or has no free connector.
+    """
+    booked = {}
+    for row, number in zip(rows, numbers):
+        if row.get('status') is None:
+            row['status'] = 'confirmed'
+        if row['status'] != 'confirmed' or row.get('slot_id') is None:
+            continue
+        if row['slot_id'] in booked and booked[row['slot_id']][0] != row.get('user_id'):
+            raise BulkIOError(f"Row {number}: slot {row['slot_id']} is booked twice in this chunk")
+        booked[row['slot_id']] = (row.get('user_id'), number)
+    if not booked:
+        return []
+
+    slots = {}
+    for chunk in _chunks(booked):
+        slots.update((slot_id, (status, reserved_by)) for slot_id, status, reserved_by in db.session.execute(
+            select(Slot.id, Slot.status, Slot.reserved_by).where(Slot.id.in_(chunk))))
+    unavailable = [
+        f"row{number} (slot {slot_id})" for slot_id, (user_id, number) in booked.items()
+        if slot_id not in slots or (slots[slot_id][0] in BOOKED_BY_OTHERS and slots[slot_id][1] not in (None, user_id))
+    ]
+    if unavailable:
+        raise BulkIOError("Slots missing or taken by another user: " + ", ".join(unavailable[:MAX_REPORTED_CONFLICTS]))
+
+    # Core executemany: one statement for the whole chunk
+    db.session.connection().execute(
+        update(Slot.__table__).where(Slot.__table__.c.id == bindparam('booked_slot_id'))
+        .values(status='occupied', reserved_by=bindparam('booked_by'), reserved_until=None),
+        [{"booked_slot_id": slot_id, "booked_by": user_id} for slot_id, (user_id, _) in booked.items()]
+    )
+    for slot_id, (_, number) in booked.items():
+        if assign_connector(slot_id) is None:
+            raise BulkIOError(f"Row {number}: no connector is free for slot {slot_id}")
+    return list(booked)
+
+
+def _announce(entity, rows, ids, taken):
+    """Tell the change bus (and with it the availability index), the listing cache and the waitlist about a committed chunk."""
+    if entity == 'slots':
+        publish_slot_events([slot_event(slot_id, row['station_id'], row['status'], row['start_time'], row['end_time'])
+                             for slot_id, row in zip(ids, rows)])
+    elif entity == 'bookings':
+        publish_slot_status(taken, 'occupied')
+    invalidate_station_listings()
+    if entity == 'slots':
+        # New slots may fit the window of someone on the waitlist
+        waiting = set()
+        for chunk in _chunks({row['station_id'] for row in rows}):
+            waiting.update(station_id for (station_id,) in db.session.execute(
+                select(WaitlistEntry.station_id).where(WaitlistEntry.station_id.in_(chunk),
+                                                       WaitlistEntry.status == 'waiting').distinct()))
+        promote_slots([slot_id for slot_id, row in zip(ids, rows)
+                       if row['status'] == 'available' and row['station_id'] in waiting])
+
+
+def _create_missing_connectors(lowest_id, highest_id):
+    """Give imported stations in an id range their connectors; stations that already have them are skipped."""
+    now = datetime.utcnow()
+    stations = db.session.execute(
+        select(ChargingStation.id, ChargingStation.capacity).where(
+            ChargingStation.id.between(lowest_id, highest_id),
+            ~exists().where(Connector.station_id == ChargingStation.id)
+        )
+    ).all()
+    rows = [{"station_id": station_id, "position": position, "state": AVAILABLE, "updated_at": now}
+            for station_id, capacity in stations for position in range(1, capacity + 1)]
+    if rows:
+        db.session.execute(insert(Connector), rows)
+
+
+def import_rows(entity, path, fmt=None, chunk_size=DEFAULT_CHUNK_SIZE, defer_indexes=False,
+                resume=False, progress=None):
+    """
+    Load rows of `entity` from `path` with batched multi-row INSERTs.
+    The file is read `chunk_size` rows at a time and each chunk is committed
+    on its own, followed by a checkpoint of the rows consumed. `resume`
+    skips what the checkpoint records; if the run stopped between a commit
+    and its checkpoint, rows whose id already exists are skipped rather than
+    inserted twice. With `defer_indexes`, the table's non-unique indexes
+    are dropped for the load and rebuilt once at the end.
+    Every chunk is handled as the API would handle the same writes: imported
+    stations get their connectors; slots are checked for overlaps and priced;
+    the slots of confirmed bookings become occupied on a connector. After
+    each commit the change is published and cached listings are dropped.
+    Args:
+        entity (str): Key of ENTITIES.
+        path (str): Input file with a header (CSV) or one object per line (NDJSON).
+        fmt (str): One of FORMATS; taken from the extension when None.
+        chunk_size (int): Rows per transaction.
+        defer_indexes (bool): Rebuild secondary indexes after the load.
+        resume (bool): Continue from the checkpoint of an interrupted run.
+        progress (callable): Called with (rows inserted, elapsed seconds) after each chunk.
+    Returns:
+        dict: rows, seconds and rows_per_second of this run.
+    Raises:
+        BulkIOError: For unknown columns, bad values, conflicting rows or a mismatched checkpoint.
+    """
+    fmt = detect_format(path, fmt)
+    table = ENTITIES[entity]["model"].__table__
+    checkpoint = Checkpoint(path)
+    job = {"entity": entity, "format": fmt}
+    state = checkpoint.load() if resume else None
+    if state is not None and state.get("job") != job:
+        raise BulkIOError(f"{checkpoint.path} belongs to a different import")
+    consumed = state["rows"] if state else 0
+    deferred = state["deferred_indexes"] if state else []
+
+    chunks = READERS[fmt](path, chunk_size, consumed)
+    names = list(next(chunks))
+    unknown = sorted(set(names) - set(table.c.keys()))
+    if unknown:
+        raise BulkIOError("Unknown columns: " + ", ".join(unknown))
+    decoders = {name: _decoder(table.c[name]) for name in names}
+
+    if defer_indexes and not deferred:
+        deferred = [index.name for index in _secondary_indexes(table)]
+        checkpoint.save({"job": job, "rows": consumed, "deferred_indexes": deferred})
+    for index in _secondary_indexes(table):
+        if index.name in deferred:
+            index.drop(db.engine, checkfirst=True)
+
+    started = time.perf_counter()
+    imported = 0
+    check_existing = state is not None and 'id' in names
+    try:
+        for chunk in chunks:
+            try:
+                rows = [{name: decoders[name](raw.get(name)) for name in names} for raw in chunk]
+            except (TypeError, ValueError) as e:
+                raise BulkIOError(f"Bad value after row {consumed}: {str(e)}")
+            numbers = range(consumed + 1, consumed + len(rows) + 1)
+            if check_existing:
+                ids = [row['id'] for row in rows if row['id'] is not None]
+                existing = {row_id for (row_id,) in db.session.execute(select(table.c.id).where(table.c.id.in_(ids)))}
+                numbers = [number for number, row in zip(numbers, rows) if row['id'] not in existing]
+                rows = [row for row in rows if row['id'] not in existing]
+                check_existing = bool(existing)
+            ids, taken = [], []
+            if entity == 'stations':
+                _prepare_stations(rows)
+                previous_id = db.session.execute(select(func.max(table.c.id))).scalar() or 0
+            elif entity == 'slots' and rows:
+                _prepare_slots(rows, numbers)
+            elif entity == 'bookings':
+                taken = _occupy_booked_slots(rows, numbers)
+            if rows and entity == 'slots':
+                ids = db.session.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True),
+                                         rows).scalars().all()
+            elif rows:
+                db.session.execute(insert(table), rows)
+            if entity == 'stations' and rows:
+                station_ids = [row['id'] for row in rows if row.get('id') is not None]
+                lowest = min(station_ids + [previous_id + 1])
+                highest = db.session.execute(select(func.max(table.c.id))).scalar()
+                _create_missing_connectors(lowest, highest)
+            elif ids:
+                refresh_prices(slot_ids=ids)
+            db.session.commit()
+            consumed += len(chunk)
+            imported += len(rows)
+            checkpoint.save({"job": job, "rows": consumed, "deferred_indexes": deferred})
+            if rows:
+                _announce(entity, rows, ids, taken)
+            if progress:
+                progress(imported, time.perf_counter() - started)
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        for index in _secondary_indexes(table):
+            if index.name in deferred:
+                index.create(db.engine, checkfirst=True)
+
+    checkpoint.clear()
+    return _stats(imported, consumed, time.perf_counter() - started)
+
+
+def _stats(rows, total, seconds):
+    return {"rows": rows, "total_rows": total, "seconds": round(seconds, 3),
+            "rows_per_second": round(rows / seconds, 1) if seconds else None}
@@ -0,0 +1,90 @@
+import json
+from app.models import db, ChargingStation, Slot
+from app.utils.change_bus import change_bus
+
+AREA_MAX_PRECISION = 6
+STATION_GEOHASH_CACHE_SIZE = 100000
+
+_station_geohashes = {}
+
+
+def station_topic(station_id):
+    return f"station:{station_id}"
+
+
+def area_topic(prefix):
+    return f"area:{prefix}"
+
+
+def parse_event_topics(args):
+    """
+    Build subscription topics from `station_id` (comma separated) and `area` (geohash prefix) arguments.
+    Raises:
+        ValueError: If an argument is malformed.
+    """
+    topics = []
+    station_ids = args.get('station_id')
+    if station_ids:
+        topics += [station_topic(int(station_id)) for station_id in station_ids.split(',')]
+    area = args.get('area')
+    if area:
+        area = area.strip().lower()
+        if not 1 <= len(area) <= AREA_MAX_PRECISION:
+            raise ValueError(f"Area must be a geohash prefix of 1 to {AREA_MAX_PRECISION} characters")
+        topics.append(area_topic(area))
+    return topics
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+def forget_station(station_id):
+    """Drop the cached geohash of a station whose coordinates changed."""
+    _station_geohashes.pop(station_id, None)
+
+
+def _station_topics(station_id):
+    if station_id not in _station_geohashes:
+        if len(_station_geohashes) >= STATION_GEOHASH_CACHE_SIZE:
+            _station_geohashes.clear()
+        _station_geohashes[station_id] = db.session.query(ChargingStation.geohash).filter_by(id=station_id).scalar()
+    geohash = _station_geohashes[station_id]
+    topics = [station_topic(station_id)]
+    if geohash:
+        topics += [area_topic(geohash[:precision]) for precision in range(1, AREA_MAX_PRECISION + 1)]
+    return topics
+
+
+def slot_event(slot_id, station_id, status=None, start_time=None, end_time=None):
+    """Incremental slot diff: only the fields that changed are included."""
+    event = {"type": "slot", "slot_id": slot_id, "station_id": station_id}
+    if status is not None:
+        event["status"] = status
+    if start_time is not None:
+        event["start_time"] = start_time.isoformat()
+    if end_time is not None:
+        event["end_time"] = end_time.isoformat()
+    return event
+
+
+def publish_slot_events(events):
+    """Publish slot diffs; call after the change is committed."""
+    topics_by_station = {}
+    for event in events:
+        station_id = event["station_id"]
+        if station_id not in topics_by_station:
+            topics_by_station[station_id] = _station_topics(station_id)
+        change_bus.publish(topics_by_station[station_id], event)
+
+
+def publish_slot_status(slot_ids, status):
+    """Publish a status change for committed slots, looking up their stations in one query."""
+    if not slot_ids:
+        return
+    rows = db.session.query(Slot.id, Slot.station_id).filter(Slot.id.in_(slot_ids)).all()
+    publish_slot_events([slot_event(slot_id, station_id, status=status) for slot_id, station_id in rows])
+
+
+def publish_station_status(station_id, status):
+    change_bus.publish(_station_topics(station_id), {"type": "station", "station_id": station_id, "status": status})
@@ -0,0 +1,311 @@
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update, select, func, exists
+from sqlalchemy.orm import aliased
+from app.models import db, ChargingStation, Connector, Slot
+from app.utils.cache import invalidate_station_listings
+
+AVAILABLE, RESERVED, CHARGING, FAULTED = 0, 1, 2, 3
+STATE_NAMES = ('available', 'reserved', 'charging', 'faulted')
+STATION_AVAILABILITY = ('available', 'occupied', 'faulted')
+MAX_CONNECTORS_PER_STATION = 100
+RESERVE_LEAD = timedelta(minutes=10)  # Booked connectors are held this long before the slot starts
+SYNC_SECONDS = 2
+SYNC_OVERLAP = timedelta(seconds=5)
+FULL_RELOAD_SECONDS = 300
+CLAIM_ATTEMPTS = 3
+
+
+class StationConnectors:
+    """
+    Connector states of one station as bitmaps, bit n-1 for position n.
+    The first free connector is the lowest set bit of `free`, so lookups
+    and availability checks do not depend on the number of connectors.
+    """
+    __slots__ = ('ids', 'positions', 'free', 'faulted', 'total')
+
+    def __init__(self):
+        self.ids = {}  # position -> connector id
+        self.positions = {}  # connector id -> position
+        self.free = 0
+        self.faulted = 0
+        self.total = 0
+
+    def set(self, connector_id, position, state):
+        if connector_id not in self.positions:
+            self.ids[position] = connector_id
+            self.positions[connector_id] = position
+            self.total |= 1 << (position - 1)
+        bit = 1 << (position - 1)
+        self.free = self.free | bit if state == AVAILABLE else self.free & ~bit
+        self.faulted = self.faulted | bit if state == FAULTED else self.faulted & ~bit
+
+    def first_free(self, exclude=0):
+        bits = self.free & ~exclude
+        if not bits:
+            return None
+        return self.ids[(bits & -bits).bit_length()]
+
+    def availability(self):
+        if self.free:
+            return 'available'
+        if self.total and self.faulted == self.total:
+            return 'faulted'
+        return 'occupied'
+
+
+class ConnectorRegistry:
+    """
+    In-memory station -> connector bitmap index.
+    Loaded from the database on first use and kept current by applying this
+    process's own changes immediately plus a delta sync of rows whose
+    `updated_at` moved (changes made by other workers) at most every
+    SYNC_SECONDS, with a full reload every FULL_RELOAD_SECONDS as a
+    backstop. Claims are still decided by conditional UPDATEs; the bitmap
+    only picks the candidate.
+    """
+
+    def __init__(self):
+        self._stations = {}
+        self._watermark = None
+        self._synced = 0.0
+        self._loaded = 0.0
+        self._lock = threading.RLock()
+
+    def _apply(self, rows):
+        for connector_id, station_id, position, state, updated_at in rows:
+            station = self._stations.get(station_id)
+            if station is None:
+                station = self._stations[station_id] = StationConnectors()
+            station.set(connector_id, position, state)
+            if self._watermark is None or updated_at > self._watermark:
+                self._watermark = updated_at
+
+    def _columns(self):
+        return db.session.query(
+            Connector.id, Connector.station_id, Connector.position, Connector.state, Connector.updated_at
+        )
+
+    def sync(self, force=False):
+        """Bring the bitmaps up to date; cheap when called often."""
+        now = time.monotonic()
+        if not force and now - self._synced < SYNC_SECONDS:
+            return
+        with self._lock:
+            if not force and now - self._synced < SYNC_SECONDS:
+                return
+            if not self._loaded or now - self._loaded >= FULL_RELOAD_SECONDS:
+                self._stations = {}
+                self._watermark = None
+                self._apply(self._columns().yield_per(10000))
+                self._loaded = now
+            elif self._watermark is not None:
+                self._apply(self._columns().filter(Connector.updated_at >= self._watermark - SYNC_OVERLAP))
+            else:
+                self._apply(self._columns())
+            self._synced = now
+
+    def _station(self, station_id):
+        station = self._stations.get(station_id)
+        if station is None:
+            # Created since the last sync
+            self._apply(self._columns().filter(Connector.station_id == station_id))
+            station = self._stations.setdefault(station_id, StationConnectors())
+        return station
+
+    def mark(self, station_id, connector_id, state):
+        """Record a committed state change made by this process."""
+        with self._lock:
+            station = self._station(station_id)
+            position = station.positions.get(connector_id)
+            if position is None:
+                self._apply(self._columns().filter(Connector.station_id == station_id))
+            else:
+                station.set(connector_id, position, state)
+
+    def first_free(self, station_id, exclude=0):
+        with self._lock:
+            return self._station(station_id).first_free(exclude)
+
+    def position(self, station_id, connector_id):
+        with self._lock:
+            return self._station(station_id).positions.get(connector_id)
+
+    def availability(self, station_id):
+        """'available' if any connector is free, 'faulted' if all are faulted, else 'occupied'."""
+        with self._lock:
+            return self._station(station_id).availability()
+
+    def stations_with(self, availability):
+        """Ids of stations whose connectors give `availability`, ascending."""
+        with self._lock:
+            return sorted(station_id for station_id, station in self._stations.items()
+                          if station.availability() == availability)
+
+    def free_count(self, station_id):
+        with self._lock:
+            return self._station(station_id).free.bit_count()
+
+
+connector_registry = ConnectorRegistry()
+
+
+def create_connectors(station, count):
+    """Give a new station `count` connectors; committed with the caller's transaction."""
+    now = datetime.utcnow()
+    station.connectors = [Connector(position=position, state=AVAILABLE, updated_at=now)
+                          for position in range(1, count + 1)]
+
+
+def _transition(connector_id, from_states, to_state):
+    result = db.session.execute(
+        update(Connector)
+        .where(Connector.id == connector_id, Connector.state.in_(from_states))
+        .values(state=to_state, updated_at=datetime.utcnow())
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def claim_connector(station_id, connector_id=None):
+    """
+    Take a connector for a new session. The caller commits, then calls
+    `connector_registry.mark(station_id, connector_id, CHARGING)`.
+    Args:
+        station_id (int): Station to charge at.
+        connector_id (int): A booked connector, which may be free or reserved
+            for the booking; otherwise the first free connector is used.
+    Returns:
+        int: Connector id, or None if no connector could be taken.
+    """
+    if connector_id is not None:
+        return connector_id if _transition(connector_id, (AVAILABLE, RESERVED), CHARGING) else None
+
+    connector_registry.sync()
+    tried = 0
+    for _ in range(CLAIM_ATTEMPTS):
+        candidate = connector_registry.first_free(station_id, exclude=tried)
+        if candidate is None:
+            break
+        if _transition(candidate, (AVAILABLE,), CHARGING):
+            return candidate
+        # Taken by another worker since the last sync
+        tried |= 1 << (connector_registry.position(station_id, candidate) - 1)
+
+    candidate = db.session.query(Connector.id).filter(
+        Connector.station_id == station_id, Connector.state == AVAILABLE
+    ).order_by(Connector.position).limit(1).scalar()
+    if candidate is not None and _transition(candidate, (AVAILABLE,), CHARGING):
+        return candidate
+    return None
+
+
+def assign_connector(slot_id):
+    """
+    Pin a station-wide slot being booked to a connector with no other slot
+    in its time range, so the booking holds a concrete connector that
+    `sync_reservations` can reserve. Slots already on a connector keep it.
+    The caller commits.
+    Returns:
+        int: Connector id, or None if every connector is taken for that time.
+    """
+    slot = db.session.query(Slot.station_id, Slot.connector_id, Slot.start_time, Slot.end_time).filter(
+        Slot.id == slot_id).one()
+    if slot.connector_id is not None:
+        return slot.connector_id
+
+    def lane_taken(connector_id):
+        other = aliased(Slot)
+        return exists().where(other.connector_id == connector_id, other.id != slot_id,
+                              other.start_time < slot.end_time, other.end_time > slot.start_time)
+
+    candidates = db.session.query(Connector.id).filter(
+        Connector.station_id == slot.station_id, Connector.state != FAULTED, ~lane_taken(Connector.id)
+    ).order_by(Connector.position)
+    for (connector_id,) in candidates.all():
+        # Re-checked in the UPDATE so two bookings cannot pin overlapping slots to one connector
+        result = db.session.execute(
+            update(Slot)
+            .where(Slot.id == slot_id, Slot.connector_id.is_(None), ~lane_taken(connector_id))
+            .values(connector_id=connector_id)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 1:
+            return connector_id
+    return None
+
+
+def release_connector(connector_id):
+    """
+    Free a connector when its session ends; a connector that faulted while
+    charging stays faulted. The caller commits.
+    Returns:
+        int: The connector's state afterwards.
+    """
+    _transition(connector_id, (CHARGING,), AVAILABLE)
+    return db.session.query(Connector.state).filter(Connector.id == connector_id).scalar()
+
+
+def set_fault(connector_id, faulted):
+    """Mark a connector faulted, or return a faulted connector to service. The caller commits."""
+    if faulted:
+        return _transition(connector_id, (AVAILABLE, RESERVED, CHARGING), FAULTED)
+    return _transition(connector_id, (FAULTED,), AVAILABLE)
+
+
+def sync_reservations(station_id=None, now=None):
+    """
+    Hold connectors for paid bookings that are about to start and free them
+    once the booked slot is over, then re-derive the status of the stations
+    affected. Runs for one station before a walk-in session picks a
+    connector, and periodically for all stations.
+    Returns:
+        int: Connectors whose state changed.
+    """
+    now = now or datetime.utcnow()
+    booked = select(Slot.connector_id).where(
+        Slot.connector_id.isnot(None),
+        Slot.status == 'occupied',
+        Slot.start_time <= now + RESERVE_LEAD,
+        Slot.end_time > now
+    )
+    scope = [Connector.station_id == station_id] if station_id is not None else []
+    to_reserve = db.session.query(Connector.id, Connector.station_id).filter(
+        Connector.state == AVAILABLE, Connector.id.in_(booked), *scope
+    ).all()
+    to_release = db.session.query(Connector.id, Connector.station_id).filter(
+        Connector.state == RESERVED, Connector.id.not_in(booked), *scope
+    ).all()
+    changed = 0
+    for rows, from_state, to_state in ((to_reserve, AVAILABLE, RESERVED), (to_release, RESERVED, AVAILABLE)):
+        if rows:
+            changed += db.session.execute(
+                update(Connector)
+                .where(Connector.id.in_([connector_id for connector_id, _ in rows]), Connector.state == from_state)
+                .values(state=to_state, updated_at=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+    station_ids = {sid for _, sid in to_reserve} | {sid for _, sid in to_release}
+    for station in ChargingStation.query.filter(ChargingStation.id.in_(station_ids)) if station_ids else ():
+        refresh_station_status(station)
+    db.session.commit()
+    if changed:
+        connector_registry.sync(force=True)
+        invalidate_station_listings()
+    return changed
+
+
+def refresh_station_status(station):
+    """Derive the stored station status from its connectors, for listings and station events."""
+    counts = dict(
+        db.session.query(Connector.state, func.count(Connector.id))
+        .filter(Connector.station_id == station.id).group_by(Connector.state)
+    )
+    if counts.get(AVAILABLE):
+        station.status = 'available'
+    elif counts and counts.get(FAULTED) == sum(counts.values()):
+        station.status = 'faulted'
+    else:
+        station.status = 'occupied'
+    return station.status
@@ -0,0 +1,33 @@
+import heapq
+from sqlalchemy import or_, and_
+from app.models import ChargingStation
+from app.utils.geo import haversine_km, covering_cells, prefix_upper_bound
+
+
+def find_nearby_stations(latitude, longitude, radius_km, limit):
+    """
+    Find the stations closest to a point using the geohash index.
+    Only stations in the geohash cells covering the search circle are loaded,
+    so the cost depends on local density rather than the size of the network.
+    Args:
+        latitude (float): Search centre latitude.
+        longitude (float): Search centre longitude.
+        radius_km (float): Maximum distance in kilometres.
+        limit (int): Maximum number of stations to return.
+    Returns:
+        list: (distance_km, station) tuples sorted by distance.
+    """
+    query = ChargingStation.query.filter(ChargingStation.geohash.isnot(None))
+    cells = covering_cells(latitude, longitude, radius_km)
+    if cells:
+        query = query.filter(or_(*[
+            and_(ChargingStation.geohash >= cell, ChargingStation.geohash < prefix_upper_bound(cell))
+            for cell in cells
+        ]))
+
+    candidates = (
+        (haversine_km(latitude, longitude, s.latitude, s.longitude), s.id, s)
+        for s in query.yield_per(500)
+    )
+    nearest = heapq.nsmallest(limit, (c for c in candidates if c[0] <= radius_km))
+    return [(distance, station) for distance, _, station in nearest]
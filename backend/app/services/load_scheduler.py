@@ -0,0 +1,161 @@
+import threading
+import time
+from app.models import db, ChargingStation, ChargingSession, Site
+from app.utils.change_bus import change_bus
+from app.services.change_events import station_topic
+
+DEFAULT_CONNECTOR_POWER_KW = 22.0
+UNLIMITED = float('inf')
+PLAN_TTL_SECONDS = 30  # Bounds how long changes made by other workers go unseen
+
+
+def water_level(caps, total):
+    """
+    Max-min fair share of `total` among consumers capped at `caps`.
+    Every consumer gets min(cap, level); the level is chosen so the shares
+    add up to `total`, or is infinite when all caps fit.
+    Args:
+        caps (list): Per-consumer limits.
+        total (float): Capacity to share.
+    Returns:
+        float: Water level.
+    """
+    if sum(caps) <= total:
+        return UNLIMITED
+    remaining = total
+    ordered = sorted(caps)
+    for index, cap in enumerate(ordered):
+        level = remaining / (len(ordered) - index)
+        if cap >= level:
+            return level
+        remaining -= cap
+    return UNLIMITED
+
+
+def allocate(sessions, station_limits, grid_limit=None):
+    """
+    Share power among concurrent sessions under station and grid limits.
+    Each station's limit is water-filled across its sessions, then the grid
+    limit is water-filled across the resulting per-session caps. Both steps
+    are a sort and a linear pass, so a plan costs O(n log n).
+    Args:
+        sessions (list): (session_id, station_id, vehicle_limit_kw) tuples.
+        station_limits (dict): station_id -> total station limit in kW.
+        grid_limit (float): Site limit in kW, or None for no site limit.
+    Returns:
+        dict: session_id -> allocated kW.
+    """
+    by_station = {}
+    for session_id, station_id, demand in sessions:
+        by_station.setdefault(station_id, []).append((session_id, demand))
+
+    capped = []
+    for station_id, members in by_station.items():
+        level = water_level([demand for _, demand in members], station_limits[station_id])
+        capped += [(session_id, min(demand, level)) for session_id, demand in members]
+
+    level = UNLIMITED if grid_limit is None else water_level([cap for _, cap in capped], grid_limit)
+    return {session_id: min(cap, level) for session_id, cap in capped}
+
+
+def session_demand(session_limit, station_max_power, capacity):
+    """A session asks for its vehicle limit, or one connector's share of the station."""
+    if session_limit is not None:
+        return session_limit
+    if station_max_power is not None:
+        return station_max_power / max(capacity, 1)
+    return DEFAULT_CONNECTOR_POWER_KW
+
+
+class LoadScheduler:
+    """
+    Keeps the current power plan of every site in memory.
+    A plan covers one site (all of its stations share the grid limit) or one
+    station that belongs to no site. When a session starts or ends only that
+    plan is recomputed, and allocations that changed are published on the
+    change bus so chargers subscribed to their station can apply new setpoints.
+    Sessions started or ended by other worker processes are picked up when a
+    cached plan is older than PLAN_TTL_SECONDS.
+    """
+
+    def __init__(self, bus=change_bus):
+        self.bus = bus
+        self._plans = {}
+        self._lock = threading.Lock()
+
+    def plan_key(self, station):
+        return ('site', station.site_id) if station.site_id is not None else ('station', station.id)
+
+    def _load(self, key):
+        kind, key_id = key
+        query = (
+            db.session.query(
+                ChargingSession.id, ChargingSession.station_id, ChargingSession.max_power_kw,
+                ChargingStation.max_power_kw, ChargingStation.capacity
+            )
+            .join(ChargingStation, ChargingSession.station_id == ChargingStation.id)
+            .filter(ChargingSession.status == "in_progress")
+        )
+        stations = ChargingStation.query.with_entities(
+            ChargingStation.id, ChargingStation.max_power_kw, ChargingStation.capacity
+        )
+        grid_limit = None
+        if kind == 'site':
+            query = query.filter(ChargingStation.site_id == key_id)
+            stations = stations.filter(ChargingStation.site_id == key_id)
+            grid_limit = db.session.query(Site.grid_limit_kw).filter(Site.id == key_id).scalar()
+        else:
+            query = query.filter(ChargingStation.id == key_id)
+            stations = stations.filter(ChargingStation.id == key_id)
+
+        sessions = [
+            (session_id, station_id, session_demand(session_limit, station_power, capacity))
+            for session_id, station_id, session_limit, station_power, capacity in query
+        ]
+        limits = {
+            station_id: station_power if station_power is not None else capacity * DEFAULT_CONNECTOR_POWER_KW
+            for station_id, station_power, capacity in stations
+        }
+        return sessions, limits, grid_limit
+
+    def replan(self, key):
+        """
+        Recompute one plan from the database and publish changed allocations.
+        Returns:
+            dict: The new plan.
+        """
+        sessions, limits, grid_limit = self._load(key)
+        allocation = allocate(sessions, limits, grid_limit)
+        stations = {session_id: station_id for session_id, station_id, _ in sessions}
+        plan = {
+            "grid_limit_kw": grid_limit,
+            "allocated_kw": round(sum(allocation.values()), 3),
+            "sessions": {
+                session_id: {"station_id": stations[session_id], "power_kw": round(power, 3)}
+                for session_id, power in allocation.items()
+            }
+        }
+        with self._lock:
+            previous = self._plans.get(key, ({"sessions": {}}, 0.0))[0]["sessions"]
+            self._plans[key] = (plan, time.monotonic())
+
+        for session_id, entry in plan["sessions"].items():
+            if previous.get(session_id) != entry:
+                self.bus.publish([station_topic(entry["station_id"])], {
+                    "type": "allocation", "session_id": session_id, **entry
+                })
+        return plan
+
+    def replan_for_station(self, station):
+        return self.replan(self.plan_key(station))
+
+    def plan(self, key):
+        """Current plan, recomputed when this process has none or it is older than PLAN_TTL_SECONDS."""
+        with self._lock:
+            cached = self._plans.get(key)
+        if cached is None or time.monotonic() - cached[1] >= PLAN_TTL_SECONDS:
+            return self.replan(key)
+        return cached[0]
+
+
+load_scheduler = LoadScheduler()
@@ -0,0 +1,280 @@
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, insert, delete, func, literal, exists, or_, and_
+from app.models import (db, Slot, ChargingSession, ChargingStation, Connector, MeterSample, MeterSampleArchive,
+                        WaitlistEntry, WaitlistEntryArchive)
+from app.services import analytics, waitlist
+from app.services.change_events import publish_slot_status, publish_station_status
+from app.services.connectors import (AVAILABLE, CHARGING, connector_registry, release_connector,
+                                     refresh_station_status, sync_reservations)
+from app.services.load_scheduler import load_scheduler
+from app.services.pricing_service import refresh_prices
+from app.services.telemetry import downsample_session, telemetry_ingestor
+from app.utils.cache import invalidate_station_listings
+
+SESSION_BATCH = 50  # Sessions are closed one by one, with telemetry downsampling
+STUCK_CONNECTOR_GRACE = timedelta(minutes=5)
+TERMINAL_WAITLIST_STATUSES = ('booked', 'cancelled', 'expired')
+PRICE_REFRESH_STATIONS = 25  # Stations repriced per transaction
+
+_price_cursor = 0  # Last station repriced by this process's refresh-prices runs
+
+
+def _ids(query, limit):
+    return [row_id for (row_id,) in query.limit(limit)]
+
+
+def expire_slots(limit=500):
+    """
+    Mark slots that ended without being booked as expired, so status scans
+    for free slots no longer walk past them.
+    Returns:
+        int: Slots expired.
+    """
+    now = datetime.utcnow()
+    slot_ids = _ids(db.session.query(Slot.id).filter(Slot.status == 'available', Slot.end_time <= now)
+                    .order_by(Slot.status, Slot.end_time), limit)
+    if not slot_ids:
+        return 0
+    db.session.execute(
+        update(Slot)
+        .where(Slot.id.in_(slot_ids), Slot.status == 'available')
+        .values(status='expired')
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    publish_slot_status(slot_ids, 'expired')
+    return len(slot_ids)
+
+
+def release_lapsed_holds(limit=500):
+    """
+    Return reservations whose hold ran out to the pool (or expire them if the
+    slot is over) and offer the freed slots to the waitlist. Lapsed holds
+    could already be claimed by anyone; this makes them visible as free.
+    Waitlist offers are lapsed by waitlist.expire_offers instead.
+    Returns:
+        int: Slots released.
+    """
+    now = datetime.utcnow()
+    slot_ids = _ids(db.session.query(Slot.id).filter(Slot.status == 'reserved', Slot.reserved_until < now)
+                    .order_by(Slot.reserved_until), limit)
+    if not slot_ids:
+        return 0
+    lapsed = and_(Slot.id.in_(slot_ids), Slot.status == 'reserved', Slot.reserved_until < now)
+    db.session.execute(
+        update(Slot).where(lapsed, Slot.end_time <= now)
+        .values(status='expired', reserved_until=None, reserved_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.execute(
+        update(Slot).where(lapsed)
+        .values(status='available', reserved_until=None, reserved_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    statuses = db.session.query(Slot.id, Slot.status).filter(Slot.id.in_(slot_ids)).all()
+    freed = [slot_id for slot_id, status in statuses if status == 'available']
+    publish_slot_status(freed, 'available')
+    publish_slot_status([slot_id for slot_id, status in statuses if status == 'expired'], 'expired')
+    waitlist.promote_slots(freed)
+    return len(slot_ids)
+
+
+def _last_activity(session_ids):
+    """session id -> time of its latest meter sample."""
+    return dict(
+        db.session.query(MeterSample.session_id, func.max(MeterSample.recorded_at))
+        .filter(MeterSample.session_id.in_(session_ids)).group_by(MeterSample.session_id)
+    )
+
+
+def close_session(session, end_time, status='completed'):
+    """
+    End a session: free its connector, record its energy and update the
+    station. Commits, then publishes the station change and replans power.
+    """
+    # Buffered samples go in before this unit of work takes the write lock
+    telemetry_ingestor.flush()
+    session.end_time = end_time
+    session.status = status
+    connector_state = release_connector(session.connector_id) if session.connector_id else None
+    refresh_station_status(session.station)
+    downsample_session(session)
+    db.session.commit()
+    if connector_state is not None:
+        connector_registry.mark(session.station_id, session.connector_id, connector_state)
+    publish_station_status(session.station_id, session.station.status)
+    load_scheduler.replan_for_station(session.station)
+
+
+def close_stale_sessions(idle, max_duration, limit=SESSION_BATCH):
+    """
+    Close in-progress sessions as 'abandoned' when they reported telemetry
+    and then went silent for `idle`, or when they have run longer than
+    `max_duration`. Telemetry is optional, so sessions that never reported
+    any are only closed by `max_duration`. The end time is the last meter
+    sample, or the start time if there was none.
+    Args:
+        idle (timedelta): Silence after the last sample after which a session is considered over.
+        max_duration (timedelta): Upper bound on any session.
+        limit (int): Sessions closed per run.
+    Returns:
+        int: Sessions closed.
+    """
+    # Samples still in this process's buffer count as activity
+    telemetry_ingestor.flush()
+    now = datetime.utcnow()
+    any_sample = exists().where(MeterSample.session_id == ChargingSession.id)
+    recent_sample = exists().where(MeterSample.session_id == ChargingSession.id,
+                                   MeterSample.recorded_at >= now - idle)
+    sessions = ChargingSession.query.filter(
+        ChargingSession.status == 'in_progress',
+        ChargingSession.start_time < now - idle,
+        or_(and_(any_sample, ~recent_sample), ChargingSession.start_time < now - max_duration)
+    ).order_by(ChargingSession.start_time).limit(limit).all()
+    if not sessions:
+        return 0
+    last_seen = _last_activity([session.id for session in sessions])
+    for session in sessions:
+        close_session(session, max(last_seen.get(session.id) or session.start_time, session.start_time),
+                      status='abandoned')
+    invalidate_station_listings()
+    for station_id in {session.station_id for session in sessions}:
+        waitlist.promote_station(station_id)
+    return len(sessions)
+
+
+def free_stuck_stations(limit=500):
+    """
+    Repair connectors and stations left inconsistent by crashed requests:
+    connectors marked charging with no open session are freed, and stored
+    station statuses that disagree with their connectors are re-derived.
+    Returns:
+        int: Connectors freed plus stations corrected.
+    """
+    now = datetime.utcnow()
+    open_session = exists().where(ChargingSession.connector_id == Connector.id,
+                                  ChargingSession.status == 'in_progress')
+    stuck = db.session.query(Connector.id, Connector.station_id).filter(
+        Connector.state == CHARGING, Connector.updated_at < now - STUCK_CONNECTOR_GRACE, ~open_session
+    ).limit(limit).all()
+    if stuck:
+        db.session.execute(
+            update(Connector)
+            .where(Connector.id.in_([connector_id for connector_id, _ in stuck]), Connector.state == CHARGING,
+                   ~open_session)
+            .values(state=AVAILABLE, updated_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        for connector_id, station_id in stuck:
+            connector_registry.mark(station_id, connector_id, AVAILABLE)
+
+    free_connector = exists().where(Connector.station_id == ChargingStation.id, Connector.state == AVAILABLE)
+    mismatched = ChargingStation.query.filter(or_(
+        and_(ChargingStation.status != 'available', free_connector),
+        and_(ChargingStation.status == 'available', ~free_connector)
+    )).limit(limit).all()
+    for station in mismatched:
+        refresh_station_status(station)
+    db.session.commit()
+    for station in mismatched:
+        publish_station_status(station.id, station.status)
+    if stuck or mismatched:
+        invalidate_station_listings()
+    return len(stuck) + len(mismatched)
+
+
+def _archive(model, archive_model, condition, limit):
+    """Move up to `limit` rows matching `condition` into the archive table in one transaction."""
+    row_ids = _ids(db.session.query(model.id).filter(condition).order_by(model.id), limit)
+    if not row_ids:
+        return 0
+    columns = [column.name for column in model.__table__.columns]
+    db.session.execute(
+        insert(archive_model).from_select(
+            columns + ['archived_at'],
+            select(*model.__table__.columns, literal(datetime.utcnow(), type_=db.DateTime)).where(model.id.in_(row_ids))
+        )
+    )
+    db.session.execute(delete(model).where(model.id.in_(row_ids)).execution_options(synchronize_session=False))
+    db.session.commit()
+    return len(row_ids)
+
+
+def archive_meter_samples(retention, limit=5000):
+    """Move telemetry of sessions that ended more than `retention` ago to meter_sample_archive."""
+    old_sessions = select(ChargingSession.id).where(
+        ChargingSession.status != 'in_progress', ChargingSession.end_time < datetime.utcnow() - retention
+    )
+    return _archive(MeterSample, MeterSampleArchive, MeterSample.session_id.in_(old_sessions), limit)
+
+
+def archive_waitlist_entries(retention, limit=5000):
+    """Move finished waitlist entries whose window ended more than `retention` ago to waitlist_entry_archive."""
+    condition = and_(WaitlistEntry.status.in_(TERMINAL_WAITLIST_STATUSES),
+                     WaitlistEntry.window_end < datetime.utcnow() - retention)
+    return _archive(WaitlistEntry, WaitlistEntryArchive, condition, limit)
+
+
+def refresh_all_prices(limit=PRICE_REFRESH_STATIONS):
+    """
+    Reprice the upcoming slots of the next `limit` stations so demand rules
+    follow bookings, in one short transaction. Successive runs walk the
+    network in station id order and start over once they reach the end.
+    Returns:
+        int: Stations repriced.
+    """
+    global _price_cursor
+    station_ids = _ids(db.session.query(ChargingStation.id).filter(ChargingStation.id > _price_cursor)
+                       .order_by(ChargingStation.id), limit)
+    if station_ids:
+        refresh_prices(station_ids=station_ids)
+        db.session.commit()
+        invalidate_station_listings()
+    _price_cursor = station_ids[-1] if len(station_ids) == limit else 0
+    return len(station_ids)
+
+
+def reprice_all_stations(limit=PRICE_REFRESH_STATIONS):
+    """
+    Reprice the upcoming slots of every station now, after a network-wide
+    rule changed. Stations are walked in id order, `limit` per transaction,
+    so bookings can take the write lock between batches and no more than
+    one batch of prices is held in memory.
+    Returns:
+        int: Slots priced.
+    """
+    priced = 0
+    cursor = 0
+    while True:
+        station_ids = _ids(db.session.query(ChargingStation.id).filter(ChargingStation.id > cursor)
+                           .order_by(ChargingStation.id), limit)
+        if not station_ids:
+            return priced
+        priced += refresh_prices(station_ids=station_ids)
+        db.session.commit()
+        cursor = station_ids[-1]
+
+
+def register_jobs(scheduler, config):
+    """Register the maintenance jobs with their configured intervals (seconds)."""
+    batch = config['JOB_BATCH_SIZE']
+    idle = timedelta(minutes=config['SESSION_IDLE_MINUTES'])
+    max_duration = timedelta(hours=config['SESSION_MAX_HOURS'])
+    retention = timedelta(days=config['ARCHIVE_AFTER_DAYS'])
+
+    scheduler.add('expire-slots', expire_slots, 60, batch_size=batch)
+    scheduler.add('release-lapsed-holds', release_lapsed_holds, 30, batch_size=batch)
+    scheduler.add('expire-waitlist-offers', waitlist.expire_offers, 30, batch_size=batch)
+    scheduler.add('sync-connector-reservations', sync_reservations, 60)
+    scheduler.add('close-stale-sessions', lambda limit: close_stale_sessions(idle, max_duration, limit),
+                  300, batch_size=SESSION_BATCH)
+    scheduler.add('free-stuck-stations', free_stuck_stations, 300, batch_size=batch)
+    scheduler.add('archive-meter-samples', lambda limit: archive_meter_samples(retention, limit),
+                  3600, batch_size=batch * 10, backlog_delay=5.0, singleton=True)
+    scheduler.add('archive-waitlist-entries', lambda limit: archive_waitlist_entries(retention, limit),
+                  3600, batch_size=batch * 10, backlog_delay=5.0, singleton=True)
+    scheduler.add('refresh-analytics', analytics.ensure_fresh, analytics.ROLLUP_MAX_AGE_SECONDS, singleton=True)
+    scheduler.add('refresh-prices', refresh_all_prices, config['PRICE_REFRESH_SECONDS'],
+                  batch_size=PRICE_REFRESH_STATIONS, backlog_delay=0.5, singleton=True)
@@ -1,4 +1,10 @@
+import hashlib
+import json
+import random
+import threading
+import time
 import uuid
+from collections import OrderedDict
 
 def process_payment(payment_details):
     """
@@ -15,3 +21,83 @@ def process_payment(payment_details):
     except Exception as e:
         print(f"Payment failed: {str(e)}")
         return {"status": "failure", "message": str(e)}
+
+
+class PaymentGateway:
+    """Interface for payment providers used by the payment worker."""
+
+    # Longest a charge call may take; the payment worker's lease must outlast it
+    timeout = 30.0
+    # Seconds a successful charge is remembered under its idempotency key; the
+    # payment worker must be done retrying a payment within it
+    idempotency_window = 24 * 3600.0
+
+    def tokenize(self, payment_details):
+        """
+        Exchange client payment details for a reusable payment method reference.
+        Only the reference is stored in the payment outbox, never card data.
+        Args:
+            payment_details (dict): Payment information from the client.
+        Returns:
+            str: Payment method reference to charge later.
+        """
+        raise NotImplementedError
+
+    def charge(self, amount, payment_method, idempotency_key):
+        """
+        Charge a payment.
+        Args:
+            amount (float): Amount to charge.
+            payment_method (str): Reference returned by `tokenize`.
+            idempotency_key (str): Stable key; a retried charge that already succeeded
+                returns the original result instead of charging again.
+        Returns:
+            dict: Payment status and transaction ID, or a failure message.
+        """
+        raise NotImplementedError
+
+
+class LocalGateway(PaymentGateway):
+    """Local fake gateway with configurable latency and failure rate, for development and benchmarks."""
+
+    def __init__(self, latency=0.0, failure_rate=0.0, timeout=30.0, idempotency_window=3600.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.timeout = timeout
+        self.idempotency_window = idempotency_window
+        self._charges = OrderedDict()  # idempotency key -> (expires_at, result), oldest first
+        self._lock = threading.Lock()
+
+    def _replay(self, idempotency_key):
+        """The remembered result for `idempotency_key`, after forgetting expired charges; the caller holds the lock."""
+        now = time.monotonic()
+        while self._charges:
+            key, (expires_at, _) = next(iter(self._charges.items()))
+            if expires_at > now:
+                break
+            del self._charges[key]
+        entry = self._charges.get(idempotency_key)
+        return entry[1] if entry else None
+
+    def tokenize(self, payment_details):
+        fingerprint = json.dumps(payment_details, sort_keys=True, default=str).encode('utf-8')
+        return f"pm-local-{hashlib.sha256(fingerprint).hexdigest()[:16]}"
+
+    def charge(self, amount, payment_method, idempotency_key):
+        with self._lock:
+            result = self._replay(idempotency_key)
+        if result is not None:
+            return result
+        if self.latency:
+            time.sleep(min(self.latency, self.timeout))
+            if self.latency > self.timeout:
+                return {"status": "failure", "message": "Local gateway timed out"}
+        if self.failure_rate and random.random() < self.failure_rate:
+            return {"status": "failure", "message": "Declined by local gateway"}
+        with self._lock:
+            # Like a real gateway, only successful charges are replayed; a declined key can be retried
+            result = self._replay(idempotency_key)
+            if result is None:
+                result = process_payment({"payment_method": payment_method, "amount": amount})
+                self._charges[idempotency_key] = (time.monotonic() + self.idempotency_window, result)
+        return result
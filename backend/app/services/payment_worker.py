@@ -0,0 +1,262 @@
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from sqlalchemy import update, or_
+from app.models import db, Payment, Slot
+from app.services.payment_service import LocalGateway
+from app.utils.background import BackgroundThreads
+from app.utils.notifications import notification_dispatcher
+from app.utils.metrics import metrics
+from app.services.change_events import publish_slot_status
+from app.services.waitlist import promote_slots, reopen_booked_offer, waitlist_allocator
+
+GATEWAY_DURATION = metrics.histogram(
+    'payment_gateway_duration_seconds', "Payment gateway charge latency", ('status',)
+)
+PAYMENTS_SETTLED = metrics.counter('payments_settled_total', "Payments settled by the worker", ('status',))
+
+
+class PaymentWorker:
+    """
+    Drains the payment outbox in the background.
+    A dispatcher thread leases due payments in batches and hands them to a
+    thread pool that calls the gateway. Failed charges are retried with
+    exponential backoff; once a payment settles, its booking and slot are
+    confirmed or released. A lease that is never settled (crashed worker)
+    simply expires and the payment is picked up again. Leases outlast the
+    gateway timeout, and charges reuse one idempotency key per payment, so a
+    re-leased payment is not charged twice.
+    """
+
+    def __init__(self, gateway=None, workers=8, batch_size=50, max_attempts=5,
+                 base_backoff=2.0, lease=timedelta(minutes=5), poll_interval=1.0):
+        self.gateway = gateway or LocalGateway()
+        self.workers = workers
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.app = None
+        self._executor = None
+        self._in_flight = threading.Semaphore(workers * 2)
+        self._wake = threading.Event()
+        self._threads = BackgroundThreads('payment-dispatcher', self._run)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('PAYMENT_WORKERS', self.workers)
+        self._in_flight = threading.Semaphore(self.workers * 2)
+        latency = app.config.get('PAYMENT_GATEWAY_LATENCY')
+        if latency is not None:
+            self.gateway = LocalGateway(latency=latency)
+        self.gateway.timeout = app.config.get('PAYMENT_GATEWAY_TIMEOUT', self.gateway.timeout)
+        self.lease = timedelta(seconds=app.config.get('PAYMENT_LEASE_SECONDS', self.lease.total_seconds()))
+        if self.lease.total_seconds() <= 2 * self.gateway.timeout:
+            raise ValueError("PAYMENT_LEASE_SECONDS must be more than twice PAYMENT_GATEWAY_TIMEOUT")
+        if self.retry_window() > self.gateway.idempotency_window:
+            raise ValueError("PAYMENT_LEASE_SECONDS is too long for the gateway's idempotency window")
+        app.extensions['payment_worker'] = self
+
+    def retry_window(self):
+        """
+        Longest time between a payment's first charge and its last retry: every
+        attempt may hold an expired lease and wait out its backoff.
+        Returns:
+            float: Seconds.
+        """
+        backoff = sum(self.base_backoff * 2 ** attempt for attempt in range(self.max_attempts - 1))
+        return self.max_attempts * self.lease.total_seconds() + backoff
+
+    def ensure_started(self):
+        """Start the dispatcher, so outbox rows left by a restart are drained without waiting for a new booking."""
+        self._threads.ensure_started()
+
+    def stop(self, timeout=None):
+        self._wake.set()
+        self._threads.stop(timeout)
+
+    def notify(self):
+        """Wake the dispatcher after new payments were committed to the outbox."""
+        self._threads.ensure_started()
+        self._wake.set()
+
+    def enqueue(self, booking, payment_details):
+        """
+        Add a pending outbox entry for `booking`; committed with the caller's transaction.
+        Only a payment method reference is stored: the client's own `payment_method`
+        token, or one the gateway issues for the submitted details.
+        """
+        payment_method = payment_details.get('payment_method') or self.gateway.tokenize(payment_details)
+        payment = Payment(
+            booking=booking,
+            amount=booking.amount,
+            details=json.dumps({"payment_method": str(payment_method)}),
+            status='pending',
+            attempts=0,
+            next_attempt_at=datetime.utcnow()
+        )
+        db.session.add(payment)
+        return payment
+
+    def _run(self, stop):
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='payment')
+        with self.app.app_context():
+            while not stop.is_set():
+                self._wake.clear()
+                try:
+                    claimed = self.dispatch_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Payment dispatcher error: {str(e)}")
+                    claimed = 0
+                finally:
+                    db.session.remove()
+                if not claimed:
+                    self._wake.wait(self.poll_interval)
+        self._executor.shutdown(wait=True)
+
+    def lease_due_payments(self, limit):
+        """Lease up to `limit` due payments so no other worker charges them concurrently."""
+        now = datetime.utcnow()
+        due = or_(Payment.status == 'pending', Payment.status == 'processing')
+        candidates = db.session.execute(
+            db.select(Payment.id)
+            .where(due, Payment.next_attempt_at <= now)
+            .order_by(Payment.next_attempt_at)
+            .limit(limit)
+        ).scalars().all()
+        leased = []
+        for payment_id in candidates:
+            result = db.session.execute(
+                update(Payment)
+                .where(Payment.id == payment_id, due, Payment.next_attempt_at <= now)
+                .values(status='processing', next_attempt_at=now + self.lease)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount == 1:
+                leased.append(payment_id)
+        db.session.commit()
+        return leased
+
+    def dispatch_batch(self):
+        if not self._in_flight.acquire(timeout=self.poll_interval):
+            return 0
+        capacity = 1
+        while capacity < self.batch_size and self._in_flight.acquire(blocking=False):
+            capacity += 1
+        leased = self.lease_due_payments(capacity)
+        for _ in range(capacity - len(leased)):
+            self._in_flight.release()
+        for payment_id in leased:
+            self._executor.submit(self._process_in_context, payment_id)
+        return len(leased)
+
+    def _process_in_context(self, payment_id):
+        try:
+            with self.app.app_context():
+                try:
+                    self.process(payment_id)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Payment {payment_id} processing error: {str(e)}")
+                finally:
+                    db.session.remove()
+        finally:
+            self._in_flight.release()
+
+    def process(self, payment_id):
+        """Charge one leased payment and settle its booking."""
+        payment = db.session.get(Payment, payment_id)
+        if payment is None or payment.status != 'processing':
+            return
+        leased_until = payment.next_attempt_at
+
+        details = json.loads(payment.details or '{}')
+        # Rows queued before tokenization hold raw details; swap them for a reference
+        payment_method = details.get('payment_method') or self.gateway.tokenize(details)
+
+        started = time.perf_counter()
+        try:
+            result = self.gateway.charge(payment.amount, payment_method, f"payment-{payment.id}")
+        except Exception as e:
+            result = {"status": "failure", "message": str(e)}
+        GATEWAY_DURATION.observe(time.perf_counter() - started, status=result.get('status', 'failure'))
+
+        # Settle only while still holding the lease; a worker that re-leased the
+        # payment after it expired charges the same idempotency key and settles it
+        held = db.session.execute(
+            update(Payment)
+            .where(Payment.id == payment.id, Payment.status == 'processing', Payment.next_attempt_at == leased_until)
+            .values(next_attempt_at=leased_until)
+            .execution_options(synchronize_session=False)
+        )
+        if held.rowcount != 1:
+            db.session.rollback()
+            return
+
+        payment.details = json.dumps({"payment_method": payment_method})
+        payment.attempts += 1
+        reopened = []
+        if result.get('status') == 'success':
+            payment.transaction_id = result.get('transaction_id')
+            self._settle_success(payment)
+        elif payment.attempts >= self.max_attempts:
+            payment.last_error = (result.get('message') or '')[:255]
+            self._settle_failure(payment)
+            reopened = reopen_booked_offer(payment.booking.user_id, payment.booking.slot_id)
+        else:
+            payment.last_error = (result.get('message') or '')[:255]
+            payment.status = 'pending'
+            payment.next_attempt_at = datetime.utcnow() + timedelta(
+                seconds=self.base_backoff * 2 ** (payment.attempts - 1)
+            )
+        db.session.commit()
+        if payment.status != 'pending':
+            PAYMENTS_SETTLED.inc(status=payment.status)
+
+        booking = payment.booking
+        if payment.status == 'succeeded':
+            publish_slot_status([booking.slot_id], 'occupied')
+        elif payment.status == 'failed':
+            # A waitlisted user whose offered slot could not be paid keeps their place in line
+            for entry in reopened:
+                waitlist_allocator.add(entry)
+            publish_slot_status([booking.slot_id], 'available')
+            promote_slots([booking.slot_id])
+        if booking.status == 'confirmed':
+            notification_dispatcher.notify(booking.user_id, f"Your slot booking with ID {booking.id} is confirmed!")
+        elif booking.status in ('payment_failed', 'expired'):
+            notification_dispatcher.notify(booking.user_id, f"Your slot booking with ID {booking.id} could not be completed.")
+
+    def _settle_success(self, payment):
+        booking = payment.booking
+        confirmed = db.session.execute(
+            update(Slot)
+            .where(Slot.id == booking.slot_id, Slot.status == 'reserved', Slot.reserved_by == booking.user_id)
+            .values(status='occupied', reserved_until=None)
+            .execution_options(synchronize_session=False)
+        )
+        if confirmed.rowcount == 1:
+            payment.status = 'succeeded'
+            booking.status = 'confirmed'
+        else:
+            # The reservation lapsed and the slot went to someone else
+            payment.status = 'refund_required'
+            booking.status = 'expired'
+
+    def _settle_failure(self, payment):
+        booking = payment.booking
+        payment.status = 'failed'
+        booking.status = 'payment_failed'
+        db.session.execute(
+            update(Slot)
+            .where(Slot.id == booking.slot_id, Slot.status == 'reserved', Slot.reserved_by == booking.user_id)
+            .values(status='available', reserved_until=None, reserved_by=None)
+            .execution_options(synchronize_session=False)
+        )
+
+
+payment_worker = PaymentWorker()
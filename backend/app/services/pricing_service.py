@@ -0,0 +1,221 @@
+from datetime import datetime
+from sqlalchemy import func, case, delete, insert, or_
+from app.models import db, Slot, PricingRule, SlotPrice
+
+BOOKED_SLOT_STATUSES = ('reserved', 'occupied')
+PRICE_TOLERANCE = 0.005
+PRICE_INSERT_CHUNK = 5000
+IN_CLAUSE_CHUNK = 500
+
+
+class PricingValidationError(ValueError):
+    pass
+
+
+def parse_rule(data):
+    """
+    Validate a pricing rule payload.
+    Example (weekday evening peak, 1.5x):
+        {"station_id": 7, "weekdays": [0, 1, 2, 3, 4], "from": "17:00", "to": "21:00", "multiplier": 1.5}
+    Example (base rate): {"station_id": 7, "rate_per_hour": 12.0}
+    Example (demand): {"station_id": 7, "min_utilization": 0.8, "multiplier": 1.25}
+    Returns:
+        dict: PricingRule column values.
+    Raises:
+        PricingValidationError: If the payload is invalid.
+    """
+    try:
+        weekdays = data.get('weekdays', list(range(7)))
+        mask = 0
+        for weekday in weekdays:
+            if not 0 <= int(weekday) <= 6:
+                raise ValueError("weekdays must be 0 (Monday) to 6 (Sunday)")
+            mask |= 1 << int(weekday)
+        start = datetime.strptime(data.get('from', '00:00'), '%H:%M')
+        start_minute = start.hour * 60 + start.minute
+        end_minute = 1440
+        if data.get('to') and data['to'] != '24:00':
+            end = datetime.strptime(data['to'], '%H:%M')
+            end_minute = end.hour * 60 + end.minute
+        rule = {
+            "station_id": int(data['station_id']) if data.get('station_id') is not None else None,
+            "weekdays": mask,
+            "start_minute": start_minute,
+            "end_minute": end_minute,
+            "rate_per_hour": float(data['rate_per_hour']) if data.get('rate_per_hour') is not None else None,
+            "multiplier": float(data.get('multiplier', 1.0)),
+            "min_utilization": float(data['min_utilization']) if data.get('min_utilization') is not None else None,
+            "priority": int(data.get('priority', 0)),
+        }
+    except (AttributeError, TypeError, ValueError) as e:
+        raise PricingValidationError(f"Invalid pricing rule: {str(e)}")
+    if not mask or start_minute == end_minute:
+        raise PricingValidationError("Pricing rule must cover at least one weekday and time window")
+    if rule["rate_per_hour"] is not None and rule["rate_per_hour"] < 0 or rule["multiplier"] < 0:
+        raise PricingValidationError("Rates and multipliers must not be negative")
+    if rule["min_utilization"] is not None and not 0 <= rule["min_utilization"] <= 1:
+        raise PricingValidationError("min_utilization must be between 0 and 1")
+    return rule
+
+
+def serialize_rule(rule):
+    def clock(minute):
+        return f"{minute // 60:02d}:{minute % 60:02d}"
+
+    return {
+        "id": rule.id,
+        "station_id": rule.station_id,
+        "weekdays": [day for day in range(7) if rule.weekdays & (1 << day)],
+        "from": clock(rule.start_minute),
+        "to": clock(rule.end_minute),
+        "rate_per_hour": rule.rate_per_hour,
+        "multiplier": rule.multiplier,
+        "min_utilization": rule.min_utilization,
+        "priority": rule.priority,
+    }
+
+
+def _matches(rule, start_time, utilization):
+    if not rule.weekdays & (1 << start_time.weekday()):
+        return False
+    minute = start_time.hour * 60 + start_time.minute
+    if rule.start_minute < rule.end_minute:
+        in_window = rule.start_minute <= minute < rule.end_minute
+    else:
+        in_window = minute >= rule.start_minute or minute < rule.end_minute
+    if not in_window:
+        return False
+    return rule.min_utilization is None or utilization >= rule.min_utilization
+
+
+def price_slot(rules, start_time, end_time, utilization):
+    """
+    Evaluate the rules for one slot.
+    The base rate comes from the highest-priority matching rule that sets one
+    (station rules win ties over network-wide rules); every matching rule's
+    multiplier then applies.
+    Args:
+        rules (list): Rules for the slot's station, including network-wide ones.
+        start_time (datetime): Slot start.
+        end_time (datetime): Slot end.
+        utilization (float): Booked share of the station's slots that day.
+    Returns:
+        float: Price, or None if no rule sets a base rate.
+    """
+    rate = None
+    rate_rank = None
+    multiplier = 1.0
+    for rule in rules:
+        if not _matches(rule, start_time, utilization):
+            continue
+        multiplier *= rule.multiplier
+        if rule.rate_per_hour is not None:
+            rank = (rule.priority, rule.station_id is not None, rule.id)
+            if rate_rank is None or rank > rate_rank:
+                rate, rate_rank = rule.rate_per_hour, rank
+    if rate is None:
+        return None
+    hours = (end_time - start_time).total_seconds() / 3600
+    return round(rate * hours * multiplier, 2)
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+def _daily_utilization(station_ids, since):
+    """(station_id, date) -> booked share of that day's slots; station_ids None means all stations."""
+    day = func.date(Slot.start_time, type_=db.Date)
+    query = db.session.query(
+        Slot.station_id, day, func.count(Slot.id),
+        func.sum(case((Slot.status.in_(BOOKED_SLOT_STATUSES), 1), else_=0))
+    ).filter(Slot.start_time >= since).group_by(Slot.station_id, day)
+    queries = [query] if station_ids is None else [query.filter(Slot.station_id.in_(chunk)) for chunk in _chunks(station_ids)]
+    utilization = {}
+    for chunk_query in queries:
+        for station_id, slot_day, total, booked in chunk_query:
+            utilization[(station_id, slot_day)] = booked / total if total else 0.0
+    return utilization
+
+
+def refresh_prices(station_ids=None, slot_ids=None):
+    """
+    Recompute the precomputed prices of upcoming slots.
+    Run after pricing rules change (per station, or for every station when a
+    network-wide rule changes), after slots are added or moved, and
+    periodically so that demand rules follow bookings. The caller commits.
+    Args:
+        station_ids (iterable): Stations to reprice; None for all stations.
+        slot_ids (iterable): Reprice only these slots instead.
+    Returns:
+        int: Number of slots priced.
+    """
+    now = datetime.utcnow()
+    slots = db.session.query(Slot.id, Slot.station_id, Slot.start_time, Slot.end_time).filter(Slot.start_time >= now)
+    clear = delete(SlotPrice).where(SlotPrice.start_time >= now)
+    if slot_ids is not None:
+        slot_ids = list(slot_ids)
+        if len(slot_ids) > IN_CLAUSE_CHUNK:
+            return sum(refresh_prices(slot_ids=chunk) for chunk in _chunks(slot_ids))
+        if not slot_ids:
+            return 0
+        slots = slots.filter(Slot.id.in_(slot_ids))
+        clear = delete(SlotPrice).where(SlotPrice.slot_id.in_(slot_ids))
+        station_ids = [sid for (sid,) in db.session.query(Slot.station_id).filter(Slot.id.in_(slot_ids)).distinct()]
+    elif station_ids is not None:
+        station_ids = list(station_ids)
+        slots = slots.filter(Slot.station_id.in_(station_ids))
+        clear = clear.where(SlotPrice.station_id.in_(station_ids))
+
+    rules = PricingRule.query
+    if station_ids is not None:
+        rules = rules.filter(or_(PricingRule.station_id.is_(None), PricingRule.station_id.in_(station_ids)))
+    network_rules = []
+    station_rules = {}
+    for rule in rules:
+        if rule.station_id is None:
+            network_rules.append(rule)
+        else:
+            station_rules.setdefault(rule.station_id, []).append(rule)
+
+    utilization = {}
+    demand_rules = [rule for rule in network_rules if rule.min_utilization is not None]
+    demand_rules += [rule for group in station_rules.values() for rule in group if rule.min_utilization is not None]
+    if demand_rules:
+        utilization = _daily_utilization(station_ids, now.replace(hour=0, minute=0, second=0, microsecond=0))
+
+    rows = []
+    for slot_id, station_id, start_time, end_time in slots.yield_per(10000):
+        rules_for_station = station_rules.get(station_id, []) + network_rules
+        if not rules_for_station:
+            continue
+        price = price_slot(rules_for_station, start_time, end_time, utilization.get((station_id, start_time.date()), 0.0))
+        if price is not None:
+            rows.append({"slot_id": slot_id, "station_id": station_id, "start_time": start_time, "price": price})
+
+    db.session.execute(clear.execution_options(synchronize_session=False))
+    for start in range(0, len(rows), PRICE_INSERT_CHUNK):
+        db.session.execute(insert(SlotPrice), rows[start:start + PRICE_INSERT_CHUNK])
+    return len(rows)
+
+
+def slot_price(slot_id):
+    """Precomputed price of a slot, or None if its station has no pricing rules."""
+    return db.session.query(SlotPrice.price).filter(SlotPrice.slot_id == slot_id).scalar()
+
+
+def check_amount(slot_id, amount):
+    """
+    Compare a client-supplied amount with the slot's precomputed price.
+    Returns:
+        tuple: (ok, price); price is None for slots without pricing rules.
+    """
+    price = slot_price(slot_id)
+    if price is None:
+        return True, None
+    try:
+        return abs(float(amount) - price) <= PRICE_TOLERANCE, price
+    except (TypeError, ValueError):
+        return False, price
@@ -0,0 +1,164 @@
+import asyncio
+import threading
+from urllib.parse import urlsplit, parse_qs
+from flask_jwt_extended import decode_token
+from app.services.change_events import parse_event_topics, format_sse
+from app.utils.change_bus import change_bus
+
+KEEPALIVE_SECONDS = 15
+MAX_PENDING_EVENTS = 64
+MAX_HEADER_BYTES = 8192
+
+
+class _Client:
+    __slots__ = ('queue', 'overflowed')
+
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=MAX_PENDING_EVENTS)
+        self.overflowed = False
+
+
+class RealtimeServer:
+    """
+    Server-Sent Events endpoint on asyncio, for large numbers of idle subscribers.
+    Each subscriber costs one socket and a small queue instead of a WSGI thread.
+    Events reach the server's event loop from the in-process change bus, so
+    subscribers only see changes made by the process hosting the server.
+
+    GET /events?station_id=1,2&area=u4pr&token=<JWT>
+    """
+
+    def __init__(self, app, host='0.0.0.0', port=8081, bus=change_bus):
+        self.app = app
+        self.host = host
+        self.port = port
+        self.bus = bus
+        self.loop = None
+        self._topics = {}
+        self._started = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self._run, name='realtime-server', daemon=True)
+        thread.start()
+        self._started.wait()
+        self.bus.add_listener(self._on_event)
+        return self
+
+    def subscriber_count(self):
+        return len({client for clients in self._topics.values() for client in clients})
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        server = self.loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, reuse_address=True)
+        )
+        self._started.set()
+        try:
+            self.loop.run_forever()
+        finally:
+            server.close()
+
+    def _on_event(self, topics, event):
+        self.loop.call_soon_threadsafe(self._fanout, topics, event)
+
+    def _fanout(self, topics, event):
+        targets = set()
+        for topic in topics:
+            targets.update(self._topics.get(topic, ()))
+        for client in targets:
+            try:
+                client.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                client.overflowed = True
+
+    def _authorized(self, token):
+        if not token:
+            return False
+        try:
+            with self.app.app_context():
+                decode_token(token)
+            return True
+        except Exception:
+            return False
+
+    async def _read_request(self, reader):
+        head = await reader.readuntil(b'\r\n\r\n')
+        if len(head) > MAX_HEADER_BYTES:
+            raise ValueError("Request headers too large")
+        lines = head.decode('latin-1').split('\r\n')
+        method, target, _ = lines[0].split(' ', 2)
+        headers = {}
+        for line in lines[1:]:
+            if ':' in line:
+                name, value = line.split(':', 1)
+                headers[name.strip().lower()] = value.strip()
+        return method, urlsplit(target), headers
+
+    async def _respond(self, writer, status, message):
+        body = message.encode('utf-8')
+        writer.write(
+            f"HTTP/1.1 {status}\r\nContent-Type: text/plain\r\nContent-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode('latin-1') + body
+        )
+        await writer.drain()
+
+    async def _handle(self, reader, writer):
+        client = None
+        topics = []
+        try:
+            method, url, headers = await self._read_request(reader)
+            if method != 'GET' or url.path != '/events':
+                await self._respond(writer, '404 Not Found', 'Not found')
+                return
+
+            args = {name: values[0] for name, values in parse_qs(url.query).items()}
+            token = args.get('token') or headers.get('authorization', '').replace('Bearer ', '', 1)
+            if not self._authorized(token):
+                await self._respond(writer, '401 Unauthorized', 'Missing or invalid token')
+                return
+            try:
+                topics = parse_event_topics(args)
+            except ValueError as e:
+                await self._respond(writer, '400 Bad Request', str(e))
+                return
+            if not topics:
+                await self._respond(writer, '400 Bad Request', 'station_id or area is required')
+                return
+
+            client = _Client()
+            for topic in topics:
+                self._topics.setdefault(topic, set()).add(client)
+            writer.write(
+                b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n"
+                b"Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n: subscribed\n\n"
+            )
+            await writer.drain()
+
+            while True:
+                try:
+                    event = await asyncio.wait_for(client.queue.get(), KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    writer.write(b": keepalive\n\n")
+                else:
+                    if client.overflowed:
+                        client.overflowed = False
+                        writer.write(b"event: resync\ndata: {}\n\n")
+                    writer.write(format_sse(event).encode('utf-8'))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            if client is not None:
+                for topic in topics:
+                    clients = self._topics.get(topic)
+                    if clients is not None:
+                        clients.discard(client)
+                        if not clients:
+                            del self._topics[topic]
+            writer.close()
+
+
+def start_realtime_server(app, host='0.0.0.0', port=8081):
+    """Start the SSE server on a background event loop thread."""
+    return RealtimeServer(app, host=host, port=port).start()
@@ -0,0 +1,254 @@
+from datetime import datetime, timedelta
+from sqlalchemy import delete, update, func
+from app.models import db, ChargingStation, Connector, Slot, SlotPrice, Booking, WaitlistEntry
+from app.utils.intervals import IntervalIndex, ConcurrencyProfile, find_self_overlaps
+from app.utils.timestamps import parse_timestamp
+from app.services.change_events import slot_event, publish_slot_events
+from app.services.pricing_service import refresh_prices
+from app.services.waitlist import promote_slots, OPEN_STATUSES as OPEN_WAITLIST_STATUSES
+
+MAX_BULK_OPERATIONS = 100000
+MAX_REPORTED_CONFLICTS = 20
+IN_CLAUSE_CHUNK = 500
+
+
+class SlotValidationError(ValueError):
+    pass
+
+
+def parse_datetime(value):
+    """Parse an ISO 8601 timestamp from a request payload as naive UTC."""
+    try:
+        return parse_timestamp(value)
+    except (TypeError, ValueError):
+        raise SlotValidationError(f"Invalid datetime: {value!r}")
+
+
+def expand_recurrence(rule):
+    """
+    Expand a recurrence rule into Add operations.
+    Example rule: every 30 min from 06:00 to 22:00 for 14 days on station 7
+        {"station_id": 7, "start_date": "2026-11-02", "days": 14,
+         "from": "06:00", "to": "22:00", "every_minutes": 30}
+    `duration_minutes` defaults to `every_minutes`; an optional `connector_id`
+    puts the slots on one connector.
+    Returns:
+        list: Add operations.
+    """
+    try:
+        station_id = int(rule['station_id'])
+        connector_id = int(rule['connector_id']) if rule.get('connector_id') is not None else None
+        start_date = datetime.fromisoformat(rule['start_date']).date()
+        days = int(rule.get('days', 1))
+        day_from = datetime.strptime(rule.get('from', '00:00'), '%H:%M').time()
+        day_to = datetime.strptime(rule.get('to', '23:59'), '%H:%M').time()
+        every = timedelta(minutes=int(rule['every_minutes']))
+        duration = timedelta(minutes=int(rule.get('duration_minutes', rule['every_minutes'])))
+    except (KeyError, TypeError, ValueError) as e:
+        raise SlotValidationError(f"Invalid recurrence rule: {str(e)}")
+    if days <= 0 or every.total_seconds() <= 0 or duration.total_seconds() <= 0:
+        raise SlotValidationError("Recurrence days, interval and duration must be positive")
+
+    operations = []
+    for day in range(days):
+        date = start_date + timedelta(days=day)
+        start = datetime.combine(date, day_from)
+        day_end = datetime.combine(date, day_to)
+        while start + duration <= day_end:
+            operations.append({
+                "action": "Add",
+                "slot_details": {"station_id": station_id, "connector_id": connector_id,
+                                 "start_time": start, "end_time": start + duration}
+            })
+            if len(operations) > MAX_BULK_OPERATIONS:
+                raise SlotValidationError(f"Recurrence expands to more than {MAX_BULK_OPERATIONS} slots")
+            start += every
+    return operations
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _parse_operations(operations):
+    adds, edits, deletes = [], [], []
+    for position, operation in enumerate(operations):
+        action = operation.get('action')
+        details = operation.get('slot_details')
+        if action not in ['Add', 'Edit', 'Delete'] or not details:
+            raise SlotValidationError(f"Operation {position}: invalid action or missing slot details")
+        try:
+            if action == 'Delete':
+                deletes.append(int(details['slot_id']))
+                continue
+            start = parse_datetime(details['start_time'])
+            end = parse_datetime(details['end_time'])
+            target = int(details['station_id'] if action == 'Add' else details['slot_id'])
+            connector_id = int(details['connector_id']) if action == 'Add' and details.get('connector_id') is not None else None
+        except SlotValidationError as e:
+            raise SlotValidationError(f"Operation {position}: {str(e)}")
+        except (KeyError, TypeError, ValueError) as e:
+            raise SlotValidationError(f"Operation {position}: invalid or missing {str(e)}")
+        if start >= end:
+            raise SlotValidationError(f"Operation {position}: start_time must be before end_time")
+        if action == 'Add':
+            adds.append({"station_id": target, "connector_id": connector_id, "start_time": start, "end_time": end,
+                         "status": "available", "_ref": f"op{position}"})
+        else:
+            edits.append({"id": target, "start_time": start, "end_time": end, "_ref": f"op{position}"})
+    return adds, edits, deletes
+
+
+def _find_conflicts(new_intervals, touched_ids):
+    """
+    Check new intervals against each other and against stored slots.
+    Slots on one connector must not overlap, and at no moment may a station
+    have more slots (station-wide or on a connector) than connectors;
+    station-wide slots get a concrete connector when they are booked.
+    """
+    conflicts = []
+    by_station = {}
+    for station_id, connector_id, start, end, ref in new_intervals:
+        by_station.setdefault(station_id, []).append((start, end, ref, connector_id))
+
+    connector_counts = {}
+    for chunk in _chunks(by_station):
+        connector_counts.update(
+            db.session.query(Connector.station_id, func.count(Connector.id))
+            .filter(Connector.station_id.in_(chunk)).group_by(Connector.station_id).all()
+        )
+
+    for station_id, intervals in by_station.items():
+        window_start = min(start for start, _, _, _ in intervals)
+        window_end = max(end for _, end, _, _ in intervals)
+        stored = [
+            (start, end, f"slot{slot_id}", connector_id)
+            for slot_id, connector_id, start, end in db.session.query(
+                Slot.id, Slot.connector_id, Slot.start_time, Slot.end_time
+            ).filter(
+                Slot.station_id == station_id,
+                Slot.start_time < window_end,
+                Slot.end_time > window_start
+            )
+            if slot_id not in touched_ids
+        ]
+
+        lanes = {}
+        for start, end, ref, connector_id in intervals:
+            if connector_id is not None:
+                lanes.setdefault(connector_id, []).append((start, end, ref))
+        for connector_id, lane in lanes.items():
+            for ref, other in find_self_overlaps(lane):
+                conflicts.append({"operation": other, "conflicts_with": ref})
+            index = IntervalIndex(item[:3] for item in stored if item[3] == connector_id)
+            for start, end, ref in lane:
+                other = index.find_overlap(start, end)
+                if other is not None:
+                    conflicts.append({"operation": ref, "conflicts_with": other})
+
+        capacity = connector_counts.get(station_id, 0)
+        profile = ConcurrencyProfile(stored + intervals)
+        for start, end, ref, _ in intervals:
+            if profile.peak(start, end) > capacity:
+                conflicts.append({"operation": ref, "conflicts_with": f"station{station_id} capacity ({capacity})"})
+        if len(conflicts) >= MAX_REPORTED_CONFLICTS:
+            break
+    return conflicts[:MAX_REPORTED_CONFLICTS]
+
+
+def apply_slot_operations(operations):
+    """
+    Validate and apply slot Add/Edit/Delete operations in one transaction.
+    New and moved slots are checked for overlap with each other and with the
+    station's stored slots; nothing is written if any operation is invalid.
+    Args:
+        operations (list): {"action": ..., "slot_details": {...}} dicts.
+    Returns:
+        dict: Counts of applied operations, or a failure message and HTTP code.
+    """
+    if len(operations) > MAX_BULK_OPERATIONS:
+        return {"status": "failure", "code": 400,
+                "message": f"At most {MAX_BULK_OPERATIONS} operations per request"}
+    try:
+        adds, edits, deletes = _parse_operations(operations)
+    except SlotValidationError as e:
+        return {"status": "failure", "code": 400, "message": str(e)}
+
+    touched_ids = {edit['id'] for edit in edits} | set(deletes)
+    known = {}
+    lanes = {}
+    for chunk in _chunks(touched_ids):
+        rows = db.session.query(Slot.id, Slot.station_id, Slot.connector_id).filter(Slot.id.in_(chunk))
+        for slot_id, station_id, connector_id in rows:
+            known[slot_id] = station_id
+            lanes[slot_id] = connector_id
+    missing = sorted(touched_ids - known.keys())
+    if missing:
+        return {"status": "failure", "code": 404, "message": "Slot not found", "slot_ids": missing[:MAX_REPORTED_CONFLICTS]}
+
+    # Deleting would orphan bookings (and their payments) or a waitlisted user's held slot
+    in_use = set()
+    for chunk in _chunks(set(deletes)):
+        in_use.update(slot_id for (slot_id,) in db.session.query(Booking.slot_id).filter(Booking.slot_id.in_(chunk)))
+        in_use.update(slot_id for (slot_id,) in db.session.query(WaitlistEntry.slot_id).filter(
+            WaitlistEntry.slot_id.in_(chunk), WaitlistEntry.status.in_(OPEN_WAITLIST_STATUSES)))
+    if in_use:
+        return {"status": "failure", "code": 409, "message": "Slots with bookings or waitlist offers cannot be deleted",
+                "slot_ids": sorted(in_use)[:MAX_REPORTED_CONFLICTS]}
+
+    station_ids = {add['station_id'] for add in adds}
+    existing_stations = set()
+    for chunk in _chunks(station_ids):
+        existing_stations.update(
+            station_id for (station_id,) in db.session.query(ChargingStation.id).filter(ChargingStation.id.in_(chunk))
+        )
+    if station_ids - existing_stations:
+        return {"status": "failure", "code": 404, "message": "Station not found",
+                "station_ids": sorted(station_ids - existing_stations)[:MAX_REPORTED_CONFLICTS]}
+
+    connector_ids = {add['connector_id'] for add in adds if add['connector_id'] is not None}
+    connector_stations = {}
+    for chunk in _chunks(connector_ids):
+        connector_stations.update(
+            db.session.query(Connector.id, Connector.station_id).filter(Connector.id.in_(chunk)).all()
+        )
+    mismatched = sorted({
+        add['connector_id'] for add in adds
+        if add['connector_id'] is not None and connector_stations.get(add['connector_id']) != add['station_id']
+    })
+    if mismatched:
+        return {"status": "failure", "code": 404, "message": "Connector not found at station",
+                "connector_ids": mismatched[:MAX_REPORTED_CONFLICTS]}
+
+    new_intervals = [(add['station_id'], add['connector_id'], add['start_time'], add['end_time'], add['_ref'])
+                     for add in adds]
+    new_intervals += [(known[edit['id']], lanes[edit['id']], edit['start_time'], edit['end_time'], edit['_ref'])
+                      for edit in edits]
+    conflicts = _find_conflicts(new_intervals, touched_ids)
+    if conflicts:
+        return {"status": "failure", "code": 409, "message": "Slots overlap existing slots", "conflicts": conflicts}
+
+    for row in adds + edits:
+        del row['_ref']
+    if adds:
+        db.session.bulk_insert_mappings(Slot, adds, return_defaults=True)
+    if edits:
+        db.session.bulk_update_mappings(Slot, edits)
+    for chunk in _chunks(deletes):
+        db.session.execute(delete(SlotPrice).where(SlotPrice.slot_id.in_(chunk)).execution_options(synchronize_session=False))
+        db.session.execute(update(WaitlistEntry).where(WaitlistEntry.slot_id.in_(chunk)).values(slot_id=None)
+                           .execution_options(synchronize_session=False))
+        db.session.execute(delete(Slot).where(Slot.id.in_(chunk)).execution_options(synchronize_session=False))
+    refresh_prices(slot_ids=[add['id'] for add in adds] + [edit['id'] for edit in edits])
+    db.session.commit()
+
+    publish_slot_events(
+        [slot_event(add['id'], add['station_id'], 'available', add['start_time'], add['end_time']) for add in adds]
+        + [slot_event(edit['id'], known[edit['id']], None, edit['start_time'], edit['end_time']) for edit in edits]
+        + [slot_event(slot_id, known[slot_id], 'deleted') for slot_id in set(deletes)]
+    )
+    # New and moved slots may fit the window of someone on the waitlist
+    promote_slots([add['id'] for add in adds] + [edit['id'] for edit in edits])
+    return {"status": "success", "added": len(adds), "updated": len(edits), "deleted": len(deletes)}
@@ -0,0 +1,227 @@
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import insert, delete
+from app.models import db, ChargingSession, MeterSample
+from app.utils.background import BackgroundThreads
+from app.utils.metrics import metrics
+from app.utils.timestamps import naive_utc
+
+MAX_SAMPLES_PER_REQUEST = 50000
+DOWNSAMPLE_SECONDS = 60
+EPOCH = datetime(1970, 1, 1)
+
+
+class TelemetryValidationError(ValueError):
+    pass
+
+
+def _parse_timestamp(value):
+    # Chargers send epoch seconds; ISO 8601 strings are accepted too, stored as naive UTC
+    if isinstance(value, (int, float)):
+        return datetime.utcfromtimestamp(value)
+    try:
+        return naive_utc(datetime.fromisoformat(value))
+    except (TypeError, ValueError):
+        raise TelemetryValidationError(f"Invalid timestamp: {value!r}")
+
+
+def parse_samples(samples):
+    """
+    Validate a batch of meter samples from a charger.
+    Each sample: {"session_id": 12, "timestamp": 1793000000.5, "energy_kwh": 3.2, "power_kw": 49.8}
+    where at least one of energy_kwh (cumulative meter reading) and power_kw is given.
+    Returns:
+        list: Row mappings for the meter_sample table.
+    Raises:
+        TelemetryValidationError: If a sample is malformed.
+    """
+    if not isinstance(samples, list) or not samples:
+        raise TelemetryValidationError("Samples must be a non-empty list")
+    if len(samples) > MAX_SAMPLES_PER_REQUEST:
+        raise TelemetryValidationError(f"At most {MAX_SAMPLES_PER_REQUEST} samples per request")
+
+    rows = []
+    for sample in samples:
+        try:
+            energy = sample.get('energy_kwh')
+            power = sample.get('power_kw')
+            rows.append({
+                "session_id": int(sample['session_id']),
+                "recorded_at": _parse_timestamp(sample['timestamp']),
+                "energy_kwh": float(energy) if energy is not None else None,
+                "power_kw": float(power) if power is not None else None,
+            })
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise TelemetryValidationError(f"Invalid sample: {str(e)}")
+        if energy is None and power is None:
+            raise TelemetryValidationError("Each sample needs energy_kwh or power_kw")
+    return rows
+
+
+class TelemetryIngestor:
+    """
+    Buffers meter samples in memory and appends them to the meter_sample table
+    in bulk. Requests only validate and append to the buffer; a background
+    thread flushes it with one executemany INSERT per chunk whenever it fills
+    up or the flush interval passes. When the buffer is full new samples are
+    rejected so the caller can retry, instead of memory growing without bound.
+    Samples still in the buffer are lost if the process dies.
+    """
+
+    def __init__(self, max_buffered=500000, flush_size=10000, flush_interval=1.0):
+        self.max_buffered = max_buffered
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.app = None
+        self._pending = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._metrics = {"accepted": 0, "rejected": 0, "written": 0, "failed": 0, "flushes": 0}
+        self._threads = BackgroundThreads('telemetry-flusher', self._run)
+        metrics.gauge('telemetry_ingestor_stats', "Telemetry ingestion counters and buffered samples",
+                      lambda: {(name,): value for name, value in self.stats().items()}, ('kind',))
+
+    def init_app(self, app):
+        self.app = app
+        self.max_buffered = app.config.get('TELEMETRY_MAX_BUFFERED', self.max_buffered)
+        self.flush_size = app.config.get('TELEMETRY_FLUSH_SIZE', self.flush_size)
+        app.extensions['telemetry_ingestor'] = self
+
+    def ingest(self, rows):
+        """
+        Queue validated rows for writing.
+        Returns:
+            bool: False if the buffer is full and the rows were rejected.
+        """
+        self._threads.ensure_started()
+        with self._lock:
+            if len(self._pending) + len(rows) > self.max_buffered:
+                self._metrics["rejected"] += len(rows)
+                return False
+            self._pending.extend(rows)
+            self._metrics["accepted"] += len(rows)
+            full = len(self._pending) >= self.flush_size
+        if full:
+            self._wake.set()
+        return True
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._metrics)
+            stats["buffered"] = len(self._pending)
+        return stats
+
+    def flush(self):
+        """
+        Write everything buffered so far. Runs in an app context, on a
+        connection of its own, so it never commits or rolls back the
+        caller's session. Call it before the caller's first write: on SQLite
+        it waits for any write lock the caller already holds.
+        """
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with db.engine.begin() as connection:
+                    for start in range(0, len(rows), self.flush_size):
+                        connection.execute(insert(MeterSample), rows[start:start + self.flush_size])
+            except Exception:
+                with self._lock:
+                    self._metrics["failed"] += len(rows)
+                raise
+            with self._lock:
+                self._metrics["written"] += len(rows)
+                self._metrics["flushes"] += 1
+            return len(rows)
+
+    def _run(self, stop):
+        with self.app.app_context():
+            while not stop.is_set():
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                try:
+                    self.flush()
+                except Exception as e:
+                    print(f"Telemetry flush failed: {str(e)}")
+                finally:
+                    db.session.remove()
+
+
+telemetry_ingestor = TelemetryIngestor()
+
+
+def open_session_ids(session_ids):
+    """Subset of `session_ids` that are still in progress."""
+    rows = db.session.query(ChargingSession.id).filter(
+        ChargingSession.id.in_(session_ids),
+        ChargingSession.status == "in_progress"
+    )
+    return {session_id for (session_id,) in rows}
+
+
+def downsample_session(session, bucket_seconds=DOWNSAMPLE_SECONDS):
+    """
+    Replace a closed session's raw samples with one sample per bucket and
+    record its delivered energy. The caller flushes the telemetry buffer
+    before its own writes, and commits.
+    Each bucket keeps the last meter reading and the mean power. Energy is the
+    difference between the first and last meter readings, or the integral of
+    power when the charger only reported power.
+    Args:
+        session (ChargingSession): Session being closed.
+        bucket_seconds (int): Bucket width.
+    Returns:
+        int: Number of samples kept.
+    """
+    rows = (
+        db.session.query(MeterSample.recorded_at, MeterSample.energy_kwh, MeterSample.power_kw)
+        .filter(MeterSample.session_id == session.id)
+        .order_by(MeterSample.recorded_at)
+        .yield_per(10000)
+    )
+    buckets = []
+    first_energy = last_energy = None
+    readings = 0
+    integrated = 0.0
+    previous = None
+    for recorded_at, energy, power in rows:
+        # Databases with timezone-aware columns hand back aware values
+        recorded_at = naive_utc(recorded_at)
+        if energy is not None:
+            if first_energy is None:
+                first_energy = energy
+            last_energy = energy
+            readings += 1
+        if power is not None:
+            if previous is not None:
+                integrated += previous[1] * (recorded_at - previous[0]).total_seconds() / 3600
+            previous = (recorded_at, power)
+
+        offset = (recorded_at - EPOCH).total_seconds() % bucket_seconds
+        bucket_start = recorded_at - timedelta(seconds=offset)
+        if not buckets or buckets[-1]["recorded_at"] != bucket_start:
+            buckets.append({"session_id": session.id, "recorded_at": bucket_start,
+                            "energy_kwh": None, "power_kw": None, "_power_sum": 0.0, "_power_count": 0})
+        bucket = buckets[-1]
+        if energy is not None:
+            bucket["energy_kwh"] = energy
+        if power is not None:
+            bucket["_power_sum"] += power
+            bucket["_power_count"] += 1
+
+    for bucket in buckets:
+        if bucket["_power_count"]:
+            bucket["power_kw"] = bucket["_power_sum"] / bucket["_power_count"]
+        del bucket["_power_sum"], bucket["_power_count"]
+
+    db.session.execute(delete(MeterSample).where(MeterSample.session_id == session.id))
+    if buckets:
+        db.session.execute(insert(MeterSample), buckets)
+    if readings > 1:
+        session.energy_kwh = last_energy - first_energy
+    elif previous is not None:
+        session.energy_kwh = integrated
+    return len(buckets)
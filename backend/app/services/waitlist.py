@@ -0,0 +1,426 @@
+import bisect
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from app.models import db, Slot, WaitlistEntry
+from app.services.change_events import publish_slot_status
+from app.utils.notifications import notification_dispatcher
+from app.utils.metrics import metrics
+from app.utils.timestamps import parse_timestamp
+
+OFFER_HOLD = timedelta(minutes=15)
+MAX_ENTRIES_PER_USER = 10
+MAX_WINDOW = timedelta(days=14)
+RELOAD_SECONDS = 60
+PROMOTE_SCAN_LIMIT = 100
+OPEN_STATUSES = ('waiting', 'offered')
+IN_CLAUSE_CHUNK = 500
+
+OFFERS = metrics.counter('waitlist_offers_total', "Freed slots offered to waitlisted users", ('outcome',))
+
+
+class WaitlistValidationError(ValueError):
+    pass
+
+
+def _length_class(window_start, window_end):
+    """Power-of-two number of minutes at least as long as the window."""
+    minutes = max(1, -(-(window_end - window_start) // timedelta(minutes=1)))
+    return timedelta(minutes=1 << (minutes - 1).bit_length())
+
+
+class StationQueue:
+    """
+    Waiting entries of one station.
+    Entries are grouped by their requested window and each group is a heap
+    ordered by queue time. Windows are also kept sorted by start, split by
+    length class, so a window containing a freed slot can only start within
+    its class length before the slot: finding the next user looks at the
+    heads of the windows around the slot rather than every window. Removed
+    entries are dropped lazily when they reach the head of their heap.
+    """
+
+    def __init__(self):
+        self.windows = {}  # (window_start, window_end) -> heap of (created_at, entry_id, user_id)
+        self.starts = {}  # length class -> sorted list of (window_start, window_end)
+        self.live = set()
+        self.loaded_at = time.monotonic()
+
+    def push(self, window_start, window_end, created_at, entry_id, user_id):
+        window = (window_start, window_end)
+        heap = self.windows.get(window)
+        if heap is None:
+            heap = self.windows[window] = []
+            bisect.insort(self.starts.setdefault(_length_class(window_start, window_end), []), window)
+        heapq.heappush(heap, (created_at, entry_id, user_id))
+        self.live.add(entry_id)
+
+    def discard(self, entry_id):
+        self.live.discard(entry_id)
+
+    def _drop(self, windows):
+        for window in windows:
+            self.live.difference_update(entry_id for _, entry_id, _ in self.windows.pop(window))
+
+    def best(self, start, end, now):
+        """
+        Longest-waiting live entry whose window contains [start, end).
+        Returns:
+            tuple: (created_at, entry_id, user_id), or None.
+        """
+        best = None
+        for length, starts in list(self.starts.items()):
+            # Windows starting more than their class length ago have ended
+            ended = bisect.bisect_left(starts, (now - length,))
+            self._drop(starts[:ended])
+            del starts[:ended]
+            empty = []
+            for window in starts[bisect.bisect_left(starts, (end - length,)):
+                                 bisect.bisect_right(starts, (start, datetime.max))]:
+                if window[1] < end:
+                    continue
+                heap = self.windows[window]
+                while heap and heap[0][1] not in self.live:
+                    heapq.heappop(heap)
+                if not heap:
+                    empty.append(window)
+                elif best is None or heap[0] < best:
+                    best = heap[0]
+            for window in empty:
+                del self.windows[window]
+                del starts[bisect.bisect_left(starts, window)]
+            if not starts:
+                del self.starts[length]
+        return best
+
+
+class WaitlistAllocator:
+    """
+    Per-process priority queues of waiting users, one per station.
+    A station's queue is loaded from the database the first time one of its
+    slots frees up and reloaded every RELOAD_SECONDS, so entries created by
+    other worker processes are picked up. Loading runs outside the lock;
+    entries added or removed meanwhile are replayed onto the new queue.
+    Every promotion is confirmed with conditional updates, so a stale queue
+    can delay an offer but never hand a slot to two users.
+    """
+
+    def __init__(self, reload_seconds=RELOAD_SECONDS):
+        self.reload_seconds = reload_seconds
+        self._stations = {}
+        self._loading = {}  # station_id -> one list of changes per load in progress
+        self._lock = threading.RLock()
+
+    def _load(self, station_id):
+        queue = StationQueue()
+        rows = db.session.query(
+            WaitlistEntry.id, WaitlistEntry.user_id, WaitlistEntry.window_start,
+            WaitlistEntry.window_end, WaitlistEntry.created_at
+        ).filter(
+            WaitlistEntry.station_id == station_id,
+            WaitlistEntry.status == 'waiting',
+            WaitlistEntry.window_end > datetime.utcnow()
+        )
+        for entry_id, user_id, window_start, window_end, created_at in rows:
+            queue.push(window_start, window_end, created_at, entry_id, user_id)
+        return queue
+
+    def _queue(self, station_id):
+        with self._lock:
+            queue = self._stations.get(station_id)
+            if queue is not None and time.monotonic() - queue.loaded_at < self.reload_seconds:
+                return queue
+            changes = []
+            self._loading.setdefault(station_id, []).append(changes)
+        try:
+            queue = self._load(station_id)
+        finally:
+            with self._lock:
+                pending = [other for other in self._loading[station_id] if other is not changes]
+                if pending:
+                    self._loading[station_id] = pending
+                else:
+                    del self._loading[station_id]
+        with self._lock:
+            for change in changes:
+                change(queue)
+            self._stations[station_id] = queue
+        return queue
+
+    def _change(self, station_id, change):
+        with self._lock:
+            queue = self._stations.get(station_id)
+            if queue is not None:
+                change(queue)
+            for changes in self._loading.get(station_id, ()):
+                changes.append(change)
+
+    def add(self, entry):
+        values = (entry.window_start, entry.window_end, entry.created_at, entry.id, entry.user_id)
+        self._change(entry.station_id, lambda queue: queue.push(*values))
+
+    def discard(self, station_id, entry_id):
+        self._change(station_id, lambda queue: queue.discard(entry_id))
+
+    def candidate(self, station_id, start, end, now):
+        """Next entry to offer a slot of `station_id` spanning [start, end), as (entry_id, user_id)."""
+        queue = self._queue(station_id)
+        with self._lock:
+            best = queue.best(start, end, now)
+        return (best[1], best[2]) if best is not None else None
+
+
+waitlist_allocator = WaitlistAllocator()
+
+
+def _chunks(values, size=IN_CLAUSE_CHUNK):
+    values = list(values)
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def parse_entry(data):
+    """
+    Validate a waitlist request.
+    Example: {"station_id": 7, "from": "2026-11-02T17:00", "to": "2026-11-02T21:00"}
+    Returns:
+        tuple: (station_id, window_start, window_end).
+    Raises:
+        WaitlistValidationError: If the payload is invalid.
+    """
+    try:
+        station_id = int(data['station_id'])
+        window_start = parse_timestamp(data['from'])
+        window_end = parse_timestamp(data['to'])
+    except (KeyError, TypeError, ValueError) as e:
+        raise WaitlistValidationError(f"Invalid waitlist request: {str(e)}")
+    if window_start >= window_end:
+        raise WaitlistValidationError("'from' must be before 'to'")
+    if window_end <= datetime.utcnow():
+        raise WaitlistValidationError("The window has already passed")
+    if window_end - window_start > MAX_WINDOW:
+        raise WaitlistValidationError(f"The window may span at most {MAX_WINDOW.days} days")
+    return station_id, window_start, window_end
+
+
+def join(user_id, station_id, window_start, window_end):
+    """
+    Queue a user for a slot at a station within a window.
+    Joining again for the same station and window returns the existing entry,
+    so a client retrying the request holds one place in the queue. If a
+    matching slot is free right now it is offered immediately.
+    Returns:
+        dict: Status with the entry and whether it was created.
+    """
+    existing = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == user_id,
+        WaitlistEntry.station_id == station_id,
+        WaitlistEntry.window_start == window_start,
+        WaitlistEntry.window_end == window_end,
+        WaitlistEntry.status.in_(OPEN_STATUSES)
+    ).first()
+    if existing:
+        return {"status": "success", "entry": existing, "created": False}
+
+    open_entries = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == user_id, WaitlistEntry.status.in_(OPEN_STATUSES)
+    ).count()
+    if open_entries >= MAX_ENTRIES_PER_USER:
+        return {"status": "failure", "code": 409,
+                "message": f"At most {MAX_ENTRIES_PER_USER} open waitlist entries per user"}
+
+    entry = WaitlistEntry(
+        user_id=user_id,
+        station_id=station_id,
+        window_start=window_start,
+        window_end=window_end,
+        status='waiting',
+        created_at=datetime.utcnow()
+    )
+    db.session.add(entry)
+    db.session.commit()
+    waitlist_allocator.add(entry)
+    promote_station(station_id)
+    db.session.refresh(entry)
+    return {"status": "success", "entry": entry, "created": True}
+
+
+def _offer(slot_id, station_id, start, end, now):
+    """Hold one free slot for the next eligible waiting user; returns (entry_id, user_id, until) or None."""
+    while True:
+        candidate = waitlist_allocator.candidate(station_id, start, end, now)
+        if candidate is None:
+            return None
+        entry_id, user_id = candidate
+        until = now + OFFER_HOLD
+        held = db.session.execute(
+            update(Slot)
+            .where(Slot.id == slot_id, Slot.status == 'available')
+            .values(status='held', reserved_by=user_id, reserved_until=until)
+            .execution_options(synchronize_session=False)
+        )
+        if held.rowcount != 1:
+            db.session.rollback()
+            return None
+        offered = db.session.execute(
+            update(WaitlistEntry)
+            .where(WaitlistEntry.id == entry_id, WaitlistEntry.status == 'waiting')
+            .values(status='offered', slot_id=slot_id, offered_until=until)
+            .execution_options(synchronize_session=False)
+        )
+        waitlist_allocator.discard(station_id, entry_id)
+        if offered.rowcount != 1:
+            # Cancelled or promoted by another process since the queue was loaded
+            db.session.rollback()
+            OFFERS.inc(outcome='stale')
+            continue
+        db.session.commit()
+        OFFERS.inc(outcome='offered')
+        return entry_id, user_id, until
+
+
+def promote_slots(slot_ids):
+    """
+    Offer freed slots to the users at the front of their stations' waitlists.
+    Call after the change that freed the slots is committed. Slots that are
+    no longer available or already started are skipped.
+    Args:
+        slot_ids (iterable): Slots that may have become available.
+    Returns:
+        int: Number of offers made.
+    """
+    now = datetime.utcnow()
+    slots = []
+    for chunk in _chunks(set(slot_ids)):
+        slots += db.session.query(Slot.id, Slot.station_id, Slot.start_time, Slot.end_time).filter(
+            Slot.id.in_(chunk), Slot.status == 'available', Slot.start_time > now
+        ).order_by(Slot.start_time).all()
+
+    waiting_stations = set()
+    for chunk in _chunks({station_id for _, station_id, _, _ in slots}):
+        waiting_stations.update(station_id for (station_id,) in db.session.query(WaitlistEntry.station_id).filter(
+            WaitlistEntry.station_id.in_(chunk), WaitlistEntry.status == 'waiting'
+        ).distinct())
+
+    offers = []
+    for slot_id, station_id, start, end in slots:
+        if station_id not in waiting_stations:
+            continue
+        offer = _offer(slot_id, station_id, start, end, now)
+        if offer is not None:
+            offers.append((slot_id, station_id, start) + offer)
+
+    if offers:
+        publish_slot_status([offer[0] for offer in offers], 'held')
+    for slot_id, station_id, start, entry_id, user_id, until in offers:
+        notification_dispatcher.notify(
+            user_id,
+            f"A slot at station {station_id} starting {start:%Y-%m-%d %H:%M} is held for you until "
+            f"{until:%H:%M} UTC. Book slot {slot_id} to confirm it."
+        )
+    return len(offers)
+
+
+def promote_station(station_id):
+    """Offer a station's currently free upcoming slots to its waitlist, e.g. after a session ends early."""
+    slot_ids = [
+        slot_id for (slot_id,) in db.session.query(Slot.id).filter(
+            Slot.station_id == station_id, Slot.status == 'available', Slot.start_time > datetime.utcnow()
+        ).order_by(Slot.start_time).limit(PROMOTE_SCAN_LIMIT)
+    ]
+    return promote_slots(slot_ids) if slot_ids else 0
+
+
+def _release_held(entry):
+    result = db.session.execute(
+        update(Slot)
+        .where(Slot.id == entry.slot_id, Slot.status == 'held', Slot.reserved_by == entry.user_id)
+        .values(status='available', reserved_until=None, reserved_by=None)
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
+def cancel(entry):
+    """
+    Leave the waitlist, declining any slot currently held for the user; the
+    slot then goes to the next user in line.
+    Returns:
+        bool: False if the entry was no longer open.
+    """
+    if entry.status not in OPEN_STATUSES:
+        return False
+    released = entry.status == 'offered' and entry.slot_id is not None and _release_held(entry)
+    entry.status = 'cancelled'
+    db.session.commit()
+    waitlist_allocator.discard(entry.station_id, entry.id)
+    if released:
+        publish_slot_status([entry.slot_id], 'available')
+        promote_slots([entry.slot_id])
+    return True
+
+
+def mark_offer_booked(user_id, slot_id):
+    """Close the offer that held `slot_id` for `user_id`; committed with the caller's booking."""
+    db.session.execute(
+        update(WaitlistEntry)
+        .where(WaitlistEntry.user_id == user_id, WaitlistEntry.slot_id == slot_id, WaitlistEntry.status == 'offered')
+        .values(status='booked')
+        .execution_options(synchronize_session=False)
+    )
+
+
+def reopen_booked_offer(user_id, slot_id):
+    """
+    Put the entry whose offer became a now-failed booking of `slot_id` back in
+    line, keeping its place; committed with the caller's settlement. Add the
+    returned entries to the allocator once committed.
+    Returns:
+        list: Reopened entries.
+    """
+    entries = WaitlistEntry.query.filter(
+        WaitlistEntry.user_id == user_id, WaitlistEntry.slot_id == slot_id, WaitlistEntry.status == 'booked'
+    ).all()
+    for entry in entries:
+        entry.status = 'waiting'
+        entry.slot_id = None
+        entry.offered_until = None
+    return entries
+
+
+def expire_offers(limit=500):
+    """
+    Close offers whose hold lapsed without a booking and pass their slots on.
+    Meant to run periodically.
+    Returns:
+        int: Number of offers expired.
+    """
+    now = datetime.utcnow()
+    entries = WaitlistEntry.query.filter(
+        WaitlistEntry.status == 'offered', WaitlistEntry.offered_until < now
+    ).order_by(WaitlistEntry.offered_until).limit(limit).all()
+    released = []
+    for entry in entries:
+        if entry.slot_id is not None and _release_held(entry):
+            released.append(entry.slot_id)
+        entry.status = 'expired'
+    db.session.commit()
+    if released:
+        publish_slot_status(released, 'available')
+        promote_slots(released)
+    return len(entries)
+
+
+def serialize_entry(entry):
+    return {
+        "id": entry.id,
+        "station_id": entry.station_id,
+        "from": entry.window_start.isoformat(),
+        "to": entry.window_end.isoformat(),
+        "status": entry.status,
+        "slot_id": entry.slot_id if entry.status in ('offered', 'booked') else None,
+        "offered_until": entry.offered_until.isoformat() if entry.status == 'offered' and entry.offered_until else None,
+        "joined_at": entry.created_at.isoformat()
+    }
@@ -0,0 +1,41 @@
+import os
+import threading
+
+COGNITO_ENV_VARS = ['AWS_COGNITO_CLIENT_ID', 'AWS_COGNITO_CLIENT_SECRET', 'AWS_REGION', 'JWT_DECODE_ISSUER']
+
+_clients = {}
+_lock = threading.Lock()
+
+
+def require_env(names):
+    """
+    Raises:
+        EnvironmentError: If any of the environment variables is missing.
+    """
+    for name in names:
+        if not os.getenv(name):
+            raise EnvironmentError(f"Missing required environment variable: {name}")
+
+
+def get_cognito_client():
+    """
+    Shared Cognito client, created on first use.
+    boto3 is only imported here, so importing the app and starting workers
+    needs neither the SDK's import cost nor AWS configuration. Clients are
+    thread-safe but must not cross fork(), so one is kept per process.
+    Raises:
+        EnvironmentError: If the Cognito settings are missing.
+    """
+    key = ('cognito-idp', os.getpid())
+    client = _clients.get(key)
+    if client is not None:
+        return client
+    with _lock:
+        client = _clients.get(key)
+        if client is None:
+            require_env(COGNITO_ENV_VARS)
+            import boto3
+            client = boto3.client('cognito-idp', region_name=os.getenv('AWS_REGION'))
+            _clients.clear()
+            _clients[key] = client
+        return client
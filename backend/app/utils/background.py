@@ -0,0 +1,48 @@
+import os
+import threading
+
+
+class BackgroundThreads:
+    """
+    Daemon threads that are started lazily on first use.
+    Threads do not survive fork(), so the owning process id is tracked and the
+    threads are started again in a forked child (e.g. a preloaded gunicorn worker).
+    """
+
+    def __init__(self, name, target, count=1):
+        """
+        Args:
+            name (str): Thread name prefix.
+            target (callable): Loop body, called with a threading.Event that is set on stop.
+            count (int): Number of threads to run.
+        """
+        self.name = name
+        self.target = target
+        self.count = count
+        self._threads = []
+        self._stop = threading.Event()
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop = threading.Event()
+            self._threads = [
+                threading.Thread(target=self.target, args=(self._stop,), name=f"{self.name}-{i}", daemon=True)
+                for i in range(self.count)
+            ]
+            for thread in self._threads:
+                thread.start()
+            self._pid = os.getpid()
+
+    def stop(self, timeout=None):
+        with self._lock:
+            self._stop.set()
+            for thread in self._threads:
+                thread.join(timeout)
+            self._threads = []
+            self._pid = None
@@ -0,0 +1,136 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+from flask import Response, current_app, request
+
+
+class InProcessBackend:
+    """Thread-safe LRU with per-entry TTL, local to one process."""
+
+    def __init__(self, maxsize=1024):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+
+class RedisBackend:
+    """Shared backend so every worker process sees the same entries and invalidations."""
+
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed when CACHE_BACKEND=redis
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        raw = self._client.get(key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key, value, ttl):
+        self._client.set(key, json.dumps(value), ex=max(1, int(ttl)))
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        return self._client.incr(key)
+
+
+class ResponseCache:
+    """
+    Read-through cache for JSON listing responses.
+    Entries are keyed by namespace and normalized query parameters, and carry
+    an ETag. Invalidating a namespace bumps its generation counter, which is
+    part of every key, so all stale entries become unreachable at once.
+    """
+
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or InProcessBackend()
+        self.ttl = ttl
+
+    def init_app(self, app):
+        if app.config.get('CACHE_BACKEND') == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = InProcessBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        self.ttl = app.config.get('CACHE_TTL', self.ttl)
+
+    def key(self, namespace, path, params):
+        normalized = sorted(
+            (name.strip().lower(), value.strip())
+            for name, value in params.items()
+            if value is not None and value.strip()
+        )
+        generation = self.backend.counter(f"generation:{namespace}")
+        return f"{namespace}:{generation}:{path}?{urlencode(normalized)}"
+
+    def invalidate(self, namespace):
+        self.backend.incr(f"generation:{namespace}")
+
+    def response(self, namespace, params, build, headers=None):
+        """
+        Serve a JSON response from cache, building it on a miss.
+        Answers 304 without touching the body when If-None-Match matches.
+        Args:
+            namespace (str): Cache namespace used for invalidation.
+            params (dict): Query parameters that select the response.
+            build (callable): Returns the response body as a dict.
+            headers (callable): Optional; returns extra headers for a built body, cached with it.
+        Returns:
+            Response: 200 with the body, or 304.
+        """
+        key = self.key(namespace, request.path, params)
+        entry = self.backend.get(key)
+        if entry is None:
+            data = build()
+            body = current_app.json.dumps(data)
+            entry = {"body": body, "etag": hashlib.sha1(body.encode('utf-8')).hexdigest(),
+                     "headers": headers(data) if headers else {}}
+            self.backend.set(key, entry, self.ttl)
+
+        if request.if_none_match.contains(entry['etag']):
+            response = Response(status=304)
+        else:
+            response = Response(entry['body'], mimetype='application/json', headers=entry.get('headers'))
+        response.set_etag(entry['etag'])
+        return response
+
+
+response_cache = ResponseCache()
+
+STATION_LISTINGS = 'stations'
+
+
+def invalidate_station_listings():
+    """Drop cached station listings after a write that changes stations or their status."""
+    response_cache.invalidate(STATION_LISTINGS)
@@ -0,0 +1,83 @@
+import queue
+import threading
+
+
+class Subscription:
+    """A subscriber's bounded inbox of change events."""
+
+    def __init__(self, bus, topics, maxsize):
+        self.bus = bus
+        self.topics = frozenset(topics)
+        self.queue = queue.Queue(maxsize=maxsize)
+        self.overflowed = False
+
+    def get(self, timeout=None):
+        """Next event, or None on timeout."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.bus.unsubscribe(self)
+
+
+class ChangeBus:
+    """
+    In-process publish/subscribe for slot and station changes.
+    Publishing never blocks: a subscriber whose inbox is full is flagged as
+    overflowed (it should resync with a full fetch) and the event is skipped
+    for it. Listeners are plain callables invoked on the publishing thread,
+    used to bridge events into other consumers such as the asyncio server.
+    """
+
+    def __init__(self, max_pending=256):
+        self.max_pending = max_pending
+        self._topics = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics, self.max_pending)
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                subscribers = self._topics.get(topic)
+                if subscribers:
+                    subscribers.discard(subscription)
+                    if not subscribers:
+                        del self._topics[topic]
+
+    def add_listener(self, listener):
+        """Register `listener(topics, event)` to receive every published event."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len({s for subscribers in self._topics.values() for s in subscribers})
+
+    def publish(self, topics, event):
+        with self._lock:
+            targets = set()
+            for topic in topics:
+                targets.update(self._topics.get(topic, ()))
+            listeners = list(self._listeners)
+        for subscription in targets:
+            try:
+                subscription.queue.put_nowait(event)
+            except queue.Full:
+                subscription.overflowed = True
+        for listener in listeners:
+            try:
+                listener(topics, event)
+            except Exception as e:
+                print(f"Change listener failed: {str(e)}")
+
+
+change_bus = ChangeBus()
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.request import urlopen
+
+import jwt
+from flask import g, jsonify, request
+
+JWKS_TTL_SECONDS = 3600
+JWKS_MIN_REFRESH_INTERVAL = 30
+VERIFIED_TOKEN_CACHE_SIZE = 1024
+
+
+def fetch_jwks(url, timeout=5):
+    """
+    Download a JSON Web Key Set.
+    Args:
+        url (str): JWKS endpoint.
+        timeout (int): Socket timeout in seconds.
+    Returns:
+        dict: The parsed key set.
+    """
+    with urlopen(url, timeout=timeout) as response:
+        return json.load(response)
+
+
+def load_static_key(pem):
+    """Parse a PEM public key once, returning None if it is missing or unusable."""
+    if not pem:
+        return None
+    try:
+        return jwt.algorithms.get_default_algorithms()['RS256'].prepare_key(pem)
+    except Exception:
+        return None
+
+
+class JWKSCache:
+    """
+    Process-wide signing key cache with kid lookup.
+    Keys are refreshed when the TTL lapses or an unknown kid is seen, but at most
+    once per `min_refresh_interval` so forged kids cannot trigger a fetch storm.
+    If the JWKS endpoint is unreachable the last good keys keep being served.
+    """
+
+    def __init__(self, url, fetcher=fetch_jwks, ttl=JWKS_TTL_SECONDS,
+                 min_refresh_interval=JWKS_MIN_REFRESH_INTERVAL, static_key=None):
+        self.url = url
+        self.fetcher = fetcher
+        self.ttl = ttl
+        self.min_refresh_interval = min_refresh_interval
+        self.static_key = static_key
+        self._keys = {}
+        self._fetched_at = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+
+    def _is_fresh(self, now):
+        return self._fetched_at is not None and now - self._fetched_at < self.ttl
+
+    def _may_refresh(self, now):
+        return self._last_attempt is None or now - self._last_attempt >= self.min_refresh_interval
+
+    def refresh(self):
+        now = time.monotonic()
+        self._last_attempt = now
+        try:
+            jwks = self.fetcher(self.url)
+        except Exception:
+            return False
+        keys = {}
+        for jwk in jwks.get('keys', []):
+            try:
+                keys[jwk.get('kid')] = jwt.PyJWK(jwk).key
+            except jwt.PyJWTError:
+                continue
+        self._keys = keys
+        self._fetched_at = now
+        return True
+
+    def get_key(self, kid):
+        now = time.monotonic()
+        key = self._keys.get(kid)
+        if key is not None and self._is_fresh(now):
+            return key
+
+        with self._lock:
+            now = time.monotonic()
+            key = self._keys.get(kid)
+            if key is not None and self._is_fresh(now):
+                return key
+            if self._may_refresh(now):
+                self.refresh()
+                key = self._keys.get(kid)
+
+        if key is None:
+            key = self.static_key
+        if key is None:
+            raise jwt.InvalidTokenError("Unable to find a signing key that matches the token")
+        return key
+
+
+class VerifiedTokenCache:
+    """Bounded LRU of already-verified tokens; entries expire with the token's `exp`."""
+
+    def __init__(self, maxsize=VERIFIED_TOKEN_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token):
+        return hashlib.sha256(token.encode('utf-8')).digest()
+
+    def get(self, token):
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            claims, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return claims
+
+    def put(self, token, claims):
+        expires_at = claims.get('exp')
+        if expires_at is None:
+            return
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (claims, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_jwks_cache = None
+_jwks_lock = threading.Lock()
+verified_tokens = VerifiedTokenCache()
+
+
+def init_jwks_cache(url=None, fetcher=fetch_jwks, static_key=None, **kwargs):
+    """
+    Replace the process-wide JWKS cache, e.g. to point it at a local stub.
+    Args:
+        url (str): JWKS endpoint; defaults to the issuer's well-known URL.
+        fetcher (callable): Function taking the URL and returning a key set.
+        static_key: Fallback key used when no kid matches.
+    Returns:
+        JWKSCache: The installed cache.
+    """
+    global _jwks_cache
+    if url is None:
+        url = f"{os.getenv('JWT_DECODE_ISSUER')}/.well-known/jwks.json"
+    if static_key is None:
+        try:
+            from config import JWT_PUBLIC_KEY
+        except ImportError:
+            JWT_PUBLIC_KEY = None
+        static_key = load_static_key(JWT_PUBLIC_KEY)
+    _jwks_cache = JWKSCache(url, fetcher=fetcher, static_key=static_key, **kwargs)
+    verified_tokens.clear()
+    return _jwks_cache
+
+
+def get_jwks_cache():
+    if _jwks_cache is None:
+        with _jwks_lock:
+            if _jwks_cache is None:
+                init_jwks_cache()
+    return _jwks_cache
+
+
+def verify_cognito_token(token):
+    """
+    Verify a Cognito ID token, reusing earlier verifications while they are valid.
+    Args:
+        token (str): Encoded JWT.
+    Returns:
+        dict: Decoded claims.
+    Raises:
+        jwt.InvalidTokenError: If the token is invalid, expired or not an ID token.
+    """
+    claims = verified_tokens.get(token)
+    if claims is not None:
+        return claims
+
+    header = jwt.get_unverified_header(token)
+    signing_key = get_jwks_cache().get_key(header.get('kid'))
+    claims = jwt.decode(
+        token,
+        signing_key,
+        algorithms=["RS256"],
+        issuer=os.getenv('JWT_DECODE_ISSUER'),
+        audience=os.getenv('AWS_COGNITO_CLIENT_ID')
+    )
+
+    if claims.get("token_use") != "id":
+        raise jwt.InvalidTokenError("Token is not an ID Token")
+
+    verified_tokens.put(token, claims)
+    return claims
+
+
+def cognito_required(fn):
+    """Require a valid Cognito ID token; the decoded claims are exposed as `g.cognito_claims`."""
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = request.headers.get('Authorization')
+        if not token or "Bearer " not in token:
+            return jsonify({"message": "Missing or malformed Authorization Header"}), 401
+
+        token = token.split("Bearer ")[1]
+        try:
+            g.cognito_claims = verify_cognito_token(token)
+        except jwt.ExpiredSignatureError:
+            return jsonify({"message": "Token has expired"}), 401
+        except jwt.InvalidAudienceError:
+            return jsonify({"message": "Invalid token audience"}), 401
+        except jwt.InvalidTokenError as e:
+            return jsonify({"message": f"Invalid token: {str(e)}"}), 401
+        return fn(*args, **kwargs)
+    return wrapper
@@ -0,0 +1,106 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils.metrics import metrics
+
+EXECUTOR_WAIT = metrics.histogram(
+    'bounded_executor_wait_seconds', "Time from submission to completion in bounded executors", ('executor',)
+)
+EXECUTOR_REJECTED = metrics.counter('bounded_executor_rejected_total', "Tasks rejected by full bounded executors", ('executor',))
+
+
+class ExecutorBusy(RuntimeError):
+    """Raised when a bounded executor already has its maximum number of tasks queued."""
+
+
+class SingleFlight:
+    """
+    Coalesce identical concurrent calls.
+    While a call for a key is running, further callers with the same key wait
+    for it and receive its result (or exception) instead of calling again.
+    Nothing is cached once the call returns.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, fn):
+        """
+        Args:
+            key (str): Identity of the call.
+            fn (callable): Called without arguments by the first caller.
+        Returns:
+            The result of fn.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {"done": threading.Event()}
+        if not leader:
+            call["done"].wait()
+        else:
+            try:
+                call["result"] = fn()
+            except BaseException as e:
+                call["error"] = e
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                call["done"].set()
+        if "error" in call:
+            raise call["error"]
+        return call["result"]
+
+
+class BoundedExecutor:
+    """
+    Thread pool with a cap on queued work, for CPU-heavy calls made from requests.
+    At most `workers` tasks run at once, so they cannot take every core away
+    from other endpoints, and at most `max_pending` wait or run, so a burst
+    is rejected with ExecutorBusy instead of piling up. The pool is created
+    lazily per process so it survives a preloading fork.
+    """
+
+    def __init__(self, name, workers=2, max_pending=32):
+        self.name = name
+        self.workers = workers
+        self.max_pending = max_pending
+        self._executor = None
+        self._pid = None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+    def configure(self, workers, max_pending):
+        with self._lock:
+            self.workers = workers
+            self.max_pending = max_pending
+            self._slots = threading.BoundedSemaphore(max_pending)
+            self._executor = None
+            self._pid = None
+
+    def _pool(self):
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name)
+                self._pid = os.getpid()
+            return self._executor
+
+    def run(self, fn, *args):
+        """
+        Run fn(*args) in the pool and wait for its result.
+        Raises:
+            ExecutorBusy: If max_pending tasks are already queued or running.
+        """
+        slots = self._slots
+        if not slots.acquire(blocking=False):
+            EXECUTOR_REJECTED.inc(executor=self.name)
+            raise ExecutorBusy(f"{self.name} executor is busy")
+        started = time.perf_counter()
+        try:
+            return self._pool().submit(fn, *args).result()
+        finally:
+            slots.release()
+            EXECUTOR_WAIT.observe(time.perf_counter() - started, executor=self.name)
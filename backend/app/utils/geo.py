@@ -0,0 +1,103 @@
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+GEOHASH_PRECISION = 9
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance between two points.
+    Args:
+        lat1, lon1, lat2, lon2 (float): Coordinates in decimal degrees.
+    Returns:
+        float: Distance in kilometres.
+    """
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlmb = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmb / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def geohash_encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """
+    Encode a coordinate as a geohash string.
+    Args:
+        latitude (float): Latitude in decimal degrees.
+        longitude (float): Longitude in decimal degrees.
+        precision (int): Number of characters in the result.
+    Returns:
+        str: Geohash of the cell containing the point.
+    """
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit = 0
+    value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bit = 0
+            value = 0
+    return "".join(chars)
+
+
+def cell_size_deg(precision):
+    """Return the (lat, lon) size in degrees of a geohash cell at `precision`."""
+    bits = 5 * precision
+    lon_bits = (bits + 1) // 2
+    lat_bits = bits // 2
+    return 180.0 / (1 << lat_bits), 360.0 / (1 << lon_bits)
+
+
+def precision_for_radius(latitude, radius_km):
+    """
+    Pick the finest geohash precision whose cells are at least `radius_km` wide,
+    so that a cell and its eight neighbours always cover the search circle.
+    Returns 0 when the radius is larger than any cell (search everything).
+    """
+    km_per_deg_lat = math.pi * EARTH_RADIUS_KM / 180.0
+    km_per_deg_lon = km_per_deg_lat * max(math.cos(math.radians(latitude)), 1e-6)
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        dlat, dlon = cell_size_deg(precision)
+        if min(dlat * km_per_deg_lat, dlon * km_per_deg_lon) >= radius_km:
+            return precision
+    return 0
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Geohash prefixes (centre cell plus neighbours) covering a search circle.
+    Returns:
+        list: Distinct prefixes, or an empty list when no prefix is selective.
+    """
+    precision = precision_for_radius(latitude, radius_km)
+    if precision == 0:
+        return []
+    dlat, dlon = cell_size_deg(precision)
+    cells = set()
+    for i in (-1, 0, 1):
+        lat = latitude + i * dlat
+        if lat > 90.0 or lat < -90.0:
+            continue
+        for j in (-1, 0, 1):
+            lon = (longitude + j * dlon + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def prefix_upper_bound(prefix):
+    """Smallest string greater than every geohash starting with `prefix`."""
+    return prefix + "{"
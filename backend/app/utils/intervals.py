@@ -0,0 +1,86 @@
+from bisect import bisect_left, bisect_right
+
+
+class IntervalIndex:
+    """
+    Static index over half-open [start, end) intervals.
+    Intervals are sorted by start with a running maximum of end, so "does
+    anything overlap [start, end)?" is a single binary search.
+    """
+
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals (iterable): (start, end, key) tuples.
+        """
+        self._items = sorted(intervals, key=lambda item: (item[0], item[1]))
+        self._starts = [item[0] for item in self._items]
+        self._max_end_at = []
+        best = None
+        for i, item in enumerate(self._items):
+            if best is None or item[1] > self._items[best][1]:
+                best = i
+            self._max_end_at.append(best)
+
+    def __len__(self):
+        return len(self._items)
+
+    def find_overlap(self, start, end):
+        """
+        Return the key of an interval overlapping [start, end), or None.
+        """
+        i = bisect_left(self._starts, end)
+        if i == 0:
+            return None
+        candidate = self._items[self._max_end_at[i - 1]]
+        return candidate[2] if candidate[1] > start else None
+
+
+def find_self_overlaps(intervals):
+    """
+    Find overlapping pairs within one set of intervals.
+    Args:
+        intervals (iterable): (start, end, key) tuples.
+    Returns:
+        list: (key, other_key) pairs that overlap.
+    """
+    overlaps = []
+    latest = None
+    for item in sorted(intervals, key=lambda item: (item[0], item[1])):
+        if latest is not None and item[0] < latest[1]:
+            overlaps.append((latest[2], item[2]))
+        if latest is None or item[1] > latest[1]:
+            latest = item
+    return overlaps
+
+
+class ConcurrencyProfile:
+    """
+    How many [start, end) intervals overlap at each moment, as a step
+    function over the interval boundaries.
+    """
+
+    def __init__(self, intervals):
+        """
+        Args:
+            intervals (iterable): (start, end, ...) tuples.
+        """
+        deltas = {}
+        for item in intervals:
+            deltas[item[0]] = deltas.get(item[0], 0) + 1
+            deltas[item[1]] = deltas.get(item[1], 0) - 1
+        self._points = sorted(deltas)
+        self._levels = []
+        level = 0
+        for point in self._points:
+            level += deltas[point]
+            self._levels.append(level)
+
+    def peak(self, start, end):
+        """Return the largest number of intervals overlapping at any moment in [start, end)."""
+        i = max(bisect_right(self._points, start) - 1, 0)
+        best = 0
+        while i < len(self._points) and self._points[i] < end:
+            best = max(best, self._levels[i])
+            i += 1
+        return best
@@ -0,0 +1,339 @@
+import glob
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from app.utils.background import BackgroundThreads
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def snapshot(self):
+        with self._lock:
+            values = [[list(key), value] for key, value in self._values.items()]
+        return {"type": "counter", "help": self.help, "labels": list(self.label_names), "values": values}
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.label_names)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def snapshot(self):
+        with self._lock:
+            series = [[list(key), list(counts), total] for key, (counts, total) in self._series.items()]
+        return {"type": "histogram", "help": self.help, "labels": list(self.label_names),
+                "buckets": list(self.buckets), "series": series}
+
+
+class CallbackGauge:
+    """Gauge read at scrape time; `callback` returns a number, or a dict of label value tuple -> number."""
+
+    def __init__(self, name, help, callback, labels=()):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        self.label_names = tuple(labels)
+
+    def snapshot(self):
+        try:
+            value = self.callback()
+        except Exception:
+            return None
+        values = value.items() if isinstance(value, dict) else [((), value)]
+        return {"type": "gauge", "help": self.help, "labels": list(self.label_names),
+                "values": [[list(key), number] for key, number in values]}
+
+
+def _merge(snapshots, label_gauges):
+    """
+    Combine per-process snapshots: counters and histograms are summed,
+    gauges are kept per process, under a `pid` label if `label_gauges`.
+    """
+    merged = {}
+    for pid, snapshot in snapshots:
+        for name, data in snapshot.items():
+            if data is None:
+                continue
+            target = merged.get(name)
+            if data["type"] == "gauge":
+                extra = ["pid"] if label_gauges else []
+                if target is None:
+                    target = merged[name] = {**data, "labels": data["labels"] + extra, "values": []}
+                target["values"] += [[key + [str(pid)][:len(extra)], value] for key, value in data["values"]]
+            elif data["type"] == "counter":
+                if target is None:
+                    target = merged[name] = {**data, "values": {}}
+                for key, value in data["values"]:
+                    target["values"][tuple(key)] = target["values"].get(tuple(key), 0) + value
+            else:
+                if target is None:
+                    target = merged[name] = {**data, "series": {}}
+                if data["buckets"] != target["buckets"]:
+                    continue
+                for key, counts, total in data["series"]:
+                    known = target["series"].get(tuple(key))
+                    if known is None:
+                        target["series"][tuple(key)] = [list(counts), total]
+                    else:
+                        known[0] = [a + b for a, b in zip(known[0], counts)]
+                        known[1] += total
+    return merged
+
+
+def _render(name, data):
+    names = data["labels"]
+    lines = [f"# HELP {name} {data['help']}", f"# TYPE {name} {data['type']}"]
+    if data["type"] == "histogram":
+        buckets = tuple(data["buckets"]) + (float('inf'),)
+        for key, (counts, total) in sorted(data["series"].items()):
+            cumulative = 0
+            for bound, count in zip(buckets, counts):
+                cumulative += count
+                labels = _labels(names, key, [('le', _number(float(bound)))])
+                lines.append(f"{name}_bucket{labels} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(total)}")
+            lines.append(f"{name}_count{_labels(names, key)} {cumulative}")
+        return lines
+    values = data["values"].items() if isinstance(data["values"], dict) else data["values"]
+    for key, value in sorted((tuple(key), value) for key, value in values):
+        lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+    return lines
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class MetricsRegistry:
+    """
+    Metrics rendered in the Prometheus text format.
+    Each process records into its own registry. With a shared `directory`
+    (METRICS_DIR), every process also writes a snapshot of its registry
+    there every few seconds and on exit, and `render` merges the snapshots
+    of all processes, so one scrape of any gunicorn worker covers them all.
+    Counters and histograms of exited workers keep counting towards the
+    totals, so they never go backwards; gauges are reported per live
+    process. Other workers' numbers lag by up to the write interval.
+    Registering a name twice returns the existing metric, so modules can
+    declare their metrics at import time.
+    """
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+        self.directory = None
+
+    def _register(self, name, factory):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = factory()
+            return metric
+
+    def counter(self, name, help, labels=()):
+        return self._register(name, lambda: Counter(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=DEFAULT_BUCKETS):
+        return self._register(name, lambda: Histogram(name, help, labels, buckets))
+
+    def gauge(self, name, help, callback, labels=()):
+        return self._register(name, lambda: CallbackGauge(name, help, callback, labels))
+
+    def snapshot(self):
+        with self._lock:
+            metrics = list(self._metrics.items())
+        return {name: metric.snapshot() for name, metric in metrics}
+
+    def write_snapshot(self):
+        """Publish this process's metrics to the shared directory (atomically replaced)."""
+        if not self.directory:
+            return
+        pid = os.getpid()
+        path = os.path.join(self.directory, f"{pid}.json")
+        temporary = f"{path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump({"pid": pid, "metrics": self.snapshot()}, f)
+        os.replace(temporary, path)
+
+    def _other_snapshots(self):
+        pid = os.getpid()
+        for path in glob.glob(os.path.join(self.directory, '*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if data["pid"] == pid:
+                continue
+            if not _process_alive(data["pid"]):
+                # Gauges describe live processes only
+                data["metrics"] = {name: metric for name, metric in data["metrics"].items()
+                                   if metric and metric["type"] != "gauge"}
+            yield data["pid"], data["metrics"]
+
+    def render(self):
+        snapshots = [(os.getpid(), self.snapshot())]
+        if self.directory:
+            snapshots += self._other_snapshots()
+        merged = _merge(snapshots, label_gauges=bool(self.directory))
+        lines = []
+        for name in sorted(merged):
+            lines += _render(name, merged[name])
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+REQUEST_DURATION = metrics.histogram(
+    'http_request_duration_seconds', "Request latency by endpoint", ('endpoint', 'method', 'status')
+)
+REQUEST_QUERIES = metrics.histogram(
+    'http_request_sql_queries', "SQL statements issued per request", ('endpoint',), COUNT_BUCKETS
+)
+REQUEST_SQL_TIME = metrics.histogram(
+    'http_request_sql_seconds', "Time spent in SQL per request", ('endpoint',)
+)
+QUERY_DURATION = metrics.histogram('db_query_duration_seconds', "SQL statement execution time", (), QUERY_BUCKETS)
+QUERY_ERRORS = metrics.counter('db_query_errors_total', "SQL statements that raised an error")
+POOL_CHECKOUT_WAIT = metrics.histogram(
+    'db_pool_checkout_wait_seconds', "Time spent waiting for a pooled connection", (), QUERY_BUCKETS
+)
+POOL_TIMEOUTS = metrics.counter('db_pool_timeouts_total', "Connection checkouts that hit pool_timeout")
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    QUERY_DURATION.observe(elapsed)
+    if has_request_context():
+        g.sql_queries = g.get('sql_queries', 0) + 1
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+
+
+def _handle_error(context):
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+    QUERY_ERRORS.inc()
+
+
+def _pool_stats(app):
+    def collect():
+        with app.app_context():
+            from app import db
+            pool = db.engine.pool
+        stats = {}
+        for name in ('size', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                stats[(name,)] = getattr(pool, name)()
+        return stats
+    return collect
+
+
+def _snapshot_writer(interval):
+    def run(stop):
+        while not stop.wait(interval):
+            try:
+                metrics.write_snapshot()
+            except Exception as e:
+                print(f"Metrics snapshot failed: {str(e)}")
+    return run
+
+
+def init_metrics(app):
+    """
+    Record request latency, per-request SQL statement count and time, and
+    connection pool stats. Rendered by the /metrics endpoint. With
+    METRICS_DIR set, each process also shares its metrics through that
+    directory (see MetricsRegistry).
+    """
+    metrics.directory = app.config.get('METRICS_DIR')
+    if metrics.directory:
+        os.makedirs(metrics.directory, exist_ok=True)
+        writer = BackgroundThreads('metrics-writer', _snapshot_writer(app.config.get('METRICS_WRITE_SECONDS', 5)))
+        app.before_request(writer.ensure_started)
+
+    for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                           ('after_cursor_execute', _after_cursor_execute),
+                           ('handle_error', _handle_error)):
+        if not event.contains(Engine, name, listener):
+            event.listen(Engine, name, listener)
+
+    metrics.gauge('db_pool_connections', "Connection pool state", _pool_stats(app), ('state',))
+
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.pop('request_started', None)
+        if started is None:
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUEST_DURATION.observe(
+            time.perf_counter() - started, endpoint=endpoint, method=request.method, status=response.status_code
+        )
+        REQUEST_QUERIES.observe(g.get('sql_queries', 0), endpoint=endpoint)
+        REQUEST_SQL_TIME.observe(g.get('sql_seconds', 0.0), endpoint=endpoint)
+        return response
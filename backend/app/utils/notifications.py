@@ -1,3 +1,12 @@
+import queue
+import threading
+import time
+from app.utils.background import BackgroundThreads
+from app.utils.metrics import metrics
+
+BATCH_DURATION = metrics.histogram('notification_batch_duration_seconds', "Notification backend delivery time per batch")
+
+
 def send_notification(user, message):
     """
     Send a notification to a user.
@@ -11,3 +20,117 @@ def send_notification(user, message):
     except Exception as e:
         print(f"Failed to send notification: {str(e)}")
         return {"status": "failure", "message": str(e)}
+
+
+class NotificationBackend:
+    """Interface for notification channels used by the dispatcher."""
+
+    def send_batch(self, batch):
+        """
+        Deliver a batch of notifications.
+        Args:
+            batch (dict): User identifier -> list of messages for that user.
+        Returns:
+            int: Number of users that could not be notified.
+        """
+        raise NotImplementedError
+
+
+class ConsoleBackend(NotificationBackend):
+    """Local stub backend that prints each user's coalesced messages."""
+
+    def send_batch(self, batch):
+        failed = 0
+        for user, messages in batch.items():
+            if send_notification(user, "\n".join(messages))['status'] != 'success':
+                failed += 1
+        return failed
+
+
+class NotificationDispatcher:
+    """
+    Queue notifications and deliver them in bulk from a background thread.
+    `notify` never blocks: when the bounded queue is full the message is
+    dropped and counted, so request latency and memory stay bounded during
+    large broadcasts. Messages for the same user within one batch are
+    coalesced into a single delivery.
+    """
+
+    def __init__(self, backend=None, max_queue=10000, batch_size=500, flush_interval=0.5):
+        self.backend = backend or ConsoleBackend()
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._metrics = {"enqueued": 0, "dropped": 0, "delivered": 0, "failed": 0, "batches": 0}
+        self._metrics_lock = threading.Lock()
+        self._threads = BackgroundThreads('notification-dispatcher', self._run)
+        metrics.gauge('notification_dispatcher_stats', "Notification dispatcher counters and queue depth",
+                      lambda: {(name,): value for name, value in self.stats().items()}, ('kind',))
+
+    def _count(self, name, amount=1):
+        with self._metrics_lock:
+            self._metrics[name] += amount
+
+    def notify(self, user, message):
+        """
+        Queue a notification.
+        Returns:
+            bool: False if the queue was full and the message was dropped.
+        """
+        self._threads.ensure_started()
+        try:
+            self._queue.put_nowait((user, message))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("enqueued")
+        return True
+
+    def stats(self):
+        with self._metrics_lock:
+            stats = dict(self._metrics)
+        stats["queued"] = self._queue.qsize()
+        return stats
+
+    def _collect(self):
+        try:
+            user, message = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return {}
+        batch = {user: [message]}
+        collected = 1
+        deadline = time.monotonic() + self.flush_interval
+        while collected < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                user, message = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            messages = batch.setdefault(user, [])
+            if message not in messages:
+                messages.append(message)
+            collected += 1
+        return batch
+
+    def flush(self, batch):
+        started = time.perf_counter()
+        try:
+            failed = self.backend.send_batch(batch)
+        except Exception as e:
+            print(f"Failed to send notification batch: {str(e)}")
+            failed = len(batch)
+        BATCH_DURATION.observe(time.perf_counter() - started)
+        self._count("batches")
+        self._count("delivered", len(batch) - failed)
+        self._count("failed", failed)
+
+    def _run(self, stop):
+        while not stop.is_set() or not self._queue.empty():
+            batch = self._collect()
+            if batch:
+                self.flush(batch)
+
+
+notification_dispatcher = NotificationDispatcher()
@@ -0,0 +1,132 @@
+import base64
+import json
+from bisect import bisect_right
+from itertools import islice
+from urllib.parse import urlencode
+from flask import Response, request, stream_with_context
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+STREAM_BATCH_SIZE = 1000
+STREAM_FORMATS = ('ndjson', 'json')
+ID_BATCH_SIZE = 500
+
+
+def encode_cursor(last_id):
+    """Encode the last id of a page as an opaque cursor."""
+    raw = json.dumps({"id": last_id}, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by `encode_cursor`.
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded))["id"]
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(last_id, int):
+        raise ValueError("Invalid cursor")
+    return last_id
+
+
+def parse_page_args(args):
+    """
+    Read `after`, `limit` and `stream` from the query string.
+    Args:
+        args: Request query arguments.
+    Returns:
+        dict: after_id, limit and stream format (or None).
+    Raises:
+        ValueError: If any parameter is invalid.
+    """
+    after = args.get('after')
+    after_id = decode_cursor(after) if after else 0
+    limit = int(args.get('limit') or DEFAULT_PAGE_SIZE)
+    if limit <= 0:
+        raise ValueError("Limit must be positive")
+    stream = args.get('stream')
+    if stream and stream not in STREAM_FORMATS:
+        raise ValueError("Stream must be one of: " + ", ".join(STREAM_FORMATS))
+    return {"after_id": after_id, "limit": min(limit, MAX_PAGE_SIZE), "stream": stream}
+
+
+def _rows_in(query, id_column, ids, after_id, batch_size=ID_BATCH_SIZE):
+    """Rows of `query` whose id is in the ascending `ids` list and after `after_id`, in id order."""
+    for start in range(bisect_right(ids, after_id), len(ids), batch_size):
+        yield from query.filter(id_column.in_(ids[start:start + batch_size])).order_by(id_column)
+
+
+def paginate(query, id_column, after_id, limit, ids=None):
+    """
+    Fetch one keyset page ordered by `id_column`.
+    `ids` (ascending) restricts the page to ids selected outside the
+    database, such as from an in-memory index; they are queried in batches.
+    Returns:
+        tuple: (rows, next_cursor); next_cursor is None on the last page.
+    """
+    if ids is not None:
+        rows = list(islice(_rows_in(query, id_column, ids, after_id), limit + 1))
+    else:
+        rows = query.filter(id_column > after_id).order_by(id_column).limit(limit + 1).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].id)
+    return rows, None
+
+
+def next_page_link(next_cursor):
+    """
+    Link header pointing at the next page, so clients that only read the
+    list still see that it was cut off at `limit` (DEFAULT_PAGE_SIZE when
+    they send none). The link is relative, so it can be cached with the body.
+    Returns:
+        dict: {"Link": ...}, or {} on the last page.
+    """
+    if not next_cursor:
+        return {}
+    args = request.args.to_dict(flat=False)
+    args['after'] = [next_cursor]
+    return {"Link": f'<{request.path}?{urlencode(args, doseq=True)}>; rel="next"'}
+
+
+def stream_response(query, id_column, after_id, serialize, key, fmt, ids=None):
+    """
+    Stream every row after `after_id` without materializing the result set.
+    Rows are pulled in `yield_per` batches and written as NDJSON lines, or as
+    a chunked JSON document of the form {key: [...]}.
+    Args:
+        query: Query to stream.
+        id_column: Column used for ordering and the `after` cursor.
+        after_id (int): Resume point.
+        serialize (callable): Turns one row into a dict.
+        key (str): Top-level key of the JSON document.
+        fmt (str): 'ndjson' or 'json'.
+        ids (list): Optional ascending ids the rows are restricted to, as in `paginate`.
+    Returns:
+        Response: Chunked HTTP response.
+    """
+    if ids is not None:
+        rows = _rows_in(query, id_column, ids, after_id)
+    else:
+        rows = query.filter(id_column > after_id).order_by(id_column).yield_per(STREAM_BATCH_SIZE)
+
+    def generate_ndjson():
+        for row in rows:
+            yield json.dumps(serialize(row)) + '\n'
+
+    def generate_json():
+        yield '{"%s": [' % key
+        separator = ''
+        for row in rows:
+            yield separator + json.dumps(serialize(row))
+            separator = ','
+        yield ']}'
+
+    if fmt == 'ndjson':
+        return Response(stream_with_context(generate_ndjson()), mimetype='application/x-ndjson')
+    return Response(stream_with_context(generate_json()), mimetype='application/json')
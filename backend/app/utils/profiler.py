@@ -0,0 +1,50 @@
+import cProfile
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from flask import g, request
+
+
+def init_profiler(app):
+    """
+    Profile a sample of requests and keep the profiles of slow ones.
+    One in PROFILE_SAMPLE_RATE requests runs under cProfile; if it takes at
+    least PROFILE_SLOW_MS, its stats are written to PROFILE_DIR as a .prof
+    file (open with `python -m pstats` or snakeviz). Only one request per
+    process is profiled at a time, since the profiler is process-wide.
+    """
+    sample_rate = app.config['PROFILE_SAMPLE_RATE']
+    slow_seconds = app.config['PROFILE_SLOW_MS'] / 1000
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    active = threading.Lock()
+
+    @app.before_request
+    def start_profile():
+        if random.randrange(sample_rate) or not active.acquire(blocking=False):
+            return
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Another profiler (e.g. a debugger) is already attached
+            active.release()
+            return
+        g.profile = (profile, time.perf_counter())
+
+    @app.teardown_request
+    def finish_profile(exc):
+        sampled = g.pop('profile', None)
+        if sampled is None:
+            return
+        profile, started = sampled
+        try:
+            profile.disable()
+            elapsed = time.perf_counter() - started
+            if elapsed >= slow_seconds:
+                name = f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{request.endpoint or 'unmatched'}-{elapsed * 1000:.0f}ms.prof"
+                profile.dump_stats(os.path.join(directory, name))
+        finally:
+            active.release()
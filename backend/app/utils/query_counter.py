@@ -0,0 +1,76 @@
+from functools import wraps
+from flask import g, has_request_context, request, current_app
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a request issues more SQL statements than its budget allows."""
+
+
+class QueryCounter:
+    """
+    Count SQL statements executed while the context manager is active.
+    Usage:
+        with QueryCounter() as counter:
+            client.get('/api/ev/history')
+        assert counter.count <= 3
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(Engine, 'before_cursor_execute', self._record)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        event.remove(Engine, 'before_cursor_execute', self._record)
+        return False
+
+
+def query_budget(max_queries):
+    """Override the per-request query budget for a single view."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            return fn(*args, **kwargs)
+        wrapper.query_budget = max_queries
+        return wrapper
+    return decorator
+
+
+def _count_request_query(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context():
+        g.query_count = g.get('query_count', 0) + 1
+
+
+def init_query_guard(app):
+    """
+    Fail any request that runs more than MAX_QUERIES_PER_REQUEST statements.
+    Meant for test and CI configs: an N+1 regression surfaces as a
+    QueryBudgetExceeded error instead of as production latency.
+    """
+    if not event.contains(Engine, 'before_cursor_execute', _count_request_query):
+        event.listen(Engine, 'before_cursor_execute', _count_request_query)
+
+    @app.before_request
+    def reset_query_count():
+        # g outlives the request when an app context was already pushed (tests, CLI)
+        g.query_count = 0
+
+    @app.after_request
+    def check_query_budget(response):
+        view = current_app.view_functions.get(request.endpoint)
+        budget = getattr(view, 'query_budget', current_app.config['MAX_QUERIES_PER_REQUEST'])
+        count = g.get('query_count', 0)
+        if count > budget:
+            raise QueryBudgetExceeded(
+                f"{request.endpoint} ran {count} queries (budget {budget})"
+            )
+        return response
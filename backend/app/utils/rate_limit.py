@@ -0,0 +1,173 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from flask import current_app, jsonify, make_response, request
+from app.utils.metrics import metrics
+
+RATE_LIMITED = metrics.counter('rate_limited_total', "Requests rejected by the rate limiter", ('scope', 'bucket'))
+
+# KEYS[1] bucket; ARGV capacity, refill per second, now (s), cost.
+# Returns {allowed, seconds until a token is available}.
+TOKEN_BUCKET_SCRIPT = """
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local cost = tonumber(ARGV[4])
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+local wait = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+else
+    wait = (cost - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(wait)}
+"""
+
+
+def parse_rate(value):
+    """
+    Parse a limit written as "<requests>/<seconds>", e.g. "10/60".
+    Returns:
+        tuple: (capacity, refill rate per second).
+    """
+    count, seconds = value.split('/')
+    return float(count), float(count) / float(seconds)
+
+
+class InProcessBuckets:
+    """Token buckets local to one process, with LRU eviction of idle keys."""
+
+    def __init__(self, maxsize=100000):
+        self.maxsize = maxsize
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.maxsize:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (cost - tokens) / rate
+
+
+class RedisBuckets:
+    """Token buckets shared by every worker process, updated atomically by a Lua script."""
+
+    def __init__(self, url):
+        import redis  # Optional dependency, only needed when RATE_LIMIT_BACKEND=redis
+        self._client = redis.Redis.from_url(url)
+        self._take = self._client.register_script(TOKEN_BUCKET_SCRIPT)
+
+    def take(self, key, capacity, rate, cost=1):
+        allowed, wait = self._take(keys=[f"ratelimit:{key}"], args=[capacity, rate, time.time(), cost])
+        return bool(int(allowed)), float(wait)
+
+
+class RateLimiter:
+    """
+    Token-bucket limits for expensive endpoints.
+    Each request takes one token from every bucket it maps to (for example
+    its client IP, and the IP plus the username it tries), so guessing one
+    account's password is throttled as well as many accounts from one
+    address. Rejected requests get 429 with a Retry-After header. If the
+    shared backend is unreachable, requests are let through rather than
+    locking everyone out.
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend or InProcessBuckets()
+        self.enabled = True
+
+    def init_app(self, app):
+        if app.config.get('RATE_LIMIT_BACKEND') == 'redis':
+            self.backend = RedisBuckets(app.config['RATE_LIMIT_REDIS_URL'])
+        else:
+            self.backend = InProcessBuckets()
+        self.enabled = app.config.get('RATE_LIMIT_ENABLED', True)
+
+    def check(self, scope, buckets):
+        """
+        Take a token from each bucket.
+        Args:
+            scope (str): Endpoint group, e.g. "login".
+            buckets (list): (kind, key, limit) tuples; limit as accepted by parse_rate.
+        Returns:
+            float: Seconds to wait before retrying, or 0 if the request may proceed.
+        """
+        if not self.enabled:
+            return 0.0
+        retry_after = 0.0
+        for kind, key, limit in buckets:
+            capacity, rate = parse_rate(limit)
+            try:
+                allowed, wait = self.backend.take(f"{scope}:{kind}:{key}", capacity, rate)
+            except Exception as e:
+                # Fail open for the buckets left, but keep a rejection already decided
+                print(f"Rate limiter unavailable: {str(e)}")
+                break
+            if not allowed:
+                RATE_LIMITED.inc(scope=scope, bucket=kind)
+                retry_after = max(retry_after, wait)
+        return retry_after
+
+    def refund(self, scope, buckets):
+        """Give back the token `check` took from each bucket, e.g. after a successful login."""
+        if not self.enabled:
+            return
+        for kind, key, limit in buckets:
+            capacity, rate = parse_rate(limit)
+            try:
+                self.backend.take(f"{scope}:{kind}:{key}", capacity, rate, cost=-1)
+            except Exception as e:
+                print(f"Rate limiter unavailable: {str(e)}")
+                return
+
+
+rate_limiter = RateLimiter()
+
+
+def rate_limited(scope, username_field=None):
+    """
+    Apply the AUTH_RATE_LIMIT_IP limit per client address, and the
+    AUTH_RATE_LIMIT_USER limit per client address and value of
+    `username_field` in the JSON body. The username bucket only counts
+    failed attempts (its token is refunded when the view succeeds) and is
+    keyed on the address too, so nobody can lock a user out of their
+    account by failing logins for it from elsewhere.
+    """
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            address = request.remote_addr or "unknown"
+            buckets = [("ip", address, current_app.config['AUTH_RATE_LIMIT_IP'])]
+            failure_buckets = []
+            data = request.get_json(silent=True)
+            if username_field and isinstance(data, dict) and isinstance(data.get(username_field), str):
+                username = data[username_field].strip().lower()
+                failure_buckets.append(("user", f"{address}:{username}", current_app.config['AUTH_RATE_LIMIT_USER']))
+            retry_after = rate_limiter.check(scope, buckets + failure_buckets)
+            if retry_after:
+                response = jsonify({"message": "Too many attempts, please try again later"})
+                response.headers['Retry-After'] = str(max(1, int(retry_after + 0.999)))
+                return response, 429
+            response = make_response(fn(*args, **kwargs))
+            if failure_buckets and response.status_code < 400:
+                rate_limiter.refund(scope, failure_buckets)
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,202 @@
+import heapq
+import itertools
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from app.models import JobLease
+from app.utils.background import BackgroundThreads
+from app.utils.metrics import metrics
+
+JOB_RUNS = metrics.counter('job_runs_total', "Scheduled job runs", ('job', 'outcome'))
+JOB_ROWS = metrics.counter('job_rows_total', "Rows processed by scheduled jobs", ('job',))
+JOB_DURATION = metrics.histogram('job_duration_seconds', "Scheduled job run time", ('job',))
+JOB_LAG = metrics.histogram('job_lag_seconds', "Delay between a job's deadline and its start", ('job',))
+
+IDLE_WAIT = 60.0
+
+
+class Job:
+    """
+    A periodic task.
+    `fn(limit)` processes at most `batch_size` rows in its own short
+    transactions and returns how many it handled. A full batch means a
+    backlog, so the job runs again after `backlog_delay` instead of waiting
+    a whole interval. Jobs without a batch size (`fn()`) always wait. A
+    singleton job runs in one process at a time, whichever holds its lease.
+    """
+    __slots__ = ('name', 'fn', 'interval', 'batch_size', 'backlog_delay', 'singleton', 'token', 'last_run',
+                 'last_rows', 'last_error')
+
+    def __init__(self, name, fn, interval, batch_size=None, backlog_delay=1.0, singleton=False):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.batch_size = batch_size
+        self.backlog_delay = backlog_delay
+        self.singleton = singleton
+        self.token = None  # Sequence number of the job's live heap entry
+        self.last_run = None
+        self.last_rows = None
+        self.last_error = None
+
+    def __call__(self):
+        return self.fn(self.batch_size) if self.batch_size else self.fn()
+
+
+def acquire_lease(name, owner, ttl):
+    """
+    Take or renew the lease on `name` for `ttl`. Only one owner holds an
+    unexpired lease, so a singleton job keeps running in the same process
+    and moves to another one only after its owner stops renewing.
+    Returns:
+        bool: True if `owner` holds the lease.
+    """
+    now = datetime.utcnow()
+    renewed = db.session.execute(
+        update(JobLease)
+        .where(JobLease.name == name, (JobLease.owner == owner) | (JobLease.expires_at < now))
+        .values(owner=owner, expires_at=now + ttl)
+        .execution_options(synchronize_session=False)
+    ).rowcount == 1
+    if not renewed:
+        if db.session.get(JobLease, name) is not None:
+            db.session.rollback()
+            return False
+        db.session.add(JobLease(name=name, owner=owner, expires_at=now + ttl))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another process created the lease first
+        db.session.rollback()
+        return False
+    return True
+
+
+class JobScheduler:
+    """
+    Runs periodic jobs from a heap of deadlines on one background thread.
+    The thread sleeps until the earliest deadline, runs that job inside the
+    app context and pushes its next deadline, so the cost per wake-up is
+    O(log jobs) however many jobs are registered. First runs are spread
+    over each job's interval so that worker processes started together do
+    not run the same jobs in lockstep. Jobs are written to be safe to run
+    concurrently from several processes; expensive whole-network jobs are
+    singletons that run only in the process holding their lease.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._jobs = {}
+        self._heap = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._threads = BackgroundThreads('job-scheduler', self._run)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['job_scheduler'] = self
+
+    def add(self, name, fn, interval, batch_size=None, backlog_delay=1.0, singleton=False):
+        """
+        Register a job, replacing any job of the same name.
+        Args:
+            name (str): Job name, used in metrics and the CLI.
+            fn (callable): Called with a row limit when batch_size is set, else without arguments.
+            interval (float): Seconds between runs.
+            batch_size (int): Rows per run.
+            backlog_delay (float): Seconds before the next run after a full batch.
+            singleton (bool): Run in one process at a time (see `acquire_lease`).
+        """
+        with self._lock:
+            job = self._jobs[name] = Job(name, fn, interval, batch_size, backlog_delay, singleton)
+            self._push(job, time.monotonic() + random.uniform(0, interval))
+        self._wake.set()
+
+    def _push(self, job, deadline):
+        job.token = next(self._sequence)
+        heapq.heappush(self._heap, (deadline, job.token, job.name))
+
+    def ensure_started(self):
+        self._threads.ensure_started()
+
+    def stop(self, timeout=None):
+        self._wake.set()
+        self._threads.stop(timeout)
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def run_job(self, name):
+        """
+        Run one job now in the calling thread, whoever holds its lease; the
+        caller provides the app context.
+        Returns:
+            int: Rows processed.
+        """
+        return self._execute(self._jobs[name], time.monotonic(), manual=True)
+
+    def _owner(self):
+        return f"{socket.gethostname()}:{os.getpid()}"
+
+    def _execute(self, job, deadline, manual=False):
+        started = time.monotonic()
+        if job.singleton and not manual:
+            try:
+                held = acquire_lease(job.name, self._owner(), timedelta(seconds=2 * job.interval))
+            except Exception as e:
+                db.session.rollback()
+                print(f"Job {job.name} lease check failed: {str(e)}")
+                held = False
+            if not held:
+                db.session.remove()
+                JOB_RUNS.inc(job=job.name, outcome='skipped')
+                return 0
+        JOB_LAG.observe(max(0.0, started - deadline), job=job.name)
+        try:
+            rows = job() or 0
+            JOB_RUNS.inc(job=job.name, outcome='success')
+            JOB_ROWS.inc(rows, job=job.name)
+            job.last_error = None
+        except Exception as e:
+            db.session.rollback()
+            JOB_RUNS.inc(job=job.name, outcome='error')
+            print(f"Job {job.name} failed: {str(e)}")
+            rows = 0
+            job.last_error = str(e)
+        finally:
+            db.session.remove()
+            JOB_DURATION.observe(time.monotonic() - started, job=job.name)
+        job.last_run = time.time()
+        job.last_rows = rows
+        return rows
+
+    def _run(self, stop):
+        with self.app.app_context():
+            while not stop.is_set():
+                with self._lock:
+                    due = self._heap and self._heap[0][0] <= time.monotonic()
+                    if due:
+                        deadline, token, name = heapq.heappop(self._heap)
+                    wait = self._heap[0][0] - time.monotonic() if self._heap else IDLE_WAIT
+                if not due:
+                    self._wake.wait(max(0.0, min(wait, IDLE_WAIT)))
+                    self._wake.clear()
+                    continue
+                job = self._jobs.get(name)
+                if job is None or job.token != token:
+                    continue  # Replaced since this deadline was pushed
+                rows = self._execute(job, deadline)
+                delay = job.backlog_delay if job.batch_size and rows >= job.batch_size else job.interval
+                with self._lock:
+                    if self._jobs.get(name) is job:
+                        self._push(job, time.monotonic() + delay)
+
+
+job_scheduler = JobScheduler()
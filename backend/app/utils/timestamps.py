@@ -0,0 +1,25 @@
+from datetime import datetime, timezone
+
+
+def naive_utc(value):
+    """
+    Convert a timezone-aware datetime to naive UTC, the form every stored
+    timestamp uses; naive datetimes are taken to be UTC already.
+    """
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def parse_timestamp(value):
+    """
+    Parse an ISO 8601 timestamp from a request as naive UTC, so that values
+    with an offset (`...Z`, `+02:00`) compare with stored timestamps.
+    Raises:
+        ValueError: If the value is not an ISO 8601 timestamp.
+    """
+    if isinstance(value, datetime):
+        return naive_utc(value)
+    if not isinstance(value, str):
+        raise ValueError(f"Invalid datetime: {value!r}")
+    return naive_utc(datetime.fromisoformat(value))
@@ -0,0 +1,147 @@
+"""
+Single-slot booking contention benchmark.
+
+    python benchmarks/booking_contention.py --threads 64 --rounds 50
+
+Each round releases --threads users at once, through a barrier, on POST
+/api/ev/book-slot for the same slot. Each user sends its own Idempotency-Key,
+and the requests go through the Flask test client from one thread per user.
+Exactly one booking per slot must succeed; the script reports any round where
+that did not hold and exits with status 1. It also reports the response
+codes, latency percentiles and booking requests per second under contention.
+Runs against a throwaway SQLite database.
+"""
+import argparse
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BOOKED = (200, 201, 202)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def generate(users, rounds):
+    """One single-connector station, `rounds` future slots and `users` users; returns (tokens, slot ids)."""
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from app import db
+    from app.models import User, ChargingStation, Slot
+    from app.services.connectors import create_connectors
+
+    db.session.execute(insert(User), [{"id": user_id, "username": f"user{user_id}", "password": "-", "role": "user"}
+                                      for user_id in range(1, users + 1)])
+    station = ChargingStation(name="Contended", location="-", capacity=1, status="available")
+    create_connectors(station, 1)
+    db.session.add(station)
+    db.session.flush()
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    db.session.execute(insert(Slot), [
+        {"station_id": station.id, "start_time": start + timedelta(hours=index),
+         "end_time": start + timedelta(hours=index + 1), "status": "available"}
+        for index in range(rounds)
+    ])
+    db.session.commit()
+    slot_ids = [slot_id for (slot_id,) in db.session.query(Slot.id).filter(Slot.station_id == station.id)
+                .order_by(Slot.start_time)]
+    return [create_access_token(identity=str(user_id)) for user_id in range(1, users + 1)], slot_ids
+
+
+def contend(app, tokens, slot_ids):
+    client = app.test_client()
+    barrier = threading.Barrier(len(tokens))
+    statuses = [[None] * len(tokens) for _ in slot_ids]
+    latencies = [[None] * len(tokens) for _ in slot_ids]
+
+    def user(index):
+        headers = {"Authorization": f"Bearer {tokens[index]}"}
+        for round_index, slot_id in enumerate(slot_ids):
+            barrier.wait()
+            began = time.perf_counter()
+            response = client.post('/api/ev/book-slot', headers={**headers, "Idempotency-Key": f"r{round_index}-u{index}"},
+                                   json={"slot_id": slot_id, "payment_details": {"amount": 2.0, "card": "bench"}})
+            latencies[round_index][index] = time.perf_counter() - began
+            statuses[round_index][index] = response.status_code
+            response.close()
+
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(len(tokens))]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return statuses, latencies, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Race concurrent bookings for one slot")
+    parser.add_argument('--threads', type=int, default=32, help="Concurrent users per slot")
+    parser.add_argument('--rounds', type=int, default=20, help="Slots raced, one after another")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+    # A directory of its own, so the -wal and -shm files are removed with the database
+    directory = tempfile.TemporaryDirectory()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory.name, 'contention.db')}"
+    from app import create_app, db
+    from app.utils.notifications import notification_dispatcher, NotificationBackend
+
+    class DiscardBackend(NotificationBackend):
+        def send_batch(self, batch):
+            return 0
+
+    # Keep console notification output out of the measurement
+    notification_dispatcher.backend = DiscardBackend()
+
+    # The fake gateway logs every charge to stdout, which carries the result
+    with contextlib.redirect_stdout(open(os.devnull, 'w')):
+        try:
+            app = create_app()
+            with app.app_context():
+                db.create_all()
+                tokens, slot_ids = generate(args.threads, args.rounds)
+                db.session.remove()
+            statuses, latencies, elapsed = contend(app, tokens, slot_ids)
+            with app.app_context():
+                db.engine.dispose()
+        finally:
+            directory.cleanup()
+
+    booked = [sum(status in BOOKED for status in round_statuses) for round_statuses in statuses]
+    all_latencies = [latency for round_latencies in latencies for latency in round_latencies]
+    results = {
+        "threads": args.threads,
+        "rounds": args.rounds,
+        "requests": len(all_latencies),
+        "bookings": sum(booked),
+        "double_booked_rounds": [index for index, count in enumerate(booked) if count > 1],
+        "unbooked_rounds": [index for index, count in enumerate(booked) if count == 0],
+        "status_codes": dict(sorted(Counter(str(status) for row in statuses for status in row).items())),
+        "p50_ms": round(percentile(all_latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(all_latencies, 0.99) * 1000, 3),
+        "requests_per_second": round(len(all_latencies) / elapsed, 1),
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if results["double_booked_rounds"] or results["unbooked_rounds"]:
+        sys.exit("Expected exactly one booking per slot")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,159 @@
+"""
+Bulk slot insert benchmark.
+
+    python benchmarks/bulk_slots.py --slots 100000 --stations 50
+
+Adds --slots 15-minute slots spread over --stations stations, in a fresh
+throwaway SQLite database per mode, through the Flask test client:
+
+- single: one POST /api/provider/manage-slots per slot, as providers had to
+  before the bulk endpoint (only --single-sample slots, since at a commit per
+  call the full run takes far longer; slots per second is what compares);
+- operations: one POST /api/provider/manage-slots/bulk carrying every slot
+  as an Add operation;
+- recurrence: one POST /api/provider/manage-slots/bulk per station, each with
+  a recurrence rule that expands to that station's share of the slots.
+
+Reports slots per second and request time per mode, and checks that every
+slot was stored.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("single", "operations", "recurrence")
+SLOT_MINUTES = 15
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES - 1  # The recurrence day ends at 23:59
+
+
+def generate(stations):
+    """`stations` single-connector stations; returns their ids."""
+    from app import db
+    from app.models import ChargingStation
+    from app.services.connectors import create_connectors
+
+    created = []
+    for index in range(stations):
+        station = ChargingStation(name=f"Bulk {index}", location="-", capacity=1, status="available")
+        create_connectors(station, 1)
+        db.session.add(station)
+        created.append(station)
+    db.session.commit()
+    return [station.id for station in created]
+
+
+def shares(total, parts):
+    return [total // parts + (index < total % parts) for index in range(parts)]
+
+
+def slot_operations(station_ids, counts, first_day):
+    """Add operations for `counts[i]` back-to-back slots on station i, laid out as the recurrence rule would."""
+    operations = []
+    for station_id, count in zip(station_ids, counts):
+        for index in range(count):
+            day, slot = divmod(index, SLOTS_PER_DAY)
+            start = datetime.combine(first_day + timedelta(days=day), datetime.min.time()) \
+                + timedelta(minutes=SLOT_MINUTES * slot)
+            operations.append({"action": "Add", "slot_details": {
+                "station_id": station_id,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(minutes=SLOT_MINUTES)).isoformat(),
+            }})
+    return operations
+
+
+def measure(mode, args):
+    from app import create_app, db
+    from app.models import Slot
+    from app.services.payment_worker import payment_worker
+
+    # Nothing here takes payments; an idle dispatcher would outlive this mode's database.
+    # Patched before create_app() registers it as a request hook.
+    payment_worker.ensure_started = lambda: None
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        station_ids = generate(args.stations)
+        db.session.remove()
+
+    total = min(args.slots, args.single_sample) if mode == 'single' else args.slots
+    counts = shares(total, len(station_ids))
+    first_day = datetime.utcnow().date() + timedelta(days=1)
+    if mode == 'recurrence':
+        requests = [('/api/provider/manage-slots/bulk', {"recurrence": {
+            "station_id": station_id, "start_date": first_day.isoformat(),
+            "days": -(-count // SLOTS_PER_DAY), "every_minutes": SLOT_MINUTES,
+        }}) for station_id, count in zip(station_ids, counts) if count]
+        # Whole days are expanded, so the last day of each station may add a few more slots
+        expected = sum(-(-count // SLOTS_PER_DAY) * SLOTS_PER_DAY for count in counts)
+    else:
+        operations = slot_operations(station_ids, counts, first_day)
+        if mode == 'single':
+            requests = [('/api/provider/manage-slots', operation) for operation in operations]
+        else:
+            requests = [('/api/provider/manage-slots/bulk', {"operations": operations})]
+        expected = len(operations)
+
+    client = app.test_client()
+    latencies = []
+    started = time.perf_counter()
+    for path, payload in requests:
+        began = time.perf_counter()
+        response = client.post(path, json=payload)
+        latencies.append(time.perf_counter() - began)
+        assert response.status_code == 200, response.get_json()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        stored = db.session.query(Slot).count()
+        db.session.remove()
+        db.engine.dispose()
+    assert stored == expected, f"{mode}: stored {stored} slots, expected {expected}"
+    return {
+        "slots": stored,
+        "requests": len(requests),
+        "seconds": round(elapsed, 2),
+        "slots_per_second": round(stored / elapsed, 1),
+        "max_request_seconds": round(max(latencies), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure bulk slot insert throughput")
+    parser.add_argument('--slots', type=int, default=100000, help="Slots added per mode")
+    parser.add_argument('--stations', type=int, default=50, help="Stations the slots are spread over")
+    parser.add_argument('--single-sample', type=int, default=2000, help="single: slots added one call at a time")
+    parser.add_argument('--modes', default=",".join(MODES), help="Comma-separated subset of: " + ", ".join(MODES))
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+    modes = args.modes.split(',')
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error("Unknown modes: " + ", ".join(unknown))
+    results = {"stations": args.stations, "slot_minutes": SLOT_MINUTES, "modes": {}}
+    for mode in modes:
+        # A directory of its own per mode, so the -wal and -shm files go with the database
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'slots.db')}"
+            results["modes"][mode] = stats = measure(mode, args)
+        print(f"{mode}: {stats['slots']} slots in {stats['seconds']} s, {stats['slots_per_second']} slots/s",
+              file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,200 @@
+"""
+Synthetic network generator for benchmarks.
+
+    python benchmarks/datagen.py --db /tmp/bench.db --scale medium
+    python benchmarks/datagen.py --db /tmp/bench.db --stations 10000 --slots-per-station 1000
+
+Fills a SQLite database with users, sites, stations with connectors,
+30-minute slots spread around the current time, bookings and completed
+sessions for a share of the slots, open sessions for telemetry and load
+scheduling, and time-of-use pricing rules. Prices and analytics rollups are
+computed at the end, as they would be in a running deployment. Data is
+derived from --seed only, so two runs at the same scale produce the same
+network (apart from timestamps, which follow the clock).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SCALES = {
+    "small": {"stations": 200, "slots_per_station": 96, "users": 1000, "open_sessions": 100},
+    "medium": {"stations": 2000, "slots_per_station": 240, "users": 10000, "open_sessions": 1000},
+    # 10k stations x 1k slots, the availability index target
+    "large": {"stations": 10000, "slots_per_station": 1000, "users": 100000, "open_sessions": 10000},
+}
+SLOT_MINUTES = 30
+STATIONS_PER_SITE = 10
+BOOKED_SHARE_PAST = 0.6
+BOOKED_SHARE_FUTURE = 0.3
+INSERT_CHUNK = 10000
+CITY_CENTRE = (52.52, 13.40)
+CITY_SPREAD_DEGREES = 0.5
+
+
+def _insert(model, rows):
+    from sqlalchemy import insert
+    from app import db
+
+    for start in range(0, len(rows), INSERT_CHUNK):
+        db.session.execute(insert(model), rows[start:start + INSERT_CHUNK])
+
+
+def generate(stations, slots_per_station, users, open_sessions, seed=7, now=None):
+    """
+    Write a synthetic network into the current app's database.
+    Must run inside an app context against an empty schema. Slots are
+    inserted and committed station by station, so memory stays bounded by
+    one station's slots.
+    Returns:
+        dict: Row counts and generation time.
+    """
+    from app import db
+    from app.models import (User, Site, ChargingStation, Connector, Slot, Booking, ChargingSession,
+                            PricingRule)
+    from app.services.connectors import AVAILABLE, CHARGING
+    from app.services.pricing_service import refresh_prices
+    from app.services import analytics
+    from app.utils.geo import geohash_encode
+
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    now = now or datetime.utcnow()
+    first_slot = now.replace(minute=0, second=0, microsecond=0) - timedelta(minutes=SLOT_MINUTES * (slots_per_station // 2))
+
+    _insert(User, [{"id": user_id, "username": f"bench{user_id}", "password": "-", "role": "user"}
+                   for user_id in range(1, users + 1)])
+    site_count = max(1, stations // STATIONS_PER_SITE)
+    _insert(Site, [{"id": site_id, "name": f"Site {site_id}", "grid_limit_kw": rng.choice((150.0, 300.0, 600.0))}
+                   for site_id in range(1, site_count + 1)])
+
+    station_rows, connector_rows = [], []
+    for station_id in range(1, stations + 1):
+        latitude = CITY_CENTRE[0] + rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES)
+        longitude = CITY_CENTRE[1] + rng.uniform(-CITY_SPREAD_DEGREES, CITY_SPREAD_DEGREES)
+        capacity = rng.choice((1, 2, 2, 4, 4, 6))
+        station_rows.append({
+            "id": station_id, "name": f"Station {station_id}", "location": f"Zone {station_id % 50}",
+            "capacity": capacity, "status": "available", "pricing": rng.choice(("low", "medium", "high")),
+            "speed": rng.choice(("slow", "fast", "rapid")), "latitude": latitude, "longitude": longitude,
+            "geohash": geohash_encode(latitude, longitude), "site_id": 1 + (station_id - 1) // STATIONS_PER_SITE,
+            "max_power_kw": capacity * rng.choice((11.0, 22.0, 50.0)),
+        })
+        connector_rows.extend({"station_id": station_id, "position": position, "state": AVAILABLE,
+                               "updated_at": now} for position in range(1, capacity + 1))
+    _insert(ChargingStation, station_rows)
+    _insert(Connector, connector_rows)
+    db.session.commit()
+
+    db.session.add_all([
+        PricingRule(station_id=None, rate_per_hour=4.0, priority=0),
+        PricingRule(station_id=None, weekdays=0b0011111, start_minute=17 * 60, end_minute=21 * 60,
+                    multiplier=1.5, priority=1),
+        PricingRule(station_id=None, min_utilization=0.8, multiplier=1.2, priority=2),
+    ])
+    db.session.commit()
+
+    slot_count = booking_count = session_count = 0
+    slot_id = booking_id = session_id = 0
+    for station in station_rows:
+        slots, bookings, sessions = [], [], []
+        for position in range(slots_per_station):
+            slot_id += 1
+            start = first_slot + timedelta(minutes=SLOT_MINUTES * position)
+            end = start + timedelta(minutes=SLOT_MINUTES)
+            past = end <= now
+            booked = rng.random() < (BOOKED_SHARE_PAST if past else BOOKED_SHARE_FUTURE)
+            slots.append({"id": slot_id, "station_id": station["id"], "start_time": start, "end_time": end,
+                          "status": "occupied" if booked else "available"})
+            if not booked:
+                continue
+            user_id = rng.randint(1, users)
+            booking_id += 1
+            bookings.append({"id": booking_id, "user_id": user_id, "slot_id": slot_id, "amount": 2.0,
+                             "booking_time": start - timedelta(hours=rng.randint(1, 72)), "status": "confirmed"})
+            if past:
+                session_id += 1
+                sessions.append({"id": session_id, "user_id": user_id, "station_id": station["id"],
+                                 "start_time": start, "end_time": end, "status": "completed",
+                                 "energy_kwh": round(rng.uniform(2, 25), 2)})
+        _insert(Slot, slots)
+        _insert(Booking, bookings)
+        _insert(ChargingSession, sessions)
+        slot_count += len(slots)
+        booking_count += len(bookings)
+        session_count += len(sessions)
+        db.session.commit()
+
+    # In-progress sessions on the first connector of the first stations
+    charging = station_rows[:open_sessions]
+    first_connectors = dict(db.session.query(Connector.station_id, Connector.id).filter(
+        Connector.position == 1, Connector.station_id <= open_sessions))
+    open_rows = [{"id": session_id + offset, "user_id": rng.randint(1, users), "station_id": station["id"],
+                  "connector_id": first_connectors[station["id"]],
+                  "start_time": now - timedelta(minutes=rng.randint(1, 120)), "status": "in_progress",
+                  "max_power_kw": rng.choice((None, 7.4, 11.0, 50.0))}
+                 for offset, station in enumerate(charging, start=1)]
+    _insert(ChargingSession, open_rows)
+    for chunk_start in range(0, len(charging), 500):
+        station_ids = [station["id"] for station in charging[chunk_start:chunk_start + 500]]
+        db.session.query(Connector).filter(Connector.station_id.in_(station_ids), Connector.position == 1).update(
+            {"state": CHARGING, "updated_at": now}, synchronize_session=False)
+        db.session.query(ChargingStation).filter(ChargingStation.id.in_(station_ids),
+                                                 ChargingStation.capacity == 1).update(
+            {"status": "occupied"}, synchronize_session=False)
+    db.session.commit()
+
+    priced = refresh_prices()
+    db.session.commit()
+    analytics.refresh_rollup(full=True)
+    return {
+        "stations": stations, "connectors": len(connector_rows), "users": users, "slots": slot_count,
+        "bookings": booking_count, "sessions": session_count + len(open_rows), "open_sessions": len(open_rows),
+        "priced_slots": priced, "seconds": round(time.perf_counter() - started, 1),
+    }
+
+
+def scale_options(args):
+    """Preset for --scale, overridden by any explicit size flags."""
+    options = dict(SCALES[args.scale])
+    for name in options:
+        value = getattr(args, name, None)
+        if value is not None:
+            options[name] = value
+    return options
+
+
+def add_scale_arguments(parser):
+    parser.add_argument('--scale', choices=sorted(SCALES), default='small')
+    parser.add_argument('--stations', type=int)
+    parser.add_argument('--slots-per-station', type=int)
+    parser.add_argument('--users', type=int)
+    parser.add_argument('--open-sessions', type=int)
+    parser.add_argument('--seed', type=int, default=7)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic charging network")
+    parser.add_argument('--db', required=True, help="SQLite file to create")
+    add_scale_arguments(parser)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        parser.error(f"{args.db} already exists")
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.abspath(args.db)}"
+    os.environ.setdefault('METRICS_ENABLED', '0')
+
+    from app import create_app, db
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        print(json.dumps(generate(seed=args.seed, **scale_options(args)), indent=2))
+
+
+if __name__ == '__main__':
+    main()
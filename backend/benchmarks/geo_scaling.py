@@ -0,0 +1,149 @@
+"""
+Nearby-station search scaling benchmark.
+
+    python benchmarks/geo_scaling.py
+    python benchmarks/geo_scaling.py --sizes 1000,10000,100000 --queries 500 --output geo.json
+
+For each network size, fills a throwaway SQLite database with that many
+stations at a constant density (--density stations per square kilometre,
+so a bigger network covers a bigger area, as a growing network does) and
+sends GET /api/ev/find-providers for random points through the Flask test
+client. Reports latency percentiles and the mean number of stations
+returned per size; with the geohash index, latency should stay flat from
+1k to 1M stations because each query only reads the cells around its point.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlencode
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+CENTRE = (50.0, 10.0)
+KM_PER_DEGREE = 111.32
+INSERT_CHUNK = 50000
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def area(size, density):
+    """(min latitude, max latitude, min longitude, max longitude) of a square holding `size` stations."""
+    half_km = math.sqrt(size / density) / 2
+    half_lat = half_km / KM_PER_DEGREE
+    half_lon = half_km / (KM_PER_DEGREE * math.cos(math.radians(CENTRE[0])))
+    return CENTRE[0] - half_lat, CENTRE[0] + half_lat, CENTRE[1] - half_lon, CENTRE[1] + half_lon
+
+
+def generate(size, density, rng):
+    """Insert `size` stations spread uniformly over the square for `size`, with their geohashes."""
+    from sqlalchemy import insert
+    from app import db
+    from app.models import ChargingStation
+    from app.utils.geo import geohash_encode
+
+    min_lat, max_lat, min_lon, max_lon = area(size, density)
+    for first in range(1, size + 1, INSERT_CHUNK):
+        rows = []
+        for station_id in range(first, min(first + INSERT_CHUNK, size + 1)):
+            latitude, longitude = rng.uniform(min_lat, max_lat), rng.uniform(min_lon, max_lon)
+            rows.append({"id": station_id, "name": f"Station {station_id}", "location": "-", "capacity": 2,
+                         "status": "available", "latitude": latitude, "longitude": longitude,
+                         "geohash": geohash_encode(latitude, longitude)})
+        # Core insert: the ORM hook that would compute each geohash is bypassed, so it is set above
+        db.session.execute(insert(ChargingStation), rows)
+        db.session.commit()
+
+
+def measure(size, args, rng):
+    from flask_jwt_extended import create_access_token
+    from app import create_app, db
+    from app.services.payment_worker import payment_worker
+
+    # Searches take no payments; an idle dispatcher would outlive this size's database.
+    # Patched before create_app() registers it as a request hook.
+    payment_worker.ensure_started = lambda: None
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        generate(size, args.density, rng)
+        generate_seconds = time.perf_counter() - started
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+        db.session.remove()
+
+    # Query points keep the search circle inside the network
+    min_lat, max_lat, min_lon, max_lon = area(size, args.density)
+    margin_lat = min(args.radius / KM_PER_DEGREE, (max_lat - min_lat) / 4)
+    margin_lon = min(args.radius / (KM_PER_DEGREE * math.cos(math.radians(CENTRE[0]))), (max_lon - min_lon) / 4)
+    client = app.test_client()
+
+    def search():
+        query = {"latitude": rng.uniform(min_lat + margin_lat, max_lat - margin_lat),
+                 "longitude": rng.uniform(min_lon + margin_lon, max_lon - margin_lon),
+                 "radius": args.radius, "limit": args.limit}
+        response = client.get('/api/ev/find-providers?' + urlencode(query), headers=headers)
+        assert response.status_code == 200, response.get_json()
+        return len(response.get_json()["providers"])
+
+    for _ in range(args.warmup):
+        search()
+    latencies, found = [], 0
+    for _ in range(args.queries):
+        began = time.perf_counter()
+        found += search()
+        latencies.append(time.perf_counter() - began)
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+    return {
+        "stations": size,
+        "generate_seconds": round(generate_seconds, 1),
+        "queries": args.queries,
+        "mean_results": round(found / args.queries, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure find-providers latency as the network grows")
+    parser.add_argument('--sizes', default="1000,10000,100000,1000000", help="Comma-separated station counts")
+    parser.add_argument('--density', type=float, default=1.0, help="Stations per square kilometre")
+    parser.add_argument('--radius', type=float, default=5.0, help="Search radius in kilometres")
+    parser.add_argument('--limit', type=int, default=20)
+    parser.add_argument('--queries', type=int, default=1000, help="Measured queries per size")
+    parser.add_argument('--warmup', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+
+    rng = random.Random(args.seed)
+    results = {"density_per_km2": args.density, "radius_km": args.radius, "limit": args.limit, "sizes": []}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        # A directory of its own per size, so the -wal and -shm files go with the database
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'geo.db')}"
+            stats = measure(size, args, rng)
+        results["sizes"].append(stats)
+        print(f"{size} stations: p50 {stats['p50_ms']} ms, p99 {stats['p99_ms']} ms, "
+              f"{stats['mean_results']} results per query", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
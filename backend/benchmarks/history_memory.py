@@ -0,0 +1,168 @@
+"""
+Booking history memory benchmark.
+
+    python benchmarks/history_memory.py --bookings 1000000
+    python benchmarks/history_memory.py --bookings 200000 --modes pages,ndjson --output history.json
+
+Gives one user `bookings` bookings in a throwaway SQLite database, then
+reads the whole history back once per mode, each in a fresh process so the
+peak RSS of one mode does not hide another's:
+
+- all: the pre-pagination behaviour, one list of every booking through jsonify;
+- pages: GET /api/ev/history page by page, following next_cursor;
+- ndjson, json: one GET /api/ev/history?stream=... response, consumed chunk by chunk.
+
+Reports rows read, seconds, peak RSS and its growth over the process after
+app start-up. Streaming and paging should stay flat as --bookings grows.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("all", "pages", "ndjson", "json")
+PAGE_SIZE = 1000
+SLOTS = 1000
+INSERT_CHUNK = 50000
+
+
+def peak_rss_mb():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def generate(bookings):
+    """Write one user, one station, SLOTS slots and `bookings` bookings into the current app's database."""
+    from sqlalchemy import insert
+    from app import db
+    from app.models import User, ChargingStation, Slot, Booking
+
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) - timedelta(days=60)
+    db.session.execute(insert(User), [{"id": 1, "username": "history", "password": "-", "role": "user"}])
+    db.session.execute(insert(ChargingStation), [{"id": 1, "name": "Station 1", "location": "-", "capacity": 1,
+                                                  "status": "available"}])
+    db.session.execute(insert(Slot), [
+        {"id": slot_id, "station_id": 1, "start_time": start + timedelta(hours=slot_id),
+         "end_time": start + timedelta(hours=slot_id + 1), "status": "occupied"}
+        for slot_id in range(1, SLOTS + 1)
+    ])
+    for first in range(1, bookings + 1, INSERT_CHUNK):
+        db.session.execute(insert(Booking), [
+            {"id": booking_id, "user_id": 1, "slot_id": 1 + booking_id % SLOTS, "amount": 2.0,
+             "booking_time": start + timedelta(minutes=booking_id), "status": "confirmed"}
+            for booking_id in range(first, min(first + INSERT_CHUNK, bookings + 1))
+        ])
+        db.session.commit()
+
+
+def read_history(mode):
+    """Read the user's whole history in `mode` and return (rows, seconds, peak RSS in MB, growth in MB)."""
+    from flask import jsonify
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.queries import history_query
+    from app.routes.ev_owner import serialize_booking
+
+    app = create_app()
+    with app.app_context():
+        headers = {"Authorization": f"Bearer {create_access_token(identity='1')}"}
+    client = app.test_client()
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    rows = 0
+    if mode == 'all':
+        with app.app_context():
+            response = jsonify({"history": [serialize_booking(booking) for booking in history_query(1).all()]})
+            rows = len(response.get_json()["history"])
+    elif mode == 'pages':
+        cursor = None
+        while True:
+            query = f"limit={PAGE_SIZE}" + (f"&after={cursor}" if cursor else "")
+            body = client.get(f'/api/ev/history?{query}', headers=headers).get_json()
+            rows += len(body["history"])
+            cursor = body["next_cursor"]
+            if not cursor:
+                break
+    else:
+        response = client.get(f'/api/ev/history?stream={mode}', headers=headers, buffered=False)
+        tail = b''
+        for chunk in response.response:
+            chunk = chunk.encode('utf-8') if isinstance(chunk, str) else chunk
+            rows += chunk.count(b'"booking_id"')
+            tail = chunk
+        response.close()
+        assert mode == 'ndjson' or tail.endswith(b']}')
+
+    peak = peak_rss_mb()
+    return rows, time.perf_counter() - started, peak, peak - baseline
+
+
+def run_child(database, mode):
+    output = subprocess.run([sys.executable, os.path.abspath(__file__), '--db', database, '--child', mode],
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure peak memory of reading a large booking history")
+    parser.add_argument('--bookings', type=int, default=1000000)
+    parser.add_argument('--modes', default=",".join(MODES), help="Comma-separated subset of: " + ", ".join(MODES))
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--db', help=argparse.SUPPRESS)
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+
+    if args.child:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{args.db}"
+        rows, seconds, peak, growth = read_history(args.child)
+        print(json.dumps({"rows": rows, "seconds": round(seconds, 2), "peak_rss_mb": round(peak, 1),
+                          "peak_rss_growth_mb": round(growth, 1)}))
+        return
+
+    modes = args.modes.split(',')
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error("Unknown modes: " + ", ".join(unknown))
+
+    directory = tempfile.TemporaryDirectory()
+    database = os.path.join(directory.name, 'history.db')
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{database}"
+    from app import create_app, db
+
+    try:
+        app = create_app()
+        started = time.perf_counter()
+        with app.app_context():
+            db.create_all()
+            generate(args.bookings)
+            db.session.remove()
+            db.engine.dispose()
+        results = {"bookings": args.bookings, "generate_seconds": round(time.perf_counter() - started, 1),
+                   "modes": {}}
+        for mode in modes:
+            results["modes"][mode] = stats = run_child(database, mode)
+            print(f"{mode}: {stats['rows']} rows in {stats['seconds']} s, "
+                  f"peak RSS {stats['peak_rss_mb']} MB (+{stats['peak_rss_growth_mb']} MB)", file=sys.stderr)
+    finally:
+        # The database lives in its own directory, so the -wal and -shm files go with it
+        directory.cleanup()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+"""
+Payment gateway latency benchmark.
+
+    python benchmarks/payment_latency.py --latency 0.2 --workers 4 --concurrency 32 --requests 400
+
+Books --requests slots through POST /api/ev/book-slot against the local fake
+gateway with --latency seconds per charge, in two modes, each in a fresh
+process with its own throwaway SQLite database:
+
+- sync: the pre-outbox behaviour, where the request charges the gateway
+  before it returns (emulated by settling the payment in an after_request
+  hook, with the background dispatcher off);
+- async: the payment outbox, where the request returns 202 and the payment
+  worker charges in the background.
+
+The app sits behind --workers request slots, like a gunicorn deployment
+with that many sync workers, and --concurrency client threads send the
+requests through the Flask test client. Reports booking requests per
+second, latency percentiles and, for async, how long the worker took to
+settle every payment.
+"""
+import argparse
+import contextlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+MODES = ("sync", "async")
+SETTLE_TIMEOUT = 300
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+class WorkerSlots:
+    """WSGI middleware serving at most `workers` requests at a time, as a pool of sync workers would."""
+
+    def __init__(self, wsgi_app, workers):
+        self.wsgi_app = wsgi_app
+        self.slots = threading.BoundedSemaphore(workers)
+
+    def __call__(self, environ, start_response):
+        with self.slots:
+            return list(self.wsgi_app(environ, start_response))
+
+
+def generate(users, slots):
+    """`users` users and `slots` future slots on one station; returns (tokens, slot ids)."""
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import insert
+    from app import db
+    from app.models import User, ChargingStation, Slot
+    from app.services.connectors import create_connectors
+
+    db.session.execute(insert(User), [{"id": user_id, "username": f"user{user_id}", "password": "-", "role": "user"}
+                                      for user_id in range(1, users + 1)])
+    station = ChargingStation(name="Payments", location="-", capacity=1, status="available")
+    create_connectors(station, 1)
+    db.session.add(station)
+    db.session.flush()
+    start = datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(days=1)
+    db.session.execute(insert(Slot), [
+        {"station_id": station.id, "start_time": start + timedelta(minutes=30 * index),
+         "end_time": start + timedelta(minutes=30 * (index + 1)), "status": "available"}
+        for index in range(slots)
+    ])
+    db.session.commit()
+    slot_ids = [slot_id for (slot_id,) in db.session.query(Slot.id).filter(Slot.station_id == station.id)
+                .order_by(Slot.start_time)]
+    return [create_access_token(identity=str(user_id)) for user_id in range(1, users + 1)], slot_ids
+
+
+def charge_in_request(app):
+    """Settle each new booking's payment before its response is sent, as the synchronous flow did."""
+    from flask import request
+    from sqlalchemy import update
+    from app import db
+    from app.models import Payment
+    from app.services.payment_worker import payment_worker
+
+    @app.after_request
+    def settle(response):
+        if request.path == '/api/ev/book-slot' and response.status_code == 202:
+            booking_id = response.get_json()["booking_id"]
+            payment_id = db.session.query(Payment.id).filter(Payment.booking_id == booking_id).scalar()
+            db.session.execute(update(Payment).where(Payment.id == payment_id).values(
+                status='processing', next_attempt_at=datetime.utcnow() + payment_worker.lease))
+            db.session.commit()
+            payment_worker.process(payment_id)
+        return response
+
+
+def unsettled_payments():
+    from app import db
+    from app.models import Payment
+    return db.session.query(Payment.id).filter(Payment.status.in_(('pending', 'processing'))).count()
+
+
+def measure(mode, args):
+    from app import create_app, db
+    from app.services.payment_worker import payment_worker
+
+    if mode == 'sync':
+        # No background dispatcher; patched before create_app() registers it as a request hook
+        payment_worker.ensure_started = lambda: None
+        payment_worker.notify = lambda: None
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        tokens, slot_ids = generate(args.concurrency, args.requests + args.concurrency)
+        db.session.remove()
+    if mode == 'sync':
+        charge_in_request(app)
+    app.wsgi_app = WorkerSlots(app.wsgi_app, args.workers)
+    client = app.test_client()
+    free_slots = deque(slot_ids)
+    lock = threading.Lock()
+
+    def book(token):
+        with lock:
+            slot_id = free_slots.popleft()
+        response = client.post('/api/ev/book-slot', headers={"Authorization": f"Bearer {token}"},
+                               json={"slot_id": slot_id, "payment_details": {"amount": 2.0, "card": "bench"}})
+        response.close()
+        return response.status_code
+
+    shares = [args.requests // args.concurrency + (index < args.requests % args.concurrency)
+              for index in range(args.concurrency)]
+    latencies, errors = [], []
+
+    def user(index):
+        book(tokens[index])  # Warm-up, unmeasured
+        barrier.wait()
+        for _ in range(shares[index]):
+            began = time.perf_counter()
+            status = book(tokens[index])
+            with lock:
+                latencies.append(time.perf_counter() - began)
+                errors.append(status != 202)
+
+    barrier = threading.Barrier(args.concurrency + 1)
+    threads = [threading.Thread(target=user, args=(index,)) for index in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        while unsettled_payments() and time.perf_counter() - started < SETTLE_TIMEOUT:
+            time.sleep(0.05)
+        settled = time.perf_counter() - started
+        db.session.remove()
+    return {
+        "requests": len(latencies),
+        "errors": sum(errors),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "requests_per_second": round(len(latencies) / elapsed, 1),
+        "all_settled_seconds": round(settled, 2),
+    }
+
+
+def run_child(mode, args):
+    command = [sys.executable, os.path.abspath(__file__), '--child', mode]
+    for name in ('latency', 'workers', 'payment_workers', 'concurrency', 'requests'):
+        command += [f"--{name.replace('_', '-')}", str(getattr(args, name))]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare booking throughput with a slow payment gateway")
+    parser.add_argument('--latency', type=float, default=0.2, help="Simulated gateway latency in seconds")
+    parser.add_argument('--workers', type=int, default=4, help="Requests the app serves at once")
+    parser.add_argument('--payment-workers', type=int, default=8, help="async: payment worker threads")
+    parser.add_argument('--concurrency', type=int, default=32, help="Client threads")
+    parser.add_argument('--requests', type=int, default=200, help="Measured bookings per mode")
+    parser.add_argument('--modes', default=",".join(MODES), help="Comma-separated subset of: " + ", ".join(MODES))
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+    os.environ.setdefault('RATE_LIMIT_ENABLED', '0')
+
+    if args.child:
+        os.environ['PAYMENT_GATEWAY_LATENCY'] = str(args.latency)
+        os.environ['PAYMENT_WORKERS'] = str(args.payment_workers)
+        # A directory of its own, so the -wal and -shm files are removed with the database
+        with tempfile.TemporaryDirectory() as directory:
+            os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'payments.db')}"
+            # The fake gateway logs every charge to stdout, which carries the result
+            with contextlib.redirect_stdout(open(os.devnull, 'w')):
+                stats = measure(args.child, args)
+        print(json.dumps(stats))
+        return
+
+    modes = args.modes.split(',')
+    unknown = [mode for mode in modes if mode not in MODES]
+    if unknown:
+        parser.error("Unknown modes: " + ", ".join(unknown))
+    results = {"gateway_latency_seconds": args.latency, "workers": args.workers, "concurrency": args.concurrency,
+               "modes": {}}
+    for mode in modes:
+        results["modes"][mode] = stats = run_child(mode, args)
+        print(f"{mode}: {stats['requests_per_second']} req/s, p50 {stats['p50_ms']} ms, "
+              f"all settled after {stats['all_settled_seconds']} s", file=sys.stderr)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
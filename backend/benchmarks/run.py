@@ -0,0 +1,464 @@
+"""
+API benchmark suite.
+
+    python benchmarks/run.py --scale small --output results.json
+    python benchmarks/run.py --scale small --save-baseline benchmarks/baseline.json
+    python benchmarks/run.py --scale small --baseline benchmarks/baseline.json
+    python benchmarks/run.py --mode http --concurrency 16 --scenarios book-slot,filter-stations
+    python benchmarks/run.py --db /tmp/bench.db --mode http --url http://127.0.0.1:8000 --label gthread
+    python benchmarks/run.py --scale small --simulations all --output results.json
+
+Generates a synthetic network (benchmarks/datagen.py) into a throwaway
+SQLite database, or uses --db (a SQLite file or a database URL), and drives
+the real Flask app:
+
+- client mode sends requests one at a time through the Flask test client,
+  measuring the app without socket or server overhead;
+- http mode serves the app with werkzeug's threaded server (or targets
+  --url, e.g. gunicorn on the same database) and sends requests from
+  --concurrency threads over keep-alive connections. Record runs of
+  different serving configurations under their own --label to compare them.
+
+Each scenario reports request count, errors, mean/p50/p95/p99 latency in
+milliseconds and throughput. With --baseline, the chosen --metric of every
+scenario is compared against a stored run and the exit status is 1 when a
+scenario is slower than the baseline by more than --threshold (and by at
+least --min-delta-ms, so sub-millisecond noise does not fail runs), or
+starts returning errors. --simulations also runs the standalone benchmarks
+in this directory (SIMULATIONS) at a routine size and stores their results
+alongside (not compared); run a script directly for its full-size numbers.
+Book-slot and telemetry write to the database, so compare runs made on
+freshly generated data.
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from urllib.parse import urlencode, urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from datagen import add_scale_arguments, scale_options  # noqa: E402
+
+BENCHMARK_USERS = 200
+TELEMETRY_BATCH = 100
+HISTORY_PAGE = 50
+
+# Standalone benchmarks run by --simulations, with arguments sized for a routine run
+SIMULATIONS = {
+    "waitlist": ("waitlist_simulation.py", ['--users', '20000', '--stations', '200', '--freed', '5000']),
+    "history-memory": ("history_memory.py", ['--bookings', '100000']),
+    "geo-scaling": ("geo_scaling.py", ['--sizes', '1000,10000,100000']),
+    "booking-contention": ("booking_contention.py", ['--threads', '32', '--rounds', '20']),
+    "payment-latency": ("payment_latency.py", ['--requests', '100']),
+    "bulk-slots": ("bulk_slots.py", ['--slots', '100000']),
+    "subscriber-memory": ("subscriber_memory.py", ['--counts', '1000,5000']),
+}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+class Context:
+    """Ids, tokens and coordinates the scenarios draw their requests from."""
+
+    def __init__(self, app, seed):
+        from flask_jwt_extended import create_access_token
+        from app import db
+        from app.models import User, Site, ChargingStation, ChargingSession, Slot, SlotPrice
+
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        with app.app_context():
+            user_ids = [user_id for (user_id,) in db.session.query(User.id).order_by(User.id).limit(BENCHMARK_USERS)]
+            self.tokens = [create_access_token(identity=str(user_id)) for user_id in user_ids]
+            self.stations = db.session.query(ChargingStation.id, ChargingStation.latitude,
+                                             ChargingStation.longitude).all()
+            self.site_ids = [site_id for (site_id,) in db.session.query(Site.id)]
+            self.open_sessions = [session_id for (session_id,) in
+                                  db.session.query(ChargingSession.id).filter(ChargingSession.status == 'in_progress')]
+            free = db.session.query(Slot.id, SlotPrice.price).outerjoin(SlotPrice, SlotPrice.slot_id == Slot.id).filter(
+                Slot.status == 'available', Slot.start_time > datetime.utcnow() + timedelta(hours=1)
+            ).all()
+            db.session.remove()
+        self.rng.shuffle(free)
+        self.free_slots = deque(free)
+
+    def headers(self):
+        return {"Authorization": f"Bearer {self.rng.choice(self.tokens)}"}
+
+    def station(self):
+        return self.rng.choice(self.stations)
+
+    def next_free_slot(self):
+        with self.lock:
+            return self.free_slots.popleft() if self.free_slots else None
+
+
+def _window(rng):
+    start = datetime.utcnow() + timedelta(hours=rng.randint(1, 24))
+    return start.replace(microsecond=0), (start + timedelta(hours=rng.choice((1, 2, 4)))).replace(microsecond=0)
+
+
+# Each scenario returns (method, path, json body, headers)
+
+def find_providers(ctx):
+    _, latitude, longitude = ctx.station()
+    query = {"latitude": latitude, "longitude": longitude, "radius": ctx.rng.choice((2, 5, 10))}
+    return 'GET', '/api/ev/find-providers?' + urlencode(query), None, ctx.headers()
+
+
+def filter_stations(ctx):
+    query = {"pricing": ctx.rng.choice(("low", "medium", "high")), "speed": ctx.rng.choice(("slow", "fast", "rapid")),
+             "availability": "available", "limit": 50}
+    return 'GET', '/api/ev/filter-stations?' + urlencode(query), None, ctx.headers()
+
+
+def search_slots(ctx):
+    _, latitude, longitude = ctx.station()
+    window_start, window_end = _window(ctx.rng)
+    query = {"from": window_start.isoformat(), "to": window_end.isoformat(),
+             "latitude": latitude, "longitude": longitude, "radius": 10}
+    return 'GET', '/api/ev/search-slots?' + urlencode(query), None, ctx.headers()
+
+
+def cheapest_slots(ctx):
+    _, latitude, longitude = ctx.station()
+    window_start, window_end = _window(ctx.rng)
+    query = {"latitude": latitude, "longitude": longitude, "radius": 5,
+             "from": window_start.isoformat(), "to": window_end.isoformat()}
+    return 'GET', '/api/ev/cheapest-slots?' + urlencode(query), None, ctx.headers()
+
+
+def book_slot(ctx):
+    slot = ctx.next_free_slot()
+    if slot is None:
+        raise RuntimeError("No free slots left to book; generate more slots or send fewer requests")
+    slot_id, price = slot
+    body = {"slot_id": slot_id, "payment_details": {"amount": price if price is not None else 2.0, "card": "bench"}}
+    return 'POST', '/api/ev/book-slot', body, ctx.headers()
+
+
+def history(ctx):
+    return 'GET', f'/api/ev/history?limit={HISTORY_PAGE}', None, ctx.headers()
+
+
+def slot_availability(ctx):
+    station_id, _, _ = ctx.station()
+    return 'GET', f'/api/provider/slot-availability?station_id={station_id}&limit=100', None, {}
+
+
+def telemetry(ctx):
+    now = time.time()
+    samples = [{"session_id": ctx.rng.choice(ctx.open_sessions), "timestamp": now - offset,
+                "power_kw": round(ctx.rng.uniform(5, 50), 1)} for offset in range(TELEMETRY_BATCH)]
+    return 'POST', '/api/provider/telemetry', {"samples": samples}, {}
+
+
+def load_allocation(ctx):
+    return 'GET', f'/api/provider/load-allocation?site_id={ctx.rng.choice(ctx.site_ids)}&refresh=1', None, {}
+
+
+def analytics_utilization(ctx):
+    return 'GET', '/api/provider/analytics/utilization', None, {}
+
+
+def analytics_heatmap(ctx):
+    station_id, _, _ = ctx.station()
+    return 'GET', f'/api/provider/analytics/heatmap?station_id={station_id}&metric=revenue', None, {}
+
+
+def pricing_refresh(ctx):
+    station_id, _, _ = ctx.station()
+    return 'POST', f'/api/provider/pricing/refresh?station_id={station_id}', None, {}
+
+
+SCENARIOS = {
+    "find-providers": find_providers,
+    "filter-stations": filter_stations,
+    "search-slots": search_slots,
+    "cheapest-slots": cheapest_slots,
+    "book-slot": book_slot,
+    "history": history,
+    "slot-availability": slot_availability,
+    "telemetry": telemetry,
+    "load-allocation": load_allocation,
+    "analytics-utilization": analytics_utilization,
+    "analytics-heatmap": analytics_heatmap,
+    "pricing-refresh": pricing_refresh,
+}
+
+
+def summarize(latencies, errors, elapsed):
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else None,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 3) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+        "requests_per_second": round(len(latencies) / elapsed, 1) if elapsed else None,
+    }
+
+
+def run_client(app, ctx, scenario, requests, warmup):
+    client = app.test_client()
+
+    def send():
+        method, path, body, headers = scenario(ctx)
+        response = client.open(path, method=method, json=body, headers=headers)
+        response.close()
+        return response.status_code
+
+    for _ in range(warmup):
+        send()
+    latencies, errors = [], 0
+    started = time.perf_counter()
+    for _ in range(requests):
+        began = time.perf_counter()
+        status = send()
+        latencies.append(time.perf_counter() - began)
+        errors += status >= 400
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def run_http(base_url, ctx, scenario, requests, warmup, concurrency):
+    target = urlsplit(base_url)
+    prefix = target.path.rstrip('/')
+    local = threading.local()
+
+    def send():
+        connection = getattr(local, 'connection', None)
+        if connection is None:
+            connection = local.connection = http.client.HTTPConnection(target.hostname, target.port, timeout=60)
+        method, path, body, headers = scenario(ctx)
+        payload = json.dumps(body).encode('utf-8') if body is not None else None
+        if payload is not None:
+            headers = {**headers, "Content-Type": "application/json"}
+        try:
+            connection.request(method, prefix + path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (ConnectionError, http.client.HTTPException):
+            connection.close()
+            local.connection = None
+            return 599
+        return response.status
+
+    def worker(count):
+        latencies, errors = [], 0
+        for _ in range(count):
+            began = time.perf_counter()
+            status = send()
+            latencies.append(time.perf_counter() - began)
+            errors += status >= 400
+        return latencies, errors
+
+    shares = [requests // concurrency + (index < requests % concurrency) for index in range(concurrency)]
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(lambda _: [send() for _ in range(max(1, warmup // concurrency))], range(concurrency)))
+        started = time.perf_counter()
+        results = list(pool.map(worker, shares))
+        elapsed = time.perf_counter() - started
+    return summarize([latency for latencies, _ in results for latency in latencies],
+                     sum(errors for _, errors in results), elapsed)
+
+
+def start_server(app):
+    from werkzeug.serving import make_server, WSGIRequestHandler
+
+    class QuietHandler(WSGIRequestHandler):
+        def log_request(self, *args, **kwargs):
+            pass
+
+    server = make_server('127.0.0.1', 0, app, threaded=True, request_handler=QuietHandler)
+    threading.Thread(target=server.serve_forever, name='benchmark-server', daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def run_simulation(name):
+    script, arguments = SIMULATIONS[name]
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, 'results.json')
+        subprocess.run([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), script)]
+                       + arguments + ['--output', output], check=True, stdout=subprocess.DEVNULL)
+        with open(output) as f:
+            return json.load(f)
+
+
+def compare(results, baseline, metric, threshold, min_delta_ms):
+    """
+    Returns:
+        list: Regressions as (scenario, baseline value, current value, reason).
+    """
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        if current["errors"] and not previous["errors"]:
+            regressions.append((name, previous["errors"], current["errors"], "errors"))
+        before, after = previous.get(metric), current.get(metric)
+        if before is None or after is None:
+            continue
+        if after > before * (1 + threshold) and after - before >= min_delta_ms:
+            regressions.append((name, before, after, metric))
+    return regressions
+
+
+def print_table(results, baseline, metric):
+    print(f"{'scenario':<24}{'reqs':>7}{'errs':>6}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'req/s':>10}"
+          + (f"{'base ' + metric:>16}" if baseline else ''))
+    for name, stats in results["scenarios"].items():
+        line = (f"{name:<24}{stats['requests']:>7}{stats['errors']:>6}{stats['p50_ms']:>10}"
+                f"{stats['p95_ms']:>10}{stats['p99_ms']:>10}{stats['requests_per_second']:>10}")
+        if baseline:
+            line += f"{baseline.get('scenarios', {}).get(name, {}).get(metric, '-')!s:>16}"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the backend API")
+    parser.add_argument('--db', help="Existing SQLite file or database URL to benchmark "
+                                     "(default: generate a throwaway SQLite database)")
+    add_scale_arguments(parser)
+    parser.add_argument('--mode', choices=('client', 'http'), default='client')
+    parser.add_argument('--url', help="http mode: benchmark this server instead of an in-process one")
+    parser.add_argument('--concurrency', type=int, default=8, help="http mode: client threads")
+    parser.add_argument('--requests', type=int, default=200, help="Measured requests per scenario")
+    parser.add_argument('--warmup', type=int, default=20, help="Unmeasured requests per scenario")
+    parser.add_argument('--scenarios', help="Comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument('--label', default='default', help="Serving configuration label stored in the results")
+    parser.add_argument('--simulations', help="Also run these standalone benchmarks (comma-separated, or all): "
+                                              + ", ".join(SIMULATIONS))
+    parser.add_argument('--waitlist', action='store_true', help="Same as --simulations waitlist")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--baseline', help="Compare against results stored in this file")
+    parser.add_argument('--save-baseline', help="Store these results as the baseline in this file")
+    parser.add_argument('--metric', choices=('mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'), default='p95_ms')
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed relative slowdown")
+    parser.add_argument('--min-delta-ms', type=float, default=1.0, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    names = args.scenarios.split(',') if args.scenarios else list(SCENARIOS)
+    unknown = [name for name in names if name not in SCENARIOS]
+    if unknown:
+        parser.error("Unknown scenarios: " + ", ".join(unknown))
+    if args.url and not args.db:
+        parser.error("--url needs --db, the database the server at --url uses")
+    simulations = list(SIMULATIONS) if args.simulations == 'all' else (
+        args.simulations.split(',') if args.simulations else [])
+    if args.waitlist and 'waitlist' not in simulations:
+        simulations.append('waitlist')
+    unknown = [name for name in simulations if name not in SIMULATIONS]
+    if unknown:
+        parser.error("Unknown simulations: " + ", ".join(unknown))
+
+    directory = None
+    if args.db and '://' in args.db:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = args.db
+    elif args.db:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.abspath(args.db)}"
+    else:
+        # A directory of its own, so the -wal and -shm files are removed with the database
+        directory = tempfile.TemporaryDirectory()
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory.name, 'bench.db')}"
+    # Maintenance jobs would otherwise run at random points during the timed scenarios
+    os.environ.setdefault('JOBS_ENABLED', '0')
+
+    from app import create_app, db
+    from app.utils.notifications import notification_dispatcher, NotificationBackend
+    from datagen import generate
+
+    class DiscardBackend(NotificationBackend):
+        def send_batch(self, batch):
+            return 0
+
+    # Keep console notification output out of the measurement
+    notification_dispatcher.backend = DiscardBackend()
+
+    app = create_app()
+    data = None
+    if directory:
+        with app.app_context():
+            db.create_all()
+            data = generate(seed=args.seed, **scale_options(args))
+            db.session.remove()
+    ctx = Context(app, args.seed)
+
+    server = None
+    base_url = args.url
+    if args.mode == 'http' and not base_url:
+        server, base_url = start_server(app)
+
+    results = {
+        "meta": {
+            "label": args.label, "mode": args.mode, "concurrency": args.concurrency if args.mode == 'http' else 1,
+            "requests": args.requests, "scale": scale_options(args) if directory else {"db": args.db},
+            "started_at": datetime.utcnow().isoformat(timespec='seconds'), "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version, "machine": platform.machine(), "cpus": os.cpu_count(),
+        },
+        "data": data,
+        "scenarios": {},
+    }
+    try:
+        for name in names:
+            if args.mode == 'client':
+                stats = run_client(app, ctx, SCENARIOS[name], args.requests, args.warmup)
+            else:
+                stats = run_http(base_url, ctx, SCENARIOS[name], args.requests, args.warmup, args.concurrency)
+            results["scenarios"][name] = stats
+            print(f"{name}: p50 {stats['p50_ms']} ms, p95 {stats['p95_ms']} ms, "
+                  f"{stats['requests_per_second']} req/s, {stats['errors']} errors", file=sys.stderr)
+        if simulations:
+            results["simulations"] = {}
+        for name in simulations:
+            results["simulations"][name] = run_simulation(name)
+            print(f"{name}: done", file=sys.stderr)
+    finally:
+        if server:
+            server.shutdown()
+        if directory:
+            with app.app_context():
+                db.engine.dispose()
+            directory.cleanup()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        recorded = baseline.get("meta", {})
+        if (recorded.get("mode"), recorded.get("concurrency")) != (results["meta"]["mode"], results["meta"]["concurrency"]):
+            sys.exit(f"{args.baseline} was recorded in {recorded.get('mode')} mode with concurrency "
+                     f"{recorded.get('concurrency')}; run with the same settings to compare")
+    print_table(results, baseline, args.metric)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, 'w') as f:
+                json.dump(results, f, indent=2)
+
+    if baseline:
+        regressions = compare(results, baseline, args.metric, args.threshold, args.min_delta_ms)
+        for name, before, after, reason in regressions:
+            print(f"REGRESSION {name}: {reason} {before} -> {after}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline} ({args.metric}, threshold {args.threshold:.0%}).")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+"""
+Realtime subscriber memory benchmark (Linux).
+
+    python benchmarks/subscriber_memory.py --counts 1000,5000,10000 --stations 100
+
+Starts the SSE server (app/services/realtime_server.py) in a child process
+and opens idle GET /events subscriptions to it, spread over --stations
+station topics, until each of --counts is reached. At every count the child
+reports its subscriber count and resident memory (VmRSS), so the result
+shows how memory grows with idle subscribers and what each one costs.
+
+Both processes hold one file descriptor per subscriber; the script raises
+its soft RLIMIT_NOFILE to the hard limit, so counts beyond that limit need
+a higher `ulimit -Hn`.
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+SPARE_DESCRIPTORS = 100
+
+
+def raise_descriptor_limit():
+    """Raise the soft open-file limit to the hard limit; returns the new limit."""
+    _, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+    return hard
+
+
+def rss_kb():
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+def serve(port):
+    """Child: run the SSE server and answer each line on stdin with its subscriber count and RSS."""
+    from flask_jwt_extended import create_access_token
+    from app import create_app
+    from app.services.realtime_server import start_realtime_server
+
+    raise_descriptor_limit()
+    app = create_app()
+    server = start_realtime_server(app, host='127.0.0.1', port=port)
+    with app.app_context():
+        print(json.dumps({"token": create_access_token(identity='1')}), flush=True)
+
+    async def count():
+        return server.subscriber_count()
+
+    for _ in sys.stdin:
+        # Read on the event loop, which owns the topic map
+        subscribers = asyncio.run_coroutine_threadsafe(count(), server.loop).result()
+        gc.collect()
+        print(json.dumps({"subscribers": subscribers, "rss_kb": rss_kb()}), flush=True)
+
+
+def subscribe(port, token, station_id):
+    connection = socket.create_connection(('127.0.0.1', port))
+    connection.sendall(f"GET /events?station_id={station_id}&token={token} HTTP/1.1\r\n"
+                       f"Host: 127.0.0.1\r\n\r\n".encode('latin-1'))
+    received = b""
+    while b": subscribed\n\n" not in received:
+        chunk = connection.recv(4096)
+        if not chunk:
+            raise RuntimeError("Subscription refused: " + received.decode('latin-1', 'replace'))
+        received += chunk
+    return connection
+
+
+def measure(counts, args):
+    port = free_port()
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--child', str(port)],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True)
+    connections = []
+    try:
+        token = json.loads(child.stdout.readline())["token"]
+
+        def sample():
+            child.stdin.write("\n")
+            child.stdin.flush()
+            return json.loads(child.stdout.readline())
+
+        baseline = sample()
+        results = {"stations": args.stations, "baseline_rss_mb": round(baseline["rss_kb"] / 1024, 1), "counts": []}
+        for count in counts:
+            started = time.perf_counter()
+            while len(connections) < count:
+                connections.append(subscribe(port, token, len(connections) % args.stations + 1))
+            elapsed = time.perf_counter() - started
+            stats = sample()
+            growth_kb = stats["rss_kb"] - baseline["rss_kb"]
+            results["counts"].append({
+                "subscribers": stats["subscribers"],
+                "rss_mb": round(stats["rss_kb"] / 1024, 1),
+                "bytes_per_subscriber": round(growth_kb * 1024 / stats["subscribers"]),
+                "subscribe_seconds": round(elapsed, 2),
+            })
+            print(f"{stats['subscribers']} subscribers: {results['counts'][-1]['rss_mb']} MB RSS, "
+                  f"{results['counts'][-1]['bytes_per_subscriber']} bytes each", file=sys.stderr)
+        return results
+    finally:
+        for connection in connections:
+            connection.close()
+        child.stdin.close()
+        child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure SSE server memory against idle subscribers")
+    parser.add_argument('--counts', default="1000,5000,10000", help="Comma-separated subscriber counts")
+    parser.add_argument('--stations', type=int, default=100, help="Station topics the subscribers are spread over")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    parser.add_argument('--child', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    os.environ.setdefault('METRICS_ENABLED', '0')
+    os.environ.setdefault('JOBS_ENABLED', '0')
+
+    # A directory of its own, so the -wal and -shm files of anything the app creates go with it
+    with tempfile.TemporaryDirectory() as directory:
+        os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory, 'realtime.db')}"
+        if args.child:
+            serve(args.child)
+            return
+        counts = sorted(int(count) for count in args.counts.split(','))
+        if counts[-1] > raise_descriptor_limit() - SPARE_DESCRIPTORS:
+            parser.error(f"{counts[-1]} subscribers need a higher open-file limit (ulimit -Hn)")
+        results = measure(counts, args)
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""
+Waitlist simulation.
+
+    python benchmarks/waitlist_simulation.py --users 100000 --stations 1000 --freed 20000
+
+Queues `users` waiting entries with hour-aligned windows over the next two
+days across `stations`, then frees random 30-minute slots and promotes the
+next eligible user for each. Runs against a throwaway SQLite database and
+reports queue load time, promotions per second and offer latency, first for
+the in-memory allocator alone and then end to end through promote_slots
+(conditional updates and notifications included).
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))] if ordered else None
+
+
+def simulate_allocator(entries, freed, now):
+    from app.services.waitlist import StationQueue
+
+    started = time.perf_counter()
+    queues = {}
+    for entry_id, (user_id, station_id, window_start, window_end, created_at) in enumerate(entries, start=1):
+        queues.setdefault(station_id, StationQueue()).push(window_start, window_end, created_at, entry_id, user_id)
+    load_seconds = time.perf_counter() - started
+
+    latencies = []
+    offered = 0
+    started = time.perf_counter()
+    for station_id, start, end in freed:
+        began = time.perf_counter()
+        queue = queues.get(station_id)
+        best = queue.best(start, end, now) if queue else None
+        if best is not None:
+            queue.discard(best[1])
+            offered += 1
+        latencies.append(time.perf_counter() - began)
+    elapsed = time.perf_counter() - started
+    return {
+        "load_seconds": round(load_seconds, 3),
+        "freed_slots": len(freed),
+        "offers": offered,
+        "promotions_per_second": round(len(freed) / elapsed, 1),
+        "p50_us": round(percentile(latencies, 0.50) * 1e6, 1),
+        "p99_us": round(percentile(latencies, 0.99) * 1e6, 1),
+    }
+
+
+def simulate_end_to_end(entries, freed, stations):
+    from sqlalchemy import insert
+    from app import create_app, db
+    from app.models import User, ChargingStation, Slot, WaitlistEntry
+    from app.services.waitlist import promote_slots
+    from app.utils.notifications import notification_dispatcher, NotificationBackend
+
+    class DiscardBackend(NotificationBackend):
+        def send_batch(self, batch):
+            return 0
+
+    # Keep console notification output out of the measurement
+    notification_dispatcher.backend = DiscardBackend()
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        user_count = max(user_id for user_id, _, _, _, _ in entries)
+        db.session.execute(insert(User), [
+            {"id": user_id, "username": f"user{user_id}", "password": "-", "role": "user"}
+            for user_id in range(1, user_count + 1)
+        ])
+        db.session.execute(insert(ChargingStation), [
+            {"id": station_id, "name": f"Station {station_id}", "location": "-", "capacity": 1,
+             "status": "available"}
+            for station_id in range(1, stations + 1)
+        ])
+        db.session.execute(insert(WaitlistEntry), [
+            {"user_id": user_id, "station_id": station_id, "window_start": window_start,
+             "window_end": window_end, "status": "waiting", "created_at": created_at}
+            for user_id, station_id, window_start, window_end, created_at in entries
+        ])
+        slot_rows = [
+            {"station_id": station_id, "start_time": start, "end_time": end, "status": "available"}
+            for station_id, start, end in freed
+        ]
+        db.session.execute(insert(Slot), slot_rows)
+        db.session.commit()
+        slot_ids = [slot_id for (slot_id,) in db.session.query(Slot.id).order_by(Slot.id)]
+
+        latencies = []
+        offered = 0
+        started = time.perf_counter()
+        for slot_id in slot_ids:
+            began = time.perf_counter()
+            offered += promote_slots([slot_id])
+            latencies.append(time.perf_counter() - began)
+        elapsed = time.perf_counter() - started
+        db.session.remove()
+        db.engine.dispose()
+    return {
+        "freed_slots": len(slot_ids),
+        "offers": offered,
+        "promotions_per_second": round(len(slot_ids) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulate waitlist promotion")
+    parser.add_argument('--users', type=int, default=100000)
+    parser.add_argument('--stations', type=int, default=1000)
+    parser.add_argument('--freed', type=int, default=20000, help="Slots freed during the run")
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--skip-db', action='store_true', help="Only simulate the in-memory allocator")
+    parser.add_argument('--output', help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    # A directory of its own, so the -wal and -shm files are removed with the database
+    directory = tempfile.TemporaryDirectory()
+    os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(directory.name, 'waitlist.db')}"
+    os.environ.setdefault('METRICS_ENABLED', '0')
+
+    rng = random.Random(args.seed)
+    now = datetime.utcnow()
+    base = now.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+    entries = []
+    for user_id in range(1, args.users + 1):
+        window_start = base + timedelta(hours=rng.randrange(48))
+        entries.append((user_id, rng.randint(1, args.stations), window_start,
+                        window_start + timedelta(hours=rng.choice((1, 2, 4))),
+                        now - timedelta(seconds=rng.randrange(86400))))
+    freed = []
+    for _ in range(args.freed):
+        start = base + timedelta(minutes=30 * rng.randrange(96))
+        freed.append((rng.randint(1, args.stations), start, start + timedelta(minutes=30)))
+
+    try:
+        results = {"users": args.users, "stations": args.stations,
+                   "allocator": simulate_allocator(entries, freed, now)}
+        if not args.skip_db:
+            results["end_to_end"] = simulate_end_to_end(entries, freed, args.stations)
+    finally:
+        directory.cleanup()
+
+    print(json.dumps(results, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
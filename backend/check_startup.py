@@ -0,0 +1,89 @@
+"""
+Startup budget check.
+
+    python check_startup.py --budget-ms 1500
+
+Imports the production entry point (wsgi.py, which builds the app) in a fresh
+interpreter under `python -X importtime`, without AWS settings, and fails if
+startup exceeds the budget or pulls in modules that should only load on first
+use (the AWS SDK, Redis). Prints the slowest imports to show where time goes.
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+
+LAZY_MODULES = ('boto3', 'botocore', 'redis')
+BUDGET_MS = 1500.0
+AWS_ENV_VARS = ('AWS_REGION', 'AWS_COGNITO_CLIENT_ID', 'AWS_COGNITO_CLIENT_SECRET', 'AWS_COGNITO_USER_POOL_ID')
+
+
+def parse_importtime(stderr):
+    """Returns: list of (self_us, cumulative_us, module) tuples."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        rows.append((int(self_us), int(cumulative_us), module.strip()))
+    return rows
+
+
+def measure_startup(env=None):
+    """
+    Import wsgi.py in a fresh interpreter under -X importtime, without AWS settings.
+    Args:
+        env (dict): Extra environment variables for the interpreter.
+    Returns:
+        tuple: (elapsed milliseconds, parse_importtime rows, subprocess.CompletedProcess)
+    """
+    child_env = {name: value for name, value in os.environ.items() if name not in AWS_ENV_VARS}
+    child_env.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite://')
+    child_env.update(env or {})
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import wsgi'],
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        env=child_env, capture_output=True, text=True
+    )
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return elapsed_ms, parse_importtime(result.stderr), result
+
+
+def eager_imports(rows):
+    """Returns: sorted LAZY_MODULES packages that startup imported."""
+    return sorted({module.split('.')[0] for _, _, module in rows} & set(LAZY_MODULES))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check app startup time and lazy imports")
+    parser.add_argument('--budget-ms', type=float, default=BUDGET_MS)
+    parser.add_argument('--top', type=int, default=10, help="Number of slowest imports to show")
+    args = parser.parse_args()
+
+    elapsed_ms, rows, result = measure_startup()
+
+    if result.returncode != 0:
+        print(result.stderr.splitlines()[-1] if result.stderr else "Startup failed")
+        sys.exit(1)
+
+    print(f"Startup (interpreter + imports + create_app): {elapsed_ms:.0f} ms, budget {args.budget_ms:.0f} ms")
+    print("Slowest imports (self time):")
+    for self_us, cumulative_us, module in sorted(rows, reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {module}")
+
+    failures = []
+    if elapsed_ms > args.budget_ms:
+        failures.append(f"startup took {elapsed_ms:.0f} ms")
+    eager = eager_imports(rows)
+    if eager:
+        failures.append("imported at startup: " + ", ".join(eager))
+    if failures:
+        print("FAILED: " + "; ".join(failures))
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
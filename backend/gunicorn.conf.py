@@ -0,0 +1,73 @@
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Production serving: gunicorn -c gunicorn.conf.py wsgi:app
+#
+# Each worker is a separate process with its own SQLAlchemy pool
+# (DB_POOL_SIZE + DB_MAX_OVERFLOW connections), its own listing cache and its
+# own background threads (payment dispatcher, notification and telemetry
+# flushers). Keep workers * (DB_POOL_SIZE + DB_MAX_OVERFLOW) below the
+# database's connection limit. With SQLite there is a single writer, so a
+# couple of workers with more threads each is usually the better trade.
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+
+# Threaded workers: requests mostly wait on the database or the network, and
+# long-lived /api/ev/slot-events streams each hold one thread. Large numbers
+# of event subscribers belong on the asyncio server (REALTIME_PORT) instead.
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 8))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Preloading imports and builds the app once in the master; workers are forked
+# from it and share that memory copy-on-write, so they start without paying
+# the import cost again. Connections and threads must not cross the fork, so
+# each worker drops the inherited pool in post_fork (background threads
+# restart themselves per process).
+preload_app = os.getenv('GUNICORN_PRELOAD', '1').lower() in ('1', 'true')
+
+# Recycle workers periodically to bound memory growth from in-process caches
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 10000))
+max_requests_jitter = 1000
+
+# Workers publish metrics snapshots here, so a scrape of any worker covers all of
+# them. The directory belongs to this master: emptied on start, removed on exit.
+metrics_dir = os.environ.setdefault(
+    'METRICS_DIR', os.path.join(tempfile.gettempdir(), f"ev-charging-metrics-{os.getpid()}")
+)
+
+accesslog = os.getenv('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOG_LEVEL', 'info')
+
+
+def post_fork(server, worker):
+    if not preload_app:
+        return
+    from wsgi import app
+    from app import db
+    with app.app_context():
+        for engine in db.engines.values():
+            # Leave the parent's connections open for the parent; just forget them here
+            engine.dispose(close=False)
+
+
+def on_starting(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir)
+
+
+def worker_exit(server, worker):
+    # Final snapshot, so the exiting worker's counts stay in the totals
+    from app.utils.metrics import metrics
+    metrics.write_snapshot()
+
+
+def on_exit(server):
+    shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,52 @@
+"""Add pricing rules and slot prices
+
+Revision ID: 2f6a8c1e9d47
+Revises: e9b1d4f7a2c8
+Create Date: 2026-10-18 15:03:48.260915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f6a8c1e9d47'
+down_revision = 'e9b1d4f7a2c8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('pricing_rule',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=True),
+    sa.Column('weekdays', sa.Integer(), nullable=False),
+    sa.Column('start_minute', sa.Integer(), nullable=False),
+    sa.Column('end_minute', sa.Integer(), nullable=False),
+    sa.Column('rate_per_hour', sa.Float(), nullable=True),
+    sa.Column('multiplier', sa.Float(), nullable=False),
+    sa.Column('min_utilization', sa.Float(), nullable=True),
+    sa.Column('priority', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['station_id'], ['charging_station.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_pricing_rule_station_id'), 'pricing_rule', ['station_id'], unique=False)
+
+    op.create_table('slot_price',
+    sa.Column('slot_id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('start_time', sa.DateTime(), nullable=False),
+    sa.Column('price', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['slot_id'], ['slot.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('slot_id')
+    )
+    op.create_index('ix_slot_price_station_id_price', 'slot_price', ['station_id', 'price'], unique=False)
+    op.create_index('ix_slot_price_price', 'slot_price', ['price'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_slot_price_price', table_name='slot_price')
+    op.drop_index('ix_slot_price_station_id_price', table_name='slot_price')
+    op.drop_table('slot_price')
+    op.drop_index(op.f('ix_pricing_rule_station_id'), table_name='pricing_rule')
+    op.drop_table('pricing_rule')
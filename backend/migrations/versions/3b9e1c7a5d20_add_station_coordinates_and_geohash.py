@@ -0,0 +1,32 @@
+"""Add station coordinates and geohash index
+
+Revision ID: 3b9e1c7a5d20
+Revises: f675c77d2fe3
+Create Date: 2026-10-18 09:12:41.208114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3b9e1c7a5d20'
+down_revision = 'f675c77d2fe3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=12), nullable=True))
+        batch_op.create_index(batch_op.f('ix_charging_station_geohash'), ['geohash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_charging_station_geohash'))
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
@@ -0,0 +1,24 @@
+"""Add booking keyset pagination index
+
+Revision ID: 5e7a9f1b2c63
+Revises: d52f08b3e1c4
+Create Date: 2026-10-18 11:27:08.740215
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e7a9f1b2c63'
+down_revision = 'd52f08b3e1c4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_booking_user_id_id', 'booking', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_booking_user_id_id', table_name='booking')
@@ -0,0 +1,44 @@
+"""Add waitlist entries
+
+Revision ID: 6d2c8e4a1f93
+Revises: 2f6a8c1e9d47
+Create Date: 2026-10-18 17:21:06.418327
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6d2c8e4a1f93'
+down_revision = '2f6a8c1e9d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('waitlist_entry',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('window_start', sa.DateTime(), nullable=False),
+    sa.Column('window_end', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('slot_id', sa.Integer(), nullable=True),
+    sa.Column('offered_until', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['slot_id'], ['slot.id'], ondelete='SET NULL'),
+    sa.ForeignKeyConstraint(['station_id'], ['charging_station.id'], ),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_waitlist_entry_station_id_status', 'waitlist_entry', ['station_id', 'status'], unique=False)
+    op.create_index('ix_waitlist_entry_user_id_status', 'waitlist_entry', ['user_id', 'status'], unique=False)
+    op.create_index('ix_waitlist_entry_status_offered_until', 'waitlist_entry', ['status', 'offered_until'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_waitlist_entry_status_offered_until', table_name='waitlist_entry')
+    op.drop_index('ix_waitlist_entry_user_id_status', table_name='waitlist_entry')
+    op.drop_index('ix_waitlist_entry_station_id_status', table_name='waitlist_entry')
+    op.drop_table('waitlist_entry')
@@ -0,0 +1,40 @@
+"""Add meter samples and session energy
+
+Revision ID: 7b3d9e2f4a16
+Revises: a1f6c3d8e925
+Create Date: 2026-10-18 13:02:11.527304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3d9e2f4a16'
+down_revision = 'a1f6c3d8e925'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('energy_kwh', sa.Float(), nullable=True))
+
+    op.create_table('meter_sample',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('energy_kwh', sa.Float(), nullable=True),
+    sa.Column('power_kw', sa.Float(), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['charging_session.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_meter_sample_session_id_recorded_at', 'meter_sample', ['session_id', 'recorded_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_meter_sample_session_id_recorded_at', table_name='meter_sample')
+    op.drop_table('meter_sample')
+
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.drop_column('energy_kwh')
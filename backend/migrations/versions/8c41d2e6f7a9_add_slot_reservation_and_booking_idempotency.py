@@ -0,0 +1,38 @@
+"""Add slot reservation columns and booking idempotency key
+
+Revision ID: 8c41d2e6f7a9
+Revises: 3b9e1c7a5d20
+Create Date: 2026-10-18 10:03:17.552901
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c41d2e6f7a9'
+down_revision = '3b9e1c7a5d20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('slot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('reserved_until', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('reserved_by', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_slot_reserved_by_user', 'user', ['reserved_by'], ['id'])
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=64), nullable=True))
+        batch_op.create_unique_constraint('uq_booking_user_idempotency_key', ['user_id', 'idempotency_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_booking_user_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
+
+    with op.batch_alter_table('slot', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_slot_reserved_by_user', type_='foreignkey')
+        batch_op.drop_column('reserved_by')
+        batch_op.drop_column('reserved_until')
@@ -0,0 +1,46 @@
+"""Add payment outbox table and booking status
+
+Revision ID: a1f6c3d8e925
+Revises: 5e7a9f1b2c63
+Create Date: 2026-10-18 12:14:36.381902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a1f6c3d8e925'
+down_revision = '5e7a9f1b2c63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('status', sa.String(length=50), nullable=True, server_default='confirmed'))
+
+    op.create_table('payment',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('booking_id', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('details', sa.Text(), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('attempts', sa.Integer(), nullable=True),
+    sa.Column('next_attempt_at', sa.DateTime(), nullable=False),
+    sa.Column('transaction_id', sa.String(length=64), nullable=True),
+    sa.Column('last_error', sa.String(length=255), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['booking_id'], ['booking.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('booking_id')
+    )
+    op.create_index('ix_payment_status_next_attempt_at', 'payment', ['status', 'next_attempt_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_payment_status_next_attempt_at', table_name='payment')
+    op.drop_table('payment')
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_column('status')
@@ -0,0 +1,29 @@
+"""Add job lease table for single-runner maintenance jobs
+
+Revision ID: a3d91f6c2e47
+Revises: e4a7c2f9b610
+Create Date: 2026-10-19 09:12:04.318220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d91f6c2e47'
+down_revision = 'e4a7c2f9b610'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('job_lease',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('owner', sa.String(length=128), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('job_lease')
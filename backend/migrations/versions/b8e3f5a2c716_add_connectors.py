@@ -0,0 +1,97 @@
+"""Add connectors
+
+Revision ID: b8e3f5a2c716
+Revises: 6d2c8e4a1f93
+Create Date: 2026-10-18 19:02:37.905114
+
+"""
+from datetime import datetime
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e3f5a2c716'
+down_revision = '6d2c8e4a1f93'
+branch_labels = None
+depends_on = None
+
+CONNECTOR_AVAILABLE = 0
+CONNECTOR_CHARGING = 2
+
+
+def upgrade():
+    op.create_table('connector',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('position', sa.Integer(), nullable=False),
+    sa.Column('state', sa.SmallInteger(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['station_id'], ['charging_station.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('station_id', 'position', name='uq_connector_station_id_position')
+    )
+    op.create_index('ix_connector_updated_at', 'connector', ['updated_at'], unique=False)
+
+    with op.batch_alter_table('slot', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('connector_id', sa.Integer(), nullable=True))
+        batch_op.create_index('ix_slot_connector_id_start_time', ['connector_id', 'start_time'], unique=False)
+        batch_op.create_foreign_key('fk_slot_connector_id', 'connector', ['connector_id'], ['id'])
+
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('connector_id', sa.Integer(), nullable=True))
+        batch_op.create_foreign_key('fk_charging_session_connector_id', 'connector', ['connector_id'], ['id'])
+
+    # One connector per unit of capacity; in-progress sessions take the first ones
+    bind = op.get_bind()
+    now = datetime.utcnow()
+    sessions = {}
+    for session_id, station_id in bind.execute(sa.text(
+        "SELECT id, station_id FROM charging_session WHERE status = 'in_progress' ORDER BY start_time"
+    )):
+        sessions.setdefault(station_id, []).append(session_id)
+    connector = sa.table('connector',
+        sa.column('station_id', sa.Integer()), sa.column('position', sa.Integer()),
+        sa.column('state', sa.SmallInteger()), sa.column('updated_at', sa.DateTime()))
+    rows = []
+    for station_id, capacity in bind.execute(sa.text("SELECT id, capacity FROM charging_station")):
+        charging = len(sessions.get(station_id, []))
+        rows += [
+            {"station_id": station_id, "position": position, "updated_at": now,
+             "state": CONNECTOR_CHARGING if position <= charging else CONNECTOR_AVAILABLE}
+            for position in range(1, max(capacity or 1, 1) + 1)
+        ]
+    if rows:
+        op.bulk_insert(connector, rows)
+    for station_id, session_ids in sessions.items():
+        for position, session_id in enumerate(session_ids, start=1):
+            bind.execute(sa.text(
+                "UPDATE charging_session SET connector_id = ("
+                "SELECT id FROM connector WHERE station_id = :station_id AND position = :position) WHERE id = :id"
+            ), {"station_id": station_id, "position": position, "id": session_id})
+
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.drop_column('active_sessions')
+
+
+def downgrade():
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('active_sessions', sa.Integer(), nullable=False, server_default='0'))
+
+    op.execute(
+        "UPDATE charging_station SET active_sessions = ("
+        "SELECT COUNT(*) FROM connector "
+        f"WHERE connector.station_id = charging_station.id AND connector.state = {CONNECTOR_CHARGING})"
+    )
+
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_charging_session_connector_id', type_='foreignkey')
+        batch_op.drop_column('connector_id')
+
+    with op.batch_alter_table('slot', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_slot_connector_id', type_='foreignkey')
+        batch_op.drop_index('ix_slot_connector_id_start_time')
+        batch_op.drop_column('connector_id')
+
+    op.drop_index('ix_connector_updated_at', table_name='connector')
+    op.drop_table('connector')
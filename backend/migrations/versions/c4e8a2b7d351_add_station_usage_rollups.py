@@ -0,0 +1,55 @@
+"""Add station usage rollups
+
+Revision ID: c4e8a2b7d351
+Revises: 7b3d9e2f4a16
+Create Date: 2026-10-18 13:41:52.118640
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4e8a2b7d351'
+down_revision = '7b3d9e2f4a16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('station_hourly_usage',
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('hour', sa.Integer(), nullable=False),
+    sa.Column('weekday', sa.Integer(), nullable=False),
+    sa.Column('slot_minutes', sa.Float(), nullable=False),
+    sa.Column('booked_minutes', sa.Float(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('energy_kwh', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['station_id'], ['charging_station.id'], ),
+    sa.PrimaryKeyConstraint('station_id', 'day', 'hour')
+    )
+    op.create_index('ix_station_hourly_usage_day', 'station_hourly_usage', ['day'], unique=False)
+
+    op.create_table('station_daily_usage',
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('slot_minutes', sa.Float(), nullable=False),
+    sa.Column('booked_minutes', sa.Float(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('sessions', sa.Integer(), nullable=False),
+    sa.Column('energy_kwh', sa.Float(), nullable=False),
+    sa.ForeignKeyConstraint(['station_id'], ['charging_station.id'], ),
+    sa.PrimaryKeyConstraint('station_id', 'day')
+    )
+    op.create_index('ix_station_daily_usage_day', 'station_daily_usage', ['day'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_station_daily_usage_day', table_name='station_daily_usage')
+    op.drop_table('station_daily_usage')
+    op.drop_index('ix_station_hourly_usage_day', table_name='station_hourly_usage')
+    op.drop_table('station_hourly_usage')
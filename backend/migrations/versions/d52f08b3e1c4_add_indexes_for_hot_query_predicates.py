@@ -0,0 +1,38 @@
+"""Add indexes for hot query predicates
+
+Revision ID: d52f08b3e1c4
+Revises: 8c41d2e6f7a9
+Create Date: 2026-10-18 10:41:55.016384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd52f08b3e1c4'
+down_revision = '8c41d2e6f7a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_charging_station_pricing_speed_status', 'charging_station', ['pricing', 'speed', 'status'], unique=False)
+    op.create_index('ix_charging_station_speed_status', 'charging_station', ['speed', 'status'], unique=False)
+    op.create_index('ix_charging_station_status', 'charging_station', ['status'], unique=False)
+    op.create_index('ix_slot_station_id_status', 'slot', ['station_id', 'status'], unique=False)
+    op.create_index('ix_charging_session_user_id_start_time', 'charging_session', ['user_id', 'start_time'], unique=False)
+    op.create_index('ix_charging_session_station_id_status', 'charging_session', ['station_id', 'status'], unique=False)
+    op.create_index('ix_booking_user_id_booking_time', 'booking', ['user_id', 'booking_time'], unique=False)
+    op.create_index('ix_booking_slot_id', 'booking', ['slot_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_booking_slot_id', table_name='booking')
+    op.drop_index('ix_booking_user_id_booking_time', table_name='booking')
+    op.drop_index('ix_charging_session_station_id_status', table_name='charging_session')
+    op.drop_index('ix_charging_session_user_id_start_time', table_name='charging_session')
+    op.drop_index('ix_slot_station_id_status', table_name='slot')
+    op.drop_index('ix_charging_station_status', table_name='charging_station')
+    op.drop_index('ix_charging_station_speed_status', table_name='charging_station')
+    op.drop_index('ix_charging_station_pricing_speed_status', table_name='charging_station')
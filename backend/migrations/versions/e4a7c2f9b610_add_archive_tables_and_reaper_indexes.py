@@ -0,0 +1,54 @@
+"""Add archive tables and indexes for the maintenance jobs
+
+Revision ID: e4a7c2f9b610
+Revises: b8e3f5a2c716
+Create Date: 2026-10-18 21:37:52.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7c2f9b610'
+down_revision = 'b8e3f5a2c716'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('meter_sample_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=False),
+    sa.Column('recorded_at', sa.DateTime(), nullable=False),
+    sa.Column('energy_kwh', sa.Float(), nullable=True),
+    sa.Column('power_kw', sa.Float(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_meter_sample_archive_session_id', 'meter_sample_archive', ['session_id'], unique=False)
+    op.create_table('waitlist_entry_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('station_id', sa.Integer(), nullable=False),
+    sa.Column('window_start', sa.DateTime(), nullable=False),
+    sa.Column('window_end', sa.DateTime(), nullable=False),
+    sa.Column('status', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('slot_id', sa.Integer(), nullable=True),
+    sa.Column('offered_until', sa.DateTime(), nullable=True),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_waitlist_entry_archive_user_id', 'waitlist_entry_archive', ['user_id'], unique=False)
+    op.create_index('ix_slot_status_end_time', 'slot', ['status', 'end_time'], unique=False)
+    op.create_index('ix_charging_session_status_start_time', 'charging_session', ['status', 'start_time'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_charging_session_status_start_time', table_name='charging_session')
+    op.drop_index('ix_slot_status_end_time', table_name='slot')
+    op.drop_index('ix_waitlist_entry_archive_user_id', table_name='waitlist_entry_archive')
+    op.drop_table('waitlist_entry_archive')
+    op.drop_index('ix_meter_sample_archive_session_id', table_name='meter_sample_archive')
+    op.drop_table('meter_sample_archive')
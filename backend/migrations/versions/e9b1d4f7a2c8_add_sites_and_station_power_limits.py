@@ -0,0 +1,57 @@
+"""Add sites and station power limits
+
+Revision ID: e9b1d4f7a2c8
+Revises: c4e8a2b7d351
+Create Date: 2026-10-18 14:20:37.804417
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9b1d4f7a2c8'
+down_revision = 'c4e8a2b7d351'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('site',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('name', sa.String(length=100), nullable=False),
+    sa.Column('grid_limit_kw', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('site_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('max_power_kw', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('active_sessions', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.create_index(batch_op.f('ix_charging_station_site_id'), ['site_id'], unique=False)
+        batch_op.create_foreign_key('fk_charging_station_site_id', 'site', ['site_id'], ['id'])
+
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('max_power_kw', sa.Float(), nullable=True))
+
+    # Stations that are busy today have one in-progress session each
+    op.execute(
+        "UPDATE charging_station SET active_sessions = ("
+        "SELECT COUNT(*) FROM charging_session "
+        "WHERE charging_session.station_id = charging_station.id "
+        "AND charging_session.status = 'in_progress')"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('charging_session', schema=None) as batch_op:
+        batch_op.drop_column('max_power_kw')
+
+    with op.batch_alter_table('charging_station', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_charging_station_site_id', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_charging_station_site_id'))
+        batch_op.drop_column('active_sessions')
+        batch_op.drop_column('max_power_kw')
+        batch_op.drop_column('site_id')
+
+    op.drop_table('site')
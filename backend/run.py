@@ -1,3 +1,4 @@
+import os
 from app import create_app, db
 from flask_migrate import Migrate
 
@@ -5,4 +6,9 @@ app = create_app()
 migrate = Migrate(app, db)
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # With the reloader active, only the serving child process hosts the push server
+    if os.getenv('REALTIME_PORT') and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from app.services.realtime_server import start_realtime_server
+        start_realtime_server(app, port=int(os.getenv('REALTIME_PORT')))
+    # Development server only; production runs gunicorn with gunicorn.conf.py (see wsgi.py)
+    app.run(debug=os.getenv('FLASK_DEBUG', '0').lower() in ('1', 'true'))
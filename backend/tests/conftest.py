@@ -0,0 +1,96 @@
+import os
+import tempfile
+import uuid
+
+import pytest
+
+# One app and database for the whole run. Process-wide caches (connector
+# registry, availability index, payment worker) outlive a test, so tests add
+# their own rows and never reset the database underneath them.
+# The database gets a directory of its own, so its -wal and -shm files are removed with it.
+_directory = tempfile.TemporaryDirectory()
+os.environ['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(_directory.name, 'test.db')}"
+os.environ['JOBS_ENABLED'] = '0'
+os.environ['METRICS_ENABLED'] = '0'
+os.environ['RATE_LIMIT_ENABLED'] = '0'
+os.environ['MAX_QUERIES_PER_REQUEST'] = '20'
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import create_app, db
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.app_context():
+        db.create_all()
+    yield app
+    from app.services.payment_worker import payment_worker
+    payment_worker.stop(timeout=10)
+    with app.app_context():
+        db.engine.dispose()
+    _directory.cleanup()
+
+
+@pytest.fixture
+def db_session(app):
+    from app import db
+    with app.app_context():
+        yield db.session
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(app):
+    """Create a user and return (user_id, Authorization headers)."""
+    from flask_jwt_extended import create_access_token
+    from app.models import db, User
+
+    def make():
+        with app.app_context():
+            user = User(username=f"user-{uuid.uuid4().hex[:12]}", password='-', role='user')
+            db.session.add(user)
+            db.session.commit()
+            return user.id, {"Authorization": "Bearer " + create_access_token(identity=str(user.id))}
+    return make
+
+
+@pytest.fixture
+def make_station(client):
+    """Create a station through the provider API and return its id."""
+    def make(capacity=1, **fields):
+        payload = {"station_name": f"Station {uuid.uuid4().hex[:8]}", "location": "Test", "station_type": "fast",
+                   "capacity": capacity, **fields}
+        response = client.post('/api/provider/add-station', json=payload)
+        assert response.status_code == 201, response.get_json()
+        return response.get_json()["station_id"]
+    return make
+
+
+@pytest.fixture
+def make_slot(app):
+    """Create an available slot (default: one hour, starting in an hour) and return its id."""
+    from datetime import datetime, timedelta
+    from app.models import db, Slot
+
+    def make(station_id, start=None, hours=1, connector_id=None):
+        start = start or datetime.utcnow().replace(microsecond=0) + timedelta(hours=1)
+        with app.app_context():
+            slot = Slot(station_id=station_id, connector_id=connector_id, start_time=start,
+                        end_time=start + timedelta(hours=hours), status='available')
+            db.session.add(slot)
+            db.session.commit()
+            return slot.id
+    return make
+
+
+def slot_amount(app, slot_id):
+    """The amount book-slot accepts for a slot: its precomputed price, or 0 for unpriced slots."""
+    from app.services.pricing_service import slot_price
+    with app.app_context():
+        price = slot_price(slot_id)
+    return price if price is not None else 0
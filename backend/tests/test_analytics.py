@@ -0,0 +1,31 @@
+import pytest
+
+from app.services import analytics
+
+
+@pytest.mark.parametrize("path", [
+    '/api/provider/analytics/utilization',
+    '/api/provider/analytics/revenue',
+    '/api/provider/analytics/heatmap?metric=revenue',
+])
+def test_reports_read_the_rollup_without_refreshing_it(client, monkeypatch, path):
+    def refresh(*args, **kwargs):
+        raise AssertionError("the rollup was refreshed inside a GET request")
+    monkeypatch.setattr(analytics, 'refresh_rollup', refresh)
+    monkeypatch.setattr(analytics, '_last_refresh', None)
+
+    assert client.get(path).status_code == 200
+
+
+def test_refresh_requires_a_token(client):
+    assert client.post('/api/provider/analytics/refresh?full=1').status_code == 401
+
+
+def test_refresh_does_not_queue_behind_a_running_one(client, make_user):
+    _, headers = make_user()
+    assert client.post('/api/provider/analytics/refresh', headers=headers).status_code == 200
+
+    with analytics._refresh_lock:
+        response = client.post('/api/provider/analytics/refresh?full=1', headers=headers)
+
+    assert response.status_code == 409
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+from app.models import db, Slot
+from app.services.availability import AvailabilityIndex
+
+
+def future(hours):
+    return datetime.utcnow().replace(microsecond=0) + timedelta(hours=hours)
+
+
+def test_pruned_slots_leave_the_free_map(app, make_station, make_slot):
+    station_id = make_station()
+    index = AvailabilityIndex(reload_seconds=3600)
+    with app.app_context():
+        index.ensure_loaded()
+        started = datetime.utcnow() - timedelta(minutes=5)
+        index._add(-1, station_id, started, started + timedelta(hours=1))
+
+        index.first_free([station_id], datetime.utcnow())
+
+    assert -1 not in index._free
+
+
+def test_reload_picks_up_slots_written_elsewhere(app, make_station, make_slot):
+    station_id = make_station()
+    index = AvailabilityIndex(reload_seconds=0)
+    with app.app_context():
+        assert index.first_free([station_id], datetime.utcnow()) == {}
+        # Written without publishing, as another worker or an import would from this process's view
+        slot_id = make_slot(station_id, start=future(3))
+
+        match = index.first_free([station_id], datetime.utcnow())
+
+    assert match[station_id][2] == slot_id
+
+
+def test_events_during_rebuild_are_replayed(app, make_station, make_slot):
+    station_id = make_station()
+    slot_id = make_slot(station_id, start=future(3))
+    index = AvailabilityIndex(reload_seconds=3600)
+    build = index._build
+
+    def build_then_book():
+        snapshot = build()
+        # Booked after the snapshot was read, before the new index is swapped in
+        index.on_event(("station", station_id), {"type": "slot", "slot_id": slot_id, "station_id": station_id,
+                                                 "status": "reserved"})
+        return snapshot
+
+    index._build = build_then_book
+    with app.app_context():
+        assert index.first_free([station_id], datetime.utcnow()) == {}
+    assert slot_id not in index._free
+
+
+def test_search_slots_accepts_utc_offsets(client, make_user):
+    _, headers = make_user()
+    window_start = future(29).isoformat() + "Z"
+    window_end = future(32).isoformat() + "%2B02:00"
+
+    response = client.get(f'/api/ev/search-slots?from={window_start}&to={window_end}', headers=headers)
+
+    assert response.status_code == 200, response.get_json()
+    assert "stations" in response.get_json()
+
+
+def test_search_slots_validates_coordinates(client, make_user):
+    _, headers = make_user()
+
+    def search(query):
+        return client.get('/api/ev/search-slots?' + query, headers=headers)
+
+    assert search('latitude=&longitude=').status_code == 200
+    assert search('latitude=52.5').get_json() == {"message": "Latitude and Longitude must be provided together"}
+    for query in ('latitude=91&longitude=13.4', 'latitude=52.5&longitude=-181',
+                  'latitude=52.5&longitude=13.4&radius=0', 'latitude=north&longitude=13.4'):
+        assert search(query).status_code == 400, query
+    assert search('latitude=52.5&longitude=13.4&radius=5').status_code == 200
+
+
+def test_cheapest_slots_accepts_utc_offsets(client, make_user):
+    _, headers = make_user()
+    window_start = future(29).isoformat() + "Z"
+
+    response = client.get(f'/api/ev/cheapest-slots?latitude=52.5&longitude=13.4&from={window_start}',
+                          headers=headers)
+
+    assert response.status_code == 200, response.get_json()
+    assert "slots" in response.get_json()
@@ -0,0 +1,92 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.models import Booking, Slot
+from conftest import slot_amount
+
+CONCURRENT_BOOKINGS = 32
+
+
+def book(client, headers, slot_id, amount, key=None):
+    if key is not None:
+        headers = {**headers, "Idempotency-Key": key}
+    return client.post('/api/ev/book-slot', headers=headers,
+                       json={"slot_id": slot_id, "payment_details": {"amount": amount}})
+
+
+def test_concurrent_bookings_of_one_slot_have_one_winner(app, db_session, make_user, make_station, make_slot):
+    slot_id = make_slot(make_station())
+    amount = slot_amount(app, slot_id)
+    users = [make_user() for _ in range(CONCURRENT_BOOKINGS)]
+    start = threading.Barrier(CONCURRENT_BOOKINGS)
+
+    def attempt(user):
+        client = app.test_client()
+        start.wait()
+        response = book(client, user[1], slot_id, amount)
+        return response.status_code, response.get_json()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(CONCURRENT_BOOKINGS) as pool:
+        results = list(pool.map(attempt, users))
+    elapsed = time.perf_counter() - started
+
+    codes = [code for code, _ in results]
+    assert codes.count(202) == 1, results
+    assert codes.count(400) == CONCURRENT_BOOKINGS - 1, results
+    assert all(body["message"] == "Slot not available" for code, body in results if code == 400)
+    assert Booking.query.filter_by(slot_id=slot_id).count() == 1
+    assert db_session.get(Slot, slot_id).status in ('reserved', 'occupied')
+    print(f"\n{CONCURRENT_BOOKINGS} concurrent bookings of one slot in {elapsed * 1000:.0f} ms "
+          f"({CONCURRENT_BOOKINGS / elapsed:.0f} requests/s)")
+
+
+def test_concurrent_retries_with_one_idempotency_key_create_one_booking(app, db_session, make_user, make_station,
+                                                                         make_slot):
+    slot_id = make_slot(make_station())
+    amount = slot_amount(app, slot_id)
+    _, headers = make_user()
+    start = threading.Barrier(8)
+
+    def attempt(_):
+        client = app.test_client()
+        start.wait()
+        response = book(client, headers, slot_id, amount, key="retry-1")
+        return response.status_code, response.get_json()
+
+    with ThreadPoolExecutor(8) as pool:
+        results = list(pool.map(attempt, range(8)))
+
+    codes = [code for code, _ in results]
+    # Retries either replay the booking (200) or overlap the original request (409)
+    assert codes.count(202) == 1, results
+    assert all(code in (200, 202, 409) for code in codes), results
+    assert len({body["booking_id"] for code, body in results if code in (200, 202)}) == 1
+    assert Booking.query.filter_by(slot_id=slot_id).count() == 1
+    assert book(app.test_client(), headers, slot_id, amount, key="retry-1").status_code == 200
+
+
+def test_idempotency_key_length_is_validated(app, client, make_user, make_station, make_slot):
+    slot_id = make_slot(make_station())
+    _, headers = make_user()
+
+    response = book(client, headers, slot_id, slot_amount(app, slot_id), key="k" * 100)
+
+    assert response.status_code == 400
+    assert "Idempotency-Key" in response.get_json()["message"]
+
+
+@pytest.mark.parametrize("amount", [-50, "free", True, None, "nan", float("inf")])
+def test_invalid_amounts_are_rejected(app, client, db_session, make_user, make_station, make_slot, amount):
+    slot_id = make_slot(make_station())
+    _, headers = make_user()
+
+    response = client.post('/api/ev/book-slot', headers=headers,
+                           json={"slot_id": slot_id, "payment_details": {"amount": amount}})
+
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "Payment amount must be a non-negative number"
+    assert Booking.query.filter_by(slot_id=slot_id).count() == 0
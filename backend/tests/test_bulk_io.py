@@ -0,0 +1,86 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Connector, PricingRule, Slot
+from app.services.bulk_io import BulkIOError, import_rows
+from app.services.change_events import station_topic
+from app.services.pricing_service import slot_price
+from app.utils.change_bus import change_bus
+
+
+def future(hours):
+    return datetime.utcnow().replace(minute=0, second=0, microsecond=0) + timedelta(hours=hours)
+
+
+def write_ndjson(path, rows):
+    path.write_text("".join(json.dumps(row, default=str) + "\n" for row in rows))
+    return str(path)
+
+
+def slot_row(station_id, start, hours=1, **fields):
+    return {"station_id": station_id, "start_time": start.isoformat(),
+            "end_time": (start + timedelta(hours=hours)).isoformat(), **fields}
+
+
+def test_overlapping_slots_are_rejected(db_session, make_station, make_slot, tmp_path):
+    station_id = make_station(capacity=1)
+    make_slot(station_id, start=future(50))
+    path = write_ndjson(tmp_path / "slots.ndjson", [slot_row(station_id, future(50))])
+
+    with pytest.raises(BulkIOError, match="overlap"):
+        import_rows('slots', path)
+
+    assert Slot.query.filter_by(station_id=station_id).count() == 1
+
+
+def test_slots_are_priced_and_published_per_chunk(db_session, make_station, tmp_path):
+    station_id = make_station(capacity=2)
+    db.session.add(PricingRule(station_id=station_id, rate_per_hour=4.0))
+    db.session.commit()
+    subscription = change_bus.subscribe([station_topic(station_id)])
+    rows = [slot_row(station_id, future(60)), slot_row(station_id, future(61)), {"station_id": station_id}]
+    path = write_ndjson(tmp_path / "slots.ndjson", rows)
+
+    # The third row fails after the first two chunks are committed
+    with pytest.raises(BulkIOError):
+        import_rows('slots', path, chunk_size=1)
+    subscription.close()
+
+    slots = Slot.query.filter_by(station_id=station_id).order_by(Slot.start_time).all()
+    assert [slot_price(slot.id) for slot in slots] == [4.0, 4.0]
+    events = [subscription.get(timeout=0) for _ in range(2)]
+    assert [(event["slot_id"], event["status"]) for event in events] == [(slot.id, 'available') for slot in slots]
+
+
+def test_confirmed_bookings_take_their_slots(db_session, make_user, make_station, make_slot, tmp_path):
+    user_id, _ = make_user()
+    station_id = make_station(capacity=1)
+    slot_id = make_slot(station_id, start=future(70))
+    path = write_ndjson(tmp_path / "bookings.ndjson", [
+        {"user_id": user_id, "slot_id": slot_id, "amount": 2.0, "booking_time": datetime.utcnow().isoformat(),
+         "status": "confirmed"}
+    ])
+
+    assert import_rows('bookings', path)["rows"] == 1
+
+    slot = db.session.get(Slot, slot_id)
+    connector = Connector.query.filter_by(station_id=station_id).one()
+    assert (slot.status, slot.reserved_by, slot.connector_id) == ('occupied', user_id, connector.id)
+
+
+def test_bookings_for_slots_taken_by_others_are_rejected(db_session, make_user, make_station, make_slot, tmp_path):
+    user_id, _ = make_user()
+    other_id, _ = make_user()
+    station_id = make_station(capacity=1)
+    slot_id = make_slot(station_id, start=future(80))
+    path = write_ndjson(tmp_path / "bookings.ndjson", [
+        {"user_id": user_id, "slot_id": slot_id, "amount": 2.0, "booking_time": datetime.utcnow().isoformat()},
+        {"user_id": other_id, "slot_id": slot_id, "amount": 2.0, "booking_time": datetime.utcnow().isoformat()},
+    ])
+
+    with pytest.raises(BulkIOError, match="taken by another user"):
+        import_rows('bookings', path, chunk_size=1)
+
+    assert db.session.get(Slot, slot_id).reserved_by == user_id
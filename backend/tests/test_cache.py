@@ -0,0 +1,72 @@
+import time
+
+from app.utils.cache import InProcessBackend, ResponseCache
+
+
+def test_hits_share_one_build_and_etag_across_normalized_params(app):
+    cache = ResponseCache(InProcessBackend())
+    builds = []
+
+    def build():
+        builds.append(1)
+        return {"stations": [1, 2]}
+
+    with app.test_request_context('/api/stations'):
+        first = cache.response('stations', {"limit": "10", "after": ""}, build)
+        second = cache.response('stations', {"LIMIT": " 10 ", "after": None}, build)
+
+    assert len(builds) == 1
+    assert first.get_json() == second.get_json() == {"stations": [1, 2]}
+    assert first.get_etag() == second.get_etag()
+
+
+def test_matching_if_none_match_gets_304(app):
+    cache = ResponseCache(InProcessBackend())
+    with app.test_request_context('/api/stations'):
+        etag = cache.response('stations', {}, lambda: {"stations": []}).get_etag()[0]
+
+    with app.test_request_context('/api/stations', headers={"If-None-Match": f'"{etag}"'}):
+        response = cache.response('stations', {}, lambda: {"stations": []})
+
+    assert response.status_code == 304 and response.get_data() == b""
+    assert response.get_etag()[0] == etag
+
+
+def test_invalidate_rebuilds_only_its_namespace(app):
+    cache = ResponseCache(InProcessBackend())
+    bodies = {"stations": {"version": 1}, "other": {"version": 1}}
+
+    def serve(namespace):
+        with app.test_request_context('/api/stations'):
+            response = cache.response(namespace, {}, lambda: dict(bodies[namespace]))
+            return response.get_json(), response.get_etag()[0]
+
+    stations, stations_etag = serve("stations")
+    other, _ = serve("other")
+    bodies["stations"]["version"] = bodies["other"]["version"] = 2
+    cache.invalidate("stations")
+
+    assert serve("stations")[0] == {"version": 2} and serve("stations")[1] != stations_etag
+    assert serve("other")[0] == other == {"version": 1}
+
+
+def test_station_listing_etag_changes_after_a_write(client, make_station):
+    etag = client.get('/api/stations?limit=500').get_etag()[0]
+    assert client.get('/api/stations?limit=500', headers={"If-None-Match": f'"{etag}"'}).status_code == 304
+
+    make_station()
+
+    response = client.get('/api/stations?limit=500', headers={"If-None-Match": f'"{etag}"'})
+    assert response.status_code == 200 and response.get_etag()[0] != etag
+
+
+def test_in_process_backend_expires_and_evicts():
+    backend = InProcessBackend(maxsize=2)
+    backend.set("a", 1, ttl=60)
+    backend.set("b", 2, ttl=60)
+    backend.get("a")
+    backend.set("c", 3, ttl=60)  # Evicts b, the least recently used; d then evicts a
+    backend.set("d", 4, ttl=0.01)
+    time.sleep(0.02)
+
+    assert [backend.get(key) for key in "abcd"] == [None, None, 3, None]
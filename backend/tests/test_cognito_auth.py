@@ -0,0 +1,150 @@
+import json
+import time
+
+import jwt
+import pytest
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from app.utils import cognito_auth
+from app.utils.cognito_auth import VerifiedTokenCache, init_jwks_cache
+
+ISSUER = "https://cognito-idp.local/pool"
+AUDIENCE = "test-client"
+
+
+def make_key(kid):
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    jwk = json.loads(jwt.algorithms.RSAAlgorithm.to_jwk(private_key.public_key()))
+    jwk.update({"kid": kid, "alg": "RS256", "use": "sig"})
+    return private_key, jwk
+
+
+class JWKSStub:
+    """Local stand-in for Cognito's jwks.json that counts fetches."""
+
+    def __init__(self, *jwks):
+        self.keys = list(jwks)
+        self.fetches = 0
+        self.down = False
+
+    def __call__(self, url):
+        self.fetches += 1
+        if self.down:
+            raise OSError("JWKS endpoint unreachable")
+        return {"keys": self.keys}
+
+
+def make_token(private_key, kid, **claims):
+    now = int(time.time())
+    payload = {"iss": ISSUER, "aud": AUDIENCE, "token_use": "id", "cognito:username": "alice",
+               "iat": now, "exp": now + 600, **claims}
+    return jwt.encode(payload, private_key, algorithm="RS256", headers={"kid": kid})
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setenv('JWT_DECODE_ISSUER', ISSUER)
+    monkeypatch.setenv('AWS_COGNITO_CLIENT_ID', AUDIENCE)
+    private_key, jwk = make_key("key-1")
+    jwks = JWKSStub(jwk)
+    jwks.private_key = private_key
+    init_jwks_cache(url="stub://jwks.json", fetcher=jwks, min_refresh_interval=0)
+    yield jwks
+    cognito_auth._jwks_cache = None
+    cognito_auth.verified_tokens.clear()
+
+
+def get_protected(client, token):
+    return client.get('/api/aws-protected', headers={"Authorization": f"Bearer {token}"})
+
+
+def test_valid_token_fetches_jwks_once(client, stub):
+    token = make_token(stub.private_key, "key-1")
+
+    first = get_protected(client, token)
+    second = get_protected(client, make_token(stub.private_key, "key-1", nonce=1))
+
+    assert first.status_code == 200
+    assert first.get_json()["message"] == "Hello, AWS Cognito user alice!"
+    assert second.status_code == 200
+    assert stub.fetches == 1
+
+
+def test_verified_token_skips_signature_check(client, stub, monkeypatch):
+    token = make_token(stub.private_key, "key-1")
+    assert get_protected(client, token).status_code == 200
+
+    def fail(*args, **kwargs):
+        raise AssertionError("token was decoded again")
+    monkeypatch.setattr(cognito_auth.jwt, 'decode', fail)
+
+    assert get_protected(client, token).status_code == 200
+
+
+def test_unknown_kid_refreshes_keys(client, stub):
+    assert get_protected(client, make_token(stub.private_key, "key-1")).status_code == 200
+    rotated_key, rotated_jwk = make_key("key-2")
+    stub.keys.append(rotated_jwk)
+
+    response = get_protected(client, make_token(rotated_key, "key-2"))
+
+    assert response.status_code == 200
+    assert stub.fetches == 2
+
+
+def test_unknown_kid_refresh_is_rate_limited(client, stub):
+    unrelated_key, _ = make_key("static")
+    init_jwks_cache(url="stub://jwks.json", fetcher=stub, static_key=unrelated_key.public_key(),
+                    min_refresh_interval=60)
+    assert get_protected(client, make_token(stub.private_key, "key-1")).status_code == 200
+    forged_key, _ = make_key("forged")
+
+    for _ in range(5):
+        assert get_protected(client, make_token(forged_key, "forged")).status_code == 401
+
+    assert stub.fetches == 1
+
+
+def test_last_good_keys_served_when_endpoint_is_down(client, stub):
+    cache = init_jwks_cache(url="stub://jwks.json", fetcher=stub, ttl=0, min_refresh_interval=0)
+    assert get_protected(client, make_token(stub.private_key, "key-1")).status_code == 200
+    stub.down = True
+
+    response = get_protected(client, make_token(stub.private_key, "key-1", nonce=2))
+
+    assert response.status_code == 200
+    assert stub.fetches == 2
+    assert "key-1" in cache._keys
+
+
+@pytest.mark.parametrize("claims, message", [
+    ({"exp": int(time.time()) - 10}, "Token has expired"),
+    ({"aud": "someone-else"}, "Invalid token audience"),
+    ({"token_use": "access"}, "Invalid token: Token is not an ID Token"),
+])
+def test_rejected_tokens(client, stub, claims, message):
+    response = get_protected(client, make_token(stub.private_key, "key-1", **claims))
+
+    assert response.status_code == 401
+    assert response.get_json()["message"] == message
+
+
+def test_missing_header(client, stub):
+    response = client.get('/api/aws-protected')
+
+    assert response.status_code == 401
+    assert stub.fetches == 0
+
+
+def test_verified_token_cache_honours_exp_and_size():
+    cache = VerifiedTokenCache(maxsize=2)
+    cache.put("expired", {"exp": time.time() - 1})
+    cache.put("a", {"exp": time.time() + 60, "sub": "a"})
+    cache.put("b", {"exp": time.time() + 60, "sub": "b"})
+    cache.get("a")
+    cache.put("c", {"exp": time.time() + 60, "sub": "c"})
+
+    assert cache.get("expired") is None
+    assert cache.get("a")["sub"] == "a"
+    assert cache.get("b") is None
+    assert cache.get("c")["sub"] == "c"
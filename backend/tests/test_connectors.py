@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from app.models import db, Connector
+from app.services.connectors import (
+    AVAILABLE, CHARGING, RESERVED, _transition, assign_connector, claim_connector, connector_registry, set_fault,
+)
+
+
+def connector_ids(station_id):
+    return [connector_id for (connector_id,) in db.session.query(Connector.id).filter(
+        Connector.station_id == station_id).order_by(Connector.position)]
+
+
+def claim(station_id, connector_id=None):
+    claimed = claim_connector(station_id, connector_id)
+    db.session.commit()
+    if claimed is not None:
+        connector_registry.mark(station_id, claimed, CHARGING)
+    return claimed
+
+
+def test_claims_take_the_lowest_free_connector(make_station, db_session):
+    station_id = make_station(capacity=3)
+    ids = connector_ids(station_id)
+
+    assert [claim(station_id) for _ in range(4)] == ids + [None]
+    assert connector_registry.availability(station_id) == 'occupied'
+
+
+def test_claim_skips_a_connector_taken_behind_the_bitmap(make_station, db_session):
+    station_id = make_station(capacity=3)
+    ids = connector_ids(station_id)
+    connector_registry.sync(force=True)
+    # Another worker takes the first connector; this process has not synced since
+    assert _transition(ids[0], (AVAILABLE,), CHARGING)
+    db_session.commit()
+
+    assert claim(station_id) == ids[1]
+    assert connector_registry.position(station_id, ids[1]) == 2
+
+
+def test_booked_connector_is_claimed_only_while_free_or_reserved(make_station, db_session):
+    station_id = make_station(capacity=2)
+    ids = connector_ids(station_id)
+    assert _transition(ids[1], (AVAILABLE,), RESERVED)
+    db_session.commit()
+
+    assert claim(station_id, ids[1]) == ids[1]
+    assert claim(station_id, ids[1]) is None
+
+
+def test_assign_connector_keeps_overlapping_slots_in_separate_lanes(make_station, make_slot, db_session):
+    station_id = make_station(capacity=3)
+    ids = connector_ids(station_id)
+    assert set_fault(ids[2], True)
+    db_session.commit()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=3)
+    overlapping = [make_slot(station_id, start=start + timedelta(minutes=20 * index)) for index in range(3)]
+    later = make_slot(station_id, start=start + timedelta(hours=2))
+    pinned = make_slot(station_id, start=start, connector_id=ids[2])
+
+    lanes = [assign_connector(slot_id) for slot_id in overlapping]
+    db_session.commit()
+
+    # The faulted connector takes no new bookings, so the third overlapping slot has no lane
+    assert lanes == [ids[0], ids[1], None]
+    assert assign_connector(later) == ids[0]
+    assert assign_connector(pinned) == ids[2]
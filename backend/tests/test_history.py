@@ -0,0 +1,57 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Booking
+from app.utils.query_counter import QueryCounter, QueryBudgetExceeded
+
+
+def add_bookings(user_id, slot_ids):
+    now = datetime.utcnow()
+    db.session.add_all([Booking(user_id=user_id, slot_id=slot_id, booking_time=now, amount=2.0, status='confirmed')
+                        for slot_id in slot_ids])
+    db.session.commit()
+
+
+def history_queries(client, headers):
+    with QueryCounter() as counter:
+        response = client.get('/api/ev/history', headers=headers)
+    assert response.status_code == 200
+    return counter.count, response.get_json()["history"]
+
+
+def test_history_query_count_does_not_grow_with_bookings(client, db_session, make_user, make_station, make_slot):
+    station_id = make_station()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=2)
+    slot_ids = [make_slot(station_id, start=start + timedelta(hours=hour)) for hour in range(30)]
+    few_id, few_headers = make_user()
+    many_id, many_headers = make_user()
+    add_bookings(few_id, slot_ids[:2])
+    add_bookings(many_id, slot_ids)
+
+    few_count, few = history_queries(client, few_headers)
+    many_count, many = history_queries(client, many_headers)
+
+    assert len(few) == 2 and len(many) == 30
+    assert many_count == few_count
+    assert all(entry["station_id"] == station_id for entry in many)
+
+
+def test_request_over_query_budget_fails(app, client, make_user, monkeypatch):
+    _, headers = make_user()
+    count, _ = history_queries(client, headers)
+
+    monkeypatch.setitem(app.config, 'MAX_QUERIES_PER_REQUEST', count)
+    assert client.get('/api/ev/history', headers=headers).status_code == 200
+    monkeypatch.setitem(app.config, 'MAX_QUERIES_PER_REQUEST', count - 1)
+    with pytest.raises(QueryBudgetExceeded, match="ev_owner.history ran"):
+        client.get('/api/ev/history', headers=headers)
+
+
+def test_history_lists_booking_whose_slot_is_gone(client, db_session, make_user):
+    user_id, headers = make_user()
+    add_bookings(user_id, [10 ** 9])
+
+    _, history = history_queries(client, headers)
+
+    assert [(entry["slot_id"], entry["station_id"]) for entry in history] == [(10 ** 9, None)]
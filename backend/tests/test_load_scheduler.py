@@ -0,0 +1,67 @@
+import random
+
+import pytest
+
+from app.services.load_scheduler import UNLIMITED, LoadScheduler, allocate, water_level
+
+
+class RecordingBus:
+    def __init__(self):
+        self.events = []
+
+    def publish(self, topics, event):
+        self.events.append(event)
+
+
+def test_water_level_caps_the_largest_demands():
+    assert water_level([5, 20, 20], 60) == UNLIMITED
+    assert water_level([5, 20, 20], 30) == 12.5
+
+
+def test_station_then_grid_limits_are_water_filled():
+    sessions = [(1, 'a', 5.0), (2, 'a', 20.0), (3, 'a', 20.0), (4, 'b', 50.0)]
+
+    assert allocate(sessions, {'a': 30.0, 'b': 50.0}) == {1: 5.0, 2: 12.5, 3: 12.5, 4: 50.0}
+    # The grid takes its cut from the biggest per-session caps first
+    assert allocate(sessions, {'a': 30.0, 'b': 50.0}, grid_limit=60.0) == {1: 5.0, 2: 12.5, 3: 12.5, 4: 30.0}
+
+
+def test_random_plans_respect_every_limit():
+    rng = random.Random(5)
+    for _ in range(200):
+        stations = {station_id: rng.uniform(10, 150) for station_id in range(rng.randint(1, 6))}
+        sessions = [(session_id, rng.choice(list(stations)), rng.uniform(3, 50)) for session_id in range(rng.randint(1, 30))]
+        grid_limit = rng.choice([None, rng.uniform(20, 300)])
+
+        allocation = allocate(sessions, stations, grid_limit)
+
+        for session_id, station_id, demand in sessions:
+            assert 0 < allocation[session_id] <= demand + 1e-9
+        for station_id, limit in stations.items():
+            assert sum(allocation[s] for s, sid, _ in sessions if sid == station_id) <= limit + 1e-6
+        total = sum(allocation.values())
+        if grid_limit is not None:
+            assert total <= grid_limit + 1e-6
+        # Power is only withheld when some limit binds
+        expected = min(sum(min(sum(d for _, sid, d in sessions if sid == station_id), limit)
+                           for station_id, limit in stations.items()), grid_limit or UNLIMITED)
+        assert total == pytest.approx(expected)
+
+
+def test_replan_publishes_only_changed_allocations():
+    bus = RecordingBus()
+    scheduler = LoadScheduler(bus=bus)
+    demands = {1: 10.0, 2: 10.0, 3: 10.0}
+    scheduler._load = lambda key: ([(1, 'a', demands[1]), (2, 'a', demands[2]), (3, 'b', demands[3])],
+                                   {'a': 100.0, 'b': 100.0}, None)
+
+    scheduler.replan(('site', 1))
+    assert sorted(event["session_id"] for event in bus.events) == [1, 2, 3]
+
+    bus.events.clear()
+    scheduler.replan(('site', 1))
+    assert bus.events == []
+
+    demands[3] = 7.0
+    scheduler.replan(('site', 1))
+    assert bus.events == [{"type": "allocation", "session_id": 3, "station_id": 'b', "power_kw": 7.0}]
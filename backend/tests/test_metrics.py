@@ -0,0 +1,86 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+from app.routes.metrics import prometheus_metrics
+from app.utils.metrics import MetricsRegistry
+
+
+def exited_pid():
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def write_worker_snapshot(directory, pid, registry):
+    with open(os.path.join(directory, f"{pid}.json"), 'w') as f:
+        json.dump({"pid": pid, "metrics": registry.snapshot()}, f)
+
+
+def make_registry(directory=None):
+    registry = MetricsRegistry()
+    registry.directory = directory
+    return registry
+
+
+def test_render_merges_worker_snapshots(tmp_path):
+    local = make_registry(str(tmp_path))
+    local.counter('bookings_total', "Bookings", ('status',)).inc(status='ok')
+    local.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0)).observe(0.05)
+    local.gauge('buffered', "Buffered", lambda: 3)
+
+    live, exited = make_registry(), make_registry()
+    for worker in (live, exited):
+        worker.counter('bookings_total', "Bookings", ('status',)).inc(2, status='ok')
+        worker.histogram('latency_seconds', "Latency", buckets=(0.1, 1.0)).observe(0.5)
+        worker.gauge('buffered', "Buffered", lambda: 7)
+    write_worker_snapshot(str(tmp_path), os.getppid(), live)
+    write_worker_snapshot(str(tmp_path), exited_pid(), exited)
+
+    lines = local.render().splitlines()
+
+    assert 'bookings_total{status="ok"} 5' in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1.0"} 3' in lines
+    assert 'latency_seconds_count 3' in lines
+    # Gauges are per live process; the exited worker's is dropped
+    assert sorted(line for line in lines if line.startswith('buffered{')) == sorted([
+        f'buffered{{pid="{os.getpid()}"}} 3', f'buffered{{pid="{os.getppid()}"}} 7'])
+
+
+def test_write_snapshot_round_trips(tmp_path):
+    worker = make_registry(str(tmp_path))
+    worker.counter('events_total', "Events").inc(4)
+    worker.write_snapshot()
+
+    assert os.listdir(tmp_path) == [f"{os.getpid()}.json"]
+    with open(tmp_path / f"{os.getpid()}.json") as f:
+        assert json.load(f)["metrics"]["events_total"]["values"] == [[[], 4]]
+
+
+def test_single_process_render_has_no_pid_label():
+    registry = make_registry()
+    registry.gauge('buffered', "Buffered", lambda: 1)
+
+    assert 'buffered 1' in registry.render().splitlines()
+
+
+@pytest.mark.parametrize("token, public, header, status", [
+    (None, False, None, 401),
+    (None, True, None, 200),
+    ("secret", False, None, 401),
+    ("secret", False, "Bearer wrong", 401),
+    ("secret", False, "Bearer secret", 200),
+])
+def test_metrics_endpoint_is_closed_by_default(app, monkeypatch, token, public, header, status):
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', token)
+    monkeypatch.setitem(app.config, 'METRICS_PUBLIC', public)
+    headers = {"Authorization": header} if header else {}
+
+    with app.test_request_context('/metrics', headers=headers):
+        response = app.make_response(prometheus_metrics())
+
+    assert response.status_code == status
@@ -0,0 +1,58 @@
+from app.utils.notifications import NotificationBackend, NotificationDispatcher
+
+
+class RecordingBackend(NotificationBackend):
+    def __init__(self, failed=0):
+        self.batches = []
+        self.failed = failed
+
+    def send_batch(self, batch):
+        self.batches.append(batch)
+        return self.failed
+
+
+def dispatcher(**options):
+    # No background thread: the tests drive _collect and flush themselves
+    dispatcher = NotificationDispatcher(**options)
+    dispatcher._threads.ensure_started = lambda: None
+    return dispatcher
+
+
+def test_messages_for_one_user_are_coalesced():
+    notifications = dispatcher(batch_size=10, flush_interval=0.05)
+    for user, message in [(1, "confirmed"), (1, "confirmed"), (2, "held"), (1, "cancelled")]:
+        assert notifications.notify(user, message)
+
+    assert notifications._collect() == {1: ["confirmed", "cancelled"], 2: ["held"]}
+    assert notifications._collect() == {}
+
+
+def test_batches_stop_at_batch_size():
+    notifications = dispatcher(batch_size=2, flush_interval=0.05)
+    for user in range(3):
+        notifications.notify(user, "hello")
+
+    assert notifications._collect() == {0: ["hello"], 1: ["hello"]}
+    assert notifications._collect() == {2: ["hello"]}
+
+
+def test_full_queue_drops_without_blocking():
+    notifications = dispatcher(max_queue=2)
+
+    assert [notifications.notify(user, "hello") for user in range(3)] == [True, True, False]
+    stats = notifications.stats()
+    assert (stats["enqueued"], stats["dropped"], stats["queued"]) == (2, 1, 2)
+
+
+def test_flush_counts_failed_and_raising_backends():
+    backend = RecordingBackend(failed=1)
+    notifications = dispatcher(backend=backend)
+    notifications.flush({1: ["a"], 2: ["b"]})
+
+    def broken(batch):
+        raise ConnectionError("channel down")
+    backend.send_batch = broken
+    notifications.flush({3: ["c"]})
+
+    stats = notifications.stats()
+    assert (stats["batches"], stats["delivered"], stats["failed"]) == (2, 1, 2)
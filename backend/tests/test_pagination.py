@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta
+
+
+def test_truncated_page_links_to_the_next_one(client, make_station, make_slot):
+    station_id = make_station()
+    start = datetime.utcnow().replace(microsecond=0) + timedelta(days=1)
+    slot_ids = [make_slot(station_id, start=start + timedelta(hours=hour)) for hour in range(3)]
+
+    first = client.get(f'/api/provider/slot-availability?station_id={station_id}&limit=2')
+    assert first.status_code == 200
+    assert [slot["slot_id"] for slot in first.get_json()["slots"]] == slot_ids[:2]
+    link = first.headers["Link"]
+    assert link.endswith('; rel="next"')
+
+    second = client.get(link[1:link.index('>')])
+    assert second.status_code == 200
+    assert [slot["slot_id"] for slot in second.get_json()["slots"]] == slot_ids[2:]
+    assert second.get_json()["next_cursor"] is None
+    assert "Link" not in second.headers
+
+
+def test_cached_station_listing_keeps_next_link(client, make_station):
+    make_station()
+    make_station()
+
+    first = client.get('/api/stations?limit=1')
+    cached = client.get('/api/stations?limit=1')
+
+    assert first.headers["Link"] == cached.headers["Link"]
+    assert first.get_json()["next_cursor"] in first.headers["Link"]
@@ -0,0 +1,123 @@
+import json
+import os
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models import db, Booking, Payment, Slot
+from app.services.payment_service import LocalGateway
+from app.services.payment_worker import PaymentWorker, payment_worker
+from conftest import slot_amount
+
+CARD_NUMBER = "4242424242424242"
+
+
+def test_outbox_stores_payment_method_reference_not_card(app, client, db_session, make_user, make_station,
+                                                         make_slot):
+    slot_id = make_slot(make_station())
+    _, headers = make_user()
+
+    response = client.post('/api/ev/book-slot', headers=headers, json={
+        "slot_id": slot_id,
+        "payment_details": {"amount": slot_amount(app, slot_id), "card_number": CARD_NUMBER, "cvc": "123"},
+    })
+
+    assert response.status_code == 202
+    payment = Payment.query.join(Booking).filter(Booking.slot_id == slot_id).one()
+    assert CARD_NUMBER not in payment.details and "cvc" not in payment.details
+    assert json.loads(payment.details)["payment_method"].startswith("pm-local-")
+
+
+def test_dispatcher_starts_on_first_request(client):
+    client.get('/api/stations')
+
+    assert payment_worker._threads._pid == os.getpid()
+
+
+def test_local_gateway_replays_successful_charges_only():
+    gateway = LocalGateway(failure_rate=1.0)
+    assert gateway.charge(5.0, "pm-1", "payment-1")["status"] == "failure"
+
+    gateway.failure_rate = 0.0
+    first = gateway.charge(5.0, "pm-1", "payment-1")
+    second = gateway.charge(5.0, "pm-1", "payment-1")
+
+    assert first["status"] == "success"
+    assert second["transaction_id"] == first["transaction_id"]
+    assert gateway.charge(5.0, "pm-1", "payment-2")["transaction_id"] != first["transaction_id"]
+
+
+def test_local_gateway_forgets_charges_after_the_idempotency_window():
+    gateway = LocalGateway(idempotency_window=0.0)
+    first = gateway.charge(5.0, "pm-1", "payment-1")
+    for key in ("payment-2", "payment-3"):
+        gateway.charge(5.0, "pm-1", key)
+
+    # Expired keys are dropped, so the map does not grow with every payment
+    assert list(gateway._charges) == ["payment-3"]
+    assert gateway.charge(5.0, "pm-1", "payment-1")["transaction_id"] != first["transaction_id"]
+
+
+def test_retries_must_fit_the_idempotency_window(app):
+    worker = PaymentWorker(gateway=LocalGateway(idempotency_window=600.0))
+
+    try:
+        with pytest.raises(ValueError, match="idempotency window"):
+            worker.init_app(app)
+    finally:
+        app.extensions['payment_worker'] = payment_worker
+
+
+def test_lease_must_outlast_gateway_timeout(app, monkeypatch):
+    monkeypatch.setitem(app.config, 'PAYMENT_LEASE_SECONDS', 30)
+    worker = PaymentWorker(gateway=LocalGateway())
+
+    try:
+        with pytest.raises(ValueError, match="PAYMENT_LEASE_SECONDS"):
+            worker.init_app(app)
+    finally:
+        app.extensions['payment_worker'] = payment_worker
+
+
+def test_worker_that_lost_its_lease_does_not_settle(app, db_session, make_user, make_station, make_slot):
+    user_id, _ = make_user()
+    slot_id = make_slot(make_station())
+    leased_until = datetime.utcnow().replace(microsecond=0) + timedelta(minutes=5)
+    db.session.query(Slot).filter_by(id=slot_id).update({"status": "reserved", "reserved_by": user_id,
+                                                         "reserved_until": leased_until})
+    booking = Booking(user_id=user_id, slot_id=slot_id, booking_time=datetime.utcnow(), amount=2.0,
+                      status='pending_payment')
+    payment = Payment(booking=booking, amount=2.0, details=json.dumps({"payment_method": "pm-1"}),
+                      status='processing', attempts=0, next_attempt_at=leased_until)
+    db.session.add_all([booking, payment])
+    db.session.commit()
+    payment_id = payment.id
+
+    gateway = LocalGateway()
+    slow, fast = PaymentWorker(gateway=gateway), PaymentWorker(gateway=gateway)
+    slow.app = fast.app = app
+    charge = gateway.charge
+
+    def charge_after_lease_moved(amount, payment_method, key):
+        # The lease expired mid-charge and another worker leased the payment again
+        with app.app_context():
+            db.session.query(Payment).filter_by(id=payment_id).update(
+                {"next_attempt_at": leased_until + timedelta(minutes=5)})
+            db.session.commit()
+            db.session.remove()
+        return charge(amount, payment_method, key)
+
+    gateway.charge = charge_after_lease_moved
+    with app.app_context():
+        slow.process(payment_id)
+        db.session.remove()
+    gateway.charge = charge
+    with app.app_context():
+        fast.process(payment_id)
+        db.session.remove()
+
+    db_session.expire_all()
+    settled = db_session.get(Payment, payment_id)
+    assert settled.status == 'succeeded' and settled.attempts == 1
+    assert settled.booking.status == 'confirmed'
+    assert len(gateway._charges) == 1
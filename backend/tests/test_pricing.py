@@ -0,0 +1,28 @@
+from app.routes import energy_provider
+from app.services import maintenance
+from app.services.pricing_service import slot_price
+
+
+def test_network_rule_is_priced_in_bounded_batches(app, client, make_station, make_slot, monkeypatch):
+    slot_ids = [make_slot(make_station()) for _ in range(3)]
+    batches = []
+    refresh_prices = maintenance.refresh_prices
+
+    def record(station_ids):
+        batches.append(list(station_ids))
+        return refresh_prices(station_ids=station_ids)
+    monkeypatch.setattr(maintenance, 'refresh_prices', record)
+    monkeypatch.setattr(energy_provider, 'reprice_all_stations', lambda: maintenance.reprice_all_stations(limit=1))
+
+    response = client.post('/api/provider/pricing-rules', json={"rate_per_hour": 3.0, "priority": -100})
+    rule_id = response.get_json()["rule"]["id"]
+    try:
+        assert response.status_code == 201
+        assert len(batches) > 1 and all(len(batch) == 1 for batch in batches)
+        with app.app_context():
+            assert [slot_price(slot_id) for slot_id in slot_ids] == [3.0, 3.0, 3.0]
+    finally:
+        assert client.delete(f'/api/provider/pricing-rules/{rule_id}').status_code == 200
+
+    with app.app_context():
+        assert [slot_price(slot_id) for slot_id in slot_ids] == [None, None, None]
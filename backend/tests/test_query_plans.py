@@ -0,0 +1,78 @@
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app.models import db, Booking, ChargingStation, Slot
+from app.queries import history_query, slot_query, station_query
+from app.utils.pagination import paginate
+
+
+@contextmanager
+def captured_statements():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT'):
+            statements.append((statement, parameters))
+    event.listen(db.engine, 'before_cursor_execute', capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', capture)
+
+
+def query_plan(run):
+    """EXPLAIN QUERY PLAN details of every SELECT issued by `run`."""
+    with captured_statements() as statements:
+        run()
+    assert statements
+    connection = db.session.connection()
+    return [row[3] for statement, parameters in statements
+            for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+
+
+def assert_no_full_scan(plan, table):
+    scans = [step for step in plan if step.startswith(f"SCAN {table}") and "INDEX" not in step]
+    assert not scans, plan
+
+
+@pytest.mark.parametrize("filters, index", [
+    ({"pricing": "low", "speed": "fast"}, "ix_charging_station_pricing_speed_status"),
+    ({"pricing": "low"}, "ix_charging_station_pricing_speed_status"),
+    ({"speed": "fast"}, "ix_charging_station_speed_status"),
+])
+def test_station_listing_uses_filter_index(db_session, filters, index):
+    plan = query_plan(lambda: paginate(station_query(**filters), ChargingStation.id, 0, 100))
+
+    assert_no_full_scan(plan, "charging_station")
+    assert any(index in step for step in plan), plan
+
+
+def test_unfiltered_station_listing_seeks_on_primary_key(db_session):
+    plan = query_plan(lambda: paginate(station_query(), ChargingStation.id, 0, 100))
+
+    assert_no_full_scan(plan, "charging_station")
+    assert any("PRIMARY KEY" in step for step in plan), plan
+
+
+def test_price_range_filter_uses_indexes(db_session):
+    plan = query_plan(lambda: paginate(station_query(max_price=5.0), ChargingStation.id, 0, 100))
+
+    for table in ("charging_station", "slot", "slot_price"):
+        assert_no_full_scan(plan, table)
+
+
+def test_slot_listing_uses_station_index(db_session):
+    plan = query_plan(lambda: paginate(slot_query(1), Slot.id, 0, 100))
+
+    assert_no_full_scan(plan, "slot")
+    assert any("ix_slot_station_id_status" in step for step in plan), plan
+
+
+def test_booking_history_uses_user_index(db_session):
+    plan = query_plan(lambda: paginate(history_query(1), Booking.id, 0, 100))
+
+    assert_no_full_scan(plan, "booking")
+    assert_no_full_scan(plan, "slot")
+    assert any("ix_booking_user_id_id" in step for step in plan), plan
@@ -0,0 +1,73 @@
+import uuid
+
+import pytest
+
+from app.utils.rate_limit import InProcessBuckets, RateLimiter, rate_limiter
+
+
+@pytest.fixture
+def limiter(app, monkeypatch):
+    monkeypatch.setattr(rate_limiter, 'backend', InProcessBuckets())
+    monkeypatch.setattr(rate_limiter, 'enabled', True)
+    monkeypatch.setitem(app.config, 'AUTH_RATE_LIMIT_IP', '100/60')
+    monkeypatch.setitem(app.config, 'AUTH_RATE_LIMIT_USER', '3/300')
+    return rate_limiter
+
+
+@pytest.fixture
+def account(client):
+    username, password = f"user-{uuid.uuid4().hex[:12]}", "correct-horse"
+    assert client.post('/api/register', json={"username": username, "password": password}).status_code == 201
+    return username, password
+
+
+def login(client, username, password, address='10.0.0.1'):
+    return client.post('/api/login', json={"username": username, "password": password},
+                       environ_base={'REMOTE_ADDR': address})
+
+
+def test_successful_logins_do_not_drain_user_bucket(client, limiter, account):
+    username, password = account
+
+    for _ in range(5):
+        assert login(client, username, password).status_code == 200
+
+
+def test_failed_logins_are_limited_per_address(client, limiter, account):
+    username, password = account
+
+    for _ in range(3):
+        assert login(client, username, "wrong").status_code == 401
+    rejected = login(client, username, password)
+
+    assert rejected.status_code == 429
+    assert int(rejected.headers['Retry-After']) >= 1
+    # The same account is still reachable from another address
+    assert login(client, username, password, address='10.0.0.2').status_code == 200
+
+
+class FailingBuckets:
+    """Backend that rejects the first bucket, then becomes unreachable."""
+
+    def __init__(self, first=(False, 5.0)):
+        self.first = first
+        self.calls = 0
+
+    def take(self, key, capacity, rate, cost=1):
+        self.calls += 1
+        if self.calls > 1 or self.first is None:
+            raise ConnectionError("backend unreachable")
+        return self.first
+
+
+def test_backend_error_keeps_earlier_rejection():
+    limiter = RateLimiter(FailingBuckets())
+    buckets = [("ip", "10.0.0.1", "30/60"), ("user", "10.0.0.1:alice", "10/300")]
+
+    assert limiter.check("login", buckets) == 5.0
+
+
+def test_backend_error_fails_open():
+    limiter = RateLimiter(FailingBuckets(first=None))
+
+    assert limiter.check("login", [("ip", "10.0.0.1", "30/60")]) == 0.0
@@ -0,0 +1,99 @@
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from app.models import db, ChargingSession, Connector, MeterSample
+from app.services.connectors import AVAILABLE, CHARGING, claim_connector, connector_registry
+from app.services.maintenance import close_stale_sessions
+from app.utils.scheduler import JobScheduler, acquire_lease
+
+
+def test_lease_is_held_by_one_owner_until_it_expires(db_session):
+    name = f"job-{uuid.uuid4().hex[:8]}"
+
+    assert acquire_lease(name, 'worker-a', timedelta(minutes=1))
+    assert not acquire_lease(name, 'worker-b', timedelta(minutes=1))
+    # The owner renews; here with a lease that has already run out
+    assert acquire_lease(name, 'worker-a', timedelta(seconds=-1))
+    assert acquire_lease(name, 'worker-b', timedelta(minutes=1))
+    assert not acquire_lease(name, 'worker-a', timedelta(minutes=1))
+
+
+def test_singleton_job_is_skipped_without_its_lease(app, db_session):
+    scheduler = JobScheduler()
+    scheduler.init_app(app)
+    calls = []
+    scheduler.add('report', lambda: calls.append(1), interval=60, singleton=True)
+    assert acquire_lease('report', 'another-host:1', timedelta(minutes=1))
+
+    assert scheduler._execute(scheduler._jobs['report'], time.monotonic()) == 0
+    assert calls == []
+    # Running a job by hand ignores the lease
+    scheduler.run_job('report')
+    assert calls == [1]
+
+
+def test_full_batches_run_again_after_the_backlog_delay(app):
+    scheduler = JobScheduler()
+    scheduler.init_app(app)
+    backlog = [100, 100, 40]
+    limits = []
+    drained = threading.Event()
+
+    def work(limit):
+        limits.append(limit)
+        if len(limits) == len(backlog):
+            drained.set()
+        return backlog[len(limits) - 1] if len(limits) <= len(backlog) else 0
+
+    scheduler.add('drain', work, interval=3600, batch_size=100, backlog_delay=0.01)
+    with scheduler._lock:
+        # Due now rather than somewhere in its first interval
+        scheduler._heap.clear()
+        scheduler._push(scheduler._jobs['drain'], time.monotonic())
+    scheduler.ensure_started()
+    try:
+        assert drained.wait(5)
+        time.sleep(0.2)
+    finally:
+        scheduler.stop(timeout=5)
+
+    # Two full batches were followed at once; the partial one waits a whole interval
+    assert limits == [100, 100, 100]
+    assert scheduler._heap[0][0] - time.monotonic() > 3500
+
+
+def test_stale_sessions_are_closed_as_abandoned(make_user, make_station, db_session):
+    user_id, _ = make_user()
+    station_id = make_station(capacity=1)
+    now = datetime.utcnow()
+    connector_id = claim_connector(station_id)
+    db_session.commit()
+    connector_registry.mark(station_id, connector_id, CHARGING)
+
+    def session(started_hours_ago, sample_minutes_ago=None, connector=None):
+        row = ChargingSession(user_id=user_id, station_id=station_id, connector_id=connector,
+                              start_time=now - timedelta(hours=started_hours_ago), status='in_progress')
+        db_session.add(row)
+        db_session.flush()
+        if sample_minutes_ago is not None:
+            db_session.add(MeterSample(session_id=row.id, recorded_at=now - timedelta(minutes=sample_minutes_ago),
+                                       energy_kwh=5.0, power_kw=11.0))
+        return row
+
+    silent = session(3, sample_minutes_ago=120, connector=connector_id)
+    reporting = session(3, sample_minutes_ago=5)
+    no_telemetry = session(3)
+    overlong = session(13)
+    db_session.commit()
+
+    closed = close_stale_sessions(idle=timedelta(minutes=30), max_duration=timedelta(hours=12), limit=100)
+
+    assert closed >= 2
+    db_session.expire_all()
+    assert [row.status for row in (silent, reporting, no_telemetry, overlong)] == \
+        ['abandoned', 'in_progress', 'in_progress', 'abandoned']
+    assert silent.end_time == now - timedelta(minutes=120)
+    assert overlong.end_time == overlong.start_time
+    assert db_session.get(Connector, connector_id).state == AVAILABLE
@@ -0,0 +1,31 @@
+import json
+import os
+import subprocess
+import sys
+
+from check_startup import BUDGET_MS, eager_imports, measure_startup
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_startup_fits_the_import_budget():
+    elapsed_ms, rows, result = measure_startup()
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert elapsed_ms <= BUDGET_MS, sorted(rows, reverse=True)[:10]
+    assert eager_imports(rows) == []
+
+
+def test_no_aws_client_is_built_at_import():
+    # Configured AWS settings must not make startup build the Cognito client either
+    env = {**os.environ, 'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'AWS_REGION': 'eu-west-1',
+           'AWS_COGNITO_CLIENT_ID': 'client', 'AWS_COGNITO_CLIENT_SECRET': 'secret',
+           'AWS_COGNITO_USER_POOL_ID': 'eu-west-1_pool', 'JWT_DECODE_ISSUER': 'issuer'}
+    code = ("import json, sys, wsgi\n"
+            "from app.utils import aws\n"
+            "print(json.dumps({'clients': len(aws._clients), 'boto3': 'boto3' in sys.modules}))")
+
+    result = subprocess.run([sys.executable, '-c', code], cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+    assert result.returncode == 0, result.stderr[-2000:]
+    assert json.loads(result.stdout.strip().splitlines()[-1]) == {"clients": 0, "boto3": False}
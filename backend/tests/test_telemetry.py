@@ -0,0 +1,45 @@
+from datetime import datetime, timedelta
+
+from app.models import db, ChargingSession, MeterSample, User
+from app.services.telemetry import parse_samples, telemetry_ingestor
+
+
+def test_iso_timestamps_with_offsets_are_stored_as_naive_utc():
+    rows = parse_samples([
+        {"session_id": 1, "timestamp": "2026-10-18T12:00:00Z", "power_kw": 11.0},
+        {"session_id": 1, "timestamp": "2026-10-18T14:00:30+02:00", "power_kw": 11.0},
+    ])
+
+    assert [row["recorded_at"] for row in rows] == [datetime(2026, 10, 18, 12, 0), datetime(2026, 10, 18, 12, 0, 30)]
+
+
+def test_flush_leaves_the_callers_transaction_alone(app, db_session):
+    session_id = 10 ** 9
+    telemetry_ingestor.ingest([{"session_id": session_id, "recorded_at": datetime.utcnow(), "energy_kwh": 1.0,
+                                "power_kw": None}])
+    db_session.add(User(username="uncommitted-telemetry-caller", password='-', role='user'))
+
+    telemetry_ingestor.flush()
+    db_session.rollback()
+
+    assert User.query.filter_by(username="uncommitted-telemetry-caller").count() == 0
+    assert MeterSample.query.filter_by(session_id=session_id).count() == 1
+
+
+def test_ending_a_session_downsamples_offset_timestamps(client, db_session, make_user, make_station):
+    station_id = make_station()
+    _, headers = make_user()
+    started = client.post('/api/sessions/start', headers=headers, json={"station_id": station_id})
+    assert started.status_code == 201, started.get_json()
+    session_id = started.get_json()["session_id"]
+    base = datetime.utcnow().replace(microsecond=0) - timedelta(minutes=10)
+    samples = [{"session_id": session_id, "timestamp": (base + timedelta(minutes=minute)).isoformat() + "Z",
+                "energy_kwh": 10.0 + minute} for minute in range(5)]
+    assert client.post('/api/provider/telemetry', json={"samples": samples}).status_code == 202
+
+    ended = client.post(f'/api/sessions/end/{session_id}', headers=headers)
+
+    assert ended.status_code == 200, ended.get_json()
+    db_session.expire_all()
+    assert db_session.get(ChargingSession, session_id).energy_kwh == 4.0
+    assert MeterSample.query.filter_by(session_id=session_id).count() == 5
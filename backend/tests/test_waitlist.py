@@ -0,0 +1,120 @@
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from app.models import db, Booking, Payment, Slot, WaitlistEntry
+from app.services.payment_service import LocalGateway
+from app.services.payment_worker import PaymentWorker
+from app.services.waitlist import StationQueue, WaitlistAllocator, parse_entry
+
+
+def test_aware_window_is_stored_as_naive_utc(client, make_user, make_station):
+    _, headers = make_user()
+    station_id = make_station()
+    start = (datetime.now(timezone.utc) + timedelta(days=1)).replace(microsecond=0)
+    offset = timezone(timedelta(hours=2))
+
+    response = client.post('/api/ev/waitlist', headers=headers, json={
+        "station_id": station_id,
+        "from": start.astimezone(offset).isoformat(),
+        "to": (start + timedelta(hours=2)).isoformat().replace('+00:00', 'Z'),
+    })
+
+    assert response.status_code == 201
+    assert response.get_json()["entry"]["from"] == start.replace(tzinfo=None).isoformat()
+
+
+def test_parse_entry_compares_mixed_offsets():
+    start = datetime.now(timezone.utc) + timedelta(days=1)
+
+    _, window_start, window_end = parse_entry({
+        "station_id": 1,
+        "from": start.isoformat(),
+        "to": (start + timedelta(hours=1)).replace(tzinfo=None).isoformat(),
+    })
+
+    assert window_start.tzinfo is None and window_end - window_start == timedelta(hours=1)
+
+
+def test_best_matches_a_full_scan():
+    rng = random.Random(3)
+    now = datetime(2026, 11, 2, 8, 0)
+    queue = StationQueue()
+    entries = []
+    for entry_id in range(1, 3001):
+        window_start = now + timedelta(minutes=rng.randrange(-600, 48 * 60))
+        window_end = window_start + timedelta(minutes=rng.randrange(15, 3 * 24 * 60))
+        created_at = now - timedelta(seconds=rng.randrange(86400))
+        entries.append((window_start, window_end, created_at, entry_id, entry_id))
+        queue.push(window_start, window_end, created_at, entry_id, entry_id)
+    removed = set(rng.sample(range(1, 3001), 500))
+    for entry_id in removed:
+        queue.discard(entry_id)
+
+    for _ in range(300):
+        start = now + timedelta(minutes=30 * rng.randrange(96))
+        end = start + timedelta(minutes=rng.choice((30, 60, 120)))
+        expected = min(((created_at, entry_id, user_id)
+                        for window_start, window_end, created_at, entry_id, user_id in entries
+                        if entry_id not in removed and window_end > now
+                        and window_start <= start and end <= window_end), default=None)
+
+        best = queue.best(start, end, now)
+
+        assert best == expected
+        if best is not None:
+            queue.discard(best[1])
+            removed.add(best[1])
+
+
+def test_changes_during_load_are_replayed(app, monkeypatch):
+    allocator = WaitlistAllocator(reload_seconds=3600)
+    window_start = datetime.utcnow() + timedelta(hours=2)
+    window_end = window_start + timedelta(hours=1)
+
+    def load(station_id):
+        # Another request joins and another cancels while this one reads the database
+        queue = StationQueue()
+        queue.push(window_start, window_end, datetime.utcnow(), 1, 10)
+        allocator.discard(station_id, 1)
+        allocator._change(station_id, lambda queue: queue.push(window_start, window_end, datetime.utcnow(), 2, 20))
+        return queue
+    monkeypatch.setattr(allocator, '_load', load)
+
+    candidate = allocator.candidate(7, window_start, window_end, datetime.utcnow())
+
+    assert candidate == (2, 20)
+    assert allocator._loading == {}
+
+
+def test_failed_payment_puts_the_offer_back_in_line(app, db_session, make_user, make_station, make_slot):
+    user_id, _ = make_user()
+    slot_id = make_slot(make_station())
+    now = datetime.utcnow().replace(microsecond=0)
+    leased_until = now + timedelta(minutes=5)
+    db.session.query(Slot).filter_by(id=slot_id).update({"status": "reserved", "reserved_by": user_id,
+                                                         "reserved_until": leased_until})
+    entry = WaitlistEntry(user_id=user_id, station_id=db.session.get(Slot, slot_id).station_id,
+                          window_start=now, window_end=now + timedelta(hours=3), status='booked',
+                          created_at=now - timedelta(hours=1), slot_id=slot_id)
+    booking = Booking(user_id=user_id, slot_id=slot_id, booking_time=now, amount=2.0, status='pending_payment')
+    # Leased into the future, so the app's own dispatcher leaves it alone
+    payment = Payment(booking=booking, amount=2.0, details=json.dumps({"payment_method": "pm-1"}),
+                      status='processing', attempts=0, next_attempt_at=leased_until)
+    db.session.add_all([entry, booking, payment])
+    db.session.commit()
+    entry_id, payment_id = entry.id, payment.id
+
+    worker = PaymentWorker(gateway=LocalGateway(failure_rate=1.0), max_attempts=1)
+    worker.app = app
+    with app.app_context():
+        worker.process(payment_id)
+        db.session.remove()
+
+    db_session.expire_all()
+    assert db_session.get(Payment, payment_id).status == 'failed'
+    # Back at the front of the queue, so the released slot is offered to the same user again
+    reopened = db_session.get(WaitlistEntry, entry_id)
+    assert (reopened.status, reopened.slot_id) == ('offered', slot_id)
+    slot = db_session.get(Slot, slot_id)
+    assert (slot.status, slot.reserved_by) == ('held', user_id)
@@ -0,0 +1,13 @@
+import os
+from app import create_app, db
+
+# Production entry point: gunicorn -c gunicorn.conf.py wsgi:app
+app = create_app()
+
+# With gunicorn's preload mode this runs once in the master, and every forked
+# worker starts with the index already built (kept current by its own change bus)
+if os.getenv('WARM_AVAILABILITY_INDEX', '0').lower() in ('1', 'true'):
+    from app.services.availability import availability_index
+    with app.app_context():
+        availability_index.ensure_loaded()
+        db.session.remove()